@@ -3,20 +3,62 @@ Aurora QA System - FastAPI Application
 
 Serves both the API endpoints and the static frontend.
 Single deployment for frontend + backend + QA system.
+
+Indexes can be hot-reloaded without a restart: POST /admin/reload (with
+X-Admin-Token = ADMIN_TOKEN) or INDEX_WATCH=1 to watch the data directory.
+Each request runs on the index generation that was current when it started.
+
+Multi-worker memory: SHARED_INDEXES=1 memory-maps BM25 (shared page cache
+across workers); PRELOAD_INDEXES=1 additionally loads the indexes at import
+time so that `gunicorn --preload` workers share them copy-on-write.
+
+Tracing: every /ask is traced per pipeline stage (src/tracing.py). Send
+"include_timings": true to get the breakdown in metadata.timings; set
+TRACE_EXPORT_PATH to append each trace as OTLP/JSON to a local file.
+
+Offline runs (load tests): VECTOR_BACKEND=local keeps the vector index in
+process (src/local_vector_search.py) instead of Qdrant Cloud, and
+GROQ_BASE_URL points the LLM client at a stub server.
+
+Coalescing: identical concurrent questions (same normalised text, same
+index generation) share one pipeline run, and a finished answer keeps
+serving the same question for ASK_RESULT_WINDOW seconds (default 5).
+ASK_COALESCING=0 turns it off; include_timings requests always run their own.
+
+Batches: POST /ask/batch answers up to BATCH_MAX_QUESTIONS questions in one
+request and streams one NDJSON line per question as soon as it is answered,
+then a summary line. Routing, sub-query embedding and retrieval are shared
+across the batch (QASystem.answer_batch); BATCH_LLM_CONCURRENCY answers
+generate at a time (default 4), under the same LLM gateway limits as /ask.
+
+Metrics: GET /metrics (Prometheus text format) — request rate and latency per
+route, per-stage latency histograms, LLM usage per call site, cache hit
+rates, retrieval result counts and queue depth. /health probes each component.
 """
 import os
+import json
 import time
+import asyncio
 import logging
-from typing import Optional
+import threading
+from typing import List, Optional
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from starlette.routing import Match
 from pydantic import BaseModel, Field
 
 from src.qa_system import QASystem
+from src.local_vector_search import LocalVectorSearch
+from src.index_reloader import IndexReloader, IndexGeneration
+from src.shared_index import preload
+from src.tracing import start_trace, set_exporter, add_trace_listener, JSONFileExporter
+from src.metrics import REGISTRY, HTTP_REQUESTS, HTTP_IN_PROGRESS, observe_trace
+from src.llm_gateway import all_gateways
+from src.request_coalescer import RequestCoalescer
 
 # Configure logging
 logging.basicConfig(
@@ -25,8 +67,46 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Global QA system instance
-qa_system: Optional[QASystem] = None
+# Index generations (each holds one QASystem); swapped atomically on reload
+index_reloader: Optional[IndexReloader] = None
+
+DATA_DIR = os.getenv("DATA_DIR", "data")
+
+
+def env_flag(name: str) -> bool:
+    """True if an environment variable is set to 1/true/yes"""
+    return os.getenv(name, "").lower() in ("1", "true", "yes")
+
+
+# Read-only indexes loaded once in the parent before workers fork (gunicorn --preload)
+PRELOADED: Optional[dict] = preload(DATA_DIR) if env_flag("PRELOAD_INDEXES") else None
+SHARED_INDEXES = env_flag("SHARED_INDEXES") or PRELOADED is not None
+
+# "qdrant" (Qdrant Cloud) or "local" (in-process vectors built from the BM25 messages)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant")
+
+# Single-flight /ask coalescing and the result window (seconds) after completion
+ASK_COALESCING = os.getenv("ASK_COALESCING", "1").lower() in ("1", "true", "yes")
+ASK_RESULT_WINDOW = float(os.getenv("ASK_RESULT_WINDOW", 5))
+coalescer: Optional[RequestCoalescer] = None
+
+# /ask/batch: questions per request, answers generated at a time, retrieval threads
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", 100))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", 4))
+BATCH_RETRIEVAL_WORKERS = int(os.getenv("BATCH_RETRIEVAL_WORKERS", 8))
+
+# Set if the startup load failed (reported by /ready and /health)
+startup_error: Optional[str] = None
+
+# Finished request traces are appended as OTLP/JSON lines (no collector needed)
+if os.getenv("TRACE_EXPORT_PATH"):
+    set_exporter(JSONFileExporter(os.getenv("TRACE_EXPORT_PATH")))
+
+# Per-route / per-stage metrics are taken from each finished trace
+add_trace_listener(observe_trace)
+
+# Seconds each /health component probe may take
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", 2))
 
 
 # ==================== Pydantic Models ====================
@@ -39,11 +119,35 @@ class QuestionRequest(BaseModel):
         max_length=1000,
         description="Natural language question about member data"
     )
+    include_timings: bool = Field(
+        False,
+        description="Return the per-stage latency/token breakdown in metadata.timings"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "question": "Which clients requested a private tour of the Louvre?",
+                "include_timings": False
+            }
+        }
+
+
+class BatchQuestionRequest(BaseModel):
+    """Request model for /ask/batch endpoint"""
+    questions: List[str] = Field(
+        ...,
+        min_length=1,
+        description="Questions to answer together (at most BATCH_MAX_QUESTIONS)"
+    )
 
     class Config:
         json_schema_extra = {
             "example": {
-                "question": "Which clients requested a private tour of the Louvre?"
+                "questions": [
+                    "Which clients requested a private tour of the Louvre?",
+                    "What are Vikram Desai's dining preferences?"
+                ]
             }
         }
 
@@ -91,42 +195,99 @@ class HealthResponse(BaseModel):
     version: str
     components: dict
     uptime_seconds: float
+    index: dict = {}
+    coalescing: dict = {}
 
 
-# ==================== Lifespan Context Manager ====================
+# ==================== Index Generations ====================
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
+def load_qa_system(previous: Optional[QASystem]) -> QASystem:
     """
-    Lifespan context manager for startup and shutdown events
+    Build a QA system for a new index generation
+
+    Args:
+        previous: Current system (None at startup); its Qdrant client,
+                  embedding model and LLM clients are reused
+
+    Returns:
+        Loaded QASystem
     """
-    # Startup
-    logger.info("🚀 Starting Aurora QA System...")
+    if previous is not None:
+        system = previous.reload_indexes()
+    else:
+        # The first generation uses the pre-fork indexes if there are any
+        system = QASystem(
+            embedding_path=os.path.join(DATA_DIR, "embeddings"),
+            bm25_path=os.path.join(DATA_DIR, "bm25"),
+            graph_path=os.path.join(DATA_DIR, "knowledge_graph.pkl"),
+            preloaded=PRELOADED,
+            shared_memory=SHARED_INDEXES,
+            qdrant_search=LocalVectorSearch() if VECTOR_BACKEND == "local" else None
+        )
 
-    global qa_system
+    vectors = system.retriever.qdrant_search
+    if isinstance(vectors, LocalVectorSearch):
+        # Point id = BM25 position, as in the Qdrant collection (upsert overwrites)
+        messages = list(system.retriever.bm25_search.messages)
+        vectors.upsert_messages(messages, point_ids=list(range(len(messages))))
+    return system
+
+
+def initial_load():
+    """Load the first index generation (runs in a worker thread at startup)"""
+    global startup_error
 
     try:
-        # Initialize QA System (loads all indexes)
         start_time = time.time()
-
         logger.info("Loading QA System components...")
-        qa_system = QASystem(
-            embedding_path="data/embeddings",
-            bm25_path="data/bm25",
-            graph_path="data/knowledge_graph.pkl"
-        )
+        index_reloader.reload()
 
         load_time = time.time() - start_time
-        logger.info(f"✅ QA System loaded successfully in {load_time:.2f}s")
+        logger.info(f"✅ QA System loaded successfully in {load_time:.2f}s "
+                    f"(index version {index_reloader.current.version})")
+
+        if env_flag("INDEX_WATCH"):
+            index_reloader.start_watching()
 
     except Exception as e:
+        startup_error = f"{type(e).__name__}: {e}"
         logger.error(f"❌ Failed to initialize QA System: {str(e)}")
-        raise
+
+
+def current_generation() -> Optional[IndexGeneration]:
+    """Generation serving new requests (hold it for the whole request)"""
+    return index_reloader.current if index_reloader else None
+
+
+# ==================== Lifespan Context Manager ====================
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Lifespan context manager for startup and shutdown events
+    """
+    # Startup
+    logger.info("🚀 Starting Aurora QA System...")
+
+    global index_reloader, startup_error, coalescer
+
+    index_reloader = IndexReloader(
+        loader=load_qa_system,
+        data_dir=DATA_DIR,
+        poll_interval=float(os.getenv("INDEX_WATCH_INTERVAL", 5))
+    )
+    startup_error = None
+    coalescer = RequestCoalescer(window=ASK_RESULT_WINDOW) if ASK_COALESCING else None
+
+    # Load the first generation in the background: the server accepts
+    # connections at once and /ready reports 503 until the load finishes
+    app.state.startup_task = asyncio.create_task(asyncio.to_thread(initial_load))
 
     yield
 
     # Shutdown
     logger.info("🛑 Shutting down Aurora QA System...")
+    index_reloader.stop_watching()
 
 
 # ==================== FastAPI App ====================
@@ -152,6 +313,30 @@ app.add_middleware(
 
 # ==================== Middleware ====================
 
+def route_path(request: Request) -> str:
+    """Route template of a request (keeps metric labels bounded), "other" if unmatched"""
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, 'path', 'other')
+    return "other"
+
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    """Count requests per route and track how many are in progress"""
+    path = route_path(request)
+    HTTP_IN_PROGRESS.inc(path=path)
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        HTTP_IN_PROGRESS.dec(path=path)
+        HTTP_REQUESTS.inc(method=request.method, path=path, status=status)
+
+
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
     """Add processing time to response headers"""
@@ -192,7 +377,11 @@ async def api_info():
         "description": "Natural language Q&A system for luxury concierge members",
         "endpoints": {
             "ask": "POST /ask - Submit a question",
+            "ask_batch": "POST /ask/batch - Submit many questions (NDJSON stream of answers)",
             "health": "GET /health - Check system health",
+            "ready": "GET /ready - Readiness + per-component load times",
+            "metrics": "GET /metrics - Prometheus metrics",
+            "reload": "POST /admin/reload - Hot-reload indexes (X-Admin-Token)",
             "docs": "GET /docs - Interactive API documentation"
         },
         "examples": [
@@ -218,8 +407,9 @@ async def ask_question(request: QuestionRequest):
     Returns a natural language answer with metadata.
     """
     try:
-        # Validate QA system is loaded
-        if qa_system is None:
+        # Validate QA system is loaded (this request stays on this generation)
+        generation = current_generation()
+        if generation is None:
             raise HTTPException(
                 status_code=503,
                 detail="QA System not initialized. Please try again later."
@@ -237,12 +427,26 @@ async def ask_question(request: QuestionRequest):
         logger.info(f"Processing question: {question}")
         start_time = time.time()
 
-        result = qa_system.answer(
-            query=question,
-            top_k=20,
-            temperature=0.3,
-            verbose=False
-        )
+        async def run_pipeline():
+            with start_trace("POST /ask", index_version=generation.version) as trace:
+                # The pipeline blocks (retrieval, LLM calls): run it off the event loop so
+                # concurrent requests overlap. to_thread copies the trace context.
+                result = await asyncio.to_thread(
+                    generation.system.answer,
+                    query=question,
+                    top_k=20,
+                    temperature=0.3,
+                    verbose=False
+                )
+                trace.root.set_attribute("route", result.get('route', 'UNKNOWN'))
+            return result, trace
+
+        # Identical concurrent questions share one run; timing requests measure their own
+        if coalescer is not None and not request.include_timings:
+            (result, trace), coalesced = await coalescer.run(
+                coalescer.key(question, generation.generation), run_pipeline)
+        else:
+            (result, trace), coalesced = await run_pipeline(), "computed"
 
         processing_time = (time.time() - start_time) * 1000  # Convert to ms
 
@@ -250,29 +454,30 @@ async def ask_question(request: QuestionRequest):
         confidence = calculate_confidence(result)
 
         # Get sources for transparency
-        sources = result.get('sources', [])
-        sources_data = []
-        for source in sources[:20]:  # Limit to top 20 for UI performance
-            sources_data.append({
-                "user_id": source.get('user_id', 'Unknown'),
-                "text": source.get('text', ''),
-                "timestamp": source.get('timestamp', None),
-                "score": source.get('score', 0)
-            })
+        sources_data = format_sources(result)
+
+        metadata = {
+            "route": result.get('route', 'UNKNOWN'),
+            "processing_time_ms": int(processing_time),
+            "sources_count": result.get('num_sources', 0),
+            "confidence": confidence,
+            "model": result.get('model', 'unknown'),
+            "index_version": generation.version,
+            "query_plans": len(result.get('query_plans', [])),
+            "context": result.get('context'),  # LLM context kept/dropped (LOOKUP route)
+            "prompt_tokens": result.get('prompt_sections'),  # Estimated prompt tokens per section
+            "sources": sources_data,  # Include actual source messages
+            "trace_id": trace.trace_id,
+            "coalesced": coalesced  # computed / in_flight / window
+        }
+        if request.include_timings:
+            metadata["timings"] = trace.timings()  # Per-stage latency + LLM tokens
 
         # Format response
         response = AnswerResponse(
             success=True,
             answer=result['answer'],
-            metadata={
-                "route": result.get('route', 'UNKNOWN'),
-                "processing_time_ms": int(processing_time),
-                "sources_count": result.get('num_sources', 0),
-                "confidence": confidence,
-                "model": result.get('model', 'unknown'),
-                "query_plans": len(result.get('query_plans', [])),
-                "sources": sources_data  # Include actual source messages
-            }
+            metadata=metadata
         )
 
         logger.info(f"✅ Answer generated in {processing_time:.0f}ms")
@@ -288,42 +493,115 @@ async def ask_question(request: QuestionRequest):
         )
 
 
+def probe_qdrant(qa_system) -> Optional[dict]:
+    """Collection size from Qdrant (a real round trip); None without a Qdrant client"""
+    qdrant_search = getattr(qa_system.retriever, 'qdrant_search', None)
+    if getattr(qdrant_search, 'client', None) is None:
+        return None  # e.g. LocalVectorSearch
+    info = qdrant_search.client.get_collection(qdrant_search.collection_name)
+    return {"collection": qdrant_search.collection_name, "points": info.points_count}
+
+
+def probe_bm25(qa_system) -> Optional[dict]:
+    """One BM25 query over the loaded index"""
+    bm25_search = getattr(qa_system.retriever, 'bm25_search', None)
+    if bm25_search is None:
+        return None
+    bm25_search.search("health check", top_k=1)
+    return {"documents": len(bm25_search.messages)}
+
+
+def probe_knowledge_graph(qa_system) -> Optional[dict]:
+    """Size of the loaded graph"""
+    knowledge_graph = getattr(qa_system.retriever, 'knowledge_graph', None)
+    if knowledge_graph is None:
+        return None
+    graph = knowledge_graph.graph
+    return {"nodes": graph.number_of_nodes(), "edges": graph.number_of_edges()}
+
+
+def probe_llm(qa_system) -> dict:
+    """Gateway counters (no paid call): calls, errors, 429s and queued calls"""
+    totals = {"calls": 0, "errors": 0, "rate_limited": 0, "queued": 0}
+    for gateway in all_gateways():
+        for counts in gateway.stats().values():
+            for key in ("calls", "errors", "rate_limited"):
+                totals[key] += counts[key]
+        totals["queued"] += sum(q["waiting"] for q in gateway.queue_depth().values())
+    return totals
+
+
+HEALTH_PROBES = {
+    "qdrant": probe_qdrant,
+    "bm25": probe_bm25,
+    "knowledge_graph": probe_knowledge_graph,
+    "llm": probe_llm
+}
+
+
+async def run_probe(probe, qa_system) -> dict:
+    """
+    Run one probe in a worker thread with a timeout
+
+    A probe returns None when its component is not configured
+    ("not_available"); any exception it raises is reported as an error.
+    """
+    start = time.perf_counter()
+    try:
+        details = await asyncio.wait_for(asyncio.to_thread(probe, qa_system), HEALTH_PROBE_TIMEOUT)
+        if details is None:
+            return {"status": "not_available"}
+        status = "ok"
+    except asyncio.TimeoutError:
+        details, status = {}, "timeout"
+    except Exception as e:
+        details, status = {"error": f"{type(e).__name__}: {e}"}, "error"
+    return {"status": status, "latency_ms": round((time.perf_counter() - start) * 1000, 1), **details}
+
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """
     Health check endpoint
 
-    Returns the status of the QA system and its components.
+    Probes each component (Qdrant round trip, a BM25 query, graph size,
+    LLM gateway error counters); "degraded" if any probe fails.
     """
     try:
         # Check if QA system is loaded
-        if qa_system is None:
+        generation = current_generation()
+        if generation is None:
             return JSONResponse(
                 status_code=503,
                 content={
                     "status": "unhealthy",
                     "version": "1.0.0",
                     "components": {
-                        "qa_system": "not_initialized"
+                        "qa_system": "failed" if startup_error else "not_initialized"
                     },
                     "uptime_seconds": 0
                 }
             )
 
-        # Check components
-        components = {
-            "qa_system": "healthy",
-            "qdrant": "connected" if hasattr(qa_system.retriever, 'qdrant_search') else "unknown",
-            "bm25": "loaded" if hasattr(qa_system.retriever, 'bm25_search') else "unknown",
-            "knowledge_graph": "loaded" if hasattr(qa_system.retriever, 'knowledge_graph') else "unknown",
-            "llm": "configured" if qa_system.generator else "unknown"
-        }
+        # Probe components concurrently
+        qa_system = generation.system
+        names = list(HEALTH_PROBES)
+        results = await asyncio.gather(*(run_probe(HEALTH_PROBES[name], qa_system) for name in names))
+        components = {"qa_system": {"status": "ok"}, **dict(zip(names, results))}
+        healthy = all(c["status"] in ("ok", "not_available") for c in components.values())
 
         return HealthResponse(
-            status="healthy",
+            status="healthy" if healthy else "degraded",
             version="1.0.0",
             components=components,
-            uptime_seconds=time.time() - app.state.start_time if hasattr(app.state, 'start_time') else 0
+            uptime_seconds=time.time() - app.state.start_time if hasattr(app.state, 'start_time') else 0,
+            index={
+                **generation.info(),
+                'reloads': index_reloader.reloads,
+                'watching': index_reloader.watching,
+                'last_reload_error': index_reloader.last_error
+            },
+            coalescing=coalescer.info() if coalescer is not None else {'enabled': False}
         )
 
     except Exception as e:
@@ -338,8 +616,249 @@ async def health_check():
         )
 
 
+def index_metrics():
+    """Index generation metrics (scrape-time collector)"""
+    generation = current_generation()
+    if generation is None:
+        return [("aurora_ready", "gauge", "1 once the first index generation is loaded", [({}, 0)])]
+    return [
+        ("aurora_ready", "gauge", "1 once the first index generation is loaded", [({}, 1)]),
+        ("aurora_index_version", "gauge", "Manifest version of the serving indexes", [({}, generation.version)]),
+        ("aurora_index_generation", "gauge", "Index generations loaded by this process",
+         [({}, generation.generation)]),
+        ("aurora_index_reloads_total", "counter", "Successful index hot-reloads", [({}, index_reloader.reloads)]),
+    ]
+
+
+REGISTRY.add_collector(index_metrics)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus metrics (text exposition format)
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/ready")
+async def readiness():
+    """
+    Readiness check
+
+    503 while the first index generation is loading (or if it failed);
+    once ready, reports the index version and per-component load times.
+    """
+    generation = current_generation()
+    if generation is None:
+        return JSONResponse(
+            status_code=503,
+            content={
+                "status": "failed" if startup_error else "loading",
+                "error": startup_error
+            }
+        )
+
+    system = generation.system
+    return {
+        "status": "ready",
+        **generation.info(),
+        "components": getattr(system, 'load_times', {}),
+        "lazy_components": {
+            "graph_analytics": "loaded" if getattr(system, '_analytics', None) is not None else "on_first_use"
+        }
+    }
+
+
+@app.post("/admin/reload", response_model=dict)
+async def reload_indexes(force: bool = True, x_admin_token: Optional[str] = Header(None)):
+    """
+    Load the current index files in the background and swap them in
+
+    In-flight requests finish on the previous generation. Requires the
+    X-Admin-Token header to match ADMIN_TOKEN (disabled when unset).
+
+    Args:
+        force: Reload even if the index files are unchanged
+    """
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints disabled (ADMIN_TOKEN not set)")
+    if x_admin_token != admin_token:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+    if current_generation() is None:
+        raise HTTPException(status_code=503, detail="QA System not initialized. Please try again later.")
+
+    result = await asyncio.to_thread(index_reloader.reload, force)
+
+    if result['reason'] == 'reload_in_progress':
+        raise HTTPException(status_code=409, detail="Index reload already in progress")
+    if result['reason'] == 'load_failed':
+        raise HTTPException(status_code=500, detail=f"Index reload failed: {index_reloader.last_error}")
+
+    logger.info(f"Index reload: {result['reason']} (version {result.get('index_version')})")
+    return result
+
+
+@app.post("/ask/batch")
+async def ask_batch(request: BatchQuestionRequest):
+    """
+    Submit several questions; answers stream back as they complete
+
+    Planning, sub-query embedding and retrieval are shared across the batch
+    and equivalent questions are answered once (QASystem.answer_batch).
+
+    Returns application/x-ndjson: one line per question, in completion order
+    ({"index", "question", "success", "answer", "metadata"} or
+    {"index", "question", "success": false, "error"}), then a summary line
+    ({"done": true, ...} with the batch counters).
+    """
+    # Validate QA system is loaded (the whole batch stays on this generation)
+    generation = current_generation()
+    if generation is None:
+        raise HTTPException(
+            status_code=503,
+            detail="QA System not initialized. Please try again later."
+        )
+
+    # Validate questions
+    questions = [question.strip() for question in request.questions]
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch"
+        )
+    for i, question in enumerate(questions):
+        if not question or len(question) > 1000:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Question {i} must be 1-1000 characters"
+            )
+
+    logger.info(f"Processing batch of {len(questions)} questions")
+    start_time = time.time()
+    loop = asyncio.get_running_loop()
+    lines: asyncio.Queue = asyncio.Queue()
+    abandoned = threading.Event()
+
+    def emit(line: Optional[dict]):
+        loop.call_soon_threadsafe(lines.put_nowait, line)
+
+    def run_batch():
+        # One trace for the whole batch; answer_batch's worker threads inherit it
+        stats, errors, summary = {}, 0, {}
+        try:
+            with start_trace("POST /ask/batch", index_version=generation.version,
+                             questions=len(questions)) as trace:
+                trace.root.set_attribute("route", "BATCH")
+                answers = generation.system.answer_batch(
+                    questions,
+                    top_k=20,
+                    temperature=0.3,
+                    retrieval_workers=BATCH_RETRIEVAL_WORKERS,
+                    llm_concurrency=BATCH_LLM_CONCURRENCY,
+                    stats=stats
+                )
+                try:
+                    for done in answers:
+                        if abandoned.is_set():
+                            break  # client gone: stop scheduling the remaining questions
+                        elapsed_ms = int((time.time() - start_time) * 1000)
+                        if 'error' in done:
+                            errors += len(done['indices'])
+                        for index in done['indices']:
+                            emit(batch_line(index, questions[index], done, generation, elapsed_ms))
+                finally:
+                    answers.close()
+            summary = {"success": True, "trace_id": trace.trace_id}
+        except Exception as e:
+            logger.error(f"❌ Error processing batch: {str(e)}", exc_info=True)
+            summary = {"success": False, "error": f"Internal server error: {str(e)}"}
+        finally:
+            processing_time = (time.time() - start_time) * 1000
+            emit({"done": True, **summary, **stats, "errors": errors,
+                  "processing_time_ms": int(processing_time), "index_version": generation.version})
+            emit(None)
+            logger.info(f"✅ Batch of {len(questions)} answered in {processing_time:.0f}ms")
+
+    async def stream():
+        producer = asyncio.ensure_future(asyncio.to_thread(run_batch))
+        try:
+            while (line := await lines.get()) is not None:
+                yield json.dumps(line, default=_json_default) + "\n"
+            await producer
+        finally:
+            abandoned.set()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 # ==================== Helper Functions ====================
 
+def format_sources(result: dict, limit: int = 20) -> list:
+    """
+    Source messages of a result, as returned to the UI
+
+    Args:
+        result: QA system result dictionary
+        limit: Sources kept (top ones; keeps the UI responsive)
+
+    Returns:
+        [{"user_id", "text", "timestamp", "score"}, ...]
+    """
+    return [
+        {
+            "user_id": source.get('user_id', 'Unknown'),
+            "text": source.get('text', ''),
+            "timestamp": source.get('timestamp', None),
+            "score": source.get('score', 0)
+        }
+        for source in result.get('sources', [])[:limit]
+    ]
+
+
+def batch_line(index: int, question: str, done: dict, generation, elapsed_ms: int) -> dict:
+    """
+    NDJSON line for one question of a batch
+
+    Args:
+        index: Position of the question in the request
+        question: Question as submitted
+        done: Item yielded by QASystem.answer_batch
+        generation: Index generation answering the batch
+        elapsed_ms: Milliseconds since the batch started
+
+    Returns:
+        Answer line (as /ask's response) or error line
+    """
+    if 'error' in done:
+        return {"index": index, "question": question, "success": False, "error": done['error']}
+
+    result = done['result']
+    return {
+        "index": index,
+        "question": question,
+        "success": True,
+        "answer": result['answer'],
+        "metadata": {
+            "route": result.get('route', 'UNKNOWN'),
+            "processing_time_ms": elapsed_ms,
+            "sources_count": result.get('num_sources', 0),
+            "confidence": calculate_confidence(result),
+            "model": result.get('model', 'unknown'),
+            "index_version": generation.version,
+            "query_plans": len(result.get('query_plans', [])),
+            "sources": format_sources(result),
+            "shared_with": [i for i in done['indices'] if i != index]  # equivalent questions in the batch
+        }
+    }
+
+
+def _json_default(value):
+    """JSON fallback for numpy scalars and other non-JSON values"""
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
 def calculate_confidence(result: dict) -> str:
     """
     Calculate confidence level based on query results
@@ -0,0 +1,3 @@
+"""
+Offline benchmarks for the QA system (run with python -m benchmarks.<name>)
+"""
@@ -0,0 +1,266 @@
+"""
+Groq-Compatible LLM Stub Server
+
+Local HTTP server speaking the OpenAI/Groq chat completions protocol, so the
+real GroqBackend (SDK, connection pool, retries) can be load tested offline.
+Point the API at it with GROQ_BASE_URL.
+
+Architecture:
+- POST .../chat/completions answers after a configurable latency (base +
+  jitter + time per completion token)
+- 429s the way Groq sends them: a server-side requests/min quota
+  (--rpm, with retry-after) and/or a random fraction of calls (--error-rate)
+- Answers are filler text of --completion-tokens tokens, except router
+  prompts, which get LOOKUP/ANALYTICS by the router's own keyword rule, so
+  the query mix exercises both pipelines (batched router prompts get one
+  "<n>: LABEL" line per listed query)
+- GET /stats: calls, 429s and calls in flight (read by the load test)
+
+Usage:
+    python -m benchmarks.llm_stub_server --port 8089 --latency-ms 400 --rpm 600
+    GROQ_BASE_URL=http://127.0.0.1:8089 GROQ_API_KEY=stub uvicorn api:app
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.llm_gateway import TokenBucket
+from src.token_budget import estimate_tokens
+
+
+ROUTER_PROMPT = "Respond with ONLY one word: LOOKUP or ANALYTICS"
+BATCH_ROUTER_PROMPT = "Classify each query. Respond with one line per query"
+ANALYTICS_WORDS = re.compile(r'\b(same|most|similar|popular|count)\b', re.IGNORECASE)
+
+FILLER = ("Based on the member messages, the client asked the concierge to arrange the booking "
+          "and confirmed the preferred dates, the number of guests and any special requests. ")
+
+
+def stub_content(request: Dict, completion_tokens: int = 120) -> str:
+    """
+    Completion text for a chat request: router labels by keyword, else filler
+
+    Args:
+        request: Chat completion request (model, messages, max_tokens, ...)
+        completion_tokens: Filler answer size (capped by the request's max_tokens)
+    """
+    prompt = request['messages'][-1].get('content', '') if request.get('messages') else ''
+    if ROUTER_PROMPT in prompt:
+        match = re.search(r'User Query: "(.*)"', prompt)
+        query = match.group(1) if match else ''
+        return "ANALYTICS" if ANALYTICS_WORDS.search(query) else "LOOKUP"
+    if BATCH_ROUTER_PROMPT in prompt:
+        listed = re.findall(r'^(\d+)\. "(.*)"$', prompt, re.MULTILINE)
+        return "\n".join(f"{n}: {'ANALYTICS' if ANALYTICS_WORDS.search(query) else 'LOOKUP'}"
+                         for n, query in listed)
+
+    tokens = min(completion_tokens, request.get('max_tokens') or completion_tokens)
+    text = FILLER * (tokens // max(estimate_tokens(FILLER), 1) + 1)
+    return text[:tokens * 4].rstrip()
+
+
+class StubLLMServer:
+    """
+    Threaded Groq-compatible server with injectable latency and rate limits
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 300.0,
+        jitter_ms: float = 100.0,
+        ms_per_token: float = 0.0,
+        completion_tokens: int = 120,
+        rpm: Optional[float] = None,
+        error_rate: float = 0.0,
+        retry_after: float = 1.0,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            host: Bind address
+            port: Port (0 = pick a free one)
+            latency_ms: Base latency per call
+            jitter_ms: Uniform jitter added to the base latency (±)
+            ms_per_token: Extra latency per completion token (generation speed)
+            completion_tokens: Filler answer size (capped by the request's max_tokens)
+            rpm: Server-side requests/min quota; calls over it get 429 (None = no quota)
+            error_rate: Fraction of calls answered with 429 regardless of quota
+            retry_after: retry-after seconds sent with injected 429s
+            seed: Random seed (latency jitter, injected errors)
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.ms_per_token = ms_per_token
+        self.completion_tokens = completion_tokens
+        self.quota = TokenBucket(rpm) if rpm else None
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+
+        self.stats = {'calls': 0, 'ok': 0, 'rate_limited': 0, 'in_flight': 0, 'max_in_flight': 0}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        """Base URL for GROQ_BASE_URL"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubLLMServer":
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return dict(self.stats)
+
+    def reset_peak(self):
+        """Start measuring max_in_flight afresh (e.g. per load step)"""
+        with self._lock:
+            self.stats['max_in_flight'] = self.stats['in_flight']
+
+    def _count(self, key: str, delta: int = 1):
+        with self._lock:
+            self.stats[key] += delta
+            if key == 'in_flight':
+                self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+
+    def _rate_limit(self) -> Optional[float]:
+        """retry-after seconds if this call is rejected, else None"""
+        with self._lock:
+            injected = self.error_rate and self.random.random() < self.error_rate
+        if injected:
+            return self.retry_after
+        if self.quota is not None and not self.quota.try_acquire(1):
+            return max(self.quota.wait_time(1), 0.05)
+        return None
+
+    def complete(self, request: Dict):
+        """
+        Answer one chat completion request
+
+        Returns:
+            (status, body dict, headers dict)
+        """
+        self._count('calls')
+        retry_after = self._rate_limit()
+        if retry_after is not None:
+            self._count('rate_limited')
+            body = {'error': {'message': "Rate limit reached (stub)", 'type': "tokens",
+                              'code': "rate_limit_exceeded"}}
+            return 429, body, {'retry-after': f"{retry_after:.2f}"}
+
+        self._count('in_flight')
+        try:
+            content = stub_content(request, self.completion_tokens)
+            completion_tokens = estimate_tokens(content)
+            with self._lock:
+                jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms)
+            delay_ms = max(0.0, self.latency_ms + jitter) + self.ms_per_token * completion_tokens
+            time.sleep(delay_ms / 1000)
+        finally:
+            self._count('in_flight', -1)
+
+        prompt_tokens = sum(estimate_tokens(m.get('content', '')) for m in request.get('messages', []))
+        self._count('ok')
+        body = {
+            'id': f"chatcmpl-stub-{os.urandom(6).hex()}",
+            'object': "chat.completion",
+            'created': int(time.time()),
+            'model': request.get('model', 'stub'),
+            'choices': [{'index': 0, 'message': {'role': "assistant", 'content': content},
+                         'finish_reason': "stop", 'logprobs': None}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens,
+                      'total_time': round(delay_ms / 1000, 3)}
+        }
+        return 200, body, {}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+            def _send(self, status: int, body: Dict, headers: Optional[Dict] = None):
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    request = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    return self._send(400, {'error': {'message': "invalid JSON"}})
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    return self._send(404, {'error': {'message': f"unknown path {self.path}"}})
+                self._send(*server.complete(request))
+
+            def do_GET(self):
+                if self.path.rstrip('/') == '/stats':
+                    return self._send(200, server.snapshot())
+                self._send(404, {'error': {'message': f"unknown path {self.path}"}})
+
+            def log_message(self, format, *args):
+                pass  # one line per call would drown the load test output
+
+        return Handler
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Groq-compatible LLM stub server")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-ms', type=float, default=300.0)
+    parser.add_argument('--jitter-ms', type=float, default=100.0)
+    parser.add_argument('--ms-per-token', type=float, default=0.0)
+    parser.add_argument('--completion-tokens', type=int, default=120)
+    parser.add_argument('--rpm', type=float, help="Server-side requests/min quota (429 above it)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of calls answered 429")
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    server = StubLLMServer(
+        host=args.host, port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        ms_per_token=args.ms_per_token, completion_tokens=args.completion_tokens, rpm=args.rpm,
+        error_rate=args.error_rate, retry_after=args.retry_after, seed=args.seed
+    )
+    print(f"🤖 LLM stub serving on {server.url} (GROQ_BASE_URL={server.url})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,505 @@
+"""
+API Load Test
+
+Replays a query mix against the FastAPI service at increasing load and
+reports where it saturates: latency percentiles, error rates and
+throughput per route, per load step. Runs offline on a laptop.
+
+Architecture:
+- Server: by default starts `uvicorn api:app` (--workers N) with
+  VECTOR_BACKEND=local and GROQ_BASE_URL pointing at an in-process
+  StubLLMServer (latency and 429 injection); --url targets a running server
+- Load: asyncio + httpx, one step per load level
+  - closed loop (--concurrency 1,4,16): N clients send back to back
+  - open loop (--rate 2,5,10): Poisson arrivals at R requests/s. Latency
+    is measured from the scheduled arrival, so client-side queueing counts
+    (no coordinated omission)
+- Mix: /ask questions from benchmarks/queries.json (or a --mix file with
+  weighted method/path/body entries)
+- Routes: requests are grouped by endpoint and, for /ask, by the route the
+  question is expected to take (LOOKUP / ANALYTICS), so the slow analytics
+  pipeline doesn't hide behind fast lookups
+- Saturation: per route, the first step where p95 exceeds --slo-ms, the
+  error rate exceeds --max-error-rate, or throughput stops growing with load
+- Each step also records the stub's 429s and peak in-flight LLM calls
+
+Usage:
+    python -m benchmarks.load_test --concurrency 1,2,4,8,16 --duration 20
+    python -m benchmarks.load_test --rate 1,2,4,8 --llm-latency-ms 800 --llm-rpm 300 --workers 2
+    python -m benchmarks.load_test --url http://localhost:8000 --concurrency 4   # existing server
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.llm_stub_server import StubLLMServer
+from benchmarks.retrieval_benchmark import QUERIES_PATH, load_queries, percentiles, git_commit
+
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Throughput must grow by this fraction per load step, else the service is saturated
+MIN_THROUGHPUT_GAIN = 0.1
+
+
+# ==================== Query Mix ====================
+
+def default_mix(queries_path: str = QUERIES_PATH) -> List[Dict]:
+    """One /ask entry per benchmark query"""
+    return [
+        {
+            'method': "POST",
+            'path': "/ask",
+            'json': {'question': query['query']},
+            'route': "ANALYTICS" if query['category'] == "analytics" else "LOOKUP",
+            'weight': 1.0
+        }
+        for query in load_queries(queries_path)
+    ]
+
+
+def load_mix(path: str) -> List[Dict]:
+    """
+    Mix file: [{"method", "path", "json" (optional), "route" (optional), "weight"}, ...]
+    """
+    with open(path, 'r') as f:
+        entries = json.load(f)
+    for entry in entries:
+        entry.setdefault('method', "GET")
+        entry.setdefault('weight', 1.0)
+    return entries
+
+
+def route_label(entry: Dict) -> str:
+    """Report key of a mix entry, e.g. "POST /ask LOOKUP" """
+    label = f"{entry['method']} {entry['path']}"
+    return f"{label} {entry['route']}" if entry.get('route') else label
+
+
+# ==================== Server Under Test ====================
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class APIServer:
+    """
+    `uvicorn api:app` in a subprocess, wired to the local LLM stub
+    """
+
+    def __init__(self, llm_url: str, workers: int = 1, llm_limits: Optional[Dict] = None,
+                 env: Optional[Dict] = None, startup_timeout: float = 180.0):
+        """
+        Args:
+            llm_url: Stub server base URL (GROQ_BASE_URL)
+            workers: uvicorn worker processes
+            llm_limits: Client-side LLM quotas (LLM_LIMITS), None = defaults
+            env: Extra environment variables
+            startup_timeout: Seconds to wait for /ready
+        """
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.workers = workers
+        self.startup_timeout = startup_timeout
+        self.env = {
+            **os.environ,
+            'GROQ_BASE_URL': llm_url,
+            'GROQ_API_KEY': os.environ.get('GROQ_API_KEY', 'stub'),
+            'VECTOR_BACKEND': "local",
+            **(env or {})
+        }
+        if llm_limits:
+            self.env['LLM_LIMITS'] = json.dumps(llm_limits)
+        self.log_path = os.path.join(tempfile.mkdtemp(prefix="aurora-load-"), "server.log")
+        self.process: Optional[subprocess.Popen] = None
+
+    def start(self) -> "APIServer":
+        """Start the server and wait until /ready"""
+        log = open(self.log_path, 'w')
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'api:app', '--host', '127.0.0.1', '--port', str(self.port),
+             '--workers', str(self.workers), '--log-level', 'warning'],
+            cwd=PROJECT_DIR, env=self.env, stdout=log, stderr=subprocess.STDOUT
+        )
+        deadline = time.time() + self.startup_timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"API server exited with code {self.process.returncode} (log: {self.log_path})")
+            try:
+                if httpx.get(f"{self.url}/ready", timeout=2).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.25)
+        self.stop()
+        raise RuntimeError(f"API server not ready after {self.startup_timeout:.0f}s (log: {self.log_path})")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+# ==================== Load Generator ====================
+
+class LoadGenerator:
+    """
+    Sends the mix at one load level and collects one record per request
+    """
+
+    def __init__(self, url: str, mix: List[Dict], timeout: float = 30.0, seed: int = 0,
+                 max_in_flight: int = 1000):
+        """
+        Args:
+            url: Server base URL
+            mix: Weighted request entries
+            timeout: Client timeout per request (seconds)
+            seed: Random seed (request choice, arrival times)
+            max_in_flight: Open loop: arrivals beyond this many outstanding requests are dropped
+        """
+        self.url = url
+        self.mix = mix
+        self.weights = [entry['weight'] for entry in mix]
+        self.timeout = timeout
+        self.random = random.Random(seed)
+        self.max_in_flight = max_in_flight
+
+    def _pick(self) -> Dict:
+        return self.random.choices(self.mix, weights=self.weights)[0]
+
+    async def _send(self, client: httpx.AsyncClient, entry: Dict, started: float) -> Dict:
+        """One request; latency counted from `started` (its scheduled time)"""
+        record = {'route': route_label(entry), 'status': None, 'error': None}
+        try:
+            response = await client.request(entry['method'], entry['path'], json=entry.get('json'))
+            record['status'] = response.status_code
+            if response.status_code >= 400:
+                record['error'] = f"HTTP {response.status_code}"
+        except httpx.TimeoutException:
+            record['error'] = "timeout"
+        except httpx.HTTPError as e:
+            record['error'] = type(e).__name__
+        record['latency_ms'] = (time.perf_counter() - started) * 1000
+        record['finished'] = time.perf_counter()
+        return record
+
+    def _client(self, connections: int) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=self.url,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+        )
+
+    async def closed_loop(self, concurrency: int, duration: float) -> List[Dict]:
+        """`concurrency` clients, each sending its next request when the last one returns"""
+        records: List[Dict] = []
+        stop_at = time.perf_counter() + duration
+
+        async def client_loop(client):
+            while time.perf_counter() < stop_at:
+                records.append(await self._send(client, self._pick(), time.perf_counter()))
+
+        async with self._client(concurrency) as client:
+            await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        return records
+
+    async def open_loop(self, rate: float, duration: float) -> List[Dict]:
+        """Poisson arrivals at `rate` requests/s for `duration` seconds"""
+        records: List[Dict] = []
+        tasks = set()
+        start = time.perf_counter()
+        next_arrival = start
+
+        async with self._client(self.max_in_flight) as client:
+            while True:
+                next_arrival += self.random.expovariate(rate)
+                if next_arrival - start >= duration:
+                    break
+                await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+                entry = self._pick()
+                if len(tasks) >= self.max_in_flight:
+                    records.append({'route': route_label(entry), 'status': None, 'error': "dropped",
+                                    'latency_ms': 0.0, 'finished': time.perf_counter()})
+                    continue
+                task = asyncio.create_task(self._send(client, entry, next_arrival))
+                tasks.add(task)
+                task.add_done_callback(lambda t: (tasks.discard(t), records.append(t.result())))
+            if tasks:
+                await asyncio.gather(*tasks)
+        return records
+
+
+# ==================== Reporting ====================
+
+def summarize(records: List[Dict], elapsed: float) -> Dict:
+    """Throughput, error rate, status counts and latency percentiles of one group"""
+    ok = [r['latency_ms'] for r in records if r['error'] is None]
+    errors: Dict[str, int] = {}
+    for record in records:
+        if record['error']:
+            errors[record['error']] = errors.get(record['error'], 0) + 1
+    return {
+        'requests': len(records),
+        'throughput_rps': round(len(ok) / elapsed, 3) if elapsed else None,
+        'error_rate': round((len(records) - len(ok)) / len(records), 4) if records else 0.0,
+        'errors': errors,
+        'latency_ms': percentiles(ok)
+    }
+
+
+def summarize_step(load: Dict, records: List[Dict], elapsed: float, llm_before: Optional[Dict],
+                   llm_after: Optional[Dict]) -> Dict:
+    """One load level: overall and per-route summaries, plus LLM stub activity"""
+    routes: Dict[str, List[Dict]] = {}
+    for record in records:
+        routes.setdefault(record['route'], []).append(record)
+
+    step = {
+        'load': load,
+        'seconds': round(elapsed, 3),
+        'overall': summarize(records, elapsed),
+        'routes': {route: summarize(group, elapsed) for route, group in sorted(routes.items())}
+    }
+    if llm_before is not None and llm_after is not None:
+        step['llm'] = {
+            'calls': llm_after['calls'] - llm_before['calls'],
+            'rate_limited': llm_after['rate_limited'] - llm_before['rate_limited'],
+            'max_in_flight': llm_after['max_in_flight']
+        }
+    return step
+
+
+def find_saturation(steps: List[Dict], slo_ms: float, max_error_rate: float, key: Optional[str] = None) -> Dict:
+    """
+    First load step at which a route (or the whole service) is saturated
+
+    Args:
+        steps: Step summaries in increasing load order
+        slo_ms: p95 latency objective
+        max_error_rate: Highest acceptable error rate
+        key: Route label (None = overall)
+
+    Returns:
+        {'saturated_at': load or None, 'reason', 'max_throughput_rps', 'last_good': load or None}
+    """
+    previous = None
+    last_good = None
+    best = 0.0
+    for step in steps:
+        summary = step['overall'] if key is None else step['routes'].get(key)
+        if not summary:
+            continue
+        throughput = summary['throughput_rps'] or 0.0
+        p95 = summary['latency_ms'].get('p95')
+
+        reason = None
+        if summary['error_rate'] > max_error_rate:
+            reason = f"error rate {summary['error_rate']:.1%} > {max_error_rate:.1%}"
+        elif p95 is not None and p95 > slo_ms:
+            reason = f"p95 {p95:.0f}ms > SLO {slo_ms:.0f}ms"
+        elif previous is not None and throughput < previous * (1 + MIN_THROUGHPUT_GAIN):
+            reason = f"throughput flat ({previous:.2f} → {throughput:.2f} rps)"
+
+        if reason:
+            return {'saturated_at': step['load'], 'reason': reason,
+                    'max_throughput_rps': round(max(best, throughput), 3), 'last_good': last_good}
+        best = max(best, throughput)
+        previous = throughput
+        last_good = step['load']
+
+    return {'saturated_at': None, 'reason': None, 'max_throughput_rps': round(best, 3), 'last_good': last_good}
+
+
+# ==================== Runner ====================
+
+async def run_steps(generator: LoadGenerator, mode: str, levels: List[float], duration: float,
+                    warmup: float, llm: Optional[StubLLMServer]) -> List[Dict]:
+    """Run each load level in turn (warmup requests are discarded)"""
+    steps = []
+    for level in levels:
+        run = generator.closed_loop if mode == "concurrency" else generator.open_loop
+        arg = int(level) if mode == "concurrency" else level
+        if warmup:
+            await run(arg, warmup)
+
+        llm_before = llm.snapshot() if llm else None
+        if llm:
+            llm.reset_peak()
+        start = time.perf_counter()
+        records = await run(arg, duration)
+        elapsed = time.perf_counter() - start
+
+        step = summarize_step({mode: arg}, records, elapsed, llm_before, llm.snapshot() if llm else None)
+        overall = step['overall']
+        print(f"   {mode}={arg}: {overall['requests']} requests, {overall['throughput_rps']} rps, "
+              f"p95 {overall['latency_ms'].get('p95')}ms, errors {overall['error_rate']:.1%}")
+        steps.append(step)
+    return steps
+
+
+def run_load_test(
+    mode: str = "concurrency",
+    levels: List[float] = (1, 2, 4, 8),
+    duration: float = 15.0,
+    warmup: float = 2.0,
+    url: Optional[str] = None,
+    workers: int = 1,
+    mix: Optional[List[Dict]] = None,
+    timeout: float = 30.0,
+    slo_ms: float = 5000.0,
+    max_error_rate: float = 0.01,
+    llm_options: Optional[Dict] = None,
+    llm_limits: Optional[Dict] = None,
+    coalesce: bool = False,
+    seed: int = 0
+) -> Dict:
+    """
+    Full load test
+
+    Args:
+        mode: "concurrency" (closed loop) or "rate" (open loop)
+        levels: Load levels in increasing order (clients or requests/s)
+        duration: Measured seconds per level
+        warmup: Unmeasured seconds before each level
+        url: Existing server (None = start api:app with the LLM stub)
+        workers: uvicorn workers when starting the server
+        mix: Request mix (default: /ask with the benchmark queries)
+        timeout: Client timeout per request
+        slo_ms: p95 objective used to find saturation
+        max_error_rate: Error rate objective used to find saturation
+        llm_options: StubLLMServer arguments (latency_ms, rpm, error_rate, ...)
+        llm_limits: Client-side LLM quotas passed to the server (LLM_LIMITS)
+        coalesce: Keep /ask coalescing on (ASK_COALESCING); off by default so
+                  the repeated mix queries measure the pipeline, not the window
+        seed: Random seed
+
+    Returns:
+        JSON-serializable result
+    """
+    mix = mix or default_mix()
+    llm = server = None
+    try:
+        if url is None:
+            llm = StubLLMServer(seed=seed, **(llm_options or {})).start()
+            print(f"🤖 LLM stub on {llm.url}; starting api:app ({workers} worker(s))...")
+            server = APIServer(llm.url, workers=workers, llm_limits=llm_limits,
+                               env={'ASK_COALESCING': "1" if coalesce else "0"}).start()
+            url = server.url
+        print(f"🚀 Load testing {url} ({mode}: {', '.join(f'{level:g}' for level in levels)})")
+
+        generator = LoadGenerator(url, mix, timeout=timeout, seed=seed)
+        steps = asyncio.run(run_steps(generator, mode, list(levels), duration, warmup, llm))
+    finally:
+        if server:
+            server.stop()
+        if llm:
+            llm.stop()
+
+    routes = sorted({route for step in steps for route in step['routes']})
+    return {
+        'benchmark': 'load',
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'git_commit': git_commit(),
+        'config': {
+            'mode': mode,
+            'levels': list(levels),
+            'duration_seconds': duration,
+            'warmup_seconds': warmup,
+            'workers': workers if server else None,
+            'timeout_seconds': timeout,
+            'slo_p95_ms': slo_ms,
+            'max_error_rate': max_error_rate,
+            'llm_stub': llm_options if llm else None,
+            'llm_limits': llm_limits,
+            'coalesce': coalesce if server else None,
+            'mix': [route_label(entry) for entry in mix]
+        },
+        'steps': steps,
+        'saturation': {
+            'overall': find_saturation(steps, slo_ms, max_error_rate),
+            'routes': {route: find_saturation(steps, slo_ms, max_error_rate, key=route) for route in routes}
+        }
+    }
+
+
+def parse_levels(text: str) -> List[float]:
+    return [float(level) for level in text.split(',') if level.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the Aurora API offline")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument('--concurrency', help="Closed loop: comma-separated client counts (default 1,2,4,8)")
+    load.add_argument('--rate', help="Open loop: comma-separated arrival rates in requests/s")
+    parser.add_argument('--duration', type=float, default=15.0, help="Measured seconds per step")
+    parser.add_argument('--warmup', type=float, default=2.0, help="Unmeasured seconds before each step")
+    parser.add_argument('--url', help="Test a running server instead of starting api:app")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--mix', help="Mix file (default: /ask with benchmarks/queries.json)")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Client timeout per request (s)")
+    parser.add_argument('--slo-ms', type=float, default=5000.0, help="p95 objective for saturation")
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--llm-latency-ms', type=float, default=300.0)
+    parser.add_argument('--llm-jitter-ms', type=float, default=100.0)
+    parser.add_argument('--llm-rpm', type=float, help="Stub's server-side quota (429 above it)")
+    parser.add_argument('--llm-error-rate', type=float, default=0.0, help="Fraction of LLM calls answered 429")
+    parser.add_argument('--llm-limits', help="Client-side quotas as JSON {model: {rpm, tpm, concurrency}}")
+    parser.add_argument('--coalesce', action='store_true',
+                        help="Keep /ask request coalescing on in the started server")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the JSON result here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    if args.rate:
+        mode, levels = "rate", parse_levels(args.rate)
+    else:
+        mode, levels = "concurrency", [int(level) for level in parse_levels(args.concurrency or "1,2,4,8")]
+
+    result = run_load_test(
+        mode=mode, levels=levels, duration=args.duration, warmup=args.warmup, url=args.url,
+        workers=args.workers, mix=load_mix(args.mix) if args.mix else None, timeout=args.timeout,
+        slo_ms=args.slo_ms, max_error_rate=args.max_error_rate,
+        llm_options={'latency_ms': args.llm_latency_ms, 'jitter_ms': args.llm_jitter_ms,
+                     'rpm': args.llm_rpm, 'error_rate': args.llm_error_rate},
+        llm_limits=json.loads(args.llm_limits) if args.llm_limits else None,
+        coalesce=args.coalesce, seed=args.seed
+    )
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"✅ Results written to {args.output}")
+    else:
+        print(text)
+
+    print("\n📊 Saturation")
+    for route, saturation in [("overall", result['saturation']['overall'])] + \
+            list(result['saturation']['routes'].items()):
+        where = f"at {saturation['saturated_at']} ({saturation['reason']})" if saturation['saturated_at'] \
+            else "not reached"
+        print(f"   {route}: {where}; max {saturation['max_throughput_rps']} rps, "
+              f"last good {saturation['last_good']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
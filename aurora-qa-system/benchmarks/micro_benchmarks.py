@@ -0,0 +1,455 @@
+"""
+Retrieval Hot-Path Micro-Benchmarks
+
+Times the functions that grow with the member base, on synthetic corpora
+scaled from the real snapshot, so their scaling is measured rather than
+guessed. --profile captures a cProfile per benchmark and scale.
+
+Architecture:
+- Scaled corpus: the 3,349-message / 10-member snapshot cloned `scale`
+  times onto synthetic members (distinct first/last name combinations, so
+  the name resolver sees realistic name collisions), with fresh message ids
+  and dates shifted per clone. The knowledge graph triples are cloned the
+  same way and indexed with the snapshot's entity dictionary. Scale 1 is
+  the snapshot itself
+- Components are built directly (BM25Search, NameResolver, KnowledgeGraph,
+  HybridRetriever internals, GraphAnalytics) - no Qdrant, no LLM
+- Inputs come from the labelled benchmark queries (benchmarks/queries.json)
+  plus name typos and temporal phrases, cycled until --min-time has passed
+- Results: per-call latency percentiles (µs) and calls/s per benchmark and
+  scale, plus a growth exponent per benchmark (log-log slope of p50 vs
+  corpus size: ~0 = flat, ~1 = linear)
+
+Usage:
+    python -m benchmarks.micro_benchmarks --scales 1,10,100 --output benchmarks/results/micro.json
+    python -m benchmarks.micro_benchmarks --scales 10 --only bm25.search --profile
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import pstats
+import argparse
+import cProfile
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.bm25_search import BM25Search
+from src.name_resolver import NameResolver
+from src.knowledge_graph import KnowledgeGraph
+from src.analytics_index import EntityAggregateIndex
+from src.temporal_analyzer import TemporalAnalyzer
+from src.hybrid_retriever import HybridRetriever
+from src.graph_analytics import GraphAnalytics
+from benchmarks.retrieval_benchmark import QUERIES_PATH, load_queries, percentiles, git_commit
+
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_DIR = os.path.join(BENCHMARK_DIR, "results", "profiles")
+
+# Name pools for synthetic members (combined first × last: 1,600 distinct names)
+FIRST_NAMES = [
+    "Amelia", "Benjamin", "Camille", "Dmitri", "Elena", "Farid", "Giulia", "Hiroshi", "Ingrid", "Javier",
+    "Katarina", "Luca", "Maya", "Nikolai", "Olivia", "Pedro", "Quentin", "Rania", "Sebastian", "Tara",
+    "Umar", "Valentina", "William", "Ximena", "Yusuf", "Zara", "Adrian", "Beatrice", "Carlos", "Daria",
+    "Emil", "Freya", "Gabriel", "Helena", "Ivan", "Julia", "Kenji", "Leila", "Marco", "Noor"
+]
+LAST_NAMES = [
+    "Andersson", "Bianchi", "Castillo", "Dubois", "Eriksen", "Fernandes", "Goldberg", "Haddad", "Ivanova",
+    "Jensen", "Kowalski", "Lindqvist", "Moreau", "Nakamura", "O'Connor", "Petrov", "Quinn", "Rossi",
+    "Schneider", "Tanaka", "Urbina", "Van Der Meer", "Wagner", "Xu", "Yamamoto", "Zimmermann", "Al-Amin",
+    "Bergström", "Chen", "De Luca", "El-Sayed", "Fischer", "García", "Hoffmann", "Iyer", "Jovanović",
+    "Kim", "Lefebvre", "Mendes", "Novak"
+]
+
+# Extra resolver / temporal inputs (typos, non-names, date phrases)
+NAME_PROBES = ["Layal", "Vikrm", "Sofia", "Amnia", "Thiagoo", "Lorenzo", "Dupont", "Al-Farsi",
+               "restaurant", "booking", "London", "tickets"]
+TEMPORAL_PROBES = ["plans for December 2025", "trips in Q3 2025", "bookings next month",
+                   "dinner on March 14, 2025", "what happened last week", "Who is going to Paris?"]
+
+
+# ==================== Scaled Corpus ====================
+
+def synthetic_names(count: int, taken: set, rng: random.Random) -> List[str]:
+    """`count` distinct "First Last" names not in `taken`"""
+    names = [f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES]
+    rng.shuffle(names)
+    base = [name for name in names if name not in taken]
+    names = list(base)
+    for initial in "ABCDEFGHJKLMNPRSTW":
+        if len(names) >= count:
+            break
+        # Pools exhausted: the same combinations with a middle initial
+        names += [f"{name.split(' ', 1)[0]} {initial}. {name.split(' ', 1)[1]}" for name in base]
+    return names[:count]
+
+
+def _shift(value: str, days: int) -> str:
+    """Shift an ISO date / timestamp by whole days (format kept)"""
+    try:
+        shifted = datetime.fromisoformat(value) + timedelta(days=days)
+    except (TypeError, ValueError):
+        return value
+    return shifted.isoformat() if 'T' in value else shifted.date().isoformat()
+
+
+def scale_corpus(messages: List[Dict], graph: KnowledgeGraph, scale: int, seed: int = 0) -> Dict:
+    """
+    Clone the snapshot `scale` times onto synthetic members
+
+    Args:
+        messages: Snapshot messages (BM25 order)
+        graph: Snapshot knowledge graph
+        scale: Corpus multiplier (1 = the snapshot)
+        seed: Random seed (names, date shifts)
+
+    Returns:
+        {'messages', 'user_index', 'knowledge_graph', 'users'}
+    """
+    rng = random.Random(seed)
+    users = sorted({(msg['user_id'], msg['user_name']) for msg in messages}, key=lambda user: user[1])
+    names = synthetic_names(len(users) * (scale - 1), {name for _, name in users}, rng)
+
+    scaled_messages: List[Dict] = []
+    user_index: Dict[str, Dict] = {}
+    message_ids: List[Dict[str, str]] = []  # per clone: original id -> clone id
+    clone_names: List[Dict[str, str]] = []  # per clone: original name -> clone name
+    clone_days: List[int] = []  # per clone: date shift
+
+    for clone in range(scale):
+        if clone == 0:
+            identities = {user_id: (user_id, name) for user_id, name in users}
+            days = 0
+        else:
+            identities = {
+                user_id: (str(uuid.UUID(int=rng.getrandbits(128))), names.pop())
+                for user_id, _ in users
+            }
+            days = rng.randint(-180, 180)
+
+        ids = {}
+        for msg in messages:
+            user_id, user_name = identities[msg['user_id']]
+            copy = msg if clone == 0 else {
+                **msg,
+                'id': str(uuid.UUID(int=rng.getrandbits(128))),
+                'user_id': user_id,
+                'user_name': user_name,
+                'timestamp': _shift(msg['timestamp'], days),
+                'normalized_dates': [_shift(date, days) for date in msg.get('normalized_dates', [])]
+            }
+            ids[msg['id']] = copy['id']
+            entry = user_index.setdefault(user_id, {'user_name': user_name, 'message_count': 0,
+                                                    'message_indices': []})
+            entry['message_indices'].append(len(scaled_messages))
+            entry['message_count'] += 1
+            scaled_messages.append(copy)
+        message_ids.append(ids)
+        clone_days.append(days)
+        clone_names.append({name: identities[user_id][1] for user_id, name in users})
+
+    # Same triples per clone, under the clone's member names and message ids
+    scaled_graph = KnowledgeGraph()
+    scaled_graph.entity_dictionary = graph.entity_dictionary
+    scaled_graph.analytics_index = EntityAggregateIndex(graph.entity_dictionary)
+    edges = list(graph.graph.edges(data=True))
+    for clone in range(scale):
+        for subject, obj, data in edges:
+            message_id = data.get('message_id')
+            scaled_graph.add_triple(
+                subject=clone_names[clone].get(subject, subject),
+                relationship=data.get('relationship'),
+                obj=obj,
+                message_id=message_ids[clone].get(message_id, message_id),
+                timestamp=_shift(data['timestamp'], clone_days[clone]) if data.get('timestamp') else None,
+                metadata=data.get('metadata') or {}
+            )
+
+    return {
+        'messages': scaled_messages,
+        'user_index': user_index,
+        'knowledge_graph': scaled_graph,
+        'users': [name for clone in clone_names for name in clone.values()]
+    }
+
+
+def build_components(corpus: Dict) -> SimpleNamespace:
+    """Index the corpus and wire the retriever internals around it (no Qdrant, no LLM)"""
+    timings = {}
+
+    start = time.perf_counter()
+    bm25 = BM25Search()
+    bm25.user_index = corpus['user_index']
+    _quiet(bm25.build_index, corpus['messages'])
+    timings['bm25_build'] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    resolver = NameResolver(user_index=corpus['user_index'])
+    for user_name in corpus['knowledge_graph'].user_index.keys():
+        resolver.add_user(user_name)
+    timings['name_resolver_build'] = round(time.perf_counter() - start, 3)
+
+    # The retriever's helpers only use these attributes
+    retriever = HybridRetriever.__new__(HybridRetriever)
+    retriever.bm25_search = bm25
+    retriever.knowledge_graph = corpus['knowledge_graph']
+    retriever.name_resolver = resolver
+    retriever.temporal_analyzer = TemporalAnalyzer()
+
+    analytics = GraphAnalytics(corpus['knowledge_graph'], api_key=os.environ.get('GROQ_API_KEY') or "offline")
+    return SimpleNamespace(bm25=bm25, resolver=resolver, retriever=retriever, analytics=analytics,
+                           temporal=retriever.temporal_analyzer, timings=timings)
+
+
+def _quiet(fn, *args, **kwargs):
+    """Call fn without its progress prints"""
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+
+# ==================== Benchmarks ====================
+
+def benchmark_cases(components: SimpleNamespace, corpus: Dict, queries: List[str],
+                    seed: int = 0) -> Dict[str, Tuple[Callable, List[tuple]]]:
+    """
+    Benchmark name -> (function, argument tuples)
+
+    Inputs mirror what HybridRetriever.search passes at runtime (top_k=20
+    BM25, top_k=10 graph, per-word name resolution).
+    """
+    rng = random.Random(seed)
+    bm25, resolver, retriever = components.bm25, components.resolver, components.retriever
+
+    user_ids = list(corpus['user_index'])
+    words = [word.strip('.,!?;:\'"') for query in queries for word in query.split()]
+    names = rng.sample(corpus['users'], min(10, len(corpus['users'])))
+    typos = [name.split()[0][:-1] + name.split()[0][-1] * 2 for name in names]  # "Layla" -> "Laylaa"
+
+    # Realistic result lists for the post-retrieval helpers
+    bm25_results = [bm25.search(query, top_k=20) for query in queries]
+    wide_results = [bm25.search(query, top_k=40)[20:] for query in queries]
+    graph_results = [retriever._graph_search(query, top_k=10) for query in queries]
+    fused = [retriever._reciprocal_rank_fusion(semantic, keyword, graph)
+             for semantic, keyword, graph in zip(wide_results, bm25_results, graph_results)]
+    date_ranges = [("2025-01-01", "2025-03-31"), ("2025-06-01", "2025-06-30"), ("2025-12-01", "2025-12-31")]
+
+    return {
+        'bm25.search': (bm25.search, [(query, 20) for query in queries]),
+        'bm25.search[user]': (lambda query, user_id: bm25.search(query, top_k=20, user_id=user_id),
+                              [(query, rng.choice(user_ids)) for query in queries]),
+        'name_resolver.resolve': (resolver.resolve, [(word,) for word in words + NAME_PROBES + typos]),
+        'name_resolver._fuzzy_match': (
+            lambda word: resolver._fuzzy_match(resolver._normalize(word)),
+            [(word,) for word in NAME_PROBES + typos]
+        ),
+        'retriever._graph_search': (lambda query: retriever._graph_search(query, top_k=10),
+                                    [(query,) for query in queries]),
+        'retriever._filter_by_date_range': (
+            retriever._filter_by_date_range,
+            [(results, date_ranges[i % len(date_ranges)]) for i, results in enumerate(bm25_results)]
+        ),
+        'retriever._reciprocal_rank_fusion': (
+            retriever._reciprocal_rank_fusion,
+            list(zip(wide_results, bm25_results, graph_results))
+        ),
+        'retriever._diversify_by_user': (lambda results: retriever._diversify_by_user(results, 2, 10),
+                                         [(results,) for results in fused]),
+        'temporal.extract_date_range': (components.temporal.extract_date_range,
+                                        [(text,) for text in queries + TEMPORAL_PROBES]),
+        'graph_analytics._query_graph': (
+            components.analytics._query_graph,
+            [('restaurant', []), ('destination', []), ('wine', ['wine', 'champagne']), ('car', ['car', 'chauffeur'])]
+        ),
+    }
+
+
+def time_calls(fn: Callable, inputs: List[tuple], min_time: float = 0.5, max_calls: int = 100000,
+               profiler: Optional[cProfile.Profile] = None) -> List[float]:
+    """
+    Call fn over the inputs (cycling) until min_time has passed
+
+    Every input runs at least once.
+
+    Returns:
+        Per-call latencies in microseconds
+    """
+    latencies = []
+    started = time.perf_counter()
+    i = 0
+    if profiler:
+        profiler.enable()
+    try:
+        while i < len(inputs) or (time.perf_counter() - started < min_time and i < max_calls):
+            args = inputs[i % len(inputs)]
+            call_start = time.perf_counter()
+            fn(*args)
+            latencies.append((time.perf_counter() - call_start) * 1e6)
+            i += 1
+    finally:
+        if profiler:
+            profiler.disable()
+    return latencies
+
+
+def write_profile(profiler: cProfile.Profile, path: str, top: int = 15) -> List[Dict]:
+    """Save the .prof (snakeviz / pstats) plus a text report; return the top functions"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    profiler.dump_stats(path)
+    stats = pstats.Stats(profiler)
+    with open(path[:-len('.prof')] + '.txt', 'w') as f:
+        pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(40)
+
+    entries = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)  # tottime
+    return [
+        {'function': f"{os.path.basename(filename)}:{line}({name})", 'calls': calls,
+         'tottime_ms': round(tottime * 1000, 2), 'cumtime_ms': round(cumtime * 1000, 2)}
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in entries[:top]
+    ]
+
+
+def growth_exponents(results: Dict[str, Dict]) -> Dict[str, Optional[float]]:
+    """
+    log-log slope of p50 latency vs corpus size, per benchmark
+
+    ~0 means the cost does not grow with the corpus, ~1 linear, >1 superlinear.
+    """
+    scales = sorted(results, key=lambda key: results[key]['corpus']['messages'])
+    if len(scales) < 2:
+        return {}
+    small, large = results[scales[0]], results[scales[-1]]
+    size_ratio = large['corpus']['messages'] / small['corpus']['messages']
+    exponents = {}
+    for name, bench in large['benchmarks'].items():
+        before = small['benchmarks'].get(name, {}).get('latency_us', {}).get('p50')
+        after = bench['latency_us'].get('p50')
+        exponents[name] = round(math.log(after / before) / math.log(size_ratio), 2) \
+            if before and after and size_ratio > 1 else None
+    return exponents
+
+
+def run_micro_benchmarks(data_dir: str = "data", scales: List[int] = (1, 10, 100), min_time: float = 0.5,
+                         only: Optional[List[str]] = None, profile_dir: Optional[str] = None,
+                         seed: int = 0) -> Dict:
+    """
+    Build each scaled corpus and time every benchmark on it
+
+    Args:
+        data_dir: Snapshot directory (bm25.pkl, knowledge_graph.pkl)
+        scales: Corpus multipliers
+        min_time: Seconds per benchmark (at least one pass over its inputs)
+        only: Benchmark names to run (default: all)
+        profile_dir: Write cProfile output per benchmark here (None = no profiling)
+        seed: Random seed
+
+    Returns:
+        JSON-serializable result
+    """
+    import pickle
+    with open(os.path.join(data_dir, "bm25.pkl"), 'rb') as f:
+        snapshot = pickle.load(f)['messages']
+    graph = KnowledgeGraph()
+    _quiet(graph.load, os.path.join(data_dir, "knowledge_graph.pkl"))
+    queries = [query['query'] for query in load_queries(QUERIES_PATH)]
+
+    results = {}
+    for scale in scales:
+        print(f"\n📦 Scale {scale}x: building corpus...")
+        start = time.perf_counter()
+        corpus = scale_corpus(snapshot, graph, scale, seed=seed)
+        corpus_seconds = round(time.perf_counter() - start, 3)
+        components = build_components(corpus)
+
+        cases = benchmark_cases(components, corpus, queries, seed=seed)
+        benchmarks = {}
+        for name, (fn, inputs) in cases.items():
+            if only and name not in only:
+                continue
+            profiler = cProfile.Profile() if profile_dir else None
+            latencies = time_calls(fn, inputs, min_time=min_time, profiler=profiler)
+            total = sum(latencies) / 1e6
+            benchmarks[name] = {
+                'latency_us': percentiles(latencies),
+                'calls_per_second': round(len(latencies) / total, 1) if total else None,
+                'inputs': len(inputs)
+            }
+            if profiler:
+                path = os.path.join(profile_dir, f"{scale}x_{name}.prof")
+                benchmarks[name]['profile'] = path
+                benchmarks[name]['top_functions'] = write_profile(profiler, path)
+            print(f"   {name:36s} p50 {benchmarks[name]['latency_us']['p50']:>12,.1f}µs  "
+                  f"p95 {benchmarks[name]['latency_us']['p95']:>12,.1f}µs")
+
+        results[f"{scale}x"] = {
+            'corpus': {
+                'messages': len(corpus['messages']),
+                'users': len(corpus['user_index']),
+                'graph_edges': corpus['knowledge_graph'].graph.number_of_edges(),
+                'build_seconds': {'corpus': corpus_seconds, **components.timings}
+            },
+            'benchmarks': benchmarks
+        }
+
+    return {
+        'benchmark': 'micro',
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'git_commit': git_commit(),
+        'config': {'scales': list(scales), 'min_time_seconds': min_time, 'seed': seed,
+                   'profile_dir': profile_dir},
+        'scales': results,
+        'growth_exponent': growth_exponents(results)
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Retrieval hot-path micro-benchmarks on scaled corpora")
+    parser.add_argument('--data-dir', default="data")
+    parser.add_argument('--scales', default="1,10,100", help="Comma-separated corpus multipliers")
+    parser.add_argument('--min-time', type=float, default=0.5, help="Seconds per benchmark")
+    parser.add_argument('--only', nargs='*', help="Benchmark names to run")
+    parser.add_argument('--profile', action='store_true', help="cProfile each benchmark")
+    parser.add_argument('--profile-dir', default=PROFILE_DIR)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the JSON result here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    result = run_micro_benchmarks(
+        data_dir=args.data_dir,
+        scales=[int(scale) for scale in args.scales.split(',') if scale.strip()],
+        min_time=args.min_time,
+        only=args.only,
+        profile_dir=args.profile_dir if args.profile else None,
+        seed=args.seed
+    )
+
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"\n✅ Results written to {args.output}")
+    else:
+        print(text)
+
+    if result['growth_exponent']:
+        print("\n📈 Growth exponent (p50 vs corpus size; 0 = flat, 1 = linear)")
+        for name, exponent in result['growth_exponent'].items():
+            print(f"   {name:36s} {exponent}")
+    if args.profile:
+        print(f"\n🔬 Profiles in {args.profile_dir} (.prof for pstats/snakeviz, .txt summaries)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
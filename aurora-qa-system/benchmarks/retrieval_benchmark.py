@@ -0,0 +1,502 @@
+"""
+Offline Retrieval Benchmark
+
+Reproducible end-to-end benchmark of the QA pipeline with no network:
+latency per stage, throughput, memory and retrieval quality, written as
+JSON so runs can be compared.
+
+Architecture:
+- Indexes: the shipped data/bm25.pkl, knowledge_graph.pkl and
+  user_index.json; the vector side runs on LocalVectorSearch (hashed
+  embeddings, Qdrant-compatible filters) built from the BM25 messages
+- LLM: RecordedBackend replays responses recorded once (--record) from
+  Groq or from the deterministic stub responder (--record-from stub,
+  benchmarks/llm_stub_server.py: keyword router labels, filler answers).
+  The shipped recordings come from the stub, so routes match the keyword
+  rule and answer text is placeholder; requests without a recording get a
+  fixed placeholder and are counted as "fallback" in the report
+- Latency: every query runs inside a trace (src/tracing.py), so the
+  per-stage percentiles come from the same spans the API reports
+- Quality: recall@k and MRR of the answer's sources (the LLM context)
+  against the labelled query set in benchmarks/queries.json. Labels are
+  derived from rules (author, required terms, date range) and frozen;
+  --relabel recomputes them after the corpus changes
+- --compare flags p95 latency, throughput and quality regressions against
+  an earlier result file (non-zero exit code, for CI)
+
+Usage:
+    python -m benchmarks.retrieval_benchmark --repeat 3 --output benchmarks/results/run.json
+    python -m benchmarks.retrieval_benchmark --compare benchmarks/results/baseline.json
+    GROQ_API_KEY=... python -m benchmarks.retrieval_benchmark --record   # refresh LLM recordings
+    python -m benchmarks.retrieval_benchmark --record --record-from stub --repeat 1 --warmup 0
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.qa_system import QASystem
+from src.local_vector_search import LocalVectorSearch, HashingEmbedder, FastEmbedEmbedder
+from src.llm_gateway import LLMGateway, GroqBackend, StubBackend, RecordedBackend, set_gateway
+from src.tracing import start_trace
+from benchmarks.llm_stub_server import stub_content
+
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+QUERIES_PATH = os.path.join(BENCHMARK_DIR, "queries.json")
+RECORDINGS_PATH = os.path.join(BENCHMARK_DIR, "recordings", "llm_responses.json")
+
+RECALL_KS = (5, 10, 20)
+
+# Replay is instant: lift the client-side Groq quotas so they don't shape the numbers
+REPLAY_LIMITS = {model: {'rpm': 1_000_000, 'tpm': 1_000_000_000, 'concurrency': 64}
+                 for model in ('llama-3.3-70b-versatile', 'llama-3.1-8b-instant')}
+
+
+# ==================== Labelled Queries ====================
+
+def load_queries(path: str = QUERIES_PATH) -> List[Dict]:
+    """Labelled query set"""
+    with open(path, 'r') as f:
+        return json.load(f)['queries']
+
+
+def _has_term(text: str, terms: List[str]) -> bool:
+    return any(re.search(r'\b' + re.escape(term) + r'\b', text) for term in terms)
+
+
+def relevant_ids(rule: Dict, messages: List[Dict]) -> List[str]:
+    """
+    Messages a query should retrieve, by its labelling rule
+
+    Args:
+        rule: {'user': name (optional), 'all_of': [[term, ...], ...] (each group
+              must match), 'dates': [start, end] (optional, any normalized date)}
+        messages: Corpus messages
+
+    Returns:
+        Relevant message ids (corpus order)
+    """
+    ids = []
+    for msg in messages:
+        if rule.get('user') and msg['user_name'] != rule['user']:
+            continue
+        text = msg['message'].lower()
+        if not all(_has_term(text, group) for group in rule.get('all_of', [])):
+            continue
+        if rule.get('dates'):
+            start, end = rule['dates']
+            if not any(start <= date <= end for date in msg.get('normalized_dates', [])):
+                continue
+        ids.append(msg['id'])
+    return ids
+
+
+def relabel(path: str, messages: List[Dict]) -> Dict[str, int]:
+    """Recompute and save relevant_ids of every labelled query"""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    counts = {}
+    for query in data['queries']:
+        if 'rule' in query:
+            query['relevant_ids'] = relevant_ids(query['rule'], messages)
+            counts[query['id']] = len(query['relevant_ids'])
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+    return counts
+
+
+# ==================== Measurements ====================
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """p50/p90/p95/p99, mean and max (rounded, same unit as values)"""
+    if not values:
+        return {}
+    arr = np.asarray(values, dtype=np.float64)
+    summary = {f"p{p}": float(np.percentile(arr, p)) for p in (50, 90, 95, 99)}
+    summary.update(mean=float(arr.mean()), max=float(arr.max()), n=len(values))
+    return {key: round(value, 3) if key != 'n' else value for key, value in summary.items()}
+
+
+def rss_mb() -> float:
+    """Current resident set size (MB)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (MB)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def retrieval_quality(queries: List[Dict], runs: List[Dict]) -> Dict:
+    """
+    Recall@k and MRR of the answer sources, for queries with labels
+
+    Args:
+        queries: Labelled queries
+        runs: Query runs (first run per query is used; replay is deterministic)
+
+    Returns:
+        {'recall@5', 'recall@10', 'recall@20', 'mrr', 'queries', 'per_query'}
+    """
+    first_run = {}
+    for run in runs:
+        first_run.setdefault(run['query_id'], run)
+
+    per_query = {}
+    for query in queries:
+        relevant = set(query.get('relevant_ids') or [])
+        run = first_run.get(query['id'])
+        if not relevant or run is None or run.get('error'):
+            continue
+        retrieved = run['source_ids']
+        scores = {f"recall@{k}": len(relevant & set(retrieved[:k])) / len(relevant) for k in RECALL_KS}
+        rank = next((i for i, msg_id in enumerate(retrieved, 1) if msg_id in relevant), None)
+        scores['mrr'] = 1.0 / rank if rank else 0.0
+        per_query[query['id']] = {key: round(value, 4) for key, value in scores.items()}
+
+    summary = {}
+    for key in [f"recall@{k}" for k in RECALL_KS] + ['mrr']:
+        values = [scores[key] for scores in per_query.values()]
+        summary[key] = round(float(np.mean(values)), 4) if values else None
+    summary['queries'] = len(per_query)
+    summary['per_query'] = per_query
+    return summary
+
+
+# ==================== Runner ====================
+
+class RetrievalBenchmark:
+    """
+    Loads the system once on local backends and runs the labelled queries
+    """
+
+    def __init__(self, data_dir: str = "data", vectors: str = "hashing",
+                 recordings: str = RECORDINGS_PATH, record: bool = False, replay_latency: bool = False,
+                 record_from: str = "groq"):
+        """
+        Args:
+            data_dir: Directory holding bm25.pkl, knowledge_graph.pkl and user_indexed/
+            vectors: "hashing" (offline, deterministic) or "fastembed" (production model)
+            recordings: LLM recordings file
+            record: Record responses from `record_from` instead of replaying
+            replay_latency: Replay each LLM response after its recorded latency
+            record_from: "groq" (live API) or "stub" (offline keyword responder)
+        """
+        self.data_dir = data_dir
+        self.vectors = vectors
+        self.record = record
+        live_groq = record and record_from == "groq"
+        live = None
+        if record:
+            live = GroqBackend() if live_groq else StubBackend(lambda **request: stub_content(request))
+        self.backend = RecordedBackend(recordings, backend=live, replay_latency=replay_latency)
+        # Groq quotas only shape live Groq calls; replay and stub recording are instant
+        self.gateway = LLMGateway(backend=self.backend, limits=None if live_groq else REPLAY_LIMITS)
+        self.system: Optional[QASystem] = None
+        self.load: Dict = {}
+
+    def setup(self):
+        """Load the QA system and build the local vector index"""
+        set_gateway(self.gateway)
+        memory_before = rss_mb()
+        start = time.perf_counter()
+
+        embedder = FastEmbedEmbedder() if self.vectors == "fastembed" else HashingEmbedder()
+        vector_search = LocalVectorSearch(embedder=embedder)
+        self.system = QASystem(
+            embedding_path=os.path.join(self.data_dir, "embeddings"),
+            bm25_path=os.path.join(self.data_dir, "bm25"),
+            graph_path=os.path.join(self.data_dir, "knowledge_graph.pkl"),
+            groq_api_key=os.environ.get('GROQ_API_KEY') or "offline",
+            qdrant_search=vector_search
+        )
+        system_seconds = time.perf_counter() - start
+
+        # Point id = BM25 position, as in the Qdrant collection
+        step = time.perf_counter()
+        messages = list(self.system.retriever.bm25_search.messages)
+        vector_search.upsert_messages(messages, point_ids=list(range(len(messages))))
+        self.messages = messages
+
+        self.load = {
+            'seconds': round(time.perf_counter() - start, 3),
+            'components': {**self.system.load_times,
+                           'qa_system': round(system_seconds, 3),
+                           'local_vectors': round(time.perf_counter() - step, 3)},
+            'messages': len(messages),
+            'rss_mb_before': memory_before,
+            'rss_mb_after': rss_mb()
+        }
+
+    def teardown(self):
+        set_gateway(None)
+        if self.record:
+            self.backend.save()
+
+    def _source_id(self, source_id):
+        # Vector hits carry their point id (= BM25 position), not the message id
+        if isinstance(source_id, (int, np.integer)):
+            return self.messages[int(source_id)]['id']
+        return source_id
+
+    def run_query(self, query: Dict) -> Dict:
+        """Answer one query inside a trace"""
+        started = time.perf_counter()
+        try:
+            with start_trace("benchmark", query_id=query['id']) as trace:
+                result = self.system.answer(query['query'], top_k=20)
+            error = None
+        except Exception as e:
+            result, error = {}, f"{type(e).__name__}: {e}"
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        stages: Dict[str, float] = {}
+        if not error:
+            stages = trace.timings()['stages']
+        return {
+            'query_id': query['id'],
+            'route': result.get('route'),
+            'latency_ms': latency_ms,
+            'stages': stages,
+            'source_ids': [self._source_id(s.get('id')) for s in result.get('sources', [])],
+            'error': error
+        }
+
+    def run(self, queries: List[Dict], repeat: int = 1, concurrency: int = 1, warmup: int = 1) -> Dict:
+        """
+        Run every query `repeat` times and summarize
+
+        Args:
+            queries: Query set
+            repeat: Measured passes over the query set
+            concurrency: Queries in flight at once
+            warmup: Unmeasured passes first (lazy components, caches)
+
+        Returns:
+            Result dict (see module docstring)
+        """
+        for _ in range(warmup):
+            for query in queries:
+                self.run_query(query)
+
+        workload = [query for _ in range(repeat) for query in queries]
+        start = time.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                runs = list(pool.map(self.run_query, workload))
+        else:
+            runs = [self.run_query(query) for query in workload]
+        elapsed = time.perf_counter() - start
+
+        ok = [run for run in runs if not run['error']]
+        stage_values: Dict[str, List[float]] = {}
+        for run in ok:
+            for name, value in run['stages'].items():
+                stage_values.setdefault(name, []).append(value)
+        by_route: Dict[str, List[float]] = {}
+        for run in ok:
+            by_route.setdefault(run['route'], []).append(run['latency_ms'])
+
+        return {
+            'latency_ms': {
+                'end_to_end': percentiles([run['latency_ms'] for run in ok]),
+                'by_route': {route: percentiles(values) for route, values in sorted(by_route.items())},
+                'stages': {name: percentiles(values) for name, values in sorted(stage_values.items())}
+            },
+            'throughput': {
+                'queries': len(runs),
+                'seconds': round(elapsed, 3),
+                'qps': round(len(runs) / elapsed, 3) if elapsed else None,
+                'concurrency': concurrency
+            },
+            'quality': retrieval_quality(queries, runs),
+            'errors': sorted({f"{run['query_id']}: {run['error']}" for run in runs if run['error']})
+        }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=BENCHMARK_DIR, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmark(data_dir: str = "data", queries_path: str = QUERIES_PATH, repeat: int = 3,
+                  concurrency: int = 1, warmup: int = 1, vectors: str = "hashing",
+                  recordings: str = RECORDINGS_PATH, record: bool = False, record_from: str = "groq",
+                  replay_latency: bool = False, query_ids: Optional[List[str]] = None) -> Dict:
+    """
+    Full benchmark run
+
+    Returns:
+        JSON-serializable result
+    """
+    queries = load_queries(queries_path)
+    if query_ids:
+        queries = [query for query in queries if query['id'] in query_ids]
+
+    benchmark = RetrievalBenchmark(data_dir, vectors=vectors, recordings=recordings,
+                                   record=record, replay_latency=replay_latency, record_from=record_from)
+    try:
+        benchmark.setup()
+        results = benchmark.run(queries, repeat=repeat, concurrency=concurrency, warmup=warmup)
+    finally:
+        benchmark.teardown()
+
+    return {
+        'benchmark': 'retrieval',
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'git_commit': git_commit(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'config': {
+            'data_dir': data_dir,
+            'queries': len(queries),
+            'repeat': repeat,
+            'warmup': warmup,
+            'concurrency': concurrency,
+            'vectors': vectors,
+            'llm': f"record:{record_from}" if record else 'replay',
+            'replay_latency': replay_latency
+        },
+        'load': benchmark.load,
+        **results,
+        'memory': {
+            'rss_mb_before_load': benchmark.load['rss_mb_before'],
+            'rss_mb_after_load': benchmark.load['rss_mb_after'],
+            'rss_mb_after_run': rss_mb(),
+            'peak_rss_mb': peak_rss_mb()
+        },
+        'llm': dict(benchmark.backend.counts, recordings=len(benchmark.backend.recordings))
+    }
+
+
+def compare(current: Dict, baseline: Dict, max_regression: float = 0.2,
+            max_quality_drop: float = 0.02) -> List[str]:
+    """
+    Regressions of `current` against `baseline`
+
+    Args:
+        current: This run's result
+        baseline: Earlier result
+        max_regression: Allowed relative slowdown of p95 latencies / QPS
+        max_quality_drop: Allowed absolute drop of recall@k / MRR
+
+    Returns:
+        Human-readable regressions (empty = none)
+    """
+    regressions = []
+
+    def check_latency(label, now, before):
+        if now and before and before.get('p95') and now['p95'] > before['p95'] * (1 + max_regression):
+            regressions.append(f"{label} p95 {before['p95']:.1f}ms → {now['p95']:.1f}ms")
+
+    check_latency("end_to_end", current['latency_ms']['end_to_end'], baseline['latency_ms']['end_to_end'])
+    for stage, now in current['latency_ms']['stages'].items():
+        before = baseline['latency_ms']['stages'].get(stage)
+        # Sub-millisecond stages are all noise
+        if before and before.get('p95', 0) >= 1.0:
+            check_latency(stage, now, before)
+
+    qps, base_qps = current['throughput']['qps'], baseline['throughput']['qps']
+    if qps and base_qps and qps < base_qps * (1 - max_regression):
+        regressions.append(f"qps {base_qps:.2f} → {qps:.2f}")
+
+    for key in [f"recall@{k}" for k in RECALL_KS] + ['mrr']:
+        now, before = current['quality'].get(key), baseline['quality'].get(key)
+        if now is not None and before is not None and now < before - max_quality_drop:
+            regressions.append(f"{key} {before:.3f} → {now:.3f}")
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline retrieval benchmark")
+    parser.add_argument('--data-dir', default="data")
+    parser.add_argument('--queries', default=QUERIES_PATH)
+    parser.add_argument('--repeat', type=int, default=3, help="Measured passes over the query set")
+    parser.add_argument('--warmup', type=int, default=1, help="Unmeasured passes first")
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--vectors', choices=['hashing', 'fastembed'], default='hashing')
+    parser.add_argument('--recordings', default=RECORDINGS_PATH)
+    parser.add_argument('--record', action='store_true', help="Record live Groq responses (GROQ_API_KEY)")
+    parser.add_argument('--record-from', choices=['groq', 'stub'], default='groq',
+                        help="Recording source: live Groq or the offline stub responder")
+    parser.add_argument('--replay-latency', action='store_true', help="Replay recorded LLM latency")
+    parser.add_argument('--only', nargs='*', help="Query ids to run")
+    parser.add_argument('--output', help="Write the JSON result here (default: stdout)")
+    parser.add_argument('--compare', help="Baseline result JSON; exit 1 on regression")
+    parser.add_argument('--max-regression', type=float, default=0.2)
+    parser.add_argument('--relabel', action='store_true', help="Recompute relevant_ids from the rules and exit")
+    args = parser.parse_args(argv)
+
+    if args.relabel:
+        import pickle
+        with open(os.path.join(args.data_dir, "bm25.pkl"), 'rb') as f:
+            messages = pickle.load(f)['messages']
+        counts = relabel(args.queries, messages)
+        print(f"✅ Relabelled {len(counts)} queries: {counts}")
+        return 0
+
+    result = run_benchmark(
+        data_dir=args.data_dir, queries_path=args.queries, repeat=args.repeat,
+        concurrency=args.concurrency, warmup=args.warmup, vectors=args.vectors,
+        recordings=args.recordings, record=args.record, record_from=args.record_from,
+        replay_latency=args.replay_latency, query_ids=args.only
+    )
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"✅ Results written to {args.output}")
+    else:
+        print(text)
+
+    e2e = result['latency_ms']['end_to_end']
+    quality = result['quality']
+    print(f"\n📊 {result['throughput']['queries']} queries: p50 {e2e.get('p50')}ms, p95 {e2e.get('p95')}ms, "
+          f"{result['throughput']['qps']} QPS | recall@10 {quality['recall@10']}, MRR {quality['mrr']} | "
+          f"peak RSS {result['memory']['peak_rss_mb']} MB | LLM {result['llm']}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, max_regression=args.max_regression)
+        if regressions:
+            print("\n⚠️  Regressions vs baseline:")
+            for regression in regressions:
+                print(f"   - {regression}")
+            return 1
+        print("\n✅ No regressions vs baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,578 @@
+"""
+Synthetic Corpus Generator
+
+Generates concierge-style member messages at any size (10k to 10M), with
+the artifacts the indexes are built from and ground-truth labels, so every
+index build and benchmark can run at production scale offline.
+
+Architecture:
+- Members: synthetic "First Last" names (same pools as the micro-benchmarks);
+  activity is Zipf-distributed (--activity-skew), so a few members write a
+  large share of the messages and most write a little
+- Entities: restaurants, hotels, destinations, services, cars, events and
+  preferences, each with Zipf popularity (--entity-skew). Every member has a
+  few favourites per type, a car or two and standing preferences, so member
+  profiles are coherent and "same restaurant" / "same car" analytics have
+  real answers
+- Messages come from templates per intent (booking, trip, visit, event,
+  car, preference, plus chatter with no triple). A share mention an explicit
+  date ("on March 14, 2025") or "next month"; normalized_dates are the
+  dates normalize_dates() extracts from that text
+- Streaming: messages and triples are written line by line; per-member
+  message positions are kept as compact arrays, so memory grows with the
+  number of members, not the text
+- Ground truth: labelled queries are chosen up front (members across the
+  activity range, their favourite entities, mid-window months) and their
+  relevant ids collected from the generator's own facts while streaming.
+  Each also carries an equivalent rule, so
+  `retrieval_benchmark --relabel` reproduces the same ids. Analytics
+  answers (most popular entity per type by distinct members, shared cars)
+  are counted exactly
+
+Output directory:
+    raw_messages.jsonl          messages (id, user_id, user_name, timestamp,
+                                message, normalized_dates), BM25 order
+    user_indexed/user_index.json user_id → {user_name, message_count, message_indices}
+    triples.jsonl               subject, relationship, object, message_id, timestamp
+    queries.json                labelled queries (benchmarks/queries.json format)
+    manifest.json               parameters, counts and distributions
+    bm25.pkl, knowledge_graph.pkl  with --build-indexes
+
+Usage:
+    python -m benchmarks.synthetic_corpus --messages 1000000 --output benchmarks/results/corpus_1m
+    python -m benchmarks.synthetic_corpus --messages 100000 --output /tmp/corpus --build-indexes
+    python -m benchmarks.retrieval_benchmark --data-dir /tmp/corpus --queries /tmp/corpus/queries.json
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import array
+import bisect
+import random
+import argparse
+from datetime import datetime, date, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.micro_benchmarks import synthetic_names
+
+
+# Messages per member in the real snapshot (3,349 / 10)
+MESSAGES_PER_MEMBER = 335
+
+# Entity pools. Names never contain each other or a destination, so a message
+# mentions exactly the entity it was generated for, and contain nothing
+# datefinder reads as a date ("Septime", "Four Seasons", weekdays)
+ENTITIES = {
+    'restaurant': [
+        "Osteria Francescana", "Eleven Madison Park", "Le Bernardin", "The River Café", "Alinea",
+        "The Ivy", "Noma", "Nobu", "Le Cinq", "Sketch", "Per Se", "Masa", "Disfrutar", "Mirazur",
+        "Gaggan", "The French Laundry", "Atomix", "Geranium", "Pujol", "Quintonil", "Arpège",
+        "Le Calandre", "Steirereck", "Odette", "Narisawa", "Den", "Frantzén", "Maido"
+    ],
+    'hotel': [
+        "The Lanesborough", "The Peninsula", "Park Hyatt", "The Ritz", "Claridge's", "The Savoy",
+        "Le Bristol", "Mandarin Oriental", "Burj Al Arab", "Belmond Cipriani", "The Connaught",
+        "Rosewood", "Hotel Caruso", "Raffles", "Chateau Marmont", "The Plaza", "Amanpuri", "Six Senses"
+    ],
+    'destination': [
+        "Paris", "Tokyo", "London", "Dubai", "New York", "Santorini", "Maldives", "Kyoto",
+        "St. Moritz", "Aspen", "Bali", "Amalfi Coast", "Cape Town", "Reykjavik", "Marrakech",
+        "Lisbon", "Sydney", "Rome", "Barcelona", "Bora Bora", "Singapore", "Mykonos", "Courchevel",
+        "Tulum", "Seychelles", "Patagonia"
+    ],
+    'service': [
+        "private jet", "yacht", "spa", "golf", "museum", "helicopter", "chauffeur",
+        "personal shopper", "sommelier", "private chef"
+    ],
+    'car': [
+        "Tesla Model S", "Porsche Taycan", "Ferrari Roma", "Bentley Continental", "Range Rover",
+        "Mercedes G-Class", "Lamborghini Urus", "Aston Martin Vantage", "BMW iX", "Rolls-Royce Cullinan",
+        "Maserati Levante", "Audi e-tron GT"
+    ],
+    'event': [
+        "the Monaco Grand Prix", "Wimbledon", "the Cannes Film Festival", "Art Basel", "the Met Gala",
+        "Milan Fashion Week", "the Super Bowl", "the Venice Biennale", "Coachella", "the Kentucky Derby",
+        "the Grammys", "Royal Ascot", "the US Open", "the Salzburg Festival"
+    ],
+    'preference': [
+        "aisle seats", "window seats", "vegan menus", "non-smoking rooms", "late checkout",
+        "quiet rooms on high floors", "sparkling water on arrival", "gluten-free options",
+        "hypoallergenic bedding", "an early breakfast", "a firm pillow", "still water only"
+    ]
+}
+
+# Booking phrase per service (object of the RENTED/BOOKED triple)
+SERVICE_OBJECTS = {
+    "private jet": "a private jet", "yacht": "a yacht", "spa": "a spa day", "golf": "a round of golf",
+    "museum": "a private museum tour", "helicopter": "a helicopter transfer", "chauffeur": "a chauffeur",
+    "personal shopper": "a personal shopper", "sommelier": "a sommelier for the evening",
+    "private chef": "a private chef"
+}
+
+# Intent → (entity type, relationship, share of messages, templates).
+# {e} = entity, {when} = optional date phrase (" on March 14, 2025" / " next month")
+INTENTS = {
+    'restaurant': ('restaurant', 'RENTED/BOOKED', 0.20, [
+        "Please book a table for two at {e}{when}.",
+        "Could you reserve a table at {e}{when}? We are celebrating an anniversary.",
+        "I'd like a table at {e}{when}, ideally by the window.",
+        "Can you get us a table at {e}{when} for a client dinner?"
+    ]),
+    'hotel': ('hotel', 'RENTED/BOOKED', 0.15, [
+        "Reserve a suite at {e}{when}, please.",
+        "Please book my usual suite at {e}{when}.",
+        "Can you secure a suite at {e}{when} with an early check-in?"
+    ]),
+    'service': ('service', 'RENTED/BOOKED', 0.15, [
+        "Please arrange {e}{when}.",
+        "Can you book {e}{when} for my family?",
+        "I need {e}{when}; please confirm the details."
+    ]),
+    'trip': ('destination', 'PLANNING_TRIP_TO', 0.12, [
+        "I'm planning a trip to {e}{when}; please arrange flights and transfers.",
+        "Start organising my trip to {e}{when}, flying business if possible.",
+        "Can you look into villas for my trip to {e}{when}?"
+    ]),
+    'visit': ('destination', 'VISITED', 0.05, [
+        "Thank you for arranging everything in {e}, it was wonderful.",
+        "Everything in {e} was perfect, please thank the local team."
+    ]),
+    'event': ('event', 'ATTENDING_EVENT', 0.06, [
+        "Can you get me VIP passes for {e}{when}?",
+        "I'd love to attend {e}{when}; please arrange access.",
+        "Please confirm my seats for {e}{when}."
+    ]),
+    'car': ('car', 'OWNS', 0.06, [
+        "Please have my {e} detailed before the weekend.",
+        "My {e} needs its annual service; can you book it?",
+        "Arrange winter tyres for my {e}, please."
+    ]),
+    'preference': ('preference', 'PREFERS', 0.08, [
+        "Please note that I prefer {e} for all future bookings.",
+        "Just a reminder that I always prefer {e}."
+    ]),
+    'chatter': (None, None, 0.13, [
+        "Thanks for the quick help earlier.",
+        "Can you update the billing address on my account?",
+        "There is an unexpected charge on my last statement; can you look into it?",
+        "Please send me the invoice for the last booking.",
+        "My new phone number is on file now, please use it from here on.",
+        "I appreciate the team's recommendations, very helpful."
+    ])
+}
+
+# Share of dated intents that mention a date, and of those how many say "next month"
+DATED_SHARE = 0.35
+NEXT_MONTH_SHARE = 0.15
+
+# How often a member picks one of their favourites rather than a popular entity
+FAVOURITE_SHARE = 0.6
+FAVOURITES_PER_TYPE = 3
+
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August",
+          "September", "October", "November", "December"]
+
+
+class ZipfSampler:
+    """
+    Draws ranks 0..n-1 with probability ∝ 1 / (rank + 1)^skew
+    """
+
+    def __init__(self, n: int, skew: float):
+        total = 0.0
+        self.cumulative = []
+        for rank in range(n):
+            total += 1.0 / (rank + 1) ** skew
+            self.cumulative.append(total)
+        self.total = total
+
+    def sample(self, rng: random.Random) -> int:
+        return bisect.bisect_left(self.cumulative, rng.random() * self.total)
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _month_range(year: int, month: int) -> Tuple[str, str]:
+    """First and last ISO date of a month"""
+    start = date(year, month, 1)
+    end = (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return start.isoformat(), end.isoformat()
+
+
+class SyntheticCorpusGenerator:
+    """
+    Streaming generator of messages, triples, user index and labels
+    """
+
+    def __init__(
+        self,
+        messages: int = 10_000,
+        users: Optional[int] = None,
+        seed: int = 0,
+        start: str = "2024-11-01",
+        days: int = 365,
+        activity_skew: float = 0.8,
+        entity_skew: float = 1.0
+    ):
+        """
+        Args:
+            messages: Number of messages
+            users: Number of members (default: one per 335 messages, like the snapshot)
+            seed: Random seed (everything is reproducible from it)
+            start: First message date
+            days: Length of the message window
+            activity_skew: Zipf exponent of member activity (0 = uniform)
+            entity_skew: Zipf exponent of entity popularity within a type
+        """
+        self.messages = messages
+        self.users = users or max(10, round(messages / MESSAGES_PER_MEMBER))
+        self.seed = seed
+        self.start = datetime.fromisoformat(start).replace(tzinfo=timezone.utc)
+        self.days = days
+        self.activity_skew = activity_skew
+        self.entity_skew = entity_skew
+
+        self.rng = random.Random(seed)
+        names = synthetic_names(self.users, set(), self.rng)
+        if len(names) < self.users:
+            raise ValueError(f"At most {len(names)} distinct member names are available")
+        self.members = [{'user_id': _uuid(self.rng), 'user_name': name} for name in names]
+
+        self.activity = ZipfSampler(self.users, activity_skew)
+        self.popularity = {kind: ZipfSampler(len(pool), entity_skew) for kind, pool in ENTITIES.items()}
+        self.intents = list(INTENTS)
+        self.intent_weights = [INTENTS[intent][2] for intent in self.intents]
+
+        # Member profiles: favourites per type, owned cars, standing preferences
+        for member in self.members:
+            member['favourites'] = {
+                kind: sorted({self._popular(kind) for _ in range(FAVOURITES_PER_TYPE)})
+                for kind in ('restaurant', 'hotel', 'destination', 'service', 'event')
+            }
+            member['cars'] = sorted({self._popular('car') for _ in range(self.rng.choice((1, 1, 2)))})
+            member['preferences'] = sorted({self._popular('preference') for _ in range(3)})
+
+        self.labels = self._choose_labels()
+
+    def _popular(self, kind: str) -> int:
+        return self.popularity[kind].sample(self.rng)
+
+    def _entity(self, member: Dict, kind: str) -> int:
+        """Entity index for a member's message of this type"""
+        if kind == 'car':
+            return self.rng.choice(member['cars'])
+        if kind == 'preference':
+            return self.rng.choice(member['preferences'])
+        if self.rng.random() < FAVOURITE_SHARE:
+            return self.rng.choice(member['favourites'][kind])
+        return self._popular(kind)
+
+    # ==================== Messages ====================
+
+    def _when(self, timestamp: datetime) -> Tuple[str, List[str]]:
+        """Optional date phrase and the dates normalize_dates() finds in it"""
+        if self.rng.random() >= DATED_SHARE:
+            return "", []
+        if self.rng.random() < NEXT_MONTH_SHARE:
+            month = (timestamp.replace(day=1) + timedelta(days=32)).replace(day=1)
+            return " next month", [month.date().isoformat()]
+        day = timestamp.date() + timedelta(days=self.rng.randint(3, 120))
+        return f" on {MONTHS[day.month - 1]} {day.day}, {day.year}", [day.isoformat()]
+
+    def generate(self):
+        """
+        Stream the corpus
+
+        Yields:
+            (message, triple or None, fact) per message. fact is
+            (member index, intent, entity index or None, normalized dates)
+        """
+        window = self.days * 86400
+        for _ in range(self.messages):
+            member_index = self.activity.sample(self.rng)
+            member = self.members[member_index]
+            timestamp = self.start + timedelta(seconds=self.rng.random() * window)
+            intent = self.rng.choices(self.intents, self.intent_weights)[0]
+            kind, relationship, _, templates = INTENTS[intent]
+            template = self.rng.choice(templates)
+
+            entity_index, when, dates = None, "", []
+            if kind is not None:
+                entity_index = self._entity(member, kind)
+                if '{when}' in template:
+                    when, dates = self._when(timestamp)
+            entity = ENTITIES[kind][entity_index] if kind else None
+            phrase = SERVICE_OBJECTS[entity] if kind == 'service' else entity
+
+            iso = timestamp.isoformat()
+            message = {
+                'id': _uuid(self.rng),
+                'user_id': member['user_id'],
+                'user_name': member['user_name'],
+                'timestamp': iso,
+                'message': template.format(e=phrase, when=when),
+                'normalized_dates': dates
+            }
+
+            triple = None
+            if relationship:
+                obj = {
+                    'restaurant': f"a table at {entity}",
+                    'hotel': f"a suite at {entity}",
+                    'car': f"my {entity}"
+                }.get(kind, phrase)
+                triple = {'subject': member['user_name'], 'relationship': relationship, 'object': obj,
+                          'message_id': message['id'], 'timestamp': iso}
+
+            yield message, triple, (member_index, intent, entity_index, dates)
+
+    # ==================== Ground Truth ====================
+
+    def _choose_labels(self) -> List[Dict]:
+        """
+        Labelled queries, chosen before generation
+
+        Each has a 'match' (fact predicate used while streaming) next to the
+        public rule; 'match' is dropped when the labels are written.
+        """
+        rng = random.Random(self.seed + 1)
+        # Members across the activity range (most active, typical, long tail)
+        ranks = sorted({0, 1, self.users // 10, self.users // 3, self.users // 2, self.users - 1})
+        mid = self.start + timedelta(days=self.days // 2)
+        month = (mid.year, mid.month)
+        labels = []
+
+        def add(category, query, rule, match):
+            labels.append({'id': f"S{len(labels) + 1}", 'category': category, 'query': query,
+                           'rule': rule, 'match': match, 'relevant_ids': []})
+
+        for rank in ranks:
+            member = self.members[rank]
+            name = member['user_name']
+            kind = rng.choice(('trip', 'restaurant', 'car', 'preference', 'temporal'))
+            if kind == 'trip':
+                dest = rng.choice(member['favourites']['destination'])
+                add('user_lookup', f"What are {name}'s plans in {ENTITIES['destination'][dest]}?",
+                    {'user': name, 'all_of': [[ENTITIES['destination'][dest].lower()]]},
+                    {'member': rank, 'intents': ['trip', 'visit'], 'entity': dest})
+            elif kind == 'restaurant':
+                add('user_lookup', f"What restaurants has {name} booked?",
+                    {'user': name, 'all_of': [["table"]]}, {'member': rank, 'intents': ['restaurant']})
+            elif kind == 'car':
+                add('user_lookup', f"Which cars does {name} own?",
+                    {'user': name, 'all_of': [[car.lower() for car in ENTITIES['car']]]},
+                    {'member': rank, 'intents': ['car']})
+            elif kind == 'preference':
+                add('user_lookup', f"What are {name}'s preferences?",
+                    {'user': name, 'all_of': [["prefer"]]}, {'member': rank, 'intents': ['preference']})
+            else:
+                start, end = _month_range(*month)
+                add('temporal', f"What does {name} have planned for {MONTHS[month[1] - 1]} {month[0]}?",
+                    {'user': name, 'dates': [start, end]}, {'member': rank, 'dates': [start, end]})
+
+        # Topic queries on a popular and a mid-popularity entity
+        for kind, intent, rank in (('restaurant', 'restaurant', 1), ('event', 'event', 5)):
+            entity = ENTITIES[kind][rank]
+            verb = "booked a table at" if kind == 'restaurant' else "asked about"
+            add('topic', f"Who {verb} {entity}?", {'all_of': [[entity.lower()]]},
+                {'intents': [intent], 'entity': rank})
+
+        dest = 2
+        start, end = _month_range(*month)
+        add('topic', f"Who is travelling to {ENTITIES['destination'][dest]} in {MONTHS[month[1] - 1]} {month[0]}?",
+            {'all_of': [[ENTITIES['destination'][dest].lower()], ["trip"]], 'dates': [start, end]},
+            {'intents': ['trip'], 'entity': dest, 'dates': [start, end]})
+        add('temporal', f"Which clients have plans for {MONTHS[month[1] - 1]} {month[0]}?",
+            {'dates': [start, end]}, {'dates': [start, end]})
+        return labels
+
+    @staticmethod
+    def _matches(match: Dict, fact: Tuple) -> bool:
+        member_index, intent, entity_index, dates = fact
+        if 'member' in match and member_index != match['member']:
+            return False
+        if 'intents' in match and intent not in match['intents']:
+            return False
+        if 'entity' in match and entity_index != match['entity']:
+            return False
+        if 'dates' in match:
+            start, end = match['dates']
+            if not any(start <= day <= end for day in dates):
+                return False
+        return True
+
+    def _analytics_labels(self, members_by_entity: Dict[str, List[bytearray]], top: int = 5) -> List[Dict]:
+        """Most popular entity per type and shared cars, by distinct members"""
+        labels = []
+        for kind, question in (('restaurant', "What are the most popular restaurants?"),
+                               ('hotel', "Which hotels are the most popular?"),
+                               ('destination', "What are the most popular destinations?"),
+                               ('event', "Which events are the most popular?")):
+            counts = sorted(((sum(seen), ENTITIES[kind][i]) for i, seen in enumerate(members_by_entity[kind])),
+                            key=lambda item: (-item[0], item[1]))
+            labels.append({'category': 'analytics', 'query': question,
+                           'answer': [{'entity': name, 'members': count} for count, name in counts[:top]]})
+
+        shared = sorted(((sum(seen), ENTITIES['car'][i]) for i, seen in enumerate(members_by_entity['car'])),
+                        key=lambda item: (-item[0], item[1]))
+        labels.append({'category': 'analytics', 'query': "Which clients own the same car?",
+                       'answer': [{'entity': name, 'members': count} for count, name in shared if count > 1][:top]})
+        return labels
+
+    # ==================== Output ====================
+
+    def write(self, output_dir: str, progress_every: int = 1_000_000) -> Dict:
+        """
+        Generate the corpus into output_dir
+
+        Args:
+            output_dir: Output directory (created)
+            progress_every: Print progress every N messages (0 = quiet)
+
+        Returns:
+            Manifest dict (also written as manifest.json)
+        """
+        os.makedirs(os.path.join(output_dir, "user_indexed"), exist_ok=True)
+        started = time.perf_counter()
+
+        positions = [array.array('Q') for _ in self.members]
+        members_by_entity = {kind: [bytearray(self.users) for _ in ENTITIES[kind]]
+                             for kind in ('restaurant', 'hotel', 'destination', 'event', 'car')}
+        by_member: Dict[int, List[Dict]] = {}
+        unkeyed = []
+        for label in self.labels:
+            if 'member' in label['match']:
+                by_member.setdefault(label['match']['member'], []).append(label)
+            else:
+                unkeyed.append(label)
+
+        counts = {'messages': 0, 'triples': 0, 'dated': 0}
+        intents = {intent: 0 for intent in INTENTS}
+        with open(os.path.join(output_dir, "raw_messages.jsonl"), 'w', encoding='utf-8') as messages_file, \
+                open(os.path.join(output_dir, "triples.jsonl"), 'w', encoding='utf-8') as triples_file:
+            for position, (message, triple, fact) in enumerate(self.generate()):
+                messages_file.write(json.dumps(message, ensure_ascii=False) + '\n')
+                member_index, intent, entity_index, dates = fact
+                positions[member_index].append(position)
+                counts['messages'] += 1
+                counts['dated'] += bool(dates)
+                intents[intent] += 1
+
+                if triple is not None:
+                    triples_file.write(json.dumps(triple, ensure_ascii=False) + '\n')
+                    counts['triples'] += 1
+                    kind = INTENTS[intent][0]
+                    if kind in members_by_entity:
+                        members_by_entity[kind][entity_index][member_index] = 1
+
+                member_labels = by_member.get(member_index)
+                for label in (member_labels + unkeyed if member_labels else unkeyed):
+                    if self._matches(label['match'], fact):
+                        label['relevant_ids'].append(message['id'])
+
+                if progress_every and (position + 1) % progress_every == 0:
+                    rate = (position + 1) / (time.perf_counter() - started)
+                    print(f"   {position + 1:,} messages ({rate:,.0f}/s)")
+
+        self._write_user_index(os.path.join(output_dir, "user_indexed", "user_index.json"), positions)
+
+        queries = [{key: value for key, value in label.items() if key != 'match'} for label in self.labels]
+        for i, label in enumerate(self._analytics_labels(members_by_entity), start=1):
+            queries.append({'id': f"SA{i}", **label})
+        with open(os.path.join(output_dir, "queries.json"), 'w', encoding='utf-8') as f:
+            json.dump({'description': (f"Ground truth for the synthetic corpus (seed {self.seed}). relevant_ids come "
+                                       "from the generator's facts; each rule reproduces them with --relabel."),
+                       'queries': queries}, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+
+        elapsed = time.perf_counter() - started
+        active = [len(p) for p in positions if len(p)]
+        manifest = {
+            'generator': 'benchmarks.synthetic_corpus',
+            'config': {'messages': self.messages, 'users': self.users, 'seed': self.seed,
+                       'start': self.start.date().isoformat(), 'days': self.days,
+                       'activity_skew': self.activity_skew, 'entity_skew': self.entity_skew},
+            'counts': {**counts, 'active_members': len(active), 'labels': len(queries)},
+            'intents': intents,
+            'messages_per_member': {'max': max(active, default=0), 'min': min(active, default=0),
+                                    'median': sorted(active)[len(active) // 2] if active else 0},
+            'generation_seconds': round(elapsed, 2),
+            'messages_per_second': round(counts['messages'] / elapsed, 1) if elapsed else None
+        }
+        with open(os.path.join(output_dir, "manifest.json"), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    def _write_user_index(self, path: str, positions: List[array.array]):
+        """user_index.json, one member at a time (same layout as BM25Search.save_user_index)"""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{')
+            first = True
+            for member, member_positions in zip(self.members, positions):
+                if not member_positions:
+                    continue
+                entry = {'user_name': member['user_name'], 'message_count': len(member_positions),
+                         'message_indices': member_positions.tolist()}
+                body = json.dumps(entry, indent=2).replace('\n', '\n  ')
+                f.write(f"{'' if first else ','}\n  {json.dumps(member['user_id'])}: {body}")
+                first = False
+            f.write('\n}' if not first else '}')
+
+
+def build_indexes(corpus_dir: str):
+    """
+    Build bm25.pkl and knowledge_graph.pkl next to the generated corpus
+
+    The directory then has the same layout as data/, so --data-dir of the
+    benchmarks and IndexRefresher can point at it.
+    """
+    from src.bm25_search import BM25Search
+    from src.knowledge_graph import KnowledgeGraph
+    from src.data_ingestion import load_messages
+
+    bm25 = BM25Search()
+    bm25.build_index(load_messages(os.path.join(corpus_dir, "raw_messages.jsonl")))
+    bm25.save(os.path.join(corpus_dir, "bm25"))
+
+    with open(os.path.join(corpus_dir, "triples.jsonl"), 'r', encoding='utf-8') as f:
+        triples = [json.loads(line) for line in f if line.strip()]
+    graph = KnowledgeGraph()
+    graph.build_from_triples(triples)
+    graph.save(os.path.join(corpus_dir, "knowledge_graph.pkl"))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Synthetic concierge corpus generator")
+    parser.add_argument('--messages', type=int, default=10_000)
+    parser.add_argument('--users', type=int, help="Members (default: messages / 335)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start', default="2024-11-01", help="First message date")
+    parser.add_argument('--days', type=int, default=365, help="Message window length")
+    parser.add_argument('--activity-skew', type=float, default=0.8, help="Zipf exponent of member activity")
+    parser.add_argument('--entity-skew', type=float, default=1.0, help="Zipf exponent of entity popularity")
+    parser.add_argument('--output', required=True, help="Output directory")
+    parser.add_argument('--build-indexes', action='store_true', help="Also build bm25.pkl and knowledge_graph.pkl")
+    args = parser.parse_args(argv)
+
+    print(f"🏭 Generating {args.messages:,} messages → {args.output}")
+    generator = SyntheticCorpusGenerator(
+        messages=args.messages, users=args.users, seed=args.seed, start=args.start, days=args.days,
+        activity_skew=args.activity_skew, entity_skew=args.entity_skew
+    )
+    manifest = generator.write(args.output)
+    print(f"✅ {manifest['counts']['messages']:,} messages, {manifest['counts']['triples']:,} triples, "
+          f"{manifest['counts']['active_members']:,} members in {manifest['generation_seconds']}s")
+
+    if args.build_indexes:
+        build_indexes(args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
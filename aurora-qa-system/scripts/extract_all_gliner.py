@@ -1,11 +1,20 @@
 """
 Extract entities from all 3,349 messages using GLiNER + spaCy
 Industry-standard approach: Local, fast, zero API costs
-Estimated time: ~20 minutes
+Batched GLiNER + nlp.pipe over a small process pool: a few minutes on a
+multi-core box for the first run (was ~20 minutes one message at a time);
+later runs reuse data/extraction_cache.db and only extract new or edited
+messages.
 """
+import os
 import json
 import random
 from src.entity_extraction_gliner import GLiNEREntityExtractor
+from src.extraction_cache import ExtractionCache
+
+
+# Each worker loads its own GLiNER model (~1 GB), so cap the pool size
+N_PROCESS = min(4, os.cpu_count() or 1)
 
 
 def main():
@@ -22,16 +31,18 @@ def main():
     print(f"✅ Loaded {len(messages)} messages")
 
     # Initialize extractor
-    extractor = GLiNEREntityExtractor()
+    cache = ExtractionCache("data/extraction_cache.db")
+    extractor = GLiNEREntityExtractor(cache=cache)
 
     # Extract from all messages
     print("\n⚡ Starting extraction...")
     print("   - Local processing (no rate limits)")
     print("   - GLiNER for entity recognition")
     print("   - spaCy for relationship extraction")
-    print("   - Estimated time: ~20 minutes\n")
+    print(f"   - Batched inference over {N_PROCESS} worker process(es)\n")
 
-    triples = extractor.extract_from_messages_batch(messages)
+    triples = extractor.extract_from_messages_batch(messages, n_process=N_PROCESS)
+    cache.print_stats()
 
     # Save results
     print("\n💾 Saving results...")
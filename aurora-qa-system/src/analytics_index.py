@@ -0,0 +1,239 @@
+"""
+Analytics Index Module
+
+Materialised entity aggregates for GraphAnalytics (SAME / MOST / POPULAR / SIMILAR).
+
+Architecture:
+- entity → users table per entity type (who mentioned each restaurant, hotel, ...)
+- user → entities table per entity type (each client's profile, for SIMILAR)
+- Count index per entity type: user_count → entities (rankings without sorting everything)
+- Entities and types come from the EntityDictionary (one Aho-Corasick pass per object)
+- Built alongside the knowledge graph and updated incrementally with each triple
+
+With the index in place an analytics query is a dictionary lookup whose cost
+depends on the size of the answer, not on the number of edges in the graph.
+
+Usage:
+    index = EntityAggregateIndex()
+    index.add("Vikram Desai", "a table at Noma")
+    index.ranked("restaurant", min_users=2)
+    # Returns: [("Noma", ["Hans Müller", "Vikram Desai"]), ...]
+"""
+from collections import defaultdict
+from typing import List, Dict, Optional, Set, Tuple
+try:
+    from src.entity_dictionary import EntityDictionary
+except ImportError:  # scripts that put src/ itself on sys.path
+    from entity_dictionary import EntityDictionary
+
+
+_SKIP_WORDS = {'a', 'the', 'at', 'in', 'for', 'on', 'to', 'of', 'and'}
+_FILLER_WORDS = _SKIP_WORDS | {'reservation', 'table'}
+
+
+def extract_entity_name(obj_text: str) -> str:
+    """
+    Heuristic entity name for objects the entity dictionary does not know
+
+    Args:
+        obj_text: Object text from triple
+
+    Returns:
+        Entity name (capitalised words, else first meaningful words)
+    """
+    # Look for capitalized words (likely proper nouns)
+    words = obj_text.split()
+    proper_nouns = []
+    for word in words:
+        # Skip common words
+        if word.lower() in _SKIP_WORDS:
+            continue
+        # Check if capitalized
+        if word and word[0].isupper():
+            proper_nouns.append(word)
+            # Take up to 3 consecutive capitalized words
+            if len(proper_nouns) == 3:
+                break
+
+    if proper_nouns:
+        return ' '.join(proper_nouns)
+
+    # Final fallback: return first 3-4 meaningful words
+    meaningful_words = [w for w in words if w.lower() not in _FILLER_WORDS][:4]
+
+    return ' '.join(meaningful_words) if meaningful_words else obj_text[:30]
+
+
+class EntityAggregateIndex:
+    """
+    Incrementally maintained entity aggregates per entity type
+
+    Tables:
+    - entity_users[type][entity] → set of users
+    - user_entities[type][user] → set of entities
+    - count_index[type][n_users] → set of entities requested by exactly n users
+    - mention_counts[type] → number of entity mentions indexed for the type
+    """
+
+    def __init__(self, dictionary: Optional[EntityDictionary] = None):
+        """
+        Initialize empty aggregate tables
+
+        Args:
+            dictionary: Entity dictionary used to recognise entities
+                        (defaults to the seed-only dictionary)
+        """
+        self.dictionary = dictionary or EntityDictionary()
+        self.entity_users: Dict[str, Dict[str, Set[str]]] = {}
+        self.user_entities: Dict[str, Dict[str, Set[str]]] = {}
+        self.count_index: Dict[str, Dict[int, Set[str]]] = {}
+        self.mention_counts: Dict[str, int] = {}
+
+    def covers(self, entity_type: str) -> bool:
+        """Check if an entity type is materialised by this index"""
+        return entity_type in self.dictionary.types
+
+    def add(self, subject: str, obj: str) -> List[str]:
+        """
+        Index a single (subject, object) pair
+
+        Args:
+            subject: User name
+            obj: Object text from triple
+
+        Returns:
+            Entity types the object was indexed under
+        """
+        entities_by_type = defaultdict(list)
+        for entity in self.dictionary.match(obj):
+            entities_by_type[entity['type']].append(entity['name'])
+
+        for entity_type, entities in entities_by_type.items():
+            for entity in entities:
+                self._add_mention(entity_type, subject, entity)
+
+        return list(entities_by_type)
+
+    def _add_mention(self, entity_type: str, subject: str, entity: str):
+        """Record that a user mentioned an entity of a given type"""
+        self.mention_counts[entity_type] = self.mention_counts.get(entity_type, 0) + 1
+
+        users = self.entity_users.setdefault(entity_type, {}).setdefault(entity, set())
+        if subject not in users:
+            # Move entity to the next count bucket
+            buckets = self.count_index.setdefault(entity_type, {})
+            old_count = len(users)
+            if old_count:
+                buckets[old_count].discard(entity)
+                if not buckets[old_count]:
+                    del buckets[old_count]
+            users.add(subject)
+            buckets.setdefault(old_count + 1, set()).add(entity)
+
+        self.user_entities.setdefault(entity_type, {}).setdefault(subject, set()).add(entity)
+
+    def build_from_graph(self, graph) -> "EntityAggregateIndex":
+        """
+        (Re)build all tables from an existing graph's edges
+
+        Args:
+            graph: networkx graph with user → object edges
+
+        Returns:
+            self (for chaining)
+        """
+        self.__init__(self.dictionary)
+        for u, v, data in graph.edges(data=True):
+            obj = data.get('metadata', {}).get('object', v)
+            self.add(u, obj)
+        return self
+
+    def num_mentions(self, entity_type: str) -> int:
+        """Number of entity mentions indexed under an entity type"""
+        return self.mention_counts.get(entity_type, 0)
+
+    def ranked(
+        self,
+        entity_type: str,
+        min_users: int = 1,
+        top_k: Optional[int] = None
+    ) -> List[Tuple[str, List[str]]]:
+        """
+        Entities ranked by number of distinct users (descending)
+
+        Walks the count index from the highest bucket down, so only the
+        buckets needed for the answer are touched.
+
+        Args:
+            entity_type: Entity type to rank
+            min_users: Minimum users per entity (2 for SAME)
+            top_k: Maximum number of entities to return (None = all)
+
+        Returns:
+            List of (entity, sorted users) tuples
+        """
+        buckets = self.count_index.get(entity_type, {})
+        entity_users = self.entity_users.get(entity_type, {})
+
+        ranked = []
+        for count in sorted(buckets, reverse=True):
+            if count < min_users:
+                break
+            for entity in sorted(buckets[count]):
+                ranked.append((entity, sorted(entity_users[entity])))
+                if top_k is not None and len(ranked) >= top_k:
+                    return ranked
+
+        return ranked
+
+    def user_profiles(self, entity_type: str) -> Dict[str, List[str]]:
+        """
+        Per-user entity sets for an entity type (input for SIMILAR)
+
+        Args:
+            entity_type: Entity type
+
+        Returns:
+            {user: sorted list of entities}
+        """
+        return {
+            user: sorted(entities)
+            for user, entities in sorted(self.user_entities.get(entity_type, {}).items())
+        }
+
+    def to_dict(self) -> Dict:
+        """Convert to plain dict (for pickling alongside the graph)"""
+        return {
+            'entity_users': {
+                t: {e: list(users) for e, users in table.items()}
+                for t, table in self.entity_users.items()
+            },
+            'user_entities': {
+                t: {u: list(entities) for u, entities in table.items()}
+                for t, table in self.user_entities.items()
+            },
+            'count_index': {
+                t: {c: list(entities) for c, entities in table.items()}
+                for t, table in self.count_index.items()
+            },
+            'mention_counts': dict(self.mention_counts)
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict, dictionary: Optional[EntityDictionary] = None) -> "EntityAggregateIndex":
+        """Restore index from dict produced by to_dict()"""
+        index = cls(dictionary)
+        index.entity_users = {
+            t: {e: set(users) for e, users in table.items()}
+            for t, table in data['entity_users'].items()
+        }
+        index.user_entities = {
+            t: {u: set(entities) for u, entities in table.items()}
+            for t, table in data['user_entities'].items()
+        }
+        index.count_index = {
+            t: {int(c): set(entities) for c, entities in table.items()}
+            for t, table in data['count_index'].items()
+        }
+        index.mention_counts = dict(data['mention_counts'])
+        return index
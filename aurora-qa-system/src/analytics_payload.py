@@ -0,0 +1,150 @@
+"""
+Analytics Payload Builder
+
+Bounded, token-budgeted encoding of analytics aggregates for LLM prompts.
+
+Architecture:
+- Rank: entities by number of clients (descending), similarity groups by tier
+- Compact: one line per entity ("Noma (3): Hans Müller; Vikram Desai; ...")
+  instead of pretty-printed JSON, with long client lists capped
+- Truncate: keep lines until the token budget (local estimate) is spent
+- Summarise: one closing line with counts for everything left out
+
+Prompt size stays flat as the dataset grows: a broad entity type with
+thousands of entries costs the same as the budget, not the whole table.
+
+Usage:
+    payload, stats = build_analytics_payload(aggregated, "restaurant", "MOST", token_budget=800)
+    # stats: {'entries_total': 120, 'entries_shown': 35, 'tokens': 790, 'format': '...'}
+    prompt = f"DATA ({stats['format']}):\n{payload}"
+"""
+import json
+from typing import List, Dict, Tuple, Optional
+from src.token_budget import estimate_tokens, pack_lines
+
+
+# Tokens reserved for the closing summary line
+_SUMMARY_RESERVE = 40
+
+
+def _entity_line(entity: str, users: List[str], max_names: int) -> str:
+    """Compact 'Entity (n): a; b; c; +k more' line"""
+    names = '; '.join(users[:max_names])
+    if len(users) > max_names:
+        names += f"; +{len(users) - max_names} more"
+    return f"{entity} ({len(users)}): {names}"
+
+
+def _individual_line(individual: List[str], max_shown: int, budget: int) -> Optional[str]:
+    """'individual: a, b, +k more' line with as many names as fit the budget"""
+    for shown in range(min(len(individual), max_shown), -1, -1):
+        if shown:
+            line = f"individual: {', '.join(individual[:shown])}"
+            if shown < len(individual):
+                line += f", +{len(individual) - shown} more"
+        else:
+            line = f"individual: {len(individual)} clients"
+        if estimate_tokens(line) + 1 <= budget:
+            return line
+    return None
+
+
+def _encode_entities(
+    aggregated: Dict[str, List[str]],
+    entity_type: str,
+    token_budget: int,
+    max_names: int
+) -> Tuple[List[str], Dict]:
+    """Ranked entity → clients lines with a tail summary"""
+    ranked = sorted(aggregated.items(), key=lambda item: (-len(item[1]), item[0]))
+    lines = [_entity_line(entity, users, max_names) for entity, users in ranked]
+
+    kept, dropped = pack_lines(lines, max(token_budget - _SUMMARY_RESERVE, 0))
+
+    if dropped:
+        tail = ranked[len(kept):]
+        tail_clients = {user for _, users in tail for user in users}
+        kept.append(
+            f"... {len(tail)} more {entity_type}s not shown "
+            f"({sum(len(users) for _, users in tail)} requests from {len(tail_clients)} clients, "
+            f"at most {len(tail[0][1])} clients each)"
+        )
+
+    return kept, {
+        'entries_total': len(ranked),
+        'entries_shown': len(ranked) - len(dropped),
+        'format': f'one line per {entity_type}: "Name (number of clients): client; client; ..."'
+    }
+
+
+def _encode_similarity(aggregated: Dict, token_budget: int, max_names: int) -> Tuple[List[str], Dict]:
+    """Similarity tiers as compact group lines with a tail summary"""
+    lines = []
+    total = 0
+    for tier in ('highly_similar', 'moderately_similar'):
+        groups = aggregated.get(tier, [])
+        total += len(groups)
+        for group in groups:
+            shared = group['shared'][:max_names * 2]
+            more = f" +{len(group['shared']) - len(shared)} more" if len(group['shared']) > len(shared) else ""
+            lines.append(
+                f"{tier}: clients: {', '.join(group['clients'])} | "
+                f"shared: {', '.join(shared)}{more} | score: {group['score']}"
+            )
+
+    # The individual line is part of the budget (at most a quarter of it)
+    individual = aggregated.get('individual', [])
+    individual_line = _individual_line(individual, max_names * 4, token_budget // 4) if individual else None
+    individual_cost = estimate_tokens(individual_line) + 1 if individual_line else 0
+
+    kept, dropped = pack_lines(lines, max(token_budget - individual_cost - _SUMMARY_RESERVE, 0))
+    if dropped:
+        kept.append(f"... {len(dropped)} more groups not shown")
+    if individual_line:
+        kept.append(individual_line)
+
+    return kept, {
+        'entries_total': total,
+        'entries_shown': total - len(dropped),
+        'format': ('one line per group: "tier: clients: client, client | shared: entity, entity | score: overlap"; '
+                   '"individual:" lists clients with unique preferences')
+    }
+
+
+def build_analytics_payload(
+    aggregated: Dict,
+    entity_type: str,
+    method: str,
+    token_budget: int = 1200,
+    max_names: int = 8
+) -> Tuple[str, Dict]:
+    """
+    Encode aggregated analytics data for a prompt within a token budget
+
+    Args:
+        aggregated: Output of GraphAnalytics aggregation
+        entity_type: Entity type label (restaurant, hotel, ...)
+        method: Aggregation method (SIMILAR uses the group encoding)
+        token_budget: Maximum estimated tokens for the payload
+        max_names: Maximum client names listed per entity
+
+    Returns:
+        (payload text, stats {'entries_total', 'entries_shown', 'tokens', 'format'}),
+        where 'format' describes the payload lines for the prompt's DATA header
+    """
+    if method == 'SIMILAR' and 'highly_similar' in aggregated:
+        lines, stats = _encode_similarity(aggregated, token_budget, max_names)
+    elif all(isinstance(users, list) for users in aggregated.values()):
+        lines, stats = _encode_entities(aggregated, entity_type, token_budget, max_names)
+    else:
+        # Unknown shape: compact JSON, cut to the budget
+        text = json.dumps(aggregated, separators=(',', ':'), ensure_ascii=False)
+        while estimate_tokens(text) > token_budget:
+            text = text[:int(len(text) * 0.8)]
+        lines, stats = [text], {
+            'entries_total': len(aggregated), 'entries_shown': len(aggregated), 'format': 'compact JSON'
+        }
+
+    payload = '\n'.join(lines)
+    stats['tokens'] = estimate_tokens(payload)
+    return payload, stats
@@ -0,0 +1,134 @@
+"""
+Analytics Renderer
+
+Templated markdown answers for analytics results whose wording is fully
+determined by the data (SAME / MOST / POPULAR / COUNT).
+
+Architecture:
+- SAME: entities requested by 2+ clients, most shared first
+- MOST / POPULAR: numbered popularity ranking with client names
+- COUNT: totals (entities, clients) plus a short per-entity breakdown
+- Pure functions over the aggregated dict: no LLM call, no network
+
+GraphAnalytics uses the LLM only for SIMILAR / free-form methods, or for an
+optional one-line "Key Insight" appended to a rendered answer.
+
+Usage:
+    answer = render_analytics_answer({"Noma": ["Hans", "Vikram"]}, "restaurant", "SAME")
+"""
+from typing import List, Dict
+
+
+# Methods answered by a template instead of the LLM
+TEMPLATED_METHODS = ('SAME', 'MOST', 'POPULAR', 'COUNT')
+
+
+def _format_clients(users: List[str], max_names: int = 5) -> str:
+    """Comma-separated client names, with the tail summarised"""
+    names = ', '.join(users[:max_names])
+    if len(users) > max_names:
+        names += f" and {len(users) - max_names} more"
+    return names
+
+
+def _client_label(n: int) -> str:
+    """'1 client' / 'N clients'"""
+    return f"{n} client" if n == 1 else f"{n} clients"
+
+
+def render_same(aggregated: Dict[str, List[str]], entity_type: str, max_items: int = 10) -> str:
+    """
+    Entities requested by multiple clients
+
+    Args:
+        aggregated: {entity: [users]} sorted by user count (descending)
+        entity_type: Entity type label
+        max_items: Maximum entities listed
+
+    Returns:
+        Markdown answer
+    """
+    shared = [(entity, users) for entity, users in aggregated.items() if len(users) > 1]
+    if not shared:
+        return f"No {entity_type}s were requested by multiple clients."
+
+    lines = [f"**{entity_type.title()}s with Multiple Clients:**", ""]
+    for entity, users in shared[:max_items]:
+        lines.append(f"- **{entity}**: Requested by {_format_clients(users)} ({_client_label(len(users))})")
+    if len(shared) > max_items:
+        lines.append(f"- ...and {len(shared) - max_items} more")
+
+    lines.append("")
+    lines.append(f"In total, {len(shared)} {entity_type}s were shared among multiple clients.")
+    return '\n'.join(lines)
+
+
+def render_ranking(aggregated: Dict[str, List[str]], entity_type: str, max_items: int = 10) -> str:
+    """
+    Popularity ranking (MOST / POPULAR)
+
+    Args:
+        aggregated: {entity: [users]} sorted by user count (descending)
+        entity_type: Entity type label
+        max_items: Maximum entities listed
+
+    Returns:
+        Markdown answer
+    """
+    lines = [f"**Most Popular {entity_type.title()}s:**", ""]
+    for rank, (entity, users) in enumerate(list(aggregated.items())[:max_items], 1):
+        lines.append(f"{rank}. **{entity}** - Requested by {_client_label(len(users))}: {_format_clients(users)}")
+
+    lines.append("")
+    lines.append(f"Total unique {entity_type}s: {len(aggregated)}")
+    return '\n'.join(lines)
+
+
+def render_count(aggregated: Dict[str, List[str]], entity_type: str, max_items: int = 5) -> str:
+    """
+    Counts of entities and clients
+
+    Args:
+        aggregated: {entity: [users]} sorted by user count (descending)
+        entity_type: Entity type label
+        max_items: Maximum entities in the breakdown
+
+    Returns:
+        Markdown answer
+    """
+    clients = {user for users in aggregated.values() for user in users}
+    lines = [
+        f"**{len(aggregated)} {entity_type}s** were requested by **{_client_label(len(clients))}**.",
+        ""
+    ]
+    for entity, users in list(aggregated.items())[:max_items]:
+        lines.append(f"- **{entity}**: {_client_label(len(users))}")
+    if len(aggregated) > max_items:
+        lines.append(f"- ...and {len(aggregated) - max_items} more {entity_type}s")
+    return '\n'.join(lines).strip()
+
+
+def render_analytics_answer(aggregated: Dict, entity_type: str, method: str, max_items: int = 10) -> str:
+    """
+    Render a deterministic analytics answer
+
+    Args:
+        aggregated: Aggregated data ({entity: [users]})
+        entity_type: Entity type label
+        method: One of TEMPLATED_METHODS
+        max_items: Maximum entities listed
+
+    Returns:
+        Markdown answer
+    """
+    if not aggregated:
+        return f"No {entity_type}s found with {method.lower()} pattern."
+
+    if method == 'SAME':
+        return render_same(aggregated, entity_type, max_items)
+    if method in ('MOST', 'POPULAR'):
+        return render_ranking(aggregated, entity_type, max_items)
+    if method == 'COUNT':
+        return render_count(aggregated, entity_type)
+
+    raise ValueError(f"No template for method: {method}")
@@ -5,7 +5,10 @@ Generates natural language answers using LLM with retrieved context (RAG).
 
 Architecture:
 - Takes user query + retrieved context
-- Constructs RAG prompt
+- Constructs RAG prompt: static prefix (system prompt + instructions, built
+  once, byte-identical across calls for provider prefix caching), then the
+  per-query context, format hint and question
+- Reports estimated prompt tokens per section
 - Calls LLM (Mistral AI)
 - Returns formatted answer
 
@@ -13,10 +16,113 @@ This is the final step in the pipeline: Query → Retrieve → Generate Answer
 """
 from typing import List, Tuple, Dict, Optional
 import os
-from groq import Groq
+import re
+from src.llm_gateway import get_gateway
+from src.result_composer import ResultComposer
+from src.token_budget import estimate_tokens
+from src.tracing import span
 # from mistralai import Mistral  # SWITCHED TO GROQ FOR BETTER RATE LIMITS
 
 
+# ==================== Static prompt prefixes ====================
+# Built once at import and byte-identical on every call, so the provider can
+# cache the shared prefix (system prompt + instructions) across requests.
+# Everything that varies per query comes after it.
+
+SYSTEM_PROMPT = """You are an intelligent concierge assistant for a luxury lifestyle management service.
+
+Your answers will be displayed directly in a UI to users, so they must be:
+✓ Clear and concise (2-4 sentences for simple questions, structured lists for complex ones)
+✓ Natural and conversational (avoid robotic language)
+✓ Actionable (provide insights, not just raw data)
+✓ Professional yet warm
+
+MARKDOWN FORMATTING REQUIRED:
+- **Use markdown** for all responses - your output will be rendered as HTML
+- Use **bold** for client names and important details: **Name**
+- Use bullet points with `-` or `*` for lists
+- Use numbered lists `1.` when order matters
+- Add line breaks between items for readability
+
+RESPONSE FORMAT RULES:
+
+1. SHORT ANSWERS (for simple lookups):
+   - Direct answer in 1-3 sentences
+   - Example: "**Vikram Desai** has requested spa services at several locations including Tokyo and Paris."
+
+2. LISTS (for "which clients" or multiple items):
+   - Use markdown bullet points with bold names
+   - Keep each item concise (name + key detail)
+   - Example:
+     "6 clients requested a personal shopper in Milan:
+
+     - **Vikram Desai**: Requested for the 12th
+     - **Thiago Monteiro**: For an upcoming visit
+     - **Hans Müller**: During his Milan visit
+     - **Lorenzo Cavalli**: Looking for suggestions and recommendations
+     - **Sophia Al-Farsi**: For a shopping day and tour
+     - **Amina Van Den Berg**: For next weekend"
+
+3. SUMMARIES (for preferences/patterns):
+   - Lead with the key insight
+   - Support with 2-3 examples using bold for names
+   - Example: "Most clients prefer evening reservations. For instance, **Thiago** typically books 8 PM slots, while **Layla** prefers 7:30 PM."
+
+4. NO DATA FOUND:
+   - Be helpful, not dismissive
+   - Suggest alternatives
+   - Example: "I don't have specific car ownership information for Vikram Desai. However, I can see he frequently requests car services in NYC and private transfers to airports. Would you like to know more about his transportation preferences?"
+
+CRITICAL ACCURACY RULES:
+
+1. NEVER mention technical details:
+   ✗ "Based on message 1, 5, and 8..."
+   ✗ "The context shows..."
+   ✗ "According to the provided data..."
+   ✓ Just state the facts naturally
+
+2. NEVER merge separate facts into new claims:
+   ✗ "Client stayed at Four Seasons Tokyo" (if one message says Four Seasons, another says Tokyo)
+   ✓ "Client has stayed at Four Seasons properties and visited Tokyo"
+
+3. IF UNCERTAIN, be honest but helpful:
+   ✗ "I don't have that information." (too blunt)
+   ✓ "I don't see specific details about X, but I found related information about Y. Would that be helpful?"
+
+4. AGGREGATE intelligently:
+   - For "which clients" queries: List names with brief context
+   - For counts: Give the number first, then details if needed
+   - For comparisons: Highlight similarities/differences clearly
+
+Tone: Professional, conversational, and helpful. Think "knowledgeable assistant" not "database query result"."""
+
+USER_PROMPT_PREFIX = """Answer the question at the end using the client messages below.
+
+IMPORTANT:
+- Answer naturally (no technical references like "message 1" or "context shows")
+- If information is incomplete, be helpful: acknowledge what you found and offer related info
+- Focus on being useful for a UI display - clear and actionable
+
+"""
+
+# Format hints by query wording (checked in order, first match wins)
+FORMAT_HINTS = [
+    (re.compile(r"which|who|what clients|list", re.IGNORECASE),
+     "Provide a markdown bullet list with **bold client names**. Lead with a count "
+     "(e.g., '5 clients requested...'). Use this format:\n- **Name**: Brief detail\n- **Name**: Brief detail"),
+    (re.compile(r"how many|count|number of", re.IGNORECASE),
+     "Start with the number, then provide brief supporting details if relevant. Use **bold** for emphasis."),
+    (re.compile(r"compare|difference|similar", re.IGNORECASE),
+     "Highlight key similarities or differences. Use a comparison structure."),
+    (re.compile(r"preference|prefer|favorite", re.IGNORECASE),
+     "Summarize the preference pattern with 2-3 concrete examples."),
+]
+DEFAULT_FORMAT_HINT = "Answer directly and concisely in 2-4 sentences."
+
+_SYSTEM_PROMPT_TOKENS = estimate_tokens(SYSTEM_PROMPT)
+_USER_PREFIX_TOKENS = estimate_tokens(USER_PROMPT_PREFIX)
+
+
 class AnswerGenerator:
     """
     Generate answers using LLM with retrieved context (RAG)
@@ -37,7 +143,8 @@ class AnswerGenerator:
             raise ValueError("Groq API key required. Set GROQ_API_KEY env var or pass api_key.")
 
         self.model = model
-        self.client = Groq(api_key=self.api_key)
+        self.client = get_gateway(self.api_key).client('answer_generator')
+        self.composer = ResultComposer()  # Keeps MinHash signatures cached across calls
 
     def generate(
         self,
@@ -61,7 +168,8 @@ class AnswerGenerator:
             {
                 'answer': 'Generated answer text',
                 'model': 'Model used',
-                'tokens': {'prompt': X, 'completion': Y, 'total': Z}
+                'tokens': {'prompt': X, 'completion': Y, 'total': Z},
+                'prompt_sections': {estimated prompt tokens per section}
             }
         """
         if verbose:
@@ -73,11 +181,13 @@ class AnswerGenerator:
             print(f"Model: {self.model}")
             print(f"Temperature: {temperature}")
 
-        # Construct RAG prompt
+        # Construct RAG prompt (static prefix + per-query sections)
         prompt = self._build_prompt(query, context)
+        prompt_sections = self.prompt_token_breakdown(query, context)
 
         if verbose:
             print(f"Prompt length: {len(prompt)} chars")
+            print(f"Prompt tokens (est.): " + ", ".join(f"{k}={v}" for k, v in prompt_sections.items()))
             print(f"{'='*80}\n")
 
         # Call LLM (Groq)
@@ -108,7 +218,8 @@ class AnswerGenerator:
                     'prompt': usage.prompt_tokens,
                     'completion': usage.completion_tokens,
                     'total': usage.total_tokens
-                }
+                },
+                'prompt_sections': prompt_sections
             }
 
             if verbose:
@@ -126,74 +237,42 @@ class AnswerGenerator:
         System prompt that defines the assistant's behavior
 
         Returns:
-            System prompt string
+            System prompt string (module constant, identical on every call)
         """
-        return """You are an intelligent concierge assistant for a luxury lifestyle management service.
-
-Your answers will be displayed directly in a UI to users, so they must be:
-✓ Clear and concise (2-4 sentences for simple questions, structured lists for complex ones)
-✓ Natural and conversational (avoid robotic language)
-✓ Actionable (provide insights, not just raw data)
-✓ Professional yet warm
-
-MARKDOWN FORMATTING REQUIRED:
-- **Use markdown** for all responses - your output will be rendered as HTML
-- Use **bold** for client names and important details: **Name**
-- Use bullet points with `-` or `*` for lists
-- Use numbered lists `1.` when order matters
-- Add line breaks between items for readability
-
-RESPONSE FORMAT RULES:
-
-1. SHORT ANSWERS (for simple lookups):
-   - Direct answer in 1-3 sentences
-   - Example: "**Vikram Desai** has requested spa services at several locations including Tokyo and Paris."
-
-2. LISTS (for "which clients" or multiple items):
-   - Use markdown bullet points with bold names
-   - Keep each item concise (name + key detail)
-   - Example:
-     "6 clients requested a personal shopper in Milan:
-
-     - **Vikram Desai**: Requested for the 12th
-     - **Thiago Monteiro**: For an upcoming visit
-     - **Hans Müller**: During his Milan visit
-     - **Lorenzo Cavalli**: Looking for suggestions and recommendations
-     - **Sophia Al-Farsi**: For a shopping day and tour
-     - **Amina Van Den Berg**: For next weekend"
-
-3. SUMMARIES (for preferences/patterns):
-   - Lead with the key insight
-   - Support with 2-3 examples using bold for names
-   - Example: "Most clients prefer evening reservations. For instance, **Thiago** typically books 8 PM slots, while **Layla** prefers 7:30 PM."
+        return SYSTEM_PROMPT
 
-4. NO DATA FOUND:
-   - Be helpful, not dismissive
-   - Suggest alternatives
-   - Example: "I don't have specific car ownership information for Vikram Desai. However, I can see he frequently requests car services in NYC and private transfers to airports. Would you like to know more about his transportation preferences?"
-
-CRITICAL ACCURACY RULES:
+    def _select_format_hint(self, query: str) -> str:
+        """
+        Pick the answer format hint for a query (first matching pattern wins)
 
-1. NEVER mention technical details:
-   ✗ "Based on message 1, 5, and 8..."
-   ✗ "The context shows..."
-   ✗ "According to the provided data..."
-   ✓ Just state the facts naturally
+        Args:
+            query: User query
 
-2. NEVER merge separate facts into new claims:
-   ✗ "Client stayed at Four Seasons Tokyo" (if one message says Four Seasons, another says Tokyo)
-   ✓ "Client has stayed at Four Seasons properties and visited Tokyo"
+        Returns:
+            Format hint string
+        """
+        for pattern, hint in FORMAT_HINTS:
+            if pattern.search(query):
+                return hint
+        return DEFAULT_FORMAT_HINT
 
-3. IF UNCERTAIN, be honest but helpful:
-   ✗ "I don't have that information." (too blunt)
-   ✓ "I don't see specific details about X, but I found related information about Y. Would that be helpful?"
+    def _build_prompt_sections(self, query: str, context: str) -> List[Tuple[str, str]]:
+        """
+        User prompt as named sections, static prefix first
 
-4. AGGREGATE intelligently:
-   - For "which clients" queries: List names with brief context
-   - For counts: Give the number first, then details if needed
-   - For comparisons: Highlight similarities/differences clearly
+        Args:
+            query: User query
+            context: Retrieved context messages
 
-Tone: Professional, conversational, and helpful. Think "knowledgeable assistant" not "database query result"."""
+        Returns:
+            List of (section name, text); concatenated they form the user prompt
+        """
+        return [
+            ('instructions', USER_PROMPT_PREFIX),
+            ('context', f"CLIENT MESSAGES:\n{context}\n\n"),
+            ('format_hint', f"Format: {self._select_format_hint(query)}\n\n"),
+            ('question', f"QUESTION: {query}\n\nAnswer:")
+        ]
 
     def _build_prompt(self, query: str, context: str) -> str:
         """
@@ -206,36 +285,24 @@ Tone: Professional, conversational, and helpful. Think "knowledgeable assistant"
         Returns:
             Formatted prompt string
         """
-        # Detect query type for better formatting hints
-        query_lower = query.lower()
-
-        if any(word in query_lower for word in ['which', 'who', 'what clients', 'list']):
-            format_hint = "\n\nFormat: Provide a markdown bullet list with **bold client names**. Lead with a count (e.g., '5 clients requested...'). Use this format:\n- **Name**: Brief detail\n- **Name**: Brief detail"
-        elif any(word in query_lower for word in ['how many', 'count', 'number of']):
-            format_hint = "\n\nFormat: Start with the number, then provide brief supporting details if relevant. Use **bold** for emphasis."
-        elif any(word in query_lower for word in ['compare', 'difference', 'similar']):
-            format_hint = "\n\nFormat: Highlight key similarities or differences. Use a comparison structure."
-        elif any(word in query_lower for word in ['preference', 'prefer', 'favorite']):
-            format_hint = "\n\nFormat: Summarize the preference pattern with 2-3 concrete examples."
-        else:
-            format_hint = "\n\nFormat: Answer directly and concisely in 2-4 sentences."
-
-        prompt = f"""Answer this question using the client messages below.
+        return ''.join(text for _, text in self._build_prompt_sections(query, context))
 
-QUESTION: {query}
-
-CLIENT MESSAGES:
-{context}
-{format_hint}
-
-IMPORTANT:
-- Answer naturally (no technical references like "message 1" or "context shows")
-- If information is incomplete, be helpful: acknowledge what you found and offer related info
-- Focus on being useful for a UI display - clear and actionable
+    def prompt_token_breakdown(self, query: str, context: str) -> Dict[str, int]:
+        """
+        Estimated prompt tokens per section
 
-Answer:"""
+        Args:
+            query: User query
+            context: Retrieved context messages
 
-        return prompt
+        Returns:
+            {'system', 'instructions', 'context', 'format_hint', 'question', 'total'}
+        """
+        breakdown = {'system': _SYSTEM_PROMPT_TOKENS}
+        for name, text in self._build_prompt_sections(query, context):
+            breakdown[name] = _USER_PREFIX_TOKENS if name == 'instructions' else estimate_tokens(text)
+        breakdown['total'] = sum(breakdown.values())
+        return breakdown
 
     def generate_with_sources(
         self,
@@ -243,7 +310,8 @@ Answer:"""
         composed_results: List[Tuple[Dict, float]],
         temperature: float = 0.3,
         max_tokens: int = 500,
-        verbose: bool = False
+        verbose: bool = False,
+        context_token_budget: Optional[int] = None
     ) -> Dict[str, any]:
         """
         Generate answer and include source messages
@@ -254,25 +322,43 @@ Answer:"""
             temperature: LLM temperature
             max_tokens: Max response tokens
             verbose: Print details
+            context_token_budget: Pack context into this many (estimated) tokens,
+                                  dropping near-duplicates and trimming long messages
+                                  (None = include every message in full)
 
         Returns:
             {
                 'answer': 'Generated answer',
                 'sources': [list of source messages],
                 'model': 'Model name',
-                'tokens': {usage stats}
+                'tokens': {usage stats},
+                'context': {kept/dropped stats, only with context_token_budget}
             }
         """
-        from src.result_composer import ResultComposer
-
-        composer = ResultComposer()
-        context = composer.format_context_for_llm(composed_results, include_scores=False)
-
-        result = self.generate(query, context, temperature, max_tokens, verbose)
+        with span("answer_generator.context", candidates=len(composed_results)) as stage:
+            if context_token_budget is None:
+                context = self.composer.format_context_for_llm(composed_results, include_scores=False)
+                context_stats = None
+            else:
+                context, context_stats = self.composer.pack_context(
+                    composed_results, query, token_budget=context_token_budget
+                )
+                stage.set_attribute("kept", context_stats['kept'])
+                if verbose:
+                    print(f"Context packed: kept {context_stats['kept']}/{context_stats['candidates']} messages, "
+                          f"~{context_stats['tokens']}/{context_token_budget} tokens "
+                          f"(duplicates: {context_stats['dropped_duplicates']}, "
+                          f"over budget: {context_stats['dropped_budget']}, trimmed: {context_stats['trimmed']})")
+
+        with span("answer_generator.generate", model=self.model):
+            result = self.generate(query, context, temperature, max_tokens, verbose)
+        if context_stats is not None:
+            result['context'] = context_stats
 
         # Add sources
         result['sources'] = [
             {
+                'id': msg.get('id'),
                 'user': msg['user_name'],
                 'message': msg['message'],
                 'score': score
@@ -8,10 +8,12 @@ Architecture:
 - Support user-specific filtering
 - Include user_name in searchable text for user queries
 - USER FILTERING: Use user_index.json for fast user-specific search
+- INCREMENTAL: upsert_messages() tokenizes only new/changed messages
 """
 import json
 import pickle
 import os
+import bisect
 from typing import List, Dict, Tuple, Optional, Set
 from rank_bm25 import BM25Okapi
 import re
@@ -26,6 +28,7 @@ class BM25Search:
         self.messages = []
         self.tokenized_corpus = []
         self.user_index = {}  # user_id -> message_indices mapping
+        self._positions_by_id = None  # message_id -> position (built on first lookup)
 
     def tokenize(self, text: str) -> List[str]:
         """
@@ -54,6 +57,7 @@ class BM25Search:
         print(f"\n📊 Building BM25 index for {len(messages)} messages...")
 
         self.messages = messages
+        self._positions_by_id = None
 
         # Tokenize messages (include user_name for user-specific queries)
         self.tokenized_corpus = []
@@ -72,6 +76,72 @@ class BM25Search:
         print(f"   Corpus size: {len(self.tokenized_corpus)} documents")
         print(f"   Strategy: user_name + message (for user-specific queries)")
 
+    def upsert_messages(self, messages: List[Dict]) -> Dict[str, int]:
+        """
+        Append new messages and replace changed ones in place
+
+        Only the given messages are tokenized. BM25Okapi has no incremental
+        API, so it is rebuilt from the cached tokenized corpus (cheap next to
+        tokenizing). Existing positions never move: they double as Qdrant
+        point ids and user_index message_indices.
+
+        Args:
+            messages: New or changed message dicts (matched by 'id')
+
+        Returns:
+            {message_id: position} for the given messages
+        """
+        positions_by_id = {msg['id']: i for i, msg in enumerate(self.messages)}
+        positions = {}
+
+        for msg in messages:
+            tokens = self.tokenize(f"{msg['user_name']} {msg['message']}")
+            position = positions_by_id.get(msg['id'])
+
+            if position is None:
+                position = len(self.messages)
+                positions_by_id[msg['id']] = position
+                self.messages.append(msg)
+                self.tokenized_corpus.append(tokens)
+            else:
+                previous_user = self.messages[position]['user_id']
+                if previous_user != msg['user_id']:
+                    self._unindex_user(previous_user, position)
+                self.messages[position] = msg
+                self.tokenized_corpus[position] = tokens
+
+            self._index_user(msg, position)
+            positions[msg['id']] = position
+
+        if messages:
+            self.bm25 = BM25Okapi(self.tokenized_corpus)
+
+        return positions
+
+    def _index_user(self, msg: Dict, position: int):
+        """Add a message position to its user's user_index entry"""
+        entry = self.user_index.setdefault(
+            msg['user_id'],
+            {'user_name': msg['user_name'], 'message_count': 0, 'message_indices': []}
+        )
+        entry['user_name'] = msg['user_name']
+        indices = entry['message_indices']
+        i = bisect.bisect_left(indices, position)
+        if i == len(indices) or indices[i] != position:
+            indices.insert(i, position)
+        entry['message_count'] = len(indices)
+
+    def _unindex_user(self, user_id: str, position: int):
+        """Remove a message position from a user's user_index entry"""
+        entry = self.user_index.get(user_id)
+        if not entry:
+            return
+        if position in entry['message_indices']:
+            entry['message_indices'].remove(position)
+        entry['message_count'] = len(entry['message_indices'])
+        if not entry['message_indices']:
+            del self.user_index[user_id]
+
     def search(
         self,
         query: str,
@@ -155,12 +225,49 @@ class BM25Search:
         print(f"   ✓ Saved: {path}")
         print(f"✅ BM25 index saved successfully")
 
-    def load(self, base_path: str = "data/bm25"):
+    def get_message(self, message_id: str) -> Optional[Dict]:
+        """
+        Look up a message by id
+
+        Args:
+            message_id: Message ID (e.g. a graph triple's message_id)
+
+        Returns:
+            Message dict or None
+        """
+        # Memory-mapped corpora (shared_index.MappedMessages) carry their own id index
+        find = getattr(self.messages, 'find', None)
+        if find is not None:
+            return find(message_id)
+
+        if self._positions_by_id is None or len(self._positions_by_id) != len(self.messages):
+            self._positions_by_id = {msg['id']: i for i, msg in enumerate(self.messages)}
+        position = self._positions_by_id.get(message_id)
+        return self.messages[position] if position is not None else None
+
+    def save_user_index(self, path: str = "data/user_indexed/user_index.json"):
+        """
+        Save the user_id → message_indices mapping
+
+        Args:
+            path: user_index.json path
+        """
+        with open(path, 'w') as f:
+            json.dump(self.user_index, f, indent=2)
+
+    def load(
+        self,
+        base_path: str = "data/bm25",
+        user_index_path: str = "data/user_indexed/user_index.json",
+        user_index: Optional[Dict] = None
+    ):
         """
         Load BM25 index and metadata from files
 
         Args:
             base_path: Base path (will load .pkl file)
+            user_index_path: user_index.json path (user_id → message_indices)
+            user_index: Already-parsed user index (skips reading user_index_path)
         """
         print(f"\n📂 Loading BM25 index...")
 
@@ -171,12 +278,15 @@ class BM25Search:
         self.bm25 = data['bm25']
         self.messages = data['messages']
         self.tokenized_corpus = data['tokenized_corpus']
+        self._positions_by_id = None
 
         # Load user index if available
-        user_index_path = "data/user_indexed/user_index.json"
-        if os.path.exists(user_index_path):
+        if user_index is not None:
+            self.user_index = user_index
+        elif os.path.exists(user_index_path):
             with open(user_index_path, 'r') as f:
                 self.user_index = json.load(f)
+        if self.user_index:
             print(f"   ✓ User index: {len(self.user_index)} users")
 
         print(f"✅ Loaded {len(self.messages)} messages")
@@ -1,98 +1,323 @@
 """
 Data Ingestion Module
 Fetches all messages from the API and saves locally
+
+Architecture:
+- First request learns `total`; remaining pages are fetched concurrently by
+  a bounded thread pool over one shared requests.Session (pooled keep-alive
+  connections), with a sliding window so only a few pages are buffered
+- Pages are written in order as streaming JSONL (one message per line),
+  de-duplicated by message id
+- Cursor checkpoint (next skip + output byte offset) after every written
+  page: an interrupted run resumes where it stopped
+- Per-page retries with exponential backoff (Retry-After honoured on 429)
+
+Usage:
+    stats = fetch_messages_to_jsonl(API_BASE_URL, "data/raw_messages.jsonl")
+    messages = load_messages("data/raw_messages.jsonl")
 """
 import os
+import time
 import requests
 import json
 import random
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Iterator, Tuple
 from tqdm import tqdm
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 
 # Load environment variables
 load_dotenv()
 
 
-def fetch_all_messages(api_base_url: str, limit: int = 100, max_retries: int = 3) -> List[Dict]:
+def create_session(max_connections: int = 8) -> requests.Session:
+    """
+    Shared HTTP session with a connection pool sized for the fetch pool
+
+    Args:
+        max_connections: Pooled connections per host
+
+    Returns:
+        requests.Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"accept": "application/json"})
+    return session
+
+
+def _fetch_page(
+    session: requests.Session,
+    api_base_url: str,
+    skip: int,
+    limit: int,
+    max_retries: int = 3,
+    backoff_base: float = 1.0
+) -> Dict:
+    """
+    Fetch one page, retrying with exponential backoff
+
+    Args:
+        session: Shared HTTP session
+        api_base_url: Base URL of the API
+        skip: Page offset
+        limit: Page size
+        max_retries: Retries after the first attempt
+        backoff_base: First backoff in seconds (doubles per retry)
+
+    Returns:
+        Page JSON ({'total': int, 'items': [...]})
+
+    Raises:
+        requests.exceptions.RequestException: after the last retry fails
+    """
+    attempt = 0
+    while True:
+        try:
+            response = session.get(
+                f"{api_base_url}/messages/",
+                params={"skip": skip, "limit": limit},
+                timeout=30
+            )
+            response.raise_for_status()
+            return response.json()
+
+        except requests.exceptions.RequestException as e:
+            if attempt >= max_retries:
+                print(f"\n⚠️  Giving up on skip={skip} after {attempt + 1} attempts: {e}")
+                raise
+
+            wait_time = backoff_base * (2 ** attempt)
+            response = getattr(e, 'response', None)
+            if response is not None and response.status_code == 429:
+                retry_after = response.headers.get('retry-after')
+                if retry_after and retry_after.replace('.', '', 1).isdigit():
+                    wait_time = float(retry_after)
+
+            attempt += 1
+            print(f"\n⚠️  Error at skip={skip}: {e}; retrying in {wait_time:.1f}s "
+                  f"(attempt {attempt}/{max_retries})")
+            time.sleep(wait_time)
+
+
+def iter_pages(
+    api_base_url: str,
+    start_skip: int = 0,
+    limit: int = 100,
+    max_workers: int = 8,
+    max_retries: int = 3,
+    session: Optional[requests.Session] = None,
+    backoff_base: float = 1.0
+) -> Iterator[Tuple[int, List[Dict], int]]:
+    """
+    Yield pages in order while fetching ahead concurrently
+
+    The first page (at start_skip) reports `total`; the remaining offsets are
+    fetched by a bounded pool, at most 2 * max_workers pages in flight.
+
+    Args:
+        api_base_url: Base URL of the API
+        start_skip: Offset to start from (resume cursor)
+        limit: Messages per page
+        max_workers: Concurrent page requests
+        max_retries: Retries per page
+        session: Shared session (created if None)
+        backoff_base: First retry backoff in seconds
+
+    Yields:
+        (skip, items, total) per page, in offset order
+    """
+    session = session or create_session(max_workers)
+
+    first = _fetch_page(session, api_base_url, start_skip, limit, max_retries, backoff_base)
+    total = first.get('total', 0)
+    yield start_skip, first.get('items', []), total
+
+    offsets = list(range(start_skip + limit, total, limit))
+    window = max_workers * 2
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {}
+        next_index = 0
+
+        for position, skip in enumerate(offsets):
+            # Keep a bounded number of pages in flight / buffered
+            while next_index < len(offsets) and next_index < position + window:
+                pending[offsets[next_index]] = pool.submit(
+                    _fetch_page, session, api_base_url, offsets[next_index], limit, max_retries, backoff_base
+                )
+                next_index += 1
+
+            page = pending.pop(skip).result()
+            yield skip, page.get('items', []), total
+
+
+def _load_checkpoint(checkpoint_path: str, output_path: str, limit: int) -> Dict:
+    """Cursor checkpoint for a resumable fetch (fresh cursor if none/mismatched)"""
+    fresh = {'next_skip': 0, 'bytes': 0, 'written': 0, 'limit': limit, 'output_path': output_path}
+    if not checkpoint_path or not os.path.exists(checkpoint_path) or not os.path.exists(output_path):
+        return fresh
+
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+
+    if checkpoint.get('limit') != limit or checkpoint.get('output_path') != output_path:
+        return fresh
+    return checkpoint
+
+
+def _save_checkpoint(checkpoint_path: str, checkpoint: Dict):
+    """Atomically write the cursor checkpoint"""
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def fetch_messages_to_jsonl(
+    api_base_url: str,
+    output_path: str = "data/raw_messages.jsonl",
+    limit: int = 100,
+    max_workers: int = 8,
+    max_retries: int = 3,
+    checkpoint_path: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+    show_progress: bool = True,
+    backoff_base: float = 1.0
+) -> Dict:
+    """
+    Fetch all messages concurrently, streaming them to JSONL with a resumable cursor
+
+    Args:
+        api_base_url: Base URL of the API
+        output_path: JSONL output file (one message per line)
+        limit: Messages per page
+        max_workers: Concurrent page requests
+        max_retries: Retries per page before the run stops (resumable)
+        checkpoint_path: Cursor file (default: output_path + ".cursor")
+        session: Shared HTTP session (created if None)
+        show_progress: Show progress bar
+        backoff_base: First retry backoff in seconds
+
+    Returns:
+        Stats {'total', 'written', 'duplicates', 'pages', 'resumed_from', 'seconds'}
+    """
+    checkpoint_path = checkpoint_path or output_path + ".cursor"
+    checkpoint = _load_checkpoint(checkpoint_path, output_path, limit)
+    started = time.perf_counter()
+
+    # Drop anything written after the last checkpointed page
+    mode = 'r+b' if checkpoint['next_skip'] > 0 else 'wb'
+    seen_ids = set()
+    with open(output_path, mode) as out:
+        if mode == 'r+b':
+            out.truncate(checkpoint['bytes'])
+            out.seek(0)
+            for line in out:
+                seen_ids.add(json.loads(line).get('id'))
+            out.seek(checkpoint['bytes'])
+            print(f"Resuming from skip={checkpoint['next_skip']} ({checkpoint['written']} messages on disk)")
+
+        print(f"Fetching messages from {api_base_url}/messages/ ({max_workers} concurrent)...")
+
+        stats = {'total': 0, 'written': checkpoint['written'], 'duplicates': 0, 'pages': 0,
+                 'resumed_from': checkpoint['next_skip']}
+        progress = None
+
+        for skip, items, total in iter_pages(
+            api_base_url, checkpoint['next_skip'], limit, max_workers, max_retries, session, backoff_base
+        ):
+            if progress is None and show_progress:
+                progress = tqdm(total=total, initial=checkpoint['next_skip'], desc="Fetching messages")
+            stats['total'] = total
+            stats['pages'] += 1
+
+            for item in items:
+                if item.get('id') in seen_ids:
+                    stats['duplicates'] += 1
+                    continue
+                seen_ids.add(item.get('id'))
+                out.write((json.dumps(item, ensure_ascii=False) + "\n").encode('utf-8'))
+                stats['written'] += 1
+            out.flush()
+
+            checkpoint.update({
+                'next_skip': skip + limit,
+                'bytes': out.tell(),
+                'written': stats['written'],
+                'total': total
+            })
+            _save_checkpoint(checkpoint_path, checkpoint)
+
+            if progress is not None:
+                progress.update(len(items))
+
+        if progress is not None:
+            progress.close()
+
+    # Complete: the next run is a fresh full refresh
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    stats['seconds'] = round(time.perf_counter() - started, 2)
+    print(f"\n✅ Fetched {stats['written']} messages to {output_path} in {stats['seconds']}s")
+    return stats
+
+
+def fetch_all_messages(
+    api_base_url: str,
+    limit: int = 100,
+    max_retries: int = 3,
+    max_workers: int = 8,
+    backoff_base: float = 1.0
+) -> List[Dict]:
     """
     Fetch all messages from API with pagination and retry logic
 
+    Pages after the first are fetched concurrently (see iter_pages). If a
+    page still fails after its retries, the messages of the pages before it
+    are returned (with a warning) instead of raising.
+
     Args:
         api_base_url: Base URL of the API
         limit: Number of messages per page
         max_retries: Maximum number of retries for failed requests
+        max_workers: Concurrent page requests
+        backoff_base: First retry backoff in seconds
 
     Returns:
-        List of all messages
+        List of all messages (partial if a page could not be fetched)
     """
-    import time
-
     all_messages = []
-    skip = 0
-    consecutive_failures = 0
+    seen_ids = set()
 
     print(f"Fetching messages from {api_base_url}/messages/...")
 
-    with tqdm(desc="Fetching messages") as pbar:
-        while consecutive_failures < max_retries:
-            try:
-                response = requests.get(
-                    f"{api_base_url}/messages/",
-                    params={"skip": skip, "limit": limit},
-                    headers={"accept": "application/json"},
-                    timeout=30
-                )
-                response.raise_for_status()
-                data = response.json()
-
-                items = data.get('items', [])
-                if not items:
-                    print(f"\nNo more items at skip={skip}")
-                    break
-
-                all_messages.extend(items)
-                pbar.update(len(items))
-                consecutive_failures = 0  # Reset on success
-
-                # Check if we've fetched all
-                total = data.get('total', 0)
-                pbar.set_postfix({"fetched": len(all_messages), "total": total})
-
-                if len(all_messages) >= total:
-                    break
-
-                skip += limit
-                time.sleep(0.1)  # Small delay to avoid rate limiting
-
-            except requests.exceptions.HTTPError as e:
-                consecutive_failures += 1
-                print(f"\n⚠️  HTTP Error at skip={skip}: {e.response.status_code}")
-
-                if consecutive_failures < max_retries:
-                    wait_time = 2 ** consecutive_failures
-                    print(f"Retrying in {wait_time} seconds... (attempt {consecutive_failures}/{max_retries})")
-                    time.sleep(wait_time)
-                else:
-                    print(f"Max retries reached. Fetched {len(all_messages)} messages.")
-                    break
-
-            except Exception as e:
-                consecutive_failures += 1
-                print(f"\nError at skip={skip}: {e}")
-
-                if consecutive_failures < max_retries:
-                    wait_time = 2 ** consecutive_failures
-                    print(f"Retrying in {wait_time} seconds... (attempt {consecutive_failures}/{max_retries})")
-                    time.sleep(wait_time)
-                else:
-                    print(f"Max retries reached. Fetched {len(all_messages)} messages.")
-                    break
+    try:
+        for _, items, _ in iter_pages(api_base_url, 0, limit, max_workers, max_retries, backoff_base=backoff_base):
+            for item in items:
+                if item.get('id') not in seen_ids:
+                    seen_ids.add(item.get('id'))
+                    all_messages.append(item)
+    except requests.exceptions.RequestException as e:
+        print(f"\n⚠️  Max retries reached ({e}). Returning the {len(all_messages)} messages fetched so far.")
+        return all_messages
 
     print(f"\n✅ Fetched {len(all_messages)} messages")
     return all_messages
 
 
+def iter_messages_jsonl(filepath: str = "data/raw_messages.jsonl") -> Iterator[Dict]:
+    """Stream messages from a JSONL file"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
 def save_messages(messages: List[Dict], filepath: str = "data/raw_messages.json"):
     """Save messages to JSON file"""
     with open(filepath, 'w') as f:
@@ -101,9 +326,12 @@ def save_messages(messages: List[Dict], filepath: str = "data/raw_messages.json"
 
 
 def load_messages(filepath: str = "data/raw_messages.json") -> List[Dict]:
-    """Load messages from JSON file"""
-    with open(filepath, 'r') as f:
-        messages = json.load(f)
+    """Load messages from a JSON or JSONL file"""
+    if filepath.endswith('.jsonl'):
+        messages = list(iter_messages_jsonl(filepath))
+    else:
+        with open(filepath, 'r') as f:
+            messages = json.load(f)
     print(f"✅ Loaded {len(messages)} messages from {filepath}")
     return messages
 
@@ -210,10 +438,11 @@ def main():
     API_BASE_URL = os.getenv("API_BASE_URL", "https://november7-730026606190.europe-west1.run.app")
     print(f"API URL: {API_BASE_URL}\n")
 
-    # Fetch all messages
-    messages = fetch_all_messages(API_BASE_URL, limit=100)
+    # Fetch all messages (concurrent, streamed to JSONL, resumable)
+    fetch_messages_to_jsonl(API_BASE_URL, "data/raw_messages.jsonl", limit=100)
+    messages = load_messages("data/raw_messages.jsonl")
 
-    # Save to file
+    # JSON copy for the downstream extraction scripts
     save_messages(messages, "data/raw_messages.json")
 
     # Basic statistics
@@ -0,0 +1,540 @@
+"""
+Entity Dictionary Module
+
+Data-driven entity canonicalization for graph analytics.
+
+Architecture:
+- Mine candidate entities from triple objects (capitalised spans + context cues)
+- Cluster aliases by a normalised key ("The River Café" / "River Cafe" → river cafe),
+  then merge a mined name into the one longer name of its type that
+  contains it ("Napa" → "Napa Valley", "Nobu" → "Nobu London")
+- Single-word venue names need repeated support: "at <Word>" with a dining
+  or lodging cue also catches people and regions ("dinner at Daniel's")
+- Assign one canonical name, entity type and stable id per cluster at build time
+- Compile every alias into an Aho-Corasick automaton: one linear pass per object
+
+Seed entities (the original hand-picked restaurants, hotels, destinations and
+services) are always present, so an empty dictionary still recognises them.
+Everything else is learned from the data when the knowledge graph is built.
+
+Usage:
+    dictionary = EntityDictionary.mine([("RENTED/BOOKED", "a table at Nobu London")])
+    dictionary.match("dinner at Nobu London")
+    # Returns: [{'id': 'ent_0003', 'name': 'Nobu London', 'type': 'restaurant', ...}, ...]
+"""
+import re
+import pickle
+import unicodedata
+from collections import Counter, defaultdict, deque
+from typing import List, Dict, Optional, Iterable, Tuple
+
+
+# Seed lexicon per entity type (canonical name first, then aliases)
+SEED_ENTITIES = {
+    'restaurant': [
+        ['Osteria Francescana'], ['Eleven Madison Park'], ['Le Bernardin'],
+        ['The River Café', 'River Café'], ['Alinea'], ['The Ivy'], ['Noma']
+    ],
+    'hotel': [
+        ['Four Seasons'], ['The Peninsula', 'Peninsula'], ['Park Hyatt'],
+        ['The Ritz', 'Ritz']
+    ],
+    'destination': [
+        ['Paris'], ['Tokyo'], ['London'], ['Dubai'],
+        ['New York', 'New York City', 'NYC'], ['Santorini']
+    ],
+    'service': [
+        ['private jet', 'private jets'], ['yacht', 'yachts'], ['spa'],
+        ['golf'], ['museum', 'museums']
+    ]
+}
+
+# Words in an object that say what kind of venue a capitalised span is
+TYPE_CUES = {
+    'restaurant': {'table', 'dinner', 'lunch', 'brunch', 'breakfast', 'restaurant',
+                   'reservation', 'reservations', 'menu', 'chef', 'tasting'},
+    'hotel': {'suite', 'room', 'hotel', 'stay', 'resort', 'penthouse', 'lodge', 'villa'}
+}
+
+# Relationships whose object is itself a place
+DESTINATION_RELATIONSHIPS = {'VISITED', 'PLANNING_TRIP_TO'}
+
+# Capitalised words that never start an entity
+_NON_ENTITY_WORDS = {
+    'i', 'my', 'our', 'a', 'an', 'vip', 'am', 'pm', 'suite', 'room', 'hotel', 'chef',
+    'january', 'february', 'march', 'april', 'may', 'june', 'july', 'august',
+    'september', 'october', 'november', 'december', 'jan', 'feb', 'mar', 'apr',
+    'jun', 'jul', 'aug', 'sep', 'sept', 'oct', 'nov', 'dec',
+    'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday'
+}
+
+# Lowercase words allowed inside a capitalised span ("Cathedral of Notre Dame")
+_SPAN_CONNECTORS = {'of', 'de', 'del', 'la', 'le', 'du', 'di', 'and', '-'}
+
+# Trailing words that do not change which entity is meant ("New York City")
+_GENERIC_SUFFIXES = {'city', 'hotel', 'restaurant'}
+
+_TOKEN_PATTERN = re.compile(r"[\w'’]+|[-,.;:]")
+
+# Mined names shorter than this are too ambiguous to match ("LA" vs "à la carte")
+_MIN_KEY_LENGTH = 3
+
+# Mentions needed by a mined one-word restaurant/hotel name ("Daniel", "Cote")
+_MIN_SINGLE_WORD_VENUE_MENTIONS = 2
+
+
+def normalize_alias(text: str) -> str:
+    """
+    Normalise text for alias matching
+
+    Folds case and accents, turns punctuation into spaces and collapses
+    whitespace, so "The River Café," and "the river cafe" compare equal.
+
+    Args:
+        text: Raw text
+
+    Returns:
+        Normalised text
+    """
+    folded = unicodedata.normalize('NFKD', text)
+    folded = ''.join(c for c in folded if not unicodedata.combining(c)).casefold()
+    return ' '.join(re.sub(r"[^\w]+", ' ', folded).split())
+
+
+def alias_key(text: str) -> str:
+    """
+    Cluster key for an entity surface form
+
+    Like normalize_alias(), but also drops a leading article and generic
+    trailing words ("The Ritz" → ritz, "New York City" → new york).
+
+    Args:
+        text: Entity surface form
+
+    Returns:
+        Cluster key
+    """
+    words = normalize_alias(text).split()
+    if len(words) > 1 and words[0] == 'the':
+        words = words[1:]
+    while len(words) > 1 and words[-1] in _GENERIC_SUFFIXES:
+        words = words[:-1]
+    return ' '.join(words)
+
+
+class AhoCorasickMatcher:
+    """
+    Multi-pattern matcher over normalised text
+
+    Patterns are matched on whole words only; all (possibly overlapping)
+    matches are reported in a single pass over the text.
+    """
+
+    def __init__(self):
+        """Initialize empty automaton"""
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, str]]] = [[]]
+        self._built = True
+
+    def add(self, pattern: str, value: str):
+        """
+        Add a (normalised) pattern
+
+        Args:
+            pattern: Pattern text, already normalised
+            value: Value reported when the pattern matches
+        """
+        if not pattern:
+            return
+        node = 0
+        for char in pattern:
+            if char not in self._goto[node]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[node][char] = len(self._goto) - 1
+            node = self._goto[node][char]
+        self._output[node].append((len(pattern), value))
+        self._built = False
+
+    def build(self):
+        """Compute failure links (breadth-first)"""
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+        self._built = True
+
+    def find(self, text: str) -> List[Tuple[int, int, str]]:
+        """
+        Find all whole-word pattern occurrences
+
+        Args:
+            text: Normalised text (see normalize_alias)
+
+        Returns:
+            List of (start, end, value), ordered by end position
+        """
+        if not self._built:
+            self.build()
+
+        matches = []
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+
+            for length, value in self._output[node]:
+                start, end = i - length + 1, i + 1
+                # Whole words only
+                if (start == 0 or text[start - 1] == ' ') and (end == len(text) or text[end] == ' '):
+                    matches.append((start, end, value))
+
+        return matches
+
+
+class EntityDictionary:
+    """
+    Canonical entities with types, aliases and ids
+
+    Tables:
+    - entities[id] → {'id', 'name', 'type', 'aliases', 'mentions'}
+    - matcher: Aho-Corasick automaton over every alias
+    """
+
+    def __init__(self):
+        """Initialize dictionary with the seed lexicon"""
+        self.entities: Dict[str, Dict] = {}
+        self._key_to_id: Dict[str, str] = {}
+        self.matcher = AhoCorasickMatcher()
+
+        for entity_type, groups in SEED_ENTITIES.items():
+            for surfaces in groups:
+                self._add_entity(surfaces[0], entity_type, surfaces)
+        self._compile()
+
+    @property
+    def types(self) -> List[str]:
+        """Entity types present in the dictionary"""
+        return sorted({entity['type'] for entity in self.entities.values()})
+
+    def _add_entity(self, name: str, entity_type: str, aliases: Iterable[str], mentions: int = 0) -> str:
+        """Register a canonical entity and its aliases, return its id"""
+        key = alias_key(name)
+        entity_id = self._key_to_id.get(key)
+        if entity_id is None:
+            entity_id = f"ent_{len(self.entities) + 1:04d}"
+            self._key_to_id[key] = entity_id
+            self.entities[entity_id] = {
+                'id': entity_id, 'name': name, 'type': entity_type,
+                'aliases': set(), 'mentions': 0
+            }
+
+        entity = self.entities[entity_id]
+        entity['mentions'] += mentions
+        for alias in aliases:
+            alias = normalize_alias(alias)
+            entity['aliases'].add(alias)
+            # Article-less spelling too ("the river cafe" → "river cafe")
+            if alias.startswith('the '):
+                entity['aliases'].add(alias[4:])
+        return entity_id
+
+    def _compile(self):
+        """Rebuild the Aho-Corasick automaton from all aliases"""
+        self.matcher = AhoCorasickMatcher()
+        for entity_id, entity in self.entities.items():
+            for alias in entity['aliases']:
+                self.matcher.add(alias, entity_id)
+        self.matcher.build()
+
+    @staticmethod
+    def _candidate_spans(obj: str) -> List[Tuple[str, Optional[str]]]:
+        """
+        Capitalised spans in an object with the preposition before them
+
+        Args:
+            obj: Object text
+
+        Returns:
+            List of (span, preceding lowercase word or None)
+        """
+        tokens = _TOKEN_PATTERN.findall(obj)
+        spans = []
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            if not token[0].isupper() or token.lower() in _NON_ENTITY_WORDS:
+                i += 1
+                continue
+
+            # Preceding preposition, skipping an article ("at the Ritz")
+            j = i - 1
+            if j >= 0 and tokens[j].lower() == 'the':
+                j -= 1
+            preceding = tokens[j].lower() if j >= 0 else None
+
+            words = [token]
+            k = i + 1
+            while k < len(tokens):
+                if tokens[k][0].isupper() and tokens[k].isalpha():
+                    words.append(tokens[k])
+                elif (tokens[k] in _SPAN_CONNECTORS and k + 1 < len(tokens)
+                      and tokens[k + 1][0].isupper()):
+                    words.append(tokens[k])
+                else:
+                    break
+                k += 1
+
+            # Drop possessive endings ("Daniel's") and trailing connectors
+            words[-1] = re.sub(r"['’]s$", '', words[-1])
+            while words and words[-1] in _SPAN_CONNECTORS:
+                words.pop()
+
+            span = ' '.join(words).replace(' - ', '-')
+            if words and any(c.isalpha() for c in span):
+                spans.append((span, preceding))
+            i = k
+
+        return spans
+
+    @classmethod
+    def _infer_type(cls, obj: str, relationship: Optional[str], preceding: Optional[str]) -> Optional[str]:
+        """
+        Guess the entity type of a span from its context
+
+        - "at X" with a dining cue → restaurant; with a lodging cue → hotel
+        - "in X", or the object of VISITED / PLANNING_TRIP_TO → destination
+        """
+        words = set(normalize_alias(obj).split())
+
+        if preceding == 'at':
+            for entity_type, cues in TYPE_CUES.items():
+                if words & cues:
+                    return entity_type
+            return None
+
+        if preceding == 'in' or (relationship in DESTINATION_RELATIONSHIPS and preceding in (None, 'to')):
+            return 'destination'
+
+        return None
+
+    @staticmethod
+    def _containment_merges(keys: List[str], key_types: Dict[str, str]) -> Dict[str, str]:
+        """
+        Map each key to the cluster it merges into
+
+        A key joins the single longer key of the same type whose words
+        contain it ("napa" → "napa valley"); a key contained in several
+        ("nobu" in "nobu london" and "nobu miami") stays on its own.
+
+        Args:
+            keys: Mined cluster keys (seed keys excluded)
+            key_types: key → inferred entity type
+
+        Returns:
+            {key: root key} for every key
+        """
+        def contains(longer: List[str], shorter: List[str]) -> bool:
+            return any(longer[i:i + len(shorter)] == shorter for i in range(len(longer) - len(shorter) + 1))
+
+        parent = {}
+        for key in keys:
+            words = key.split()
+            containers = [
+                other for other in keys
+                if len(other.split()) > len(words) and key_types[other] == key_types[key]
+                and contains(other.split(), words)
+            ]
+            if len(containers) == 1:
+                parent[key] = containers[0]
+
+        roots = {}
+        for key in keys:
+            root = key
+            while root in parent:
+                root = parent[root]
+            roots[key] = root
+        return roots
+
+    @classmethod
+    def mine(cls, objects: Iterable[Tuple[Optional[str], str]], min_mentions: int = 1) -> "EntityDictionary":
+        """
+        Build a dictionary from triple objects
+
+        Args:
+            objects: Iterable of (relationship, object text)
+            min_mentions: Minimum mentions for a mined entity
+
+        Returns:
+            EntityDictionary with seed and mined entities
+        """
+        dictionary = cls()
+        surfaces = defaultdict(Counter)   # key -> surface form counts
+        type_votes = defaultdict(Counter)  # key -> type counts
+
+        for relationship, obj in objects:
+            if not obj:
+                continue
+            for span, preceding in cls._candidate_spans(obj):
+                entity_type = cls._infer_type(obj, relationship, preceding)
+                if entity_type is None:
+                    continue
+                key = alias_key(span)
+                surfaces[key][span] += 1
+                type_votes[key][entity_type] += 1
+
+        # Seed entity: keep its name and type, learn new spellings
+        for key in sorted(set(surfaces) & set(dictionary._key_to_id)):
+            forms = surfaces[key]
+            mentions = sum(forms.values())
+            if mentions >= min_mentions:
+                entity = dictionary.entities[dictionary._key_to_id[key]]
+                dictionary._add_entity(entity['name'], entity['type'], forms, mentions)
+
+        # Mined keys: merge contained names within a type, then one entity per cluster
+        mined = sorted(key for key in surfaces
+                       if key not in dictionary._key_to_id and len(key) >= _MIN_KEY_LENGTH)
+        key_types = {key: max(type_votes[key], key=lambda t: (type_votes[key][t], t)) for key in mined}
+        clusters = defaultdict(list)
+        for key, root in cls._containment_merges(mined, key_types).items():
+            clusters[root].append(key)
+
+        # Sorted roots → ids independent of triple order
+        for root in sorted(clusters):
+            forms, votes = Counter(), Counter()
+            for key in clusters[root]:
+                forms.update(surfaces[key])
+                votes.update(type_votes[key])
+            mentions = sum(forms.values())
+            entity_type = max(votes, key=lambda t: (votes[t], t))
+            # Most frequent spelling wins; ties go to the longer form
+            name = max(forms, key=lambda form: (forms[form], len(form), form))
+
+            if mentions < min_mentions:
+                continue
+            words = normalize_alias(name).split()
+            if len(words) > 1 and words[0] == 'the':
+                words = words[1:]
+            if entity_type in TYPE_CUES and len(words) == 1 and mentions < _MIN_SINGLE_WORD_VENUE_MENTIONS:
+                continue
+
+            dictionary._add_entity(name, entity_type, forms, mentions)
+
+        dictionary._compile()
+        return dictionary
+
+    @classmethod
+    def mine_from_graph(cls, graph, min_mentions: int = 1) -> "EntityDictionary":
+        """
+        Build a dictionary from an existing graph's edges
+
+        Args:
+            graph: networkx graph with user → object edges
+            min_mentions: Minimum mentions for a mined entity
+
+        Returns:
+            EntityDictionary
+        """
+        return cls.mine(
+            ((data.get('relationship'), data.get('metadata', {}).get('object', v))
+             for _, v, data in graph.edges(data=True)),
+            min_mentions=min_mentions
+        )
+
+    def match(self, text: str, entity_type: Optional[str] = None) -> List[Dict]:
+        """
+        Entities mentioned in a text (one linear pass)
+
+        Overlapping matches of the same type keep only the longest one
+        ("Ritz" inside "the Ritz-Carlton"); matches of different types may
+        overlap ("George V Paris" is a hotel, "Paris" a destination).
+
+        Args:
+            text: Raw text (e.g. a triple object)
+            entity_type: Only return entities of this type
+
+        Returns:
+            List of entity records in order of appearance (no duplicates)
+        """
+        hits = []
+        for start, end, entity_id in self.matcher.find(normalize_alias(text)):
+            entity = self.entities[entity_id]
+            if entity_type is None or entity['type'] == entity_type:
+                hits.append((start, end, entity))
+
+        # Longest first; a hit survives unless it overlaps a kept hit of its type
+        kept = []
+        for start, end, entity in sorted(hits, key=lambda h: (h[0] - h[1], h[0])):
+            if not any(s < end and start < e and other['type'] == entity['type'] for s, e, other in kept):
+                kept.append((start, end, entity))
+
+        results, seen = [], set()
+        for _, _, entity in sorted(kept, key=lambda h: h[0]):
+            if entity['id'] not in seen:
+                seen.add(entity['id'])
+                results.append(entity)
+
+        return results
+
+    def canonical_name(self, text: str, entity_type: Optional[str] = None) -> Optional[str]:
+        """
+        Canonical name of the first entity mentioned in a text
+
+        Args:
+            text: Raw text
+            entity_type: Restrict to this type
+
+        Returns:
+            Canonical name, or None if no entity matches
+        """
+        matches = self.match(text, entity_type)
+        return matches[0]['name'] if matches else None
+
+    def to_dict(self) -> Dict:
+        """Convert to plain dict (for pickling)"""
+        return {
+            'entities': {
+                entity_id: {**entity, 'aliases': sorted(entity['aliases'])}
+                for entity_id, entity in self.entities.items()
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "EntityDictionary":
+        """Restore dictionary from dict produced by to_dict()"""
+        dictionary = cls.__new__(cls)
+        dictionary.entities = {
+            entity_id: {**entity, 'aliases': set(entity['aliases'])}
+            for entity_id, entity in data['entities'].items()
+        }
+        dictionary._key_to_id = {
+            alias_key(entity['name']): entity_id
+            for entity_id, entity in dictionary.entities.items()
+        }
+        dictionary._compile()
+        return dictionary
+
+    def save(self, filepath: str = "data/entity_dictionary.pkl"):
+        """Save dictionary to file"""
+        with open(filepath, 'wb') as f:
+            pickle.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, filepath: str = "data/entity_dictionary.pkl") -> "EntityDictionary":
+        """Load dictionary from file"""
+        with open(filepath, 'rb') as f:
+            return cls.from_dict(pickle.load(f))
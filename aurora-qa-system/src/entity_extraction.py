@@ -7,7 +7,7 @@ import json
 import re
 from typing import List, Dict, Optional
 from dotenv import load_dotenv
-from groq import Groq
+from src.llm_gateway import get_gateway
 from tqdm import tqdm
 import time
 
@@ -27,7 +27,7 @@ class EntityExtractor:
         """
         self.model = model or os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
         self.api_key = api_key or os.getenv("GROQ_API_KEY")
-        self.client = Groq(api_key=self.api_key)
+        self.client = get_gateway(self.api_key).client('entity_extraction')
 
         # Prompt template for extraction
         self.extraction_prompt_template = """
@@ -1,44 +1,110 @@
 """
 Entity Extraction using GLiNER + spaCy (Industry-Standard Approach)
-Zero API costs, processes 3,349 messages in ~20 minutes
+Zero API costs. One message at a time the corpus (3,349 messages) took
+~20 minutes; the batch path below is a small fraction of that.
+
+Batch path (extract_from_messages_batch):
+- GLiNER: batched inference (batch_predict_entities) instead of one
+  forward pass per message
+- spaCy: nlp.pipe over the chunk; NER and lemmatizer are not loaded
+  (relationship rules only read POS tags and the dependency parse)
+- n_process > 1: chunks are spread over a process pool, each worker with
+  its own models and a share of the CPU threads
+- With an ExtractionCache, GLiNER entities and spaCy parses are reused for
+  unchanged messages; only the (cheap) relationship post-processing re-runs
 """
+import os
 import json
 import spacy
-from typing import List, Dict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Tuple, Optional
 from gliner import GLiNER
+from spacy.tokens import Doc
 from tqdm import tqdm
 from collections import defaultdict
+from src.extraction_cache import cache_key
+
+
+# spaCy components the relationship rules never read
+SPACY_EXCLUDE = ["ner", "lemmatizer"]
+
+# Entity labels for member data domain
+ENTITY_LABELS = [
+    "person_name",      # Layla, Vikram Desai, Amira
+    "location",         # London, Paris, Dubai, Bangalore
+    "vehicle",          # Tesla Model S, yacht, car
+    "restaurant",       # Nobu, Le Bernardin
+    "accommodation",    # villa, hotel, room
+    "preference",       # aisle seats, quiet rooms
+    "contact_info",     # phone numbers, emails
+    "event",           # concert, show, conference
+    "time_reference",  # next month, tomorrow, last week
+    "service",         # concierge, booking
+]
+
+# Per-process models for the process pool (set by _init_worker)
+_worker_models = {}
+
+
+def _init_worker(gliner_model: str, labels: List[str], threads: int):
+    """Load GLiNER + spaCy once per pool worker, limiting its CPU threads"""
+    import torch
+    torch.set_num_threads(threads)
+    _worker_models['gliner'] = GLiNER.from_pretrained(gliner_model)
+    _worker_models['nlp'] = spacy.load("en_core_web_sm", exclude=SPACY_EXCLUDE)
+    _worker_models['labels'] = labels
+
+
+def _worker_analyze(texts: List[str], threshold: float, batch_size: int) -> Tuple[List[List[Dict]], List[bytes]]:
+    """Entities + serialized parses for a chunk of texts (runs in a pool worker)"""
+    entities = _predict_entities_batch(_worker_models['gliner'], texts, _worker_models['labels'], threshold, batch_size)
+    docs = [doc.to_bytes() for doc in _worker_models['nlp'].pipe(texts, batch_size=batch_size)]
+    return entities, docs
+
+
+def _predict_entities_batch(
+    gliner,
+    texts: List[str],
+    labels: List[str],
+    threshold: float,
+    batch_size: int
+) -> List[List[Dict]]:
+    """Batched GLiNER inference with JSON-safe scores"""
+    if not texts:
+        return []
+    predictions = gliner.batch_predict_entities(texts, labels, threshold=threshold, batch_size=batch_size)
+    return [
+        [{**entity, 'score': float(entity.get('score', 0.0))} for entity in entities]
+        for entities in predictions
+    ]
 
 
 class GLiNEREntityExtractor:
     """Extract entities and relationships using GLiNER + spaCy dependency parsing"""
 
-    def __init__(self, gliner_model: str = "urchade/gliner_medium-v2.1"):
+    def __init__(self, gliner_model: str = "urchade/gliner_medium-v2.1", cache=None):
         """
         Initialize the entity extractor
 
         Args:
             gliner_model: GLiNER model name (default: medium v2.1)
+            cache: Optional ExtractionCache for GLiNER entities and spaCy parses
         """
         print(f"Loading GLiNER model: {gliner_model}...")
+        self.gliner_model = gliner_model
         self.gliner = GLiNER.from_pretrained(gliner_model)
 
         print("Loading spaCy model: en_core_web_sm...")
-        self.nlp = spacy.load("en_core_web_sm")
+        self.nlp = spacy.load("en_core_web_sm", exclude=SPACY_EXCLUDE)
+        self.spacy_model = (
+            f"{self.nlp.meta['name']}-{self.nlp.meta['version']}/spacy-{spacy.__version__}"
+            f"/pipes={','.join(self.nlp.pipe_names)}"
+        )
+
+        self.cache = cache
 
         # Entity labels for member data domain
-        self.entity_labels = [
-            "person_name",      # Layla, Vikram Desai, Amira
-            "location",         # London, Paris, Dubai, Bangalore
-            "vehicle",          # Tesla Model S, yacht, car
-            "restaurant",       # Nobu, Le Bernardin
-            "accommodation",    # villa, hotel, room
-            "preference",       # aisle seats, quiet rooms
-            "contact_info",     # phone numbers, emails
-            "event",           # concert, show, conference
-            "time_reference",  # next month, tomorrow, last week
-            "service",         # concierge, booking
-        ]
+        self.entity_labels = ENTITY_LABELS
 
         # Relationship type mapping based on verb patterns
         self.relationship_patterns = {
@@ -79,7 +145,64 @@ class GLiNEREntityExtractor:
         entities = self.gliner.predict_entities(text, self.entity_labels, threshold=threshold)
         return entities
 
-    def extract_relationships(self, text: str, entities: List[Dict], user_name: str) -> List[Dict]:
+    def _entity_key(self, text: str, user_name: str, threshold: float) -> str:
+        """Extraction cache key for GLiNER entities"""
+        return cache_key(text, user_name, 'gliner', self.gliner_model,
+                         f"{','.join(self.entity_labels)}|threshold={threshold}")
+
+    def _parse_key(self, text: str, user_name: str) -> str:
+        """Extraction cache key for a spaCy parse"""
+        return cache_key(text, user_name, 'spacy', self.spacy_model)
+
+    def _cached_entities(self, text: str, user_name: str, threshold: float = 0.5) -> List[Dict]:
+        """
+        GLiNER entities, read from / written to the extraction cache
+
+        Args:
+            text: Input text
+            user_name: Message author (part of the cache key)
+            threshold: Confidence threshold for entity extraction
+
+        Returns:
+            List of entities with labels and positions
+        """
+        if self.cache is None:
+            return self.extract_entities(text, threshold)
+
+        key = self._entity_key(text, user_name, threshold)
+        entities = self.cache.get('gliner_entities', key)
+        if entities is None:
+            entities = [
+                {**entity, 'score': float(entity.get('score', 0.0))}
+                for entity in self.extract_entities(text, threshold)
+            ]
+            self.cache.put('gliner_entities', key, entities)
+        return entities
+
+    def _cached_doc(self, text: str, user_name: str):
+        """
+        spaCy parse, read from / written to the extraction cache
+
+        Args:
+            text: Input text
+            user_name: Message author (part of the cache key)
+
+        Returns:
+            spaCy Doc
+        """
+        if self.cache is None:
+            return self.nlp(text)
+
+        key = self._parse_key(text, user_name)
+        data = self.cache.get('spacy_parses', key)
+        if data is not None:
+            return Doc(self.nlp.vocab).from_bytes(data)
+
+        doc = self.nlp(text)
+        self.cache.put('spacy_parses', key, doc.to_bytes())
+        return doc
+
+    def extract_relationships(self, text: str, entities: List[Dict], user_name: str, doc=None) -> List[Dict]:
         """
         Extract relationships using spaCy dependency parsing
 
@@ -87,11 +210,12 @@ class GLiNEREntityExtractor:
             text: Input text
             entities: List of extracted entities
             user_name: User name from message metadata (ALWAYS used as subject)
+            doc: Pre-computed spaCy parse of text (parsed here if None)
 
         Returns:
             List of relationship triples (subject, relationship, object)
         """
-        doc = self.nlp(text)
+        doc = doc if doc is not None else self.nlp(text)
         relationships = []
 
         # Extract subject-verb-object patterns
@@ -162,11 +286,29 @@ class GLiNEREntityExtractor:
         text = message.get('message', '')
         user_name = message.get('user_name', 'Unknown')
 
-        # Extract entities
-        entities = self.extract_entities(text)
+        # Extract entities and parse once (cached when a cache is set)
+        entities = self._cached_entities(text, user_name)
+        doc = self._cached_doc(text, user_name)
+
+        return self._triples_from_analysis(message, entities, doc)
+
+    def _triples_from_analysis(self, message: Dict, entities: List[Dict], doc) -> List[Dict]:
+        """
+        Build triples from a message's GLiNER entities and spaCy parse
+
+        Args:
+            message: Message dict with keys: id, user_name, message, timestamp
+            entities: GLiNER entities for the message text
+            doc: spaCy parse of the message text
+
+        Returns:
+            List of knowledge graph triples
+        """
+        text = message.get('message', '')
+        user_name = message.get('user_name', 'Unknown')
 
         # Extract relationships (PASS user_name to ensure it's always used as subject)
-        relationships = self.extract_relationships(text, entities, user_name)
+        relationships = self.extract_relationships(text, entities, user_name, doc=doc)
 
         # Build triples
         triples = []
@@ -186,12 +328,12 @@ class GLiNEREntityExtractor:
             triples.append(triple)
 
         # Extract simple patterns (possessive: "my X")
-        possessive_triples = self._extract_possessive_patterns(text, user_name, message)
+        possessive_triples = self._extract_possessive_patterns(text, user_name, message, doc=doc)
         triples.extend(possessive_triples)
 
         return triples
 
-    def _extract_possessive_patterns(self, text: str, user_name: str, message: Dict) -> List[Dict]:
+    def _extract_possessive_patterns(self, text: str, user_name: str, message: Dict, doc=None) -> List[Dict]:
         """
         Extract ownership patterns like 'my Tesla', 'my phone number'
 
@@ -201,11 +343,12 @@ class GLiNEREntityExtractor:
             text: Message text
             user_name: User name
             message: Full message dict
+            doc: Pre-computed spaCy parse of text (parsed here if None)
 
         Returns:
             List of ownership triples
         """
-        doc = self.nlp(text)
+        doc = doc if doc is not None else self.nlp(text)
         triples = []
 
         # Define what types of things are actually OWNABLE
@@ -259,35 +402,168 @@ class GLiNEREntityExtractor:
 
         return triples
 
+    def analyze_batch(
+        self,
+        messages: List[Dict],
+        threshold: float = 0.5,
+        batch_size: int = 32,
+        pool: Optional[ProcessPoolExecutor] = None,
+        n_process: int = 1
+    ) -> List[Tuple[List[Dict], Doc]]:
+        """
+        GLiNER entities and spaCy parses for a chunk of messages
+
+        Cached results are looked up in one query; only misses are computed
+        (batched, or split across `pool` workers) and written back.
+
+        Args:
+            messages: Message dicts
+            threshold: GLiNER confidence threshold
+            batch_size: GLiNER / nlp.pipe batch size
+            pool: Process pool from _init_worker (None: run in this process)
+            n_process: Number of pool workers (chunk split)
+
+        Returns:
+            (entities, doc) per message, in order
+        """
+        texts = [message.get('message', '') or '' for message in messages]
+        users = [message.get('user_name', 'Unknown') for message in messages]
+
+        entities = [None] * len(messages)
+        docs = [None] * len(messages)
+
+        if self.cache is not None:
+            entity_keys = [self._entity_key(t, u, threshold) for t, u in zip(texts, users)]
+            parse_keys = [self._parse_key(t, u) for t, u in zip(texts, users)]
+            cached_entities = self.cache.get_many('gliner_entities', entity_keys)
+            cached_parses = self.cache.get_many('spacy_parses', parse_keys)
+            for i in range(len(messages)):
+                entities[i] = cached_entities.get(entity_keys[i])
+                if parse_keys[i] in cached_parses:
+                    docs[i] = Doc(self.nlp.vocab).from_bytes(cached_parses[parse_keys[i]])
+
+        # Recompute both stages for any message missing either one
+        missing = [i for i in range(len(messages)) if entities[i] is None or docs[i] is None]
+        if missing:
+            miss_texts = [texts[i] for i in missing]
+
+            if pool is not None:
+                shard = -(-len(miss_texts) // n_process)
+                futures = [
+                    pool.submit(_worker_analyze, miss_texts[start:start + shard], threshold, batch_size)
+                    for start in range(0, len(miss_texts), shard)
+                ]
+                new_entities, new_docs = [], []
+                for future in futures:
+                    shard_entities, shard_docs = future.result()
+                    new_entities.extend(shard_entities)
+                    new_docs.extend(Doc(self.nlp.vocab).from_bytes(data) for data in shard_docs)
+            else:
+                new_entities = _predict_entities_batch(self.gliner, miss_texts, self.entity_labels, threshold, batch_size)
+                new_docs = list(self.nlp.pipe(miss_texts, batch_size=batch_size))
+
+            for i, ents, doc in zip(missing, new_entities, new_docs):
+                entities[i] = ents
+                docs[i] = doc
+
+            if self.cache is not None:
+                self.cache.put_many('gliner_entities', [
+                    (entity_keys[i], entities[i], messages[i].get('id')) for i in missing
+                ])
+                self.cache.put_many('spacy_parses', [
+                    (parse_keys[i], docs[i].to_bytes(), messages[i].get('id')) for i in missing
+                ])
+
+        return list(zip(entities, docs))
+
+    def extract_batch_by_message(
+        self,
+        messages: List[Dict],
+        show_progress: bool = True,
+        batch_size: int = 32,
+        n_process: int = 1,
+        chunk_size: int = 512
+    ) -> List[List[Dict]]:
+        """
+        Batched GLiNER + nlp.pipe extraction, keeping results per message
+
+        Args:
+            messages: List of message dicts
+            show_progress: Show progress bar
+            batch_size: GLiNER / nlp.pipe batch size
+            n_process: Worker processes (0 = one per CPU core, 1 = in-process)
+            chunk_size: Messages per chunk (cache lookup, progress and pool unit)
+
+        Returns:
+            List of triples per message, in order
+        """
+        results = []
+        n_process = n_process or os.cpu_count() or 1
+
+        pool = None
+        if n_process > 1:
+            threads = max(1, (os.cpu_count() or n_process) // n_process)
+            pool = ProcessPoolExecutor(
+                max_workers=n_process,
+                initializer=_init_worker,
+                initargs=(self.gliner_model, self.entity_labels, threads)
+            )
+
+        try:
+            chunks = [messages[i:i + chunk_size] for i in range(0, len(messages), chunk_size)]
+            progress = tqdm(total=len(messages), desc="Extracting") if show_progress else None
+
+            for chunk in chunks:
+                analyses = self.analyze_batch(chunk, batch_size=batch_size, pool=pool, n_process=n_process)
+                for message, (entities, doc) in zip(chunk, analyses):
+                    results.append(self._triples_from_analysis(message, entities, doc))
+                if progress is not None:
+                    progress.update(len(chunk))
+
+            if progress is not None:
+                progress.close()
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        return results
+
     def extract_from_messages_batch(
         self,
         messages: List[Dict],
-        show_progress: bool = True
+        show_progress: bool = True,
+        batch_size: int = 32,
+        n_process: int = 1,
+        chunk_size: int = 512
     ) -> List[Dict]:
         """
-        Extract triples from multiple messages
+        Extract triples from multiple messages (batched GLiNER + nlp.pipe)
 
         Args:
             messages: List of message dicts
             show_progress: Show progress bar
+            batch_size: GLiNER / nlp.pipe batch size
+            n_process: Worker processes (0 = one per CPU core, 1 = in-process)
+            chunk_size: Messages per chunk (cache lookup, progress and pool unit)
 
         Returns:
             List of all extracted triples
         """
-        all_triples = []
-
         print(f"\n🔍 Extracting entities from {len(messages)} messages...")
         print(f"   Using GLiNER + spaCy (local, 0 API costs)")
-        print(f"   Estimated time: ~{len(messages) * 0.3 / 60:.1f} minutes\n")
-
-        iterator = tqdm(messages, desc="Extracting") if show_progress else messages
+        print(f"   Batched: batch size {batch_size}, {n_process or os.cpu_count()} process(es)\n")
 
-        for message in iterator:
-            triples = self.extract_from_message(message)
-            all_triples.extend(triples)
+        per_message = self.extract_batch_by_message(
+            messages,
+            show_progress=show_progress,
+            batch_size=batch_size,
+            n_process=n_process,
+            chunk_size=chunk_size
+        )
+        all_triples = [triple for triples in per_message for triple in triples]
 
         print(f"\n✅ Extracted {len(all_triples)} triples from {len(messages)} messages")
-        print(f"   Average: {len(all_triples)/len(messages):.2f} triples per message")
+        print(f"   Average: {len(all_triples)/max(len(messages), 1):.2f} triples per message")
 
         return all_triples
 
@@ -0,0 +1,220 @@
+"""
+Extraction Cache Module
+
+Persistent, content-addressed cache for the triple extraction pipeline.
+
+Architecture:
+- Key: SHA-256 of (message text, user name, extractor, model, prompt version),
+  so a result is reused only while every input that shaped it is unchanged
+- Stages stored separately (one SQLite table each):
+  - gliner_entities: GLiNER entity spans (JSON)
+  - spacy_parses: serialized spaCy Doc (bytes) - post-processing re-runs
+    from the cached parse without re-parsing
+  - llm_triples: LLM Reasoner triples (JSON)
+- Single SQLite file (WAL mode), safe to share between extractor threads
+- Per-stage hit/miss counters for rebuild reports
+
+Bumping a model or prompt version changes the key, so only that stage is
+recomputed; adding messages only computes the new ones.
+
+Usage:
+    cache = ExtractionCache("data/extraction_cache.db")
+    key = cache_key(text, user_name, "llm", "llama-3.1-8b-instant", PROMPT_VERSION)
+    triples = cache.get("llm_triples", key)
+    if triples is None:
+        triples = extract(...)
+        cache.put("llm_triples", key, triples, message_id=message["id"])
+"""
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, Optional, Iterable, Tuple
+
+
+# Stage name → value encoding
+STAGES = {
+    'gliner_entities': 'json',
+    'spacy_parses': 'bytes',
+    'llm_triples': 'json',
+}
+
+
+def cache_key(text: str, user_name: str, extractor: str, model: str, prompt_version: str = "") -> str:
+    """
+    Content hash identifying one extraction result
+
+    Args:
+        text: Message text
+        user_name: Message author (subject of extracted triples)
+        extractor: Extractor name (gliner, spacy, llm)
+        model: Model name/version used by the extractor
+        prompt_version: Prompt / label-set / config version
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    payload = json.dumps([text, user_name, extractor, model, prompt_version], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ExtractionCache:
+    """
+    SQLite-backed extraction cache with one table per stage
+    """
+
+    def __init__(self, path: str = "data/extraction_cache.db"):
+        """
+        Open (or create) the cache
+
+        Args:
+            path: SQLite file path (":memory:" for a throwaway cache)
+        """
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.hits = {stage: 0 for stage in STAGES}
+        self.misses = {stage: 0 for stage in STAGES}
+
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            for stage in STAGES:
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {stage} ("
+                    "key TEXT PRIMARY KEY, message_id TEXT, value BLOB NOT NULL, created_at REAL)"
+                )
+            self._conn.commit()
+
+    def _check_stage(self, stage: str):
+        if stage not in STAGES:
+            raise ValueError(f"Unknown cache stage: {stage} (expected one of {list(STAGES)})")
+
+    def _encode(self, stage: str, value):
+        if STAGES[stage] == 'json':
+            return json.dumps(value, ensure_ascii=False)
+        return sqlite3.Binary(value)
+
+    def _decode(self, stage: str, raw):
+        if STAGES[stage] == 'json':
+            return json.loads(raw)
+        return bytes(raw)
+
+    def get(self, stage: str, key: str):
+        """
+        Cached value for a key
+
+        Args:
+            stage: Stage name (see STAGES)
+            key: cache_key(...) digest
+
+        Returns:
+            Decoded value, or None on a miss
+        """
+        return self.get_many(stage, [key]).get(key)
+
+    def get_many(self, stage: str, keys: Iterable[str]) -> Dict[str, object]:
+        """
+        Look up many keys at once
+
+        Args:
+            stage: Stage name
+            keys: cache_key digests
+
+        Returns:
+            {key: value} for the keys that were found
+        """
+        self._check_stage(stage)
+        keys = list(dict.fromkeys(keys))
+        found = {}
+
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM {stage} WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, raw in rows:
+                    found[key] = self._decode(stage, raw)
+
+            self.hits[stage] += len(found)
+            self.misses[stage] += len(keys) - len(found)
+
+        return found
+
+    def put(self, stage: str, key: str, value, message_id: Optional[str] = None):
+        """
+        Store one result
+
+        Args:
+            stage: Stage name
+            key: cache_key digest
+            value: JSON-serializable value (bytes for spacy_parses)
+            message_id: Source message id (for inspection only)
+        """
+        self.put_many(stage, [(key, value, message_id)])
+
+    def put_many(self, stage: str, items: Iterable[Tuple[str, object, Optional[str]]]):
+        """
+        Store many results in one transaction
+
+        Args:
+            stage: Stage name
+            items: (key, value, message_id) tuples
+        """
+        self._check_stage(stage)
+        now = time.time()
+        rows = [(key, message_id, self._encode(stage, value), now) for key, value, message_id in items]
+
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {stage} (key, message_id, value, created_at) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def count(self, stage: str) -> int:
+        """Number of cached results for a stage"""
+        self._check_stage(stage)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {stage}").fetchone()[0]
+
+    def clear(self, stage: Optional[str] = None):
+        """
+        Drop cached results
+
+        Args:
+            stage: Stage to clear (None clears every stage)
+        """
+        stages = [stage] if stage else list(STAGES)
+        for name in stages:
+            self._check_stage(name)
+
+        with self._lock:
+            for name in stages:
+                self._conn.execute(f"DELETE FROM {name}")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-stage hits, misses and stored entries"""
+        return {
+            stage: {'hits': self.hits[stage], 'misses': self.misses[stage], 'entries': self.count(stage)}
+            for stage in STAGES
+        }
+
+    def print_stats(self):
+        """Print cache usage for a rebuild report"""
+        print("\n📦 Extraction cache:")
+        for stage, counts in self.stats().items():
+            lookups = counts['hits'] + counts['misses']
+            rate = counts['hits'] / lookups * 100 if lookups else 0.0
+            print(f"   {stage:16s} hits {counts['hits']:5d} / {lookups:5d} ({rate:.1f}%), "
+                  f"{counts['entries']} stored")
+
+    def close(self):
+        """Close the SQLite connection"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,299 @@
+"""
+Batch Extraction Executor
+
+Concurrent, rate-limit-aware LLM triple extraction for large message sets.
+
+Architecture:
+- Pack: short messages are grouped into one prompt (per-message JSON output)
+  up to a prompt token budget; long messages get a prompt of their own
+- Execute: a bounded thread pool sized to the model's concurrency cap. Pacing
+  comes from the shared LLM gateway's token buckets (requests/min and
+  tokens/min), so there are no fixed sleeps between calls
+- Fallback: a group whose response cannot be parsed is re-run one message
+  at a time (as are messages a packed reply left out)
+- Checkpoint: finished messages are appended to a JSONL file as they
+  complete, with the same content key as the cache (text, author, model,
+  prompt version); a rerun skips those whose key still matches and resumes
+  where the last run stopped. Messages whose extraction failed (rate
+  limits, deadlines, bad replies) are not checkpointed, so the rerun
+  retries them. A run with no failures removes the checkpoint
+- Cache (optional): per-message results in the content-addressed
+  ExtractionCache, so rebuilds only send new or changed messages
+  (failed extractions are not cached)
+
+Usage:
+    executor = BatchExtractionExecutor(LLMSemanticExtractor(), checkpoint_path="data/llm_checkpoint.jsonl")
+    triples_by_id = executor.run(messages)
+    # executor.stats: {'messages': 800, 'resumed': 120, 'cached': 600, 'prompts': 20, 'fallbacks': 0, 'failed': 0}
+"""
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional
+from src.llm_gateway import FALLBACK_LIMITS
+from src.token_budget import estimate_tokens
+from src.extraction_cache import cache_key
+
+
+class BatchExtractionExecutor:
+    """
+    Runs LLMSemanticExtractor over many messages with packed prompts,
+    bounded concurrency and a resumable checkpoint
+    """
+
+    def __init__(
+        self,
+        extractor,
+        max_workers: Optional[int] = None,
+        prompt_token_budget: int = 1200,
+        max_messages_per_prompt: int = 8,
+        short_message_tokens: int = 60,
+        checkpoint_path: Optional[str] = None,
+        cache=None
+    ):
+        """
+        Initialize executor
+
+        Args:
+            extractor: LLMSemanticExtractor (its client routes through the gateway)
+            max_workers: Concurrent prompts (default: the model's concurrency cap)
+            prompt_token_budget: Max estimated prompt tokens per packed request
+            max_messages_per_prompt: Max messages packed into one prompt
+            short_message_tokens: Messages above this many tokens are sent alone
+            checkpoint_path: JSONL file for checkpoint/resume (None disables it)
+            cache: Optional ExtractionCache for per-message LLM triples
+        """
+        self.extractor = extractor
+        limits = self._model_limits()
+
+        self.max_workers = max_workers or limits['concurrency']
+        # Every in-flight prompt reserves its tokens from the tokens/min bucket,
+        # so a full pool of packed prompts must fit in one minute's quota
+        per_request_quota = limits['tpm'] // self.max_workers
+        self.prompt_token_budget = max(min(prompt_token_budget, per_request_quota // 2), 1)
+        self.max_messages_per_prompt = max_messages_per_prompt
+        self.short_message_tokens = short_message_tokens
+        self.checkpoint_path = checkpoint_path
+        self.cache = cache
+
+        self.stats = {'messages': 0, 'resumed': 0, 'cached': 0, 'prompts': 0, 'fallbacks': 0, 'failed': 0}
+        self._lock = threading.Lock()
+
+    def _model_limits(self) -> Dict:
+        """Provider quota for the extractor's model (from the gateway)"""
+        gateway = getattr(self.extractor.client, 'gateway', None)
+        limits = gateway.limits.get(self.extractor.model, {}) if gateway is not None else {}
+        return {**FALLBACK_LIMITS, **limits}
+
+    def pack(self, messages: List[Dict]) -> List[List[Dict]]:
+        """
+        Group messages into prompts
+
+        Args:
+            messages: Message dicts to extract
+
+        Returns:
+            List of message groups (one LLM request each)
+        """
+        overhead = estimate_tokens(self.extractor._build_multi_extraction_prompt([]))
+        groups = []
+        current = []
+        current_tokens = overhead
+
+        for message in messages:
+            tokens = estimate_tokens(message.get('message', '')) + estimate_tokens(message.get('user_name', '')) + 4
+
+            if tokens > self.short_message_tokens:
+                groups.append([message])
+                continue
+
+            if current and (current_tokens + tokens > self.prompt_token_budget
+                            or len(current) >= self.max_messages_per_prompt):
+                groups.append(current)
+                current = []
+                current_tokens = overhead
+
+            current.append(message)
+            current_tokens += tokens
+
+        if current:
+            groups.append(current)
+
+        return groups
+
+    def load_checkpoint(self, messages: Optional[List[Dict]] = None) -> Dict[str, List[Dict]]:
+        """
+        Read finished messages from the checkpoint file
+
+        Args:
+            messages: Only resume these messages, and only records whose
+                      content key still matches (edited text, new model or
+                      prompt version are re-extracted). None = every record
+
+        Returns:
+            {message_id: triples} (empty if there is no checkpoint)
+        """
+        done = {}
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return done
+
+        with open(self.checkpoint_path, encoding='utf-8') as f:
+            content = f.read()
+
+        for line in content.splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Partial last line from an interrupted run
+                continue
+            done[record['message_id']] = (record.get('key'), record['triples'])
+
+        # Terminate a partial last line so new records start on their own line
+        if content and not content.endswith('\n'):
+            with open(self.checkpoint_path, 'a', encoding='utf-8') as f:
+                f.write('\n')
+
+        if messages is None:
+            return {message_id: triples for message_id, (_, triples) in done.items()}
+
+        resumed = {}
+        for message in messages:
+            record = done.get(message.get('id'))
+            if record is not None and record[0] == self._cache_key(message):
+                resumed[message.get('id')] = record[1]
+        return resumed
+
+    def _write_checkpoint(self, group: List[Dict], results: Dict[str, List[Dict]]):
+        """Append a finished group's successful extractions to the checkpoint file"""
+        if not self.checkpoint_path:
+            return
+
+        with self._lock:
+            with open(self.checkpoint_path, 'a', encoding='utf-8') as f:
+                for message in group:
+                    message_id = message.get('id')
+                    if message_id not in results:
+                        continue
+                    record = {'message_id': message_id, 'key': self._cache_key(message),
+                              'triples': results[message_id]}
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                f.flush()
+
+    def _cache_key(self, message: Dict) -> str:
+        """Content key for a message's LLM triples"""
+        return cache_key(
+            message.get('message', ''),
+            message.get('user_name', 'Unknown'),
+            'llm',
+            self.extractor.model,
+            self.extractor.prompt_version
+        )
+
+    def _load_cached(self, messages: List[Dict]) -> Dict[str, List[Dict]]:
+        """Cached triples for messages, re-bound to each message's id/timestamp"""
+        keys = {message.get('id'): self._cache_key(message) for message in messages}
+        found = self.cache.get_many('llm_triples', keys.values())
+
+        results = {}
+        for message in messages:
+            triples = found.get(keys[message.get('id')])
+            if triples is None:
+                continue
+            # Same text can appear under another message id
+            results[message.get('id')] = [
+                {**triple, 'message_id': message.get('id'), 'timestamp': message.get('timestamp')}
+                for triple in triples
+            ]
+        return results
+
+    def _store_cached(self, group: List[Dict], results: Dict[str, List[Dict]]):
+        """Write a finished group's successful extractions to the cache"""
+        self.cache.put_many('llm_triples', [
+            (self._cache_key(message), results[message.get('id')], message.get('id'))
+            for message in group if message.get('id') in results
+        ])
+
+    def _extract_group(self, group: List[Dict]) -> Dict[str, Optional[List[Dict]]]:
+        """
+        One packed request, falling back to per-message calls
+
+        Returns:
+            {message_id: triples}, None for messages whose extraction failed
+        """
+        results = self.extractor.extract_triples_llm_multi(group)
+        if len(group) == 1:
+            return results
+
+        missing = group if results is None else [m for m in group if results.get(m.get('id')) is None]
+        if missing:
+            with self._lock:
+                self.stats['fallbacks'] += 1
+            results = dict(results or {})
+            for message in missing:
+                results[message.get('id')] = self.extractor.extract_triples_llm(message, strict=True)
+        return results
+
+    def run(self, messages: List[Dict], show_progress: bool = True) -> Dict[str, List[Dict]]:
+        """
+        Extract triples for all messages
+
+        Args:
+            messages: Message dicts (each needs a unique 'id')
+            show_progress: Print progress
+
+        Returns:
+            {message_id: triples} for every message (resumed ones included)
+            except those whose extraction failed (counted in stats['failed'])
+        """
+        results = self.load_checkpoint(messages)
+        pending = [message for message in messages if message.get('id') not in results]
+
+        self.stats['messages'] = len(messages)
+        self.stats['resumed'] = len(messages) - len(pending)
+
+        if self.cache is not None and pending:
+            cached = self._load_cached(pending)
+            results.update(cached)
+            pending = [message for message in pending if message.get('id') not in cached]
+            self.stats['cached'] = len(cached)
+
+        groups = self.pack(pending)
+        self.stats['prompts'] = len(groups)
+
+        if show_progress:
+            print(f"\n🤖 LLM extraction: {len(pending)} messages in {len(groups)} prompts "
+                  f"({self.max_workers} concurrent)")
+            if self.stats['resumed']:
+                print(f"   Resumed {self.stats['resumed']} messages from {self.checkpoint_path}")
+            if self.stats['cached']:
+                print(f"   Reused {self.stats['cached']} unchanged messages from the extraction cache")
+
+        completed = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self._extract_group, group): group for group in groups}
+            for future in as_completed(futures):
+                group_results = future.result()
+                failed = [message_id for message_id, triples in group_results.items() if triples is None]
+                group_results = {
+                    message_id: triples for message_id, triples in group_results.items() if triples is not None
+                }
+                self.stats['failed'] += len(failed)
+                self._write_checkpoint(futures[future], group_results)
+                if self.cache is not None:
+                    self._store_cached(futures[future], group_results)
+                results.update(group_results)
+
+                completed += len(futures[future])
+                if show_progress and completed // 50 != (completed - len(futures[future])) // 50:
+                    print(f"   Processed {completed}/{len(pending)} messages...")
+
+        if self.stats['failed']:
+            if show_progress:
+                print(f"   ⚠️  {self.stats['failed']} messages failed and were not checkpointed (a rerun retries them)")
+        elif self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            # Complete run: nothing left to resume
+            os.remove(self.checkpoint_path)
+
+        ids = {message.get('id') for message in messages}
+        return {message_id: triples for message_id, triples in results.items() if message_id in ids}
@@ -6,18 +6,23 @@ Uses Knowledge Graph for structured querying instead of RAG retrieval.
 
 Query Flow:
 1. Extract entity type from query (LLM)
-2. Query graph for all relevant triples
-3. Resolve entity names (group variants)
-4. Aggregate (GROUP BY entity, COUNT users)
-5. Generate natural language answer (LLM)
+2. Look up precomputed aggregates (dictionary entity types, SAME/MOST/POPULAR/SIMILAR)
+   - OR query graph for all relevant triples, resolve names, aggregate (fallback)
+3. Render the answer:
+   - SAME/MOST/POPULAR/COUNT: markdown template (optional LLM "Key Insight" line)
+   - SIMILAR and free-form methods: natural language answer (LLM)
 """
 import os
 import json
 from typing import List, Dict, Optional, Tuple
 from collections import defaultdict
-# from groq import Groq  # COMMENTED OUT
-from groq import Groq  # SWITCHED TO GROQ
+from src.llm_gateway import get_gateway
 from src.knowledge_graph import KnowledgeGraph
+from src.analytics_index import extract_entity_name
+from src.similarity_engine import UserSimilarityEngine, format_similarity_groups
+from src.analytics_renderer import TEMPLATED_METHODS, render_analytics_answer
+from src.analytics_payload import build_analytics_payload
+from src.tracing import span
 
 
 class GraphAnalytics:
@@ -30,21 +35,34 @@ class GraphAnalytics:
     - "What are the MOST POPULAR destinations?"
     """
 
-    def __init__(self, knowledge_graph: KnowledgeGraph, api_key: Optional[str] = None):
+    # Methods answered directly from KnowledgeGraph.analytics_index
+    INDEXED_METHODS = ('SAME', 'MOST', 'POPULAR', 'SIMILAR', 'COUNT')
+
+    def __init__(
+        self,
+        knowledge_graph: KnowledgeGraph,
+        api_key: Optional[str] = None,
+        key_insight: bool = False,
+        payload_token_budget: int = 1200
+    ):
         """
         Initialize Graph Analytics
 
         Args:
             knowledge_graph: Loaded KnowledgeGraph instance
             api_key: Mistral API key (optional, uses env var if not provided)
+            key_insight: Append a one-line LLM "Key Insight" to templated answers
+            payload_token_budget: Max (estimated) prompt tokens for aggregated data
         """
         self.kg = knowledge_graph
+        self.key_insight = key_insight
+        self.payload_token_budget = payload_token_budget
 
         # Initialize LLM client
         api_key = api_key or os.environ.get('GROQ_API_KEY')
         if not api_key:
             raise ValueError("GROQ_API_KEY not found in environment")
-        self.llm = Groq(api_key=api_key)
+        self.llm = get_gateway(api_key).client('graph_analytics')
 
     def analyze(self, query: str, verbose: bool = False) -> Dict:
         """
@@ -69,12 +87,27 @@ class GraphAnalytics:
             print(f"Query: '{query}'")
 
         # Step 1: Extract entity type and aggregation method
-        entity_type, method, keywords = self._extract_entity_info(query, verbose=verbose)
-
-        # Step 2: Query graph for relevant triples
-        triples = self._query_graph(entity_type, keywords, verbose=verbose)
+        with span("graph_analytics.extract") as stage:
+            entity_type, method, keywords = self._extract_entity_info(query, verbose=verbose)
+            stage.set_attribute("entity_type", entity_type)
+            stage.set_attribute("method", method)
+
+        # Step 2: Aggregate data
+        index = self.kg.analytics_index
+        with span("graph_analytics.aggregate") as stage:
+            if index.covers(entity_type) and method in self.INDEXED_METHODS:
+                # Fast path: precomputed aggregates (no graph scan)
+                stage.set_attribute("source", "index")
+                has_data = index.num_mentions(entity_type) > 0
+                aggregated = self._aggregate_from_index(entity_type, method, verbose=verbose) if has_data else {}
+            else:
+                # Fallback: scan graph for free-form entity types
+                stage.set_attribute("source", "graph_scan")
+                triples = self._query_graph(entity_type, keywords, verbose=verbose)
+                has_data = bool(triples)
+                aggregated = self._aggregate_triples(triples, method, verbose=verbose) if has_data else {}
 
-        if not triples:
+        if not has_data:
             return {
                 'answer': f"No data found for {entity_type} in the knowledge base.",
                 'aggregated_data': {},
@@ -82,11 +115,20 @@ class GraphAnalytics:
                 'method': method
             }
 
-        # Step 3: Aggregate data
-        aggregated = self._aggregate_triples(triples, method, verbose=verbose)
-
-        # Step 4: Generate natural language answer
-        answer = self._generate_answer(query, aggregated, entity_type, method, verbose=verbose)
+        # Step 3: Render deterministic answers directly, LLM for the rest
+        with span("graph_analytics.answer") as stage:
+            if method in TEMPLATED_METHODS:
+                stage.set_attribute("renderer", "template")
+                answer = render_analytics_answer(aggregated, entity_type, method)
+                if self.key_insight:
+                    insight = self._generate_insight(query, answer, verbose=verbose)
+                    if insight:
+                        answer += f"\n\n**Key Insight:** {insight}"
+                if verbose:
+                    print(f"\n💬 Answer Rendered (template, {method})")
+            else:
+                stage.set_attribute("renderer", "llm")
+                answer = self._generate_answer(query, aggregated, entity_type, method, verbose=verbose)
 
         if verbose:
             print(f"{'='*80}\n")
@@ -179,6 +221,63 @@ JSON:"""
 
             return entity_type, method, keywords
 
+    def _aggregate_from_index(self, entity_type: str, method: str, verbose: bool = False) -> Dict:
+        """
+        Aggregate using the knowledge graph's precomputed entity tables
+
+        Produces the same structure as _aggregate_triples without touching
+        the graph edges.
+
+        Args:
+            entity_type: Known entity type (restaurant, hotel, ...)
+            method: Aggregation method (SAME, MOST, POPULAR, SIMILAR)
+            verbose: Print aggregation details
+
+        Returns:
+            Aggregated data structure
+        """
+        index = self.kg.analytics_index
+
+        if method == 'SIMILAR':
+            engine = UserSimilarityEngine.from_index(index, entity_type)
+            return self._similarity_groups(engine, verbose=verbose)
+
+        # SAME: only entities shared by multiple users; MOST/POPULAR/COUNT: full ranking
+        min_users = 2 if method == 'SAME' else 1
+        aggregated = dict(index.ranked(entity_type, min_users=min_users))
+
+        if verbose:
+            print(f"\n📈 Aggregation ({method}, indexed):")
+            print(f"   Mentions indexed: {index.num_mentions(entity_type)}")
+            print(f"   Unique entities: {len(aggregated)}")
+            for entity, users in list(aggregated.items())[:3]:
+                print(f"   - {entity}: {len(users)} users {users[:2]}")
+
+        return aggregated
+
+    def _similarity_groups(self, engine: UserSimilarityEngine, verbose: bool = False) -> Dict:
+        """
+        Cluster users into similarity tiers (highly / moderately similar)
+
+        Args:
+            engine: UserSimilarityEngine over the users' entity sets
+            verbose: Print aggregation details
+
+        Returns:
+            Similarity groups (see UserSimilarityEngine.cluster)
+        """
+        aggregated = engine.cluster()
+
+        if verbose:
+            print(f"\n📈 Aggregation (SIMILAR):")
+            print(f"   Unique clients: {aggregated['total_clients']}")
+            print(f"   Highly similar groups: {len(aggregated['highly_similar'])}")
+            print(f"   Moderately similar groups: {len(aggregated['moderately_similar'])}")
+            for group in aggregated['highly_similar'][:3]:
+                print(f"   - {group['clients']}: {group['shared'][:3]}")
+
+        return aggregated
+
     def _query_graph(self, entity_type: str, keywords: List[str], verbose: bool = False) -> List[Dict]:
         """
         Query knowledge graph for relevant triples
@@ -192,61 +291,33 @@ JSON:"""
             List of relevant triples
         """
         relevant_triples = []
-
-        # Known specific entities to look for (based on entity type)
-        known_entities_by_type = {
-            'restaurant': [
-                'Osteria Francescana', 'Eleven Madison Park', 'Le Bernardin',
-                'The River Café', 'Alinea', 'The Ivy', 'Noma', 'River Café'
-            ],
-            'hotel': [
-                'Four Seasons', 'The Peninsula', 'Park Hyatt', 'The Ritz',
-                'Peninsula', 'Ritz'
-            ],
-            'destination': ['Paris', 'Tokyo', 'London', 'Dubai', 'New York', 'Santorini'],
-            'service': ['private jet', 'yacht', 'spa', 'golf', 'museum']
-        }
-
-        # Get known entities for this type
-        known_entities = known_entities_by_type.get(entity_type, [])
+        dictionary = self.kg.entity_dictionary
+        known_type = entity_type in dictionary.types
 
         # Search through all graph edges
         for u, v, data in self.kg.graph.edges(data=True):
             obj = data.get('metadata', {}).get('object', v)
-            obj_lower = obj.lower()
-
-            # Strategy 1: Match known specific entities
-            matched = False
-            for entity in known_entities:
-                if entity.lower() in obj_lower:
-                    triple = {
-                        'subject': u,  # user name
-                        'relationship': data.get('relationship'),
-                        'object': obj,
-                        'message_id': data.get('message_id'),
-                        'timestamp': data.get('timestamp')
-                    }
-                    relevant_triples.append(triple)
-                    matched = True
-                    break
-
-            # Strategy 2: If no known entities, use keyword matching
-            # But be more selective - only match if keywords are substantial part
-            if not matched and not known_entities:
-                if any(keyword.lower() in obj_lower for keyword in keywords):
-                    triple = {
-                        'subject': u,
-                        'relationship': data.get('relationship'),
-                        'object': obj,
-                        'message_id': data.get('message_id'),
-                        'timestamp': data.get('timestamp')
-                    }
-                    relevant_triples.append(triple)
+            triple = {
+                'subject': u,  # user name
+                'relationship': data.get('relationship'),
+                'object': obj,
+                'message_id': data.get('message_id'),
+                'timestamp': data.get('timestamp')
+            }
+
+            # Strategy 1: Canonical entities of this type (one matcher pass)
+            if known_type:
+                for entity in dictionary.match(obj, entity_type):
+                    relevant_triples.append({**triple, 'entity': entity['name']})
+
+            # Strategy 2: Type not in the dictionary, use keyword matching
+            elif any(keyword.lower() in obj.lower() for keyword in keywords):
+                relevant_triples.append(triple)
 
         if verbose:
             print(f"\n🔍 Graph Query:")
             print(f"   Entity type: {entity_type}")
-            print(f"   Searching for known entities: {known_entities[:3]}...")
+            print(f"   Matching: {'entity dictionary' if known_type else f'keywords {keywords[:3]}'}")
             print(f"   Found {len(relevant_triples)} triples")
 
         return relevant_triples
@@ -264,38 +335,24 @@ JSON:"""
             Aggregated data structure
         """
         if method == 'SIMILAR':
-            # For similarity: compute user-to-preferences mapping
-            # Then the LLM can analyze overlap between users
+            # For similarity: compute user-to-preferences mapping,
+            # then precompute overlaps and similarity groups
             user_preferences = defaultdict(set)
 
             for triple in triples:
                 user = triple['subject']
-                entity = self._extract_entity_name(triple['object'])
+                entity = triple.get('entity') or self._extract_entity_name(triple['object'])
                 user_preferences[user].add(entity)
 
-            # Convert sets to lists for JSON serialization
-            aggregated = {
-                user: list(prefs)
-                for user, prefs in user_preferences.items()
-            }
-
-            if verbose:
-                print(f"\n📈 Aggregation ({method}):")
-                print(f"   Unique clients: {len(aggregated)}")
-                if aggregated:
-                    top_3 = list(aggregated.items())[:3]
-                    for user, prefs in top_3:
-                        print(f"   - {user}: {len(prefs)} preferences {prefs[:2]}")
-
-            return aggregated
+            return self._similarity_groups(UserSimilarityEngine(user_preferences), verbose=verbose)
 
-        elif method in ['SAME', 'POPULAR', 'MOST']:
+        elif method in ['SAME', 'POPULAR', 'MOST', 'COUNT']:
             # Group by entity, count users per entity
             entity_users = defaultdict(set)
 
             for triple in triples:
-                # Extract entity name from object (simple extraction)
-                entity = self._extract_entity_name(triple['object'])
+                # Canonical entity from the dictionary, else extract from object
+                entity = triple.get('entity') or self._extract_entity_name(triple['object'])
                 entity_users[entity].add(triple['subject'])
 
             # Convert sets to lists and sort
@@ -315,7 +372,7 @@ JSON:"""
                 # Sort by user count (descending)
                 aggregated = dict(sorted(aggregated.items(), key=lambda x: len(x[1]), reverse=True))
 
-            elif method in ['MOST', 'POPULAR']:
+            elif method in ['MOST', 'POPULAR', 'COUNT']:
                 # Sort by user count (descending)
                 aggregated = dict(sorted(aggregated.items(), key=lambda x: len(x[1]), reverse=True))
 
@@ -342,51 +399,42 @@ JSON:"""
         Returns:
             Canonical entity name
         """
-        # List of known entities to extract (restaurants, hotels, etc.)
-        # Order matters: check specific names before generic terms
-        known_entities = [
-            # Restaurants (most specific first)
-            'Osteria Francescana', 'Eleven Madison Park', 'Le Bernardin',
-            'The River Café', 'Alinea', 'The Ivy', 'Noma',
-            # Hotels
-            'Four Seasons', 'The Peninsula', 'Park Hyatt', 'The Ritz',
-            # Cities (less specific)
-            'Santorini', 'New York', 'Paris', 'Tokyo', 'London', 'Dubai',
-            # Services
-            'private jet', 'yacht', 'spa', 'golf', 'museum'
-        ]
-
-        obj_lower = obj_text.lower()
-
-        # Try to find known entity (check longest/most specific first)
-        for entity in known_entities:
-            if entity.lower() in obj_lower:
-                return entity
-
-        # If no known entity found, try to extract proper nouns
-        # Look for capitalized words (likely proper nouns)
-        words = obj_text.split()
-        proper_nouns = []
-        for i, word in enumerate(words):
-            # Skip common words
-            if word.lower() in ['a', 'the', 'at', 'in', 'for', 'on', 'to', 'of', 'and']:
-                continue
-            # Check if capitalized
-            if word and word[0].isupper():
-                proper_nouns.append(word)
-                # Take up to 3 consecutive capitalized words
-                if len(proper_nouns) == 3:
-                    break
-
-        if proper_nouns:
-            return ' '.join(proper_nouns)
-
-        # Final fallback: return first 3-4 meaningful words
-        meaningful_words = [w for w in words if w.lower() not in [
-            'a', 'the', 'at', 'in', 'for', 'on', 'to', 'of', 'and', 'reservation', 'table'
-        ]][:4]
-
-        return ' '.join(meaningful_words) if meaningful_words else obj_text[:30]
+        return self.kg.entity_dictionary.canonical_name(obj_text) or extract_entity_name(obj_text)
+
+    def _generate_insight(self, query: str, rendered: str, verbose: bool = False) -> Optional[str]:
+        """
+        One-sentence insight for a templated answer (optional LLM call)
+
+        Args:
+            query: Original user query
+            rendered: Templated markdown answer
+            verbose: Print generation details
+
+        Returns:
+            Insight sentence, or None if the LLM call fails
+        """
+        prompt = f"""QUESTION: "{query}"
+
+ANSWER:
+{rendered}
+
+Write ONE sentence (max 25 words) with the key insight from this answer. Use only facts shown above.
+
+Insight:"""
+
+        try:
+            response = self.llm.chat.completions.create(
+                model="llama-3.3-70b-versatile",
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.3,
+                max_tokens=60
+            )
+            return response.choices[0].message.content.strip()
+
+        except Exception as e:
+            if verbose:
+                print(f"⚠️  Key insight failed ({str(e)[:50]}), answer without it")
+            return None
 
     def _generate_answer(self, query: str, aggregated: Dict, entity_type: str,
                         method: str, verbose: bool = False) -> str:
@@ -403,31 +451,35 @@ JSON:"""
         Returns:
             Natural language answer
         """
-        # Format aggregated data for LLM
-        formatted_data = json.dumps(aggregated, indent=2)
+        # Ranked, compact, token-budgeted encoding of the aggregated data
+        formatted_data, payload_stats = build_analytics_payload(
+            aggregated, entity_type, method, token_budget=self.payload_token_budget
+        )
+
+        if verbose:
+            print(f"\n📦 Payload: {payload_stats['entries_shown']}/{payload_stats['entries_total']} entries, "
+                  f"~{payload_stats['tokens']} tokens (budget {self.payload_token_budget})")
 
         # Customize instructions based on aggregation method
         if method == "SIMILAR":
             instructions = f"""Instructions for SIMILARITY ANALYSIS:
-1. Analyze which clients share the MOST overlapping preferences
-2. Group clients into similarity clusters based on shared {entity_type}s
-3. Calculate similarity levels:
-   - Highly similar: clients who share 3+ {entity_type}s
-   - Moderately similar: clients who share 2 {entity_type}s
-   - Individual: clients with unique preferences
-4. Present results in this format:
+The DATA already contains the computed similarity groups - do NOT recompute overlaps.
+- "highly_similar": clients who share 3+ {entity_type}s
+- "moderately_similar": clients who share 2 {entity_type}s
+- "individual": clients with unique preferences
+- "shared" lists the {entity_type}s each group has in common; "score" is the overlap strength (0-1)
+
+Present the groups exactly as given, in this format:
 
 **Highly Similar Clients:**
-- Group 1: [Client A, Client B, Client C] - All prefer: [list shared {entity_type}s]
-- Group 2: [Client D, Client E] - Both prefer: [list shared {entity_type}s]
+- Group 1: [Client A, Client B, Client C] - All prefer: [shared {entity_type}s]
 
 **Moderately Similar Clients:**
-- [Client F, Client G] - Share: [list shared {entity_type}s]
+- [Client D, Client E] - Share: [shared {entity_type}s]
 
-**Key Insight:** [1-sentence summary of the main similarity pattern discovered]
+**Key Insight:** [1-sentence summary of the main similarity pattern]
 
-5. Focus on identifying PATTERNS and GROUPINGS, not just listing all clients
-6. Be specific about what makes clients similar"""
+Omit a section if it has no groups. Do not add clients or {entity_type}s that are not in the DATA."""
 
         elif method == "SAME":
             instructions = f"""Instructions for SAME ENTITY ANALYSIS:
@@ -473,7 +525,7 @@ JSON:"""
 
 QUESTION: "{query}"
 
-DATA:
+DATA ({payload_stats['format']}):
 {formatted_data}
 
 {instructions}
@@ -508,6 +560,12 @@ Answer:"""
             if not aggregated:
                 return f"No {entity_type}s found with {method.lower()} pattern."
 
+            if method == "SIMILAR":
+                return format_similarity_groups(aggregated, entity_type)
+
+            if method in TEMPLATED_METHODS:
+                return render_analytics_answer(aggregated, entity_type, method)
+
             lines = [f"Found {len(aggregated)} {entity_type}(s):"]
             for entity, users in list(aggregated.items())[:5]:
                 lines.append(f"- {entity}: {', '.join(users[:3])} ({len(users)} total)")
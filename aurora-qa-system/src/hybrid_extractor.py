@@ -2,11 +2,15 @@
 Hybrid Extractor (The Orchestrator)
 
 Combines Filter (rule-based) and Reasoner (LLM) for optimal quality and cost.
-Triages messages: simple → Filter, complex → Reasoner
+Triages messages before any model runs: simple → Filter, complex → Reasoner
+(see message_triage.MessageTriage), so each message pays for one model.
 """
+import time
 from typing import List, Dict, Optional
 from entity_extraction_gliner import GLiNEREntityExtractor
 from llm_extractor import LLMSemanticExtractor
+from src.extraction_executor import BatchExtractionExecutor
+from message_triage import MessageTriage, ROUTE_FILTER, ROUTE_LLM
 
 
 class HybridExtractor:
@@ -14,24 +18,29 @@ class HybridExtractor:
     Hybrid extractor that combines rule-based (Filter) and LLM (Reasoner)
 
     Strategy:
-    1. Run fast Filter on all messages
-    2. If message is complex OR Filter found nothing → escalate to LLM Reasoner
-    3. Return best results
+    1. Pre-triage every message with compiled patterns (no models)
+    2. Filter-routed messages run the fast Filter; if it finds nothing
+       → escalate to LLM Reasoner
+    3. LLM-routed messages (complex, or no cue the Filter can use) go
+       straight to the Reasoner; the Filter only runs if the LLM finds nothing
+    4. Return best results
     """
 
-    def __init__(self, use_llm: bool = True, groq_api_key: Optional[str] = None):
+    def __init__(self, use_llm: bool = True, groq_api_key: Optional[str] = None, cache=None):
         """
         Initialize hybrid extractor
 
         Args:
             use_llm: Enable LLM fallback for complex messages
             groq_api_key: Groq API key (optional, uses env var if not provided)
+            cache: Optional ExtractionCache shared by the Filter and the Reasoner
         """
         print("\n🔧 Initializing Hybrid Extractor...")
+        self.cache = cache
 
         # Initialize Filter (always available)
         print("  1/2 Loading Filter (GLiNER + spaCy)...")
-        self.filter = GLiNEREntityExtractor()
+        self.filter = GLiNEREntityExtractor(cache=cache)
 
         # Initialize Reasoner (optional, requires API key)
         self.reasoner = None
@@ -46,6 +55,9 @@ class HybridExtractor:
                 print("  → Will use Filter only (no LLM fallback)")
                 self.use_llm = False
 
+        self.triage = MessageTriage(use_llm=self.use_llm)
+        self.last_report: Dict = {}
+
         print("✅ Hybrid Extractor ready!")
 
     def is_complex_message(self, text: str) -> bool:
@@ -63,42 +75,7 @@ class HybridExtractor:
         Returns:
             True if message is complex
         """
-        text_lower = text.lower()
-
-        # Question patterns (often need semantic understanding)
-        question_triggers = [
-            "what are",
-            "what is",
-            "where can",
-            "how many",
-            "how much",
-            "which",
-            "could you",
-            "can you",
-            "is it possible",
-            "would you",
-            "i'd love",
-            "i would like to know",
-            "wondering",
-        ]
-
-        # Multiple entity indicators (need semantic division)
-        multi_entity_triggers = [
-            " for my ",
-            " to the ",
-            " at the ",
-            " instead of ",
-            " rather than ",
-            " as well as ",
-            " and also ",
-        ]
-
-        # Check triggers
-        has_question = any(trigger in text_lower for trigger in question_triggers)
-        has_multi_entity = any(trigger in text_lower for trigger in multi_entity_triggers)
-
-        # Complex if has questions or multiple entities
-        return has_question or has_multi_entity
+        return self.triage.is_complex(text)
 
     def extract_from_message(
         self,
@@ -110,14 +87,14 @@ class HybridExtractor:
         Extract triples using hybrid approach
 
         Workflow:
-        1. Run Filter (fast, cheap)
-        2. Triage: Is message complex OR Filter found nothing?
-        3. If yes → Escalate to Reasoner (LLM)
+        1. Triage (patterns only): Filter or Reasoner?
+        2. Filter route: run Filter, escalate to Reasoner if it found nothing
+        3. Reasoner route: run Reasoner, fall back to Filter if it found nothing
         4. Return best results
 
         Args:
             message: Message dict
-            force_llm: Force LLM usage (skip Filter)
+            force_llm: Force LLM usage (skip triage)
             verbose: Print decision logic
 
         Returns:
@@ -137,105 +114,187 @@ class HybridExtractor:
                 print("  ⚠️  Force LLM requested but LLM not available")
             force_llm = False
 
-        # Fast path: Run Filter first (unless forced to use LLM)
-        filter_triples = []
-        if not force_llm:
-            filter_triples = self.filter.extract_from_message(message)
+        route, reason = (ROUTE_LLM, 'forced') if force_llm else self.triage.route(text)
+        if verbose:
+            print(f"  Triage: {route} ({reason})")
 
+        if route == ROUTE_FILTER:
+            filter_triples = self.filter.extract_from_message(message)
             if verbose:
                 print(f"  Filter: {len(filter_triples)} triples")
 
-        # Decision point: Use LLM?
-        use_llm_for_this = False
-
-        if self.use_llm:
-            if force_llm:
-                use_llm_for_this = True
-                reason = "Forced LLM"
-            elif len(filter_triples) == 0:
-                use_llm_for_this = True
-                reason = "Filter found nothing"
-            elif self.is_complex_message(text):
-                use_llm_for_this = True
-                reason = "Complex message detected"
-
-            if verbose and use_llm_for_this:
-                print(f"  → Escalating to LLM ({reason})")
-
-        # Slow path: Use LLM if needed
-        if use_llm_for_this:
-            llm_triples = self.reasoner.extract_triples_llm(message)
+            if filter_triples or not self.use_llm:
+                return filter_triples
+            if verbose:
+                print("  → Escalating to LLM (Filter found nothing)")
 
+        if route == ROUTE_FILTER or route == ROUTE_LLM:
+            llm_triples = self.reasoner.extract_triples_llm(message)
             if verbose:
                 print(f"  LLM: {len(llm_triples)} triples")
 
             # Use LLM results if better
-            if len(llm_triples) > 0:
+            if llm_triples or route == ROUTE_FILTER:
                 return llm_triples
 
-        # Return Filter results (if LLM didn't produce better)
-        return filter_triples
+            # Reasoner found nothing: Filter as fallback
+            return self.filter.extract_from_message(message)
+
+        return []
 
     def extract_from_messages_batch(
         self,
         messages: List[Dict],
         show_progress: bool = True,
-        verbose: bool = False
+        verbose: bool = False,
+        checkpoint_path: Optional[str] = None,
+        max_workers: Optional[int] = None
     ) -> List[Dict]:
         """
         Extract triples from multiple messages using hybrid approach
 
+        Stages:
+        1. Triage all messages (compiled patterns, no models)
+        2. Filter (batched GLiNER + spaCy) on Filter-routed messages
+        3. Reasoner on LLM-routed + escalated messages as packed, concurrent
+           prompts (paced by the LLM gateway, resumable via checkpoint_path)
+        4. Filter fallback for LLM-routed messages the Reasoner found nothing in
+
+        Routing decisions and per-stage costs are printed and kept in
+        self.last_report.
+
         Args:
             messages: List of message dicts
             show_progress: Show progress
             verbose: Print decisions for each message
+            checkpoint_path: JSONL checkpoint for the LLM pass
+            max_workers: Concurrent LLM prompts (default: model concurrency cap)
 
         Returns:
             List of all extracted triples
         """
-        all_triples = []
-
         print(f"\n🔀 Hybrid extraction from {len(messages)} messages...")
+        stage_seconds = {'triage': 0.0, 'filter': 0.0, 'llm': 0.0, 'filter_fallback': 0.0}
 
-        filter_count = 0
-        llm_count = 0
-
-        for i, message in enumerate(messages, 1):
-            if show_progress and i % 50 == 0:
-                print(f"   Processed {i}/{len(messages)} (Filter: {filter_count}, LLM: {llm_count})")
-
-            # Extract with triage
-            filter_result = self.filter.extract_from_message(message)
-
-            # Triage
-            use_llm = False
-            if self.use_llm:
-                if len(filter_result) == 0:
-                    use_llm = True
-                elif self.is_complex_message(message.get('message', '')):
-                    use_llm = True
+        # Stage 1: Triage
+        started = time.perf_counter()
+        decisions = self.triage.route_batch(messages)
+        stage_seconds['triage'] = time.perf_counter() - started
 
-            if use_llm:
-                triples = self.reasoner.extract_triples_llm(message)
-                llm_count += 1
-
-                # Rate limiting for Groq (30 req/min)
-                if llm_count < len(messages):
-                    import time
-                    time.sleep(2.1)
-            else:
-                triples = filter_result
-                filter_count += 1
-
-            all_triples.extend(triples)
+        if verbose:
+            for message, (route, reason) in zip(messages, decisions):
+                print(f"  → {message.get('id')}: {route} ({reason})")
+
+        # Stage 2: Filter on Filter-routed messages
+        results: Dict[int, List[Dict]] = {}
+        filter_indices = [i for i, (route, _) in enumerate(decisions) if route == ROUTE_FILTER]
+
+        started = time.perf_counter()
+        if filter_indices:
+            filter_results = self.filter.extract_batch_by_message(
+                [messages[i] for i in filter_indices], show_progress=show_progress
+            )
+            results.update(zip(filter_indices, filter_results))
+        stage_seconds['filter'] = time.perf_counter() - started
+
+        escalated = [i for i in filter_indices if not results[i]] if self.use_llm else []
+        for i in escalated:
+            decisions[i] = (ROUTE_LLM, 'filter_empty')
+
+        # Stage 3: Reasoner on LLM-routed + escalated messages
+        llm_indices = [i for i, (route, _) in enumerate(decisions) if route == ROUTE_LLM]
+        llm_stats = {}
+
+        usage_before = self._llm_usage()
+        started = time.perf_counter()
+        if llm_indices:
+            executor = BatchExtractionExecutor(
+                self.reasoner,
+                max_workers=max_workers,
+                checkpoint_path=checkpoint_path,
+                cache=self.cache
+            )
+            llm_results = executor.run([messages[i] for i in llm_indices], show_progress=show_progress)
+            llm_stats = dict(executor.stats)
+            for i in llm_indices:
+                triples = llm_results.get(messages[i].get('id'))
+                # Use LLM results if better
+                if triples:
+                    results[i] = triples
+        stage_seconds['llm'] = time.perf_counter() - started
+        usage_after = self._llm_usage()
+        for key in ('prompt_tokens', 'completion_tokens'):
+            llm_stats[key] = usage_after.get(key, 0) - usage_before.get(key, 0)
+
+        # Stage 4: Filter fallback where the Reasoner found nothing
+        fallback = [i for i in llm_indices if i not in results]
+        started = time.perf_counter()
+        if fallback:
+            fallback_results = self.filter.extract_batch_by_message(
+                [messages[i] for i in fallback], show_progress=False
+            )
+            results.update(zip(fallback, fallback_results))
+        stage_seconds['filter_fallback'] = time.perf_counter() - started
 
-        print(f"\n✅ Extracted {len(all_triples)} triples")
-        print(f"   Filter: {filter_count} messages ({filter_count/len(messages)*100:.1f}%)")
-        print(f"   LLM: {llm_count} messages ({llm_count/len(messages)*100:.1f}%)")
-        print(f"   Average: {len(all_triples)/len(messages):.2f} triples per message")
+        all_triples = []
+        for i in range(len(messages)):
+            all_triples.extend(results.get(i, []))
+
+        self.last_report = {
+            'messages': len(messages),
+            'routes': MessageTriage.summarize(decisions),
+            'stage_messages': {
+                'filter': len(filter_indices),
+                'llm': len(llm_indices),
+                'filter_fallback': len(fallback)
+            },
+            'stage_seconds': {stage: round(seconds, 3) for stage, seconds in stage_seconds.items()},
+            'llm': llm_stats,
+            'triples': len(all_triples)
+        }
+        self.print_report()
+
+        if self.cache is not None:
+            self.cache.print_stats()
 
         return all_triples
 
+    def _llm_usage(self) -> Dict:
+        """Reasoner token counters from the shared LLM gateway"""
+        gateway = getattr(getattr(self.reasoner, 'client', None), 'gateway', None)
+        if gateway is None:
+            return {}
+        return gateway.stats().get(self.reasoner.client.call_site, {})
+
+    def print_report(self):
+        """Print routing decisions and per-stage costs of the last batch"""
+        report = self.last_report
+        if not report:
+            return
+
+        total = max(report['messages'], 1)
+        print(f"\n✅ Extracted {report['triples']} triples from {report['messages']} messages")
+        print(f"   Average: {report['triples']/total:.2f} triples per message")
+
+        print("\n🔀 Routing:")
+        for route, reasons in sorted(report['routes'].items()):
+            count = sum(reasons.values())
+            detail = ", ".join(f"{reason}: {n}" for reason, n in sorted(reasons.items()))
+            print(f"   {route:7s} {count:5d} ({count/total*100:.1f}%)  [{detail}]")
+
+        print("\n⏱️  Stage costs:")
+        for stage, seconds in report['stage_seconds'].items():
+            count = report['stage_messages'].get(stage, report['messages'])
+            per_message = seconds / count * 1000 if count else 0.0
+            print(f"   {stage:16s} {seconds:8.2f}s  {count:5d} msgs  ({per_message:.1f} ms/msg)")
+
+        if report['llm']:
+            llm = report['llm']
+            print(f"   LLM prompts: {llm.get('prompts', 0)}, cached: {llm.get('cached', 0)}, "
+                  f"resumed: {llm.get('resumed', 0)}, fallbacks: {llm.get('fallbacks', 0)}")
+            print(f"   LLM tokens: {llm.get('prompt_tokens', 0)} prompt + "
+                  f"{llm.get('completion_tokens', 0)} completion")
+
 
 def test_hybrid_extractor():
     """Test hybrid extractor decision logic"""
@@ -6,7 +6,13 @@ Architecture:
 - Parallel retrieval from 3 sources
 - Reciprocal Rank Fusion (RRF) for score combination
 - Configurable method weights
+- Index components load in parallel (Qdrant, BM25, graph)
+- Each retrieval stage is a tracing span (src/tracing.py)
 """
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Tuple, Optional
 from collections import defaultdict
 from src.qdrant_search import QdrantSearch  # NEW: Replaces EmbeddingIndex
@@ -14,6 +20,7 @@ from src.temporal_analyzer import TemporalAnalyzer  # NEW: For date extraction
 from src.bm25_search import BM25Search
 from src.knowledge_graph import KnowledgeGraph
 from src.name_resolver import NameResolver
+from src.tracing import span
 
 
 class HybridRetriever:
@@ -25,37 +32,70 @@ class HybridRetriever:
         self,
         embedding_path: str = "data/embeddings",
         bm25_path: str = "data/bm25",
-        graph_path: str = "data/knowledge_graph.pkl"
+        graph_path: str = "data/knowledge_graph.pkl",
+        qdrant_search: Optional[QdrantSearch] = None,
+        user_index_path: Optional[str] = None,
+        preloaded: Optional[Dict] = None,
+        shared_memory: bool = False
     ):
         """
         Initialize hybrid retriever
 
+        Independent components load in parallel: the Qdrant client + FastEmbed
+        model, the BM25 pickle and the graph pickle. user_index.json is parsed
+        once and shared by BM25 and the name resolver.
+
         Args:
             embedding_path: Path to embeddings index
             bm25_path: Path to BM25 index
             graph_path: Path to knowledge graph
+            qdrant_search: Already-connected Qdrant searcher to reuse (index reloads)
+            user_index_path: user_index.json (default: user_indexed/ next to the BM25 index)
+            preloaded: Components already loaded before fork (shared_index.preload):
+                       'user_index', 'bm25_search', 'knowledge_graph'
+            shared_memory: Map BM25 from the shared export instead of unpickling it
         """
         print("\n🔧 Initializing Hybrid Retriever...")
-
-        # Load semantic search (Qdrant with temporal filtering)
-        print("  1/4 Loading semantic search (Qdrant)...")
-        self.qdrant_search = QdrantSearch()
-
-        # Load keyword search (BM25 - unchanged)
-        print("  2/4 Loading keyword search (BM25)...")
-        self.bm25_search = BM25Search()
-        self.bm25_search.load(bm25_path)
-
-        # Load knowledge graph (unchanged)
-        print("  3/4 Loading knowledge graph...")
-        self.knowledge_graph = KnowledgeGraph()
-        self.knowledge_graph.load(graph_path)
-
-        # Initialize name resolver (unchanged)
+        self.load_times: Dict[str, float] = {}
+        user_index_path = user_index_path or os.path.join(
+            os.path.dirname(bm25_path), "user_indexed", "user_index.json"
+        )
+        preloaded = preloaded or {}
+        self.shared_memory = shared_memory
+
+        with ThreadPoolExecutor(max_workers=4, thread_name_prefix="retriever-load") as pool:
+            # Semantic search (Qdrant with temporal filtering)
+            print("  1/4 Loading semantic search (Qdrant)...")
+            qdrant_future = pool.submit(self._timed, 'qdrant', lambda: QdrantSearch() if qdrant_search is None else qdrant_search)
+
+            # Shared user index (BM25 user filtering + name resolver user ids)
+            user_index_future = pool.submit(
+                self._timed, 'user_index', self._preloaded_or, preloaded, 'user_index',
+                self._load_user_index, user_index_path
+            )
+
+            # Keyword search (BM25)
+            print("  2/4 Loading keyword search (BM25)...")
+            bm25_future = pool.submit(
+                self._timed, 'bm25', self._preloaded_or, preloaded, 'bm25_search',
+                self._load_bm25, bm25_path, user_index_future, shared_memory
+            )
+
+            # Knowledge graph
+            print("  3/4 Loading knowledge graph...")
+            graph_future = pool.submit(
+                self._timed, 'knowledge_graph', self._preloaded_or, preloaded, 'knowledge_graph',
+                self._load_graph, graph_path
+            )
+
+            self.knowledge_graph = graph_future.result()
+            self.bm25_search = bm25_future.result()
+            user_index = user_index_future.result()
+            self.qdrant_search = qdrant_future.result()
+
+        # Initialize name resolver (needs the graph's users)
         print("  4/4 Building name resolver...")
-        self.name_resolver = NameResolver()
-        for user_name in self.knowledge_graph.user_index.keys():
-            self.name_resolver.add_user(user_name)
+        self.name_resolver = self._timed('name_resolver', self._build_name_resolver, user_index)
         print(f"       Indexed {self.name_resolver.total_users} users")
 
         # Initialize temporal analyzer (NEW)
@@ -63,6 +103,62 @@ class HybridRetriever:
 
         print("✅ Hybrid Retriever ready!")
 
+    def _timed(self, name: str, load, *args):
+        """Run one loader and record its wall time in self.load_times"""
+        start = time.perf_counter()
+        result = load(*args)
+        self.load_times[name] = round(time.perf_counter() - start, 3)
+        return result
+
+    @staticmethod
+    def _preloaded_or(preloaded: Dict, name: str, load, *args):
+        """Preloaded component if given, else load it"""
+        if preloaded.get(name) is not None:
+            return preloaded[name]
+        return load(*args)
+
+    @staticmethod
+    def _load_user_index(path: str) -> Dict:
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    @staticmethod
+    def _load_bm25(bm25_path: str, user_index_future, shared_memory: bool = False) -> BM25Search:
+        if shared_memory:
+            from src.shared_index import load_shared_bm25
+            return load_shared_bm25(bm25_path, user_index=user_index_future.result())
+        bm25_search = BM25Search()
+        bm25_search.load(bm25_path, user_index=user_index_future.result())
+        return bm25_search
+
+    @staticmethod
+    def _load_graph(graph_path: str) -> KnowledgeGraph:
+        knowledge_graph = KnowledgeGraph()
+        knowledge_graph.load(graph_path)
+        return knowledge_graph
+
+    def _build_name_resolver(self, user_index: Dict) -> NameResolver:
+        name_resolver = NameResolver(user_index=user_index)
+        for user_name in self.knowledge_graph.user_index.keys():
+            name_resolver.add_user(user_name)
+        return name_resolver
+
+    def embed_queries(self, queries: List[str]) -> Optional[List]:
+        """
+        Embed several queries in one vector-backend call
+
+        Args:
+            queries: Search queries
+
+        Returns:
+            One vector per query for search(query_vector=...), or None if the
+            vector backend cannot embed in batches
+        """
+        embed = getattr(self.qdrant_search, 'embed_queries', None)
+        return list(embed(queries)) if embed and queries else None
+
     def search(
         self,
         query: str,
@@ -73,7 +169,8 @@ class HybridRetriever:
         rrf_k: int = 60,
         weights: Optional[Dict[str, float]] = None,
         query_type: str = "AGGREGATION",
-        verbose: bool = False
+        verbose: bool = False,
+        query_vector=None
     ) -> List[Tuple[Dict, float]]:
         """
         Hybrid search with RRF fusion
@@ -88,6 +185,7 @@ class HybridRetriever:
             weights: Method weights {'semantic': w1, 'bm25': w2, 'graph': w3}
             query_type: Query classification (AGGREGATION, ENTITY_SPECIFIC_BROAD, etc.)
             verbose: Print retrieval details
+            query_vector: Query embedding from embed_queries (skips embedding)
 
         Returns:
             List of (message, rrf_score) tuples sorted by score
@@ -103,39 +201,45 @@ class HybridRetriever:
         # ========== USER DETECTION ==========
         # Detect user in query for filtering (e.g., "Fatima's plan" → filter to Fatima's messages)
         # Extract user names from query (same logic as _graph_search)
-        users_detected = []
-        query_words = query.split()
-        for word in query_words:
-            # Remove punctuation
-            word = word.strip('.,!?;:\'"')
-            resolved_name = self.name_resolver.resolve(word, fuzzy_threshold=0.85)
-            if resolved_name and resolved_name not in users_detected:
-                users_detected.append(resolved_name)
-
-        user_id = None
-        if users_detected:
-            # Get user_id for first detected user
-            user_id = self.name_resolver.get_user_id(users_detected[0])
-            if verbose and user_id:
-                print(f"   🔍 User filtering: {users_detected[0]} (id: {user_id[:8]}...)")
-
-        # ========== TEMPORAL DETECTION (NEW) ==========
-        # Extract date range from query for temporal filtering
-        date_range = self.temporal_analyzer.extract_date_range(query)
-        if verbose and date_range:
-            print(f"   📅 Temporal filtering: {date_range[0]} to {date_range[1]}")
+        with span("retriever.detect") as stage:
+            users_detected = []
+            query_words = query.split()
+            for word in query_words:
+                # Remove punctuation
+                word = word.strip('.,!?;:\'"')
+                resolved_name = self.name_resolver.resolve(word, fuzzy_threshold=0.85)
+                if resolved_name and resolved_name not in users_detected:
+                    users_detected.append(resolved_name)
+
+            user_id = None
+            if users_detected:
+                # Get user_id for first detected user
+                user_id = self.name_resolver.get_user_id(users_detected[0])
+                if verbose and user_id:
+                    print(f"   🔍 User filtering: {users_detected[0]} (id: {user_id[:8]}...)")
+
+            # ========== TEMPORAL DETECTION (NEW) ==========
+            # Extract date range from query for temporal filtering
+            date_range = self.temporal_analyzer.extract_date_range(query)
+            if verbose and date_range:
+                print(f"   📅 Temporal filtering: {date_range[0]} to {date_range[1]}")
+            stage.set_attribute("user_filter", user_id is not None)
+            stage.set_attribute("date_filter", date_range is not None)
 
         # ========== RETRIEVAL 1: SEMANTIC SEARCH (QDRANT) ==========
         if verbose:
             print(f"\n  1/3 Semantic search (Qdrant, top {semantic_top_k})...")
 
         # NEW: Pass date_range to Qdrant for Filter-then-Rank
-        semantic_results_raw = self.qdrant_search.search(
-            query,
-            top_k=semantic_top_k,
-            user_id=user_id,
-            date_range=date_range  # NEW: Temporal filtering
-        )
+        with span("retriever.qdrant", top_k=semantic_top_k) as stage:
+            semantic_results_raw = self.qdrant_search.search(
+                query,
+                top_k=semantic_top_k,
+                user_id=user_id,
+                date_range=date_range,  # NEW: Temporal filtering
+                **({'query_vector': query_vector} if query_vector is not None else {})
+            )
+            stage.set_attribute("results", len(semantic_results_raw))
 
         # Convert Qdrant format to hybrid retriever format
         semantic_results = [(r, r['score']) for r in semantic_results_raw]
@@ -150,11 +254,13 @@ class HybridRetriever:
         if verbose:
             print(f"\n  2/3 BM25 keyword search (top {bm25_top_k})...")
 
-        bm25_results = self.bm25_search.search(query, top_k=bm25_top_k, user_id=user_id)
+        with span("retriever.bm25", top_k=bm25_top_k) as stage:
+            bm25_results = self.bm25_search.search(query, top_k=bm25_top_k, user_id=user_id)
 
-        # POST-FILTER: Apply temporal filter to BM25 results if date_range specified
-        if date_range:
-            bm25_results = self._filter_by_date_range(bm25_results, date_range)
+            # POST-FILTER: Apply temporal filter to BM25 results if date_range specified
+            if date_range:
+                bm25_results = self._filter_by_date_range(bm25_results, date_range)
+            stage.set_attribute("results", len(bm25_results))
 
         if verbose:
             print(f"      Retrieved {len(bm25_results)} results")
@@ -165,11 +271,13 @@ class HybridRetriever:
         if verbose:
             print(f"\n  3/3 Knowledge graph search (top {graph_top_k})...")
 
-        graph_results = self._graph_search(query, top_k=graph_top_k, verbose=verbose)
+        with span("retriever.graph", top_k=graph_top_k) as stage:
+            graph_results = self._graph_search(query, top_k=graph_top_k, verbose=verbose)
 
-        # POST-FILTER: Apply temporal filter to Graph results if date_range specified
-        if date_range:
-            graph_results = self._filter_by_date_range(graph_results, date_range)
+            # POST-FILTER: Apply temporal filter to Graph results if date_range specified
+            if date_range:
+                graph_results = self._filter_by_date_range(graph_results, date_range)
+            stage.set_attribute("results", len(graph_results))
 
         if verbose:
             print(f"      Retrieved {len(graph_results)} results")
@@ -180,13 +288,15 @@ class HybridRetriever:
         if verbose:
             print(f"\n  🔀 Applying RRF fusion (k={rrf_k})...")
 
-        fused_results = self._reciprocal_rank_fusion(
-            semantic_results,
-            bm25_results,
-            graph_results,
-            k=rrf_k,
-            weights=weights
-        )
+        with span("retriever.fusion") as stage:
+            fused_results = self._reciprocal_rank_fusion(
+                semantic_results,
+                bm25_results,
+                graph_results,
+                k=rrf_k,
+                weights=weights
+            )
+            stage.set_attribute("results", len(fused_results))
 
         if verbose:
             print(f"      Fused {len(fused_results)} unique messages")
@@ -365,7 +475,7 @@ class HybridRetriever:
                 normalized_keywords.append(kw[:-1])  # cars -> car
 
         # Use normalized keywords for matching
-        keywords = list(set(normalized_keywords))
+        keywords = list(dict.fromkeys(normalized_keywords))  # Dedupe, keep query order
 
         if verbose and keywords:
             print(f"      Keywords: {keywords[:5]}")
@@ -431,8 +541,7 @@ class HybridRetriever:
                         continue
 
                     # Find the message
-                    msg = next((m for m in self.bm25_search.messages
-                              if m['id'] == msg_id), None)
+                    msg = self.bm25_search.get_message(msg_id)
 
                     if msg:
                         # If relationship type was detected, accept message without keyword check
@@ -458,7 +567,8 @@ class HybridRetriever:
             for keyword in keywords:
                 # Search entity index
                 if keyword in self.knowledge_graph.entity_index:
-                    users_with_entity = self.knowledge_graph.entity_index[keyword]
+                    # Sets iterate in hash order: sort so results don't vary between processes
+                    users_with_entity = sorted(self.knowledge_graph.entity_index[keyword])
 
                     # FIX: If specific users were detected, only search within those users
                     # This prevents returning other users' messages when query mentions specific user
@@ -475,8 +585,7 @@ class HybridRetriever:
                             if msg_id in seen_ids:
                                 continue
 
-                            msg = next((m for m in self.bm25_search.messages
-                                      if m['id'] == msg_id), None)
+                            msg = self.bm25_search.get_message(msg_id)
 
                             if msg and keyword in msg['message'].lower():
                                 graph_messages.append(msg)
@@ -0,0 +1,433 @@
+"""
+Index Refresh Module
+
+Incremental delta ingestion: pushes only new or changed messages through
+date normalisation, embedding + Qdrant upsert, BM25 and the knowledge graph,
+then publishes a new index version for the running API to swap in.
+
+Architecture:
+- Delta detection by message id + content hash against the indexed corpus
+  (bm25.pkl messages), so there is no separate state file to drift
+- Stable positions: existing messages keep their BM25 position (= Qdrant
+  point id = user_index message index); new messages are appended
+- Steps run on the delta only and are idempotent per message id:
+  - dates: normalize_dates() on new/changed messages
+  - vectors: embed + upsert with stable point ids (overwrites in place)
+  - bm25: tokenize the delta, replace/append, rebuild BM25Okapi from the
+    cached tokens; user_index.json updated alongside
+  - graph: drop triples of changed messages, add triples for the delta,
+    re-mine the entity dictionary
+- Local artifacts are only written once every step succeeded: all of them
+  are staged as temp files first, the manifest records that, then they are
+  moved into place (os.replace) one after the other
+- Recovery at the start of every refresh (recover()): a run that stopped
+  after staging has its publish finished (remaining temp files moved,
+  version bumped); a run that stopped earlier left the old index intact,
+  so its temp files are dropped and the same delta is re-detected
+- index_manifest.json records each step under the pending version and is
+  bumped last; its version is the swap signal for the API
+
+Usage:
+    refresher = IndexRefresher(data_dir="data")
+    report = refresher.refresh(load_messages("data/raw_messages.jsonl"))
+    # report['version'] → new index version (unchanged if no delta)
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+from datetime import datetime, timezone
+from typing import List, Dict, Optional, Callable, Tuple
+from src.bm25_search import BM25Search
+from src.knowledge_graph import KnowledgeGraph
+
+
+MANIFEST_NAME = "index_manifest.json"
+
+# Fields that define a message's content (normalized_dates is derived)
+HASHED_FIELDS = ('user_id', 'user_name', 'timestamp', 'message')
+
+# Published versions kept in the manifest history
+HISTORY_SIZE = 20
+
+
+def content_hash(message: Dict) -> str:
+    """
+    Content hash of a message's source fields
+
+    Args:
+        message: Message dict
+
+    Returns:
+        sha256 hex digest
+    """
+    payload = json.dumps([message.get(field) for field in HASHED_FIELDS], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def load_manifest(data_dir: str = "data") -> Dict:
+    """
+    Load the index manifest (version 0 if none was published yet)
+
+    Args:
+        data_dir: Directory holding the index artifacts
+
+    Returns:
+        Manifest dict
+    """
+    path = os.path.join(data_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {'version': 0, 'steps': {}, 'history': []}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+def _write_json_atomic(path: str, data: Dict):
+    """Write JSON through a temp file + os.replace (readers never see a torn file)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _default_triple_extractor(data_dir: str) -> Callable[[List[Dict]], List[Dict]]:
+    """HybridExtractor (Filter + Reasoner) sharing the extraction cache"""
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    if src_dir not in sys.path:
+        sys.path.insert(0, src_dir)
+    from hybrid_extractor import HybridExtractor
+    from extraction_cache import ExtractionCache
+
+    extractor = HybridExtractor(use_llm=True, cache=ExtractionCache(os.path.join(data_dir, "extraction_cache.db")))
+    return lambda messages: extractor.extract_from_messages_batch(messages, show_progress=False)
+
+
+def _default_date_normalizer(text: str, timestamp: str) -> List[str]:
+    from src.date_normalizer import normalize_dates
+    return normalize_dates(text, timestamp)
+
+
+class IndexRefresher:
+    """
+    Incremental refresh of the Qdrant, BM25, user and graph indexes
+    """
+
+    def __init__(
+        self,
+        data_dir: str = "data",
+        vector_index=None,
+        extract_triples: Optional[Callable[[List[Dict]], List[Dict]]] = None,
+        normalize_dates: Optional[Callable[[str, str], List[str]]] = None
+    ):
+        """
+        Initialize refresher
+
+        Args:
+            data_dir: Directory holding bm25.pkl, knowledge_graph.pkl,
+                      user_indexed/user_index.json and the manifest
+            vector_index: Object with upsert_messages(messages, point_ids)
+                          (default: QdrantSearch, created on first use)
+            extract_triples: messages → triples (default: HybridExtractor
+                             with the shared extraction cache, created on first use)
+            normalize_dates: (text, timestamp) → ISO dates (default: date_normalizer)
+        """
+        self.data_dir = data_dir
+        self.bm25_path = os.path.join(data_dir, "bm25")
+        self.graph_path = os.path.join(data_dir, "knowledge_graph.pkl")
+        self.user_index_path = os.path.join(data_dir, "user_indexed", "user_index.json")
+        self.manifest_path = os.path.join(data_dir, MANIFEST_NAME)
+
+        self._vector_index = vector_index
+        self._extract_triples = extract_triples
+        self.normalize_dates = normalize_dates or _default_date_normalizer
+
+        self.bm25: Optional[BM25Search] = None
+        self.graph: Optional[KnowledgeGraph] = None
+        self.manifest: Dict = {}
+
+    @property
+    def vector_index(self):
+        if self._vector_index is None:
+            from src.qdrant_search import QdrantSearch
+            self._vector_index = QdrantSearch()
+        return self._vector_index
+
+    @property
+    def extract_triples(self) -> Callable[[List[Dict]], List[Dict]]:
+        if self._extract_triples is None:
+            self._extract_triples = _default_triple_extractor(self.data_dir)
+        return self._extract_triples
+
+    def load(self):
+        """Load the current BM25 index, user index, graph and manifest"""
+        self.bm25 = BM25Search()
+        self.bm25.load(self.bm25_path, user_index_path=self.user_index_path)
+        self.graph = KnowledgeGraph()
+        self.graph.load(self.graph_path)
+        self.manifest = load_manifest(self.data_dir)
+
+    def detect_delta(self, messages: List[Dict]) -> Dict:
+        """
+        Split incoming messages into new, changed and unchanged
+
+        Args:
+            messages: Full or partial message feed (dicts with 'id')
+
+        Returns:
+            {'new': [...], 'changed': [...], 'unchanged': int, 'positions': {id: position}}
+            - positions are the BM25 positions / Qdrant point ids the delta will use
+        """
+        indexed = {msg['id']: (i, content_hash(msg)) for i, msg in enumerate(self.bm25.messages)}
+        next_position = len(self.bm25.messages)
+
+        new, changed, unchanged = [], [], 0
+        positions, seen = {}, set()
+        for msg in messages:
+            if msg['id'] in seen:
+                continue
+            seen.add(msg['id'])
+
+            known = indexed.get(msg['id'])
+            if known is None:
+                positions[msg['id']] = next_position
+                next_position += 1
+                new.append(msg)
+            elif known[1] != content_hash(msg):
+                positions[msg['id']] = known[0]
+                changed.append(msg)
+            else:
+                unchanged += 1
+
+        return {'new': new, 'changed': changed, 'unchanged': unchanged, 'positions': positions}
+
+    def _record_step(self, name: str, version: int, count: int, seconds: float, **details):
+        """Record a completed step under the pending version"""
+        self.manifest['pending_version'] = version
+        self.manifest.setdefault('steps', {})[name] = {
+            'version': version,
+            'messages': count,
+            'seconds': round(seconds, 3),
+            'completed_at': _now(),
+            **details
+        }
+        _write_json_atomic(self.manifest_path, self.manifest)
+        print(f"   ✓ {name}: {count} messages in {seconds:.2f}s")
+
+    def _step_dates(self, delta: List[Dict]) -> List[Dict]:
+        return [
+            {
+                'id': msg['id'],
+                'user_id': msg['user_id'],
+                'user_name': msg['user_name'],
+                'timestamp': msg['timestamp'],
+                'message': msg['message'],
+                'normalized_dates': self.normalize_dates(msg['message'], msg['timestamp'])
+            }
+            for msg in delta
+        ]
+
+    def _step_graph(self, delta: List[Dict], changed_ids: List[str]) -> Dict:
+        removed = self.graph.remove_message_triples(changed_ids)
+        triples = self.extract_triples(delta) if delta else []
+        added = 0
+        for triple in triples:
+            added += self.graph.add_triple(
+                subject=triple.get('subject'),
+                relationship=triple.get('relationship'),
+                obj=triple.get('object'),
+                message_id=triple.get('message_id'),
+                timestamp=triple.get('timestamp'),
+                metadata=triple.get('metadata', {})
+            )
+        self.graph.rebuild_entity_dictionary()
+        return {'triples_removed': removed, 'triples_added': added}
+
+    def _staged_files(self) -> List[Tuple[str, str]]:
+        """(temp file, live file) pairs of a publish, in replace order"""
+        tmp_graph = f"{self.graph_path}.tmp"
+        return [
+            (f"{self.bm25_path}.tmp.pkl", f"{self.bm25_path}.pkl"),
+            (f"{self.user_index_path}.tmp", self.user_index_path),
+            # The entity dictionary is named after the graph file: move both
+            (KnowledgeGraph.entity_dictionary_path(tmp_graph),
+             KnowledgeGraph.entity_dictionary_path(self.graph_path)),
+            (tmp_graph, self.graph_path)
+        ]
+
+    def _stage_artifacts(self):
+        """Write bm25.pkl, user_index.json and the graph files as temp files"""
+        os.makedirs(os.path.dirname(self.user_index_path), exist_ok=True)
+        self.bm25.save(f"{self.bm25_path}.tmp")
+        self.bm25.save_user_index(f"{self.user_index_path}.tmp")
+        self.graph.save(f"{self.graph_path}.tmp")
+
+    def _replace_staged(self):
+        """Move the staged temp files into place (ones already moved are skipped)"""
+        for tmp_path, path in self._staged_files():
+            if os.path.exists(tmp_path):
+                os.replace(tmp_path, path)
+
+    def _publish(self, staged: Dict):
+        """
+        Move the staged artifacts into place, then bump the manifest version
+
+        Args:
+            staged: Manifest 'staged' record {'version', 'messages', 'delta'}
+        """
+        self._replace_staged()
+        version = staged['version']
+
+        self.manifest.pop('pending_version', None)
+        self.manifest.pop('staged', None)
+        self.manifest.update({
+            'version': version,
+            'published_at': _now(),
+            'messages': staged['messages'],
+            'delta': staged['delta'],
+            'artifacts': {
+                'bm25': os.path.basename(self.bm25_path) + ".pkl",
+                'graph': os.path.basename(self.graph_path),
+                'user_index': os.path.relpath(self.user_index_path, self.data_dir)
+            }
+        })
+        history = self.manifest.setdefault('history', [])
+        history.append({'version': version, 'published_at': self.manifest['published_at'], **staged['delta']})
+        del history[:-HISTORY_SIZE]
+        _write_json_atomic(self.manifest_path, self.manifest)
+
+    def recover(self) -> Optional[int]:
+        """
+        Settle a refresh that stopped before publishing (manifest pending_version)
+
+        - Every artifact was staged: finish the publish (move the remaining
+          temp files, bump the version), so live files never stay mixed
+        - Stopped earlier: the live artifacts are the old ones; drop the temp
+          files, the next refresh re-detects the same delta
+
+        Returns:
+            Version published by finishing the interrupted publish (None if none)
+        """
+        self.manifest = load_manifest(self.data_dir)
+        version = self.manifest.get('pending_version')
+        if version is None:
+            return None
+
+        staged = self.manifest.get('staged')
+        if staged and staged['version'] == version:
+            print(f"   Finishing the interrupted publish of version {version}")
+            self._publish(staged)
+            return version
+
+        print(f"   Dropping the unpublished version {version} (its delta will be redone)")
+        for tmp_path, _ in self._staged_files():
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.manifest.pop('pending_version', None)
+        self.manifest.pop('staged', None)
+        _write_json_atomic(self.manifest_path, self.manifest)
+        return None
+
+    def refresh(self, messages: List[Dict]) -> Dict:
+        """
+        Push new/changed messages through every index and publish a version
+
+        Args:
+            messages: Message feed (e.g. load_messages("data/raw_messages.jsonl"))
+
+        Returns:
+            Report: version, new/changed/unchanged counts and per-step records
+        """
+        print("\n🔄 Refreshing indexes...")
+        start = time.perf_counter()
+        # Settle an interrupted run, then start from what is on disk
+        # (a failed run may have mutated memory)
+        recovered = self.recover()
+        self.load()
+
+        delta_info = self.detect_delta(messages)
+        delta = delta_info['new'] + delta_info['changed']
+        counts = {
+            'new': len(delta_info['new']),
+            'changed': len(delta_info['changed']),
+            'unchanged': delta_info['unchanged']
+        }
+        print(f"   Delta: {counts['new']} new, {counts['changed']} changed, {counts['unchanged']} unchanged")
+
+        if not delta:
+            print(f"✅ Index up to date (version {self.manifest.get('version', 0)})")
+            return {'version': self.manifest.get('version', 0), 'published': False, 'recovered': recovered,
+                    **counts, 'steps': {}}
+
+        version = self.manifest.get('version', 0) + 1
+        self.manifest['steps'] = {}
+
+        # 1. Date normalisation
+        step_start = time.perf_counter()
+        delta = self._step_dates(delta)
+        self._record_step('dates', version, len(delta), time.perf_counter() - step_start,
+                          with_dates=sum(1 for msg in delta if msg['normalized_dates']))
+
+        # 2. Embedding + Qdrant upsert (stable point ids)
+        step_start = time.perf_counter()
+        point_ids = [delta_info['positions'][msg['id']] for msg in delta]
+        self.vector_index.upsert_messages(delta, point_ids)
+        self._record_step('vectors', version, len(delta), time.perf_counter() - step_start)
+
+        # 3. BM25 append/replace + user index
+        step_start = time.perf_counter()
+        positions = self.bm25.upsert_messages(delta)
+        if positions != {msg['id']: delta_info['positions'][msg['id']] for msg in delta}:
+            raise RuntimeError("BM25 positions diverged from the Qdrant point ids")
+        self._record_step('bm25', version, len(delta), time.perf_counter() - step_start,
+                          corpus_size=len(self.bm25.messages), users=len(self.bm25.user_index))
+
+        # 4. Knowledge graph
+        step_start = time.perf_counter()
+        graph_details = self._step_graph(delta, [msg['id'] for msg in delta_info['changed']])
+        self._record_step('graph', version, len(delta), time.perf_counter() - step_start,
+                          edges=self.graph.graph.number_of_edges(), **graph_details)
+
+        # Publish: stage every artifact, record that, move them all into place,
+        # manifest version last
+        self._stage_artifacts()
+        self.manifest['staged'] = {'version': version, 'messages': len(self.bm25.messages), 'delta': counts}
+        _write_json_atomic(self.manifest_path, self.manifest)
+        self._publish(self.manifest['staged'])
+
+        elapsed = time.perf_counter() - start
+        print(f"✅ Published index version {version} ({len(self.bm25.messages)} messages, {elapsed:.2f}s)")
+        return {'version': version, 'published': True, 'recovered': recovered, **counts,
+                'steps': self.manifest['steps']}
+
+
+def main():
+    """Refresh the indexes from the latest ingested messages"""
+    from src.data_ingestion import load_messages
+
+    input_path = sys.argv[1] if len(sys.argv) > 1 else "data/raw_messages.jsonl"
+
+    print("="*60)
+    print("INCREMENTAL INDEX REFRESH")
+    print("="*60)
+
+    messages = load_messages(input_path)
+    print(f"📂 Loaded {len(messages)} messages from {input_path}")
+
+    report = IndexRefresher(data_dir="data").refresh(messages)
+    if report['recovered']:
+        print(f"Finished the interrupted publish of version {report['recovered']}")
+
+    print("\n" + "="*60)
+    print(f"Version: {report['version']} (published: {report['published']})")
+    for name, step in report['steps'].items():
+        print(f"  {name:8s} {step['messages']:5d} messages  {step['seconds']:.2f}s")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Index Reloader Module
+
+Hot-reload of the QA system's indexes without restarting the API.
+
+Architecture:
+- An IndexGeneration wraps one loaded QASystem plus the index version it
+  was built from (index_manifest.json, see index_refresh.py)
+- reload() builds the next generation off the request path and swaps it in
+  with a single reference assignment; requests hold on to the generation
+  they started with, so in-flight requests finish on the old one
+- Only one load runs at a time; a failed load keeps the current generation
+  and records the error
+- Watch mode polls the manifest version and the artifact mtimes. A manifest
+  bump reloads immediately; bare file changes (e.g. a rebuild script
+  rewriting knowledge_graph.pkl) reload once they stop changing between polls
+
+Usage:
+    reloader = IndexReloader(loader=lambda previous: QASystem(), data_dir="data")
+    reloader.reload()
+    generation = reloader.current   # hold this for the whole request
+    generation.system.answer("...")
+"""
+import os
+import time
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+from src.index_refresh import load_manifest
+
+
+# Index files whose changes trigger a reload in watch mode
+WATCHED_FILES = ["bm25.pkl", "knowledge_graph.pkl", os.path.join("user_indexed", "user_index.json")]
+
+
+class IndexGeneration:
+    """
+    One loaded QA system and the index version it serves
+    """
+
+    def __init__(self, system, version: int, generation: int, load_seconds: float, signature: Tuple):
+        """
+        Initialize generation
+
+        Args:
+            system: Loaded QASystem (or any object the loader returns)
+            version: Manifest index version at load time
+            generation: Load counter (1 = startup load)
+            load_seconds: Time spent building the system
+            signature: Watch signature (manifest version + file mtimes) at load time
+        """
+        self.system = system
+        self.version = version
+        self.generation = generation
+        self.load_seconds = load_seconds
+        self.signature = signature
+        self.loaded_at = time.time()
+
+    def info(self) -> Dict:
+        """Summary for /health and the admin endpoint"""
+        return {
+            'index_version': self.version,
+            'generation': self.generation,
+            'loaded_at': self.loaded_at,
+            'load_seconds': round(self.load_seconds, 3)
+        }
+
+
+class IndexReloader:
+    """
+    Background load + atomic swap of index generations
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[Optional[object]], object],
+        data_dir: str = "data",
+        watch_files: Optional[List[str]] = None,
+        poll_interval: float = 5.0
+    ):
+        """
+        Initialize reloader
+
+        Args:
+            loader: Builds a system; receives the current system (or None) so
+                    shared components (Qdrant client, LLM clients) can be reused
+            data_dir: Directory holding the indexes and index_manifest.json
+            watch_files: Files (relative to data_dir) that trigger a reload in watch mode
+            poll_interval: Seconds between watch polls
+        """
+        self.loader = loader
+        self.data_dir = data_dir
+        self.watch_files = watch_files if watch_files is not None else WATCHED_FILES
+        self.poll_interval = poll_interval
+
+        self.current: Optional[IndexGeneration] = None
+        self.last_error: Optional[str] = None
+        self.reloads = 0
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    @property
+    def watching(self) -> bool:
+        """Whether watch mode is running"""
+        return self._watcher is not None
+
+    def signature(self) -> Tuple:
+        """Manifest version + mtimes of the watched index files"""
+        mtimes = []
+        for name in self.watch_files:
+            path = os.path.join(self.data_dir, name)
+            mtimes.append(os.stat(path).st_mtime_ns if os.path.exists(path) else None)
+        return (load_manifest(self.data_dir).get('version', 0), tuple(mtimes))
+
+    def reload(self, force: bool = True) -> Dict:
+        """
+        Load a new generation and swap it in (blocking; call off the event loop)
+
+        Args:
+            force: Reload even if the index files are unchanged
+
+        Returns:
+            {'reloaded': bool, 'reason': str, **current generation info}
+        """
+        if not self._load_lock.acquire(blocking=False):
+            return self._result(False, 'reload_in_progress')
+
+        try:
+            signature = self.signature()
+            if not force and self.current is not None and signature == self.current.signature:
+                return self._result(False, 'unchanged')
+
+            previous = self.current
+            start = time.perf_counter()
+            try:
+                system = self.loader(previous.system if previous else None)
+            except Exception as e:
+                if previous is None:
+                    raise
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"⚠️  Index reload failed, keeping generation {previous.generation}: {self.last_error}")
+                return self._result(False, 'load_failed')
+
+            # Atomic swap: new requests see the new generation, in-flight ones keep theirs
+            self.current = IndexGeneration(
+                system=system,
+                version=signature[0],
+                generation=(previous.generation + 1) if previous else 1,
+                load_seconds=time.perf_counter() - start,
+                signature=signature
+            )
+            self.last_error = None
+            if previous is not None:
+                self.reloads += 1
+                print(f"🔀 Swapped in index version {self.current.version} "
+                      f"(generation {self.current.generation}, {self.current.load_seconds:.2f}s)")
+            return self._result(True, 'loaded')
+        finally:
+            self._load_lock.release()
+
+    def _result(self, reloaded: bool, reason: str) -> Dict:
+        info = self.current.info() if self.current else {}
+        return {'reloaded': reloaded, 'reason': reason, **info}
+
+    def start_watching(self):
+        """Poll the index files in a daemon thread and reload on change"""
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="index-watcher", daemon=True)
+        self._watcher.start()
+        print(f"👀 Watching {self.data_dir} for index changes (every {self.poll_interval:g}s)")
+
+    def stop_watching(self):
+        """Stop the watch thread"""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=self.poll_interval + 1)
+            self._watcher = None
+
+    def _watch(self):
+        pending = None
+        while not self._stop.wait(self.poll_interval):
+            try:
+                signature = self.signature()
+                if self.current is None or signature == self.current.signature:
+                    pending = None
+                    continue
+
+                # A manifest bump is published last, so its files are complete;
+                # bare file changes must be stable for one poll interval
+                if signature[0] != self.current.signature[0] or signature == pending:
+                    self.reload(force=False)
+                    pending = None
+                else:
+                    pending = signature
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"⚠️  Index watcher error: {self.last_error}")
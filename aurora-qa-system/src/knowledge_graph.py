@@ -2,11 +2,18 @@
 Knowledge Graph Module
 Build and query knowledge graph from extracted triples
 """
+import os
 import json
 import pickle
 import networkx as nx
 from typing import List, Dict, Optional, Set
 from collections import defaultdict
+try:
+    from src.analytics_index import EntityAggregateIndex
+    from src.entity_dictionary import EntityDictionary
+except ImportError:  # scripts that put src/ itself on sys.path
+    from analytics_index import EntityAggregateIndex
+    from entity_dictionary import EntityDictionary
 
 
 class KnowledgeGraph:
@@ -18,6 +25,8 @@ class KnowledgeGraph:
         self.user_index = defaultdict(list)  # user_name -> list of triples
         self.relationship_index = defaultdict(list)  # relationship -> list of triples
         self.entity_index = defaultdict(set)  # entity -> set of users who mention it
+        self.entity_dictionary = EntityDictionary()  # canonical entities (seed lexicon until built)
+        self.analytics_index = EntityAggregateIndex(self.entity_dictionary)  # entity type -> aggregates for analytics
 
     def _extract_keywords(self, text: str) -> Set[str]:
         """
@@ -70,53 +79,160 @@ class KnowledgeGraph:
         """
         print(f"\n🔨 Building knowledge graph from {len(triples)} triples...")
 
-        for triple in triples:
-            subject = triple.get('subject')
-            relationship = triple.get('relationship')
-            obj = triple.get('object')
-
-            if not subject or not relationship or not obj:
-                continue
-
-            # Skip noise (prepositions as objects)
-            noise_words = {'to', 'for', 'in', 'on', 'at', 'of', 'during', 'with', 'from'}
-            if obj.lower() in noise_words:
-                continue
-
-            # Add nodes
-            self.graph.add_node(subject, type='person')
-            self.graph.add_node(obj, type='entity')
+        # Canonical entities are mined once, before any triple is indexed
+        self.entity_dictionary = EntityDictionary.mine(
+            (triple.get('relationship'), (triple.get('metadata') or {}).get('object', triple.get('object')))
+            for triple in triples
+        )
+        self.analytics_index = EntityAggregateIndex(self.entity_dictionary)
 
-            # Add edge with metadata
-            self.graph.add_edge(
-                subject,
-                obj,
-                relationship=relationship,
+        for triple in triples:
+            self.add_triple(
+                subject=triple.get('subject'),
+                relationship=triple.get('relationship'),
+                obj=triple.get('object'),
                 message_id=triple.get('message_id'),
                 timestamp=triple.get('timestamp'),
                 metadata=triple.get('metadata', {})
             )
 
-            # Index by user
-            self.user_index[subject].append(triple)
-
-            # Index by relationship
-            self.relationship_index[relationship].append(triple)
-
-            # Index entities - IMPROVED: Index both full phrase AND keywords
-            # Full phrase (for exact matches)
-            self.entity_index[obj.lower()].add(subject)
-
-            # Individual keywords (for partial/keyword matches)
-            keywords = self._extract_keywords(obj)
-            for keyword in keywords:
-                self.entity_index[keyword].add(subject)
-
         print(f"✅ Graph built:")
         print(f"   - Nodes: {self.graph.number_of_nodes()}")
         print(f"   - Edges: {self.graph.number_of_edges()}")
         print(f"   - Users: {len(self.user_index)}")
         print(f"   - Relationship types: {len(self.relationship_index)}")
+        print(f"   - Canonical entities: {len(self.entity_dictionary.entities)}")
+
+    def rebuild_entity_dictionary(self):
+        """
+        Re-mine canonical entities from the current graph and re-index analytics
+
+        add_triple() only recognises entities already in the dictionary; call
+        this after a batch of new triples to pick up newly mentioned entities.
+        """
+        self.entity_dictionary = EntityDictionary.mine_from_graph(self.graph)
+        self.analytics_index = EntityAggregateIndex(self.entity_dictionary).build_from_graph(self.graph)
+
+    def add_triple(
+        self,
+        subject: str,
+        relationship: str,
+        obj: str,
+        message_id: Optional[str] = None,
+        timestamp: Optional[str] = None,
+        metadata: Optional[Dict] = None
+    ) -> bool:
+        """
+        Add a single triple to the graph and update all indexes incrementally
+
+        Args:
+            subject: User name
+            relationship: Relationship type
+            obj: Object phrase
+            message_id: Source message ID
+            timestamp: Source message timestamp
+            metadata: Extractor metadata
+
+        Returns:
+            True if the triple was added, False if it was skipped as noise
+        """
+        if not subject or not relationship or not obj:
+            return False
+
+        # Skip noise (prepositions as objects)
+        noise_words = {'to', 'for', 'in', 'on', 'at', 'of', 'during', 'with', 'from'}
+        if obj.lower() in noise_words:
+            return False
+
+        metadata = metadata or {}
+        triple = {
+            'subject': subject,
+            'relationship': relationship,
+            'object': obj,
+            'message_id': message_id,
+            'timestamp': timestamp
+        }
+        if metadata:
+            triple['metadata'] = metadata
+
+        # Add nodes
+        self.graph.add_node(subject, type='person')
+        self.graph.add_node(obj, type='entity')
+
+        # Add edge with metadata
+        self.graph.add_edge(
+            subject,
+            obj,
+            relationship=relationship,
+            message_id=message_id,
+            timestamp=timestamp,
+            metadata=metadata
+        )
+
+        # Index by user
+        self.user_index[subject].append(triple)
+
+        # Index by relationship
+        self.relationship_index[relationship].append(triple)
+
+        # Index entities - IMPROVED: Index both full phrase AND keywords
+        # Full phrase (for exact matches)
+        self.entity_index[obj.lower()].add(subject)
+
+        # Individual keywords (for partial/keyword matches)
+        keywords = self._extract_keywords(obj)
+        for keyword in keywords:
+            self.entity_index[keyword].add(subject)
+
+        # Analytics aggregates (entity type → entity → users)
+        self.analytics_index.add(subject, metadata.get('object', obj))
+
+        return True
+
+    def remove_message_triples(self, message_ids) -> int:
+        """
+        Remove every triple extracted from the given messages
+
+        Used by incremental refreshes before re-adding triples for edited
+        messages. Call rebuild_entity_dictionary() afterwards to refresh the
+        analytics aggregates.
+
+        Args:
+            message_ids: Source message IDs whose triples should be dropped
+
+        Returns:
+            Number of edges removed
+        """
+        message_ids = set(message_ids)
+        stale = [
+            (u, v, key)
+            for u, v, key, message_id in self.graph.edges(keys=True, data='message_id')
+            if message_id in message_ids
+        ]
+        if not stale:
+            return 0
+
+        self.graph.remove_edges_from(stale)
+        touched = {u for u, _, _ in stale} | {v for _, v, _ in stale}
+        self.graph.remove_nodes_from([n for n in touched if self.graph.degree(n) == 0])
+
+        for index in (self.user_index, self.relationship_index):
+            for key in list(index):
+                kept = [t for t in index[key] if t.get('message_id') not in message_ids]
+                if kept:
+                    index[key] = kept
+                else:
+                    del index[key]
+
+        # Entity sets carry no per-triple counts, so rebuild them from what is left
+        self.entity_index = defaultdict(set)
+        for subject, triples in self.user_index.items():
+            for triple in triples:
+                self.entity_index[triple['object'].lower()].add(subject)
+                for keyword in self._extract_keywords(triple['object']):
+                    self.entity_index[keyword].add(subject)
+
+        return len(stale)
 
     def get_user_relationships(self, user_name: str, relationship: Optional[str] = None) -> List[Dict]:
         """
@@ -237,19 +353,33 @@ class KnowledgeGraph:
         }
         return stats
 
+    @staticmethod
+    def entity_dictionary_path(filepath: str) -> str:
+        """
+        Entity dictionary file of a graph file
+
+        Named after the graph (knowledge_graph.pkl → knowledge_graph.entity_dictionary.pkl),
+        so graphs saved side by side (e.g. a temp file next to the live one) keep
+        their own dictionaries.
+        """
+        root = filepath[:-len('.pkl')] if filepath.endswith('.pkl') else filepath
+        return f"{root}.entity_dictionary.pkl"
+
     def save(self, filepath: str = "data/knowledge_graph.pkl"):
-        """Save knowledge graph to file"""
+        """Save knowledge graph (and its entity dictionary) to file"""
         with open(filepath, 'wb') as f:
             pickle.dump({
                 'graph': self.graph,
                 'user_index': dict(self.user_index),
                 'relationship_index': dict(self.relationship_index),
-                'entity_index': {k: list(v) for k, v in self.entity_index.items()}
+                'entity_index': {k: list(v) for k, v in self.entity_index.items()},
+                'analytics_index': self.analytics_index.to_dict()
             }, f)
+        self.entity_dictionary.save(self.entity_dictionary_path(filepath))
         print(f"✅ Knowledge graph saved to {filepath}")
 
     def load(self, filepath: str = "data/knowledge_graph.pkl"):
-        """Load knowledge graph from file"""
+        """Load knowledge graph (and its entity dictionary) from file"""
         with open(filepath, 'rb') as f:
             data = pickle.load(f)
             self.graph = data['graph']
@@ -258,6 +388,17 @@ class KnowledgeGraph:
             self.entity_index = defaultdict(set, {
                 k: set(v) for k, v in data['entity_index'].items()
             })
+
+        dictionary_path = self.entity_dictionary_path(filepath)
+        if os.path.exists(dictionary_path):
+            self.entity_dictionary = EntityDictionary.load(dictionary_path)
+            if 'analytics_index' in data:
+                self.analytics_index = EntityAggregateIndex.from_dict(data['analytics_index'], self.entity_dictionary)
+            else:
+                self.analytics_index = EntityAggregateIndex(self.entity_dictionary).build_from_graph(self.graph)
+        else:
+            # Graphs saved before the entity dictionary existed: mine it once
+            self.rebuild_entity_dictionary()
         print(f"✅ Knowledge graph loaded from {filepath}")
 
 
@@ -7,13 +7,19 @@ Handles semantic division (e.g., "Bentley for my Paris trip" → two separate tr
 import os
 import json
 from typing import List, Dict, Optional
-from groq import Groq
+from src.llm_gateway import get_gateway
+from src.extraction_executor import BatchExtractionExecutor
+
+
+# Bump when the extraction prompts or triple post-processing change
+# (part of the extraction cache key)
+PROMPT_VERSION = "triples-v2"
 
 
 class LLMSemanticExtractor:
     """
     LLM-based extractor for complex semantic relationships
-    Uses Groq (free tier: 30 req/min, 14K tokens/min)
+    Uses Groq (free tier: 30 req/min, 14K tokens/min, paced by the LLM gateway)
     """
 
     def __init__(self, api_key: Optional[str] = None):
@@ -31,10 +37,11 @@ class LLMSemanticExtractor:
                 "Get free API key at: https://console.groq.com/keys"
             )
 
-        self.client = Groq(api_key=self.api_key)
+        self.client = get_gateway(self.api_key).client('llm_extractor')
 
         # Use fast, capable model
         self.model = "llama-3.1-8b-instant"  # Fast, good quality
+        self.prompt_version = PROMPT_VERSION
 
         # Define valid relationship types
         self.valid_relationships = [
@@ -50,15 +57,17 @@ class LLMSemanticExtractor:
 
         print("✅ LLM Semantic Extractor initialized (Groq/Llama-3.1-8B)")
 
-    def extract_triples_llm(self, message: Dict) -> List[Dict]:
+    def extract_triples_llm(self, message: Dict, strict: bool = False) -> Optional[List[Dict]]:
         """
         Extract semantic triples using LLM
 
         Args:
             message: Message dict with keys: id, user_name, message, timestamp
+            strict: Return None instead of [] when the call or its parsing fails
+                    (so callers can tell a failure from a message without triples)
 
         Returns:
-            List of knowledge graph triples
+            List of knowledge graph triples (None on failure if strict)
         """
         user_name = message.get('user_name', 'Unknown')
         text = message.get('message', '')
@@ -68,6 +77,7 @@ class LLMSemanticExtractor:
 
         # Build prompt
         prompt = self._build_extraction_prompt(user_name, text)
+        llm_output = ""
 
         try:
             # Call LLM
@@ -89,45 +99,127 @@ class LLMSemanticExtractor:
 
             # Parse response
             llm_output = response.choices[0].message.content.strip()
+            triples_data = self._parse_json_output(llm_output)
 
-            # Extract JSON from response (handle markdown code blocks)
-            if "```json" in llm_output:
-                llm_output = llm_output.split("```json")[1].split("```")[0].strip()
-            elif "```" in llm_output:
-                llm_output = llm_output.split("```")[1].split("```")[0].strip()
-
-            # Parse JSON
-            triples_data = json.loads(llm_output)
-
-            # Build triples with metadata
-            triples = []
-            for triple_data in triples_data:
-                triple = {
-                    'subject': triple_data.get('subject', user_name),
-                    'relationship': triple_data.get('relationship'),
-                    'object': triple_data.get('object'),
-                    'message_id': message.get('id'),
-                    'timestamp': message.get('timestamp'),
-                    'metadata': {
-                        'extractor': 'llm',
-                        'model': self.model,
-                        'confidence': triple_data.get('confidence', 'high')
-                    }
-                }
-
-                # Validate relationship type
-                if triple['relationship'] in self.valid_relationships:
-                    triples.append(triple)
-
-            return triples
+            return self._build_triples(triples_data, message)
 
         except json.JSONDecodeError as e:
             print(f"⚠️  LLM output parsing error: {e}")
             print(f"   Raw output: {llm_output[:200]}")
-            return []
+            return None if strict else []
         except Exception as e:
             print(f"⚠️  LLM extraction error: {e}")
-            return []
+            return None if strict else []
+
+    def extract_triples_llm_multi(self, messages: List[Dict]) -> Optional[Dict[str, List[Dict]]]:
+        """
+        Extract triples for several short messages with one LLM call
+
+        The prompt numbers the messages and asks for one JSON object keyed by
+        those numbers, so every message keeps its own subject and triples.
+
+        Args:
+            messages: Message dicts (each with id, user_name, message, timestamp)
+
+        Returns:
+            {message_id: triples} for every message (None for a message the
+            response has no entry for, e.g. a truncated reply), or None if the
+            call failed or the response could not be parsed (callers fall back
+            to extract_triples_llm)
+        """
+        if len(messages) == 1:
+            return {messages[0].get('id'): self.extract_triples_llm(messages[0], strict=True)}
+
+        prompt = self._build_multi_extraction_prompt(messages)
+
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are an expert at extracting structured knowledge from text. You output ONLY valid JSON, no explanations."
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                temperature=0.1,
+                max_tokens=min(150 * len(messages) + 100, 2000),
+            )
+
+            results = self._parse_json_output(response.choices[0].message.content.strip())
+            if not isinstance(results, dict):
+                return None
+
+            extracted = {}
+            for index, message in enumerate(messages, 1):
+                triples_data = results.get(str(index))
+                if triples_data is None:
+                    extracted[message.get('id')] = None
+                    continue
+                if not isinstance(triples_data, list):
+                    return None
+                extracted[message.get('id')] = self._build_triples(triples_data, message)
+            return extracted
+
+        except json.JSONDecodeError as e:
+            print(f"⚠️  LLM batch output parsing error: {e}")
+            return None
+        except Exception as e:
+            print(f"⚠️  LLM batch extraction error: {e}")
+            return None
+
+    def _parse_json_output(self, llm_output: str):
+        """
+        Parse JSON from an LLM response (handles markdown code blocks)
+
+        Raises:
+            json.JSONDecodeError: if the output is not valid JSON
+        """
+        if "```json" in llm_output:
+            llm_output = llm_output.split("```json")[1].split("```")[0].strip()
+        elif "```" in llm_output:
+            llm_output = llm_output.split("```")[1].split("```")[0].strip()
+
+        return json.loads(llm_output)
+
+    def _build_triples(self, triples_data: List[Dict], message: Dict) -> List[Dict]:
+        """
+        Build triples with metadata, keeping valid relationships only
+
+        Args:
+            triples_data: Parsed LLM triples for one message
+            message: Source message dict
+
+        Returns:
+            List of knowledge graph triples
+        """
+        user_name = message.get('user_name', 'Unknown')
+
+        triples = []
+        for triple_data in triples_data:
+            if not isinstance(triple_data, dict):
+                continue
+            triple = {
+                'subject': triple_data.get('subject', user_name),
+                'relationship': triple_data.get('relationship'),
+                'object': triple_data.get('object'),
+                'message_id': message.get('id'),
+                'timestamp': message.get('timestamp'),
+                'metadata': {
+                    'extractor': 'llm',
+                    'model': self.model,
+                    'confidence': triple_data.get('confidence', 'high')
+                }
+            }
+
+            # Validate relationship type
+            if triple['relationship'] in self.valid_relationships:
+                triples.append(triple)
+
+        return triples
 
     def _build_extraction_prompt(self, user_name: str, message_text: str) -> str:
         """
@@ -180,6 +272,53 @@ Return ONLY a valid JSON array of objects. Each object must have:
 **Message to analyze:**
 "{message_text}"
 
+**Output (JSON only, no explanation):**"""
+
+        return prompt
+
+    def _build_multi_extraction_prompt(self, messages: List[Dict]) -> str:
+        """
+        Build one extraction prompt covering several numbered messages
+
+        Args:
+            messages: Message dicts (user_name, message)
+
+        Returns:
+            Formatted prompt string
+        """
+        relationships_list = "\n".join([f"  - {rel}" for rel in self.valid_relationships])
+        numbered = "\n".join(
+            f'{index}. [{message.get("user_name", "Unknown")}] "{message.get("message", "")}"'
+            for index, message in enumerate(messages, 1)
+        )
+
+        prompt = f"""Extract semantic knowledge triples from each of these concierge service messages.
+
+**Valid Relationships:**
+{relationships_list}
+
+**Task:**
+For EACH numbered message, extract ALL distinct semantic (Subject, Relationship, Object) triples.
+
+**Critical Rules:**
+1. Subject is ALWAYS the user name shown in [brackets] before that message
+2. Perform SEMANTIC DIVISION when needed:
+   - "Bentley for my Paris trip" → WANTS_TO_RENT Bentley AND PLANNING_TRIP_TO Paris
+3. Real ownership vs concepts:
+   - "my BMW" → OWNS (real asset)
+   - "my trip" → NOT OWNS (abstract concept)
+4. Only extract SPECIFIC entities as objects (not "What", "to", "for", "it")
+5. Never mix messages: triples for message 2 only come from message 2
+
+**Output Format:**
+Return ONLY a valid JSON object keyed by message number. Each value is a
+(possibly empty) array of objects with "subject", "relationship", "object"
+and "confidence" ("high" | "medium" | "low"), e.g.
+{{"1": [{{"subject": "...", "relationship": "OWNS", "object": "...", "confidence": "high"}}], "2": []}}
+
+**Messages to analyze:**
+{numbered}
+
 **Output (JSON only, no explanation):**"""
 
         return prompt
@@ -187,38 +326,47 @@ Return ONLY a valid JSON array of objects. Each object must have:
     def extract_from_messages_batch(
         self,
         messages: List[Dict],
-        show_progress: bool = True
+        show_progress: bool = True,
+        checkpoint_path: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        cache=None
     ) -> List[Dict]:
         """
         Extract triples from multiple messages using LLM
 
+        Short messages are packed several per prompt and prompts run
+        concurrently; the shared gateway paces calls to the provider quota.
+
         Args:
             messages: List of message dicts
             show_progress: Show progress info
+            checkpoint_path: JSONL checkpoint for resuming an interrupted run
+            max_workers: Concurrent prompts (default: model concurrency cap)
+            cache: Optional ExtractionCache (unchanged messages are not re-sent)
 
         Returns:
-            List of all extracted triples
+            List of all extracted triples (in message order); messages whose
+            extraction failed contribute none and are retried by a resumed run
         """
-        all_triples = []
-
         print(f"\n🤖 LLM Extracting from {len(messages)} messages...")
-        print(f"   Model: {self.model} (via Groq)")
-        print(f"   Rate limit: 30 req/min\n")
+        print(f"   Model: {self.model} (via Groq, rate-limited by the LLM gateway)\n")
 
-        for i, message in enumerate(messages, 1):
-            if show_progress and i % 10 == 0:
-                print(f"   Processed {i}/{len(messages)} messages...")
+        executor = BatchExtractionExecutor(
+            self,
+            max_workers=max_workers,
+            checkpoint_path=checkpoint_path,
+            cache=cache
+        )
+        triples_by_id = executor.run(messages, show_progress=show_progress)
 
-            triples = self.extract_triples_llm(message)
-            all_triples.extend(triples)
-
-            # Rate limiting (30 req/min = 2 seconds per request)
-            if i < len(messages):
-                import time
-                time.sleep(2.1)  # Slightly over 2 seconds to be safe
+        all_triples = []
+        for message in messages:
+            all_triples.extend(triples_by_id.get(message.get('id'), []))
 
         print(f"\n✅ Extracted {len(all_triples)} triples from {len(messages)} messages")
-        print(f"   Average: {len(all_triples)/len(messages):.2f} triples per message")
+        print(f"   Prompts: {executor.stats['prompts']}, fallbacks: {executor.stats['fallbacks']}, "
+              f"cached: {executor.stats['cached']}, failed: {executor.stats['failed']}")
+        print(f"   Average: {len(all_triples)/max(len(messages), 1):.2f} triples per message")
 
         return all_triples
 
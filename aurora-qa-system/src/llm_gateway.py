@@ -0,0 +1,565 @@
+"""
+LLM Gateway Module
+
+One shared entry point for every LLM call in the system.
+
+Architecture:
+- Backend: Groq SDK over one pooled httpx client (keep-alive connections shared
+  by all components), a StubBackend for offline tests, or a RecordedBackend
+  that records live responses once and replays them offline (benchmarks)
+- Token buckets per model: requests/min AND tokens/min (client-side, so we wait
+  instead of hitting 429s)
+- Per-model concurrency caps (bounded semaphores)
+- Per-call deadline covering rate-limit waits, the request and all retries
+- Retries on 429 / 5xx / connection errors: Retry-After header when present,
+  otherwise exponential backoff with full jitter
+- Per-call-site usage stats (calls, errors, retries, tokens, wait time) and
+  per-model queue depth (calls waiting for quota / running)
+- Each call is a tracing span (src/tracing.py) with its token usage
+
+Components keep their existing call style: gateway.client("answer_generator")
+returns an object with the familiar .chat.completions.create(...) method.
+
+Usage:
+    gateway = get_gateway()
+    llm = gateway.client("query_processor")
+    response = llm.chat.completions.create(model="llama-3.3-70b-versatile", messages=[...])
+
+    # Offline tests
+    set_gateway(LLMGateway(backend=StubBackend(lambda model, messages, **kw: "LOOKUP")))
+"""
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+from types import SimpleNamespace
+from typing import List, Dict, Optional, Callable
+
+import httpx
+from groq import Groq
+from src.token_budget import estimate_tokens
+from src.tracing import span
+
+
+# Provider quotas per model (Groq free tier)
+DEFAULT_LIMITS = {
+    'llama-3.3-70b-versatile': {'rpm': 30, 'tpm': 12000, 'concurrency': 4},
+    'llama-3.1-8b-instant': {'rpm': 30, 'tpm': 14000, 'concurrency': 4},
+}
+FALLBACK_LIMITS = {'rpm': 30, 'tpm': 6000, 'concurrency': 2}
+
+# HTTP status codes worth retrying
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """LLM call failed (raised by StubBackend, or after retries/deadline)"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class LLMDeadlineExceeded(LLMError):
+    """The call's deadline passed while waiting, calling or retrying"""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket
+
+    Holds up to `capacity` tokens and refills continuously at
+    `capacity / period` tokens per second.
+    """
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        """
+        Args:
+            capacity: Bucket size (e.g. requests per minute)
+            period: Seconds to refill a full bucket
+        """
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)"""
+        with self.lock:
+            self._refill()
+            amount = min(amount, self.capacity)
+            return max(0.0, (amount - self.tokens) / self.rate)
+
+    def try_acquire(self, amount: float) -> bool:
+        """Take `amount` tokens if available"""
+        with self.lock:
+            self._refill()
+            amount = min(amount, self.capacity)
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return True
+            return False
+
+    def refund(self, amount: float):
+        """Give back tokens that were reserved but not used"""
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class GroqBackend:
+    """Groq SDK over one pooled httpx client (SDK retries disabled, the gateway retries)"""
+
+    def __init__(self, api_key: Optional[str] = None, max_connections: int = 20):
+        """
+        Args:
+            api_key: Groq API key (or GROQ_API_KEY env var)
+            max_connections: Connection pool size shared by all components
+        """
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        self.sdk = Groq(
+            api_key=api_key or os.environ.get('GROQ_API_KEY'),
+            http_client=self.http_client,
+            max_retries=0
+        )
+
+    def create(self, timeout: float, **kwargs):
+        """Call chat completions with a per-request timeout"""
+        return self.sdk.chat.completions.create(timeout=timeout, **kwargs)
+
+
+class StubBackend:
+    """
+    Offline backend for tests
+
+    `responder(model, messages, **kwargs)` returns the completion text or
+    raises (e.g. LLMError(status_code=429, retry_after=1.0) to simulate limits).
+    """
+
+    def __init__(self, responder: Optional[Callable] = None, latency: float = 0.0):
+        """
+        Args:
+            responder: Callable producing the completion text (default: echo "OK")
+            latency: Simulated seconds per call
+        """
+        self.responder = responder or (lambda model, messages, **kwargs: "OK")
+        self.latency = latency
+        self.calls: List[Dict] = []
+
+    def create(self, timeout: float, **kwargs):
+        """Return an OpenAI-shaped response object"""
+        self.calls.append(kwargs)
+        if self.latency:
+            time.sleep(self.latency)
+
+        content = self.responder(**kwargs)
+        prompt_tokens = sum(estimate_tokens(m.get('content', '')) for m in kwargs.get('messages', []))
+        return _completion(content, prompt_tokens, estimate_tokens(content), kwargs.get('model'))
+
+
+def _completion(content: str, prompt_tokens: int, completion_tokens: int, model: Optional[str]):
+    """OpenAI-shaped chat completion response"""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason='stop')],
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens
+        ),
+        model=model
+    )
+
+
+class RecordedBackend:
+    """
+    Record a live backend's responses to a JSON file, or replay them offline
+
+    Responses are keyed by the request (model, messages, temperature,
+    max_tokens). In replay mode a request that was never recorded is
+    answered by `fallback` (default: a fixed placeholder text), which every
+    component already treats like an unusable LLM reply.
+    """
+
+    FALLBACK_TEXT = "[no recorded response]"
+
+    def __init__(self, path: str, backend=None, replay_latency: bool = False,
+                 fallback: Optional[Callable] = None):
+        """
+        Args:
+            path: Recordings file (JSON); read if it exists
+            backend: Live backend to record from (None = replay mode)
+            replay_latency: Sleep for each response's recorded latency when replaying
+            fallback: Responder(model, messages, **kwargs) for unrecorded requests
+        """
+        self.path = path
+        self.backend = backend
+        self.replay_latency = replay_latency
+        self.fallback = fallback or (lambda model, messages, **kwargs: self.FALLBACK_TEXT)
+        self.counts = {'recorded': 0, 'replayed': 0, 'fallback': 0}
+        self._lock = threading.Lock()
+
+        self.recordings: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.recordings = json.load(f)
+
+    @staticmethod
+    def key(**kwargs) -> str:
+        """Recording key of a chat completion request"""
+        request = {name: kwargs.get(name) for name in ('model', 'messages', 'temperature', 'max_tokens')}
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def create(self, timeout: float, **kwargs):
+        key = self.key(**kwargs)
+
+        if self.backend is not None:
+            started = time.monotonic()
+            response = self.backend.create(timeout=timeout, **kwargs)
+            with self._lock:
+                self.recordings[key] = {
+                    'model': kwargs.get('model'),
+                    'content': response.choices[0].message.content,
+                    'prompt_tokens': response.usage.prompt_tokens,
+                    'completion_tokens': response.usage.completion_tokens,
+                    'latency_seconds': round(time.monotonic() - started, 3)
+                }
+                self.counts['recorded'] += 1
+            return response
+
+        recording = self.recordings.get(key)
+        if recording is None:
+            with self._lock:
+                self.counts['fallback'] += 1
+            content = self.fallback(**kwargs)
+            prompt_tokens = sum(estimate_tokens(m.get('content', '')) for m in kwargs.get('messages', []))
+            return _completion(content, prompt_tokens, estimate_tokens(content), kwargs.get('model'))
+
+        with self._lock:
+            self.counts['replayed'] += 1
+        if self.replay_latency:
+            time.sleep(recording['latency_seconds'])
+        return _completion(recording['content'], recording['prompt_tokens'],
+                           recording['completion_tokens'], recording['model'])
+
+    def save(self):
+        """Write the recordings (record mode)"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            with open(self.path, 'w') as f:
+                json.dump(self.recordings, f, indent=1, ensure_ascii=False, sort_keys=True)
+
+
+def _status_code(exc: Exception) -> Optional[int]:
+    """HTTP status of an SDK / stub error (None for connection errors)"""
+    status = getattr(exc, 'status_code', None)
+    if status is None and getattr(exc, 'response', None) is not None:
+        status = getattr(exc.response, 'status_code', None)
+    return status
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    """Seconds from a Retry-After / retry-after-ms header (or stub attribute)"""
+    if getattr(exc, 'retry_after', None) is not None:
+        return float(exc.retry_after)
+
+    response = getattr(exc, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def _is_retryable(exc: Exception) -> bool:
+    """Rate limits, server errors and connection problems are retried"""
+    status = _status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return isinstance(exc, (httpx.TransportError, TimeoutError, ConnectionError)) or \
+        type(exc).__name__ in ('APIConnectionError', 'APITimeoutError')
+
+
+class LLMGateway:
+    """
+    Shared, rate-limited LLM client
+
+    Thread-safe: one instance serves every component and request thread.
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        api_key: Optional[str] = None,
+        limits: Optional[Dict[str, Dict]] = None,
+        max_retries: int = 3,
+        default_timeout: float = 30.0,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0
+    ):
+        """
+        Initialize gateway
+
+        Args:
+            backend: GroqBackend / StubBackend (default: GroqBackend)
+            api_key: Groq API key for the default backend
+            limits: {model: {'rpm', 'tpm', 'concurrency'}} (merged over DEFAULT_LIMITS)
+            max_retries: Retries after the first attempt
+            default_timeout: Deadline per call in seconds (waits + retries included)
+            backoff_base: First backoff in seconds (doubles per retry, jittered)
+            backoff_max: Backoff ceiling in seconds
+        """
+        self.backend = backend or GroqBackend(api_key=api_key)
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.max_retries = max_retries
+        self.default_timeout = default_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._models: Dict[str, Dict] = {}
+        self._stats: Dict[str, Dict] = {}
+        self._queue: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _model_state(self, model: str) -> Dict:
+        """Buckets + semaphore for a model (created on first use)"""
+        with self._lock:
+            if model not in self._models:
+                limits = {**FALLBACK_LIMITS, **self.limits.get(model, {})}
+                self._models[model] = {
+                    'requests': TokenBucket(limits['rpm']),
+                    'tokens': TokenBucket(limits['tpm']),
+                    'semaphore': threading.BoundedSemaphore(limits['concurrency'])
+                }
+            return self._models[model]
+
+    def _record(self, call_site: str, **counts):
+        """Add to a call site's usage counters"""
+        with self._lock:
+            stats = self._stats.setdefault(call_site, {
+                'calls': 0, 'errors': 0, 'retries': 0, 'rate_limited': 0,
+                'prompt_tokens': 0, 'completion_tokens': 0, 'wait_seconds': 0.0, 'latency_seconds': 0.0
+            })
+            for key, value in counts.items():
+                stats[key] += value
+
+    def stats(self) -> Dict[str, Dict]:
+        """Usage counters per call site"""
+        with self._lock:
+            return {site: dict(counts) for site, counts in self._stats.items()}
+
+    def _track(self, model: str, state: str, delta: int):
+        """Move a call in/out of the waiting/active count of a model"""
+        with self._lock:
+            queue = self._queue.setdefault(model, {'waiting': 0, 'active': 0})
+            queue[state] += delta
+
+    def queue_depth(self) -> Dict[str, Dict[str, int]]:
+        """Calls per model waiting for quota or a slot, and running"""
+        with self._lock:
+            return {model: dict(queue) for model, queue in self._queue.items()}
+
+    def _acquire(self, model: str, token_cost: int, deadline: float) -> float:
+        """
+        Wait for a request slot and `token_cost` tokens of quota
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            LLMDeadlineExceeded: if the quota will not be available in time
+        """
+        state = self._model_state(model)
+        started = time.monotonic()
+
+        while True:
+            wait = max(state['requests'].wait_time(1), state['tokens'].wait_time(token_cost))
+            if wait == 0:
+                if state['requests'].try_acquire(1):
+                    if state['tokens'].try_acquire(token_cost):
+                        return time.monotonic() - started
+                    state['requests'].refund(1)
+                continue
+
+            if time.monotonic() + wait > deadline:
+                raise LLMDeadlineExceeded(f"Rate limit wait ({wait:.1f}s) exceeds deadline for {model}")
+            time.sleep(min(wait, 1.0))
+
+    def _backoff(self, attempt: int, exc: Exception) -> float:
+        """Retry-After if the provider sent one, else jittered exponential backoff"""
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def chat(self, call_site: str = "default", timeout: Optional[float] = None, **kwargs):
+        """
+        Rate-limited chat completion with retries
+
+        Inside a request trace the call is recorded as an "llm.<call_site>"
+        span carrying the response's token usage.
+
+        Args:
+            call_site: Component name (for stats)
+            timeout: Deadline in seconds for the whole call (default: default_timeout)
+            **kwargs: Chat completion arguments (model, messages, temperature, max_tokens, ...)
+
+        Returns:
+            Chat completion response (OpenAI-shaped)
+        """
+        with span(f"llm.{call_site}", model=kwargs.get('model')) as llm_span:
+            response = self._chat(call_site, timeout, **kwargs)
+            usage = getattr(response, 'usage', None)
+            if usage is not None:
+                llm_span.add_tokens(usage.prompt_tokens, usage.completion_tokens)
+            return response
+
+    def _chat(self, call_site: str, timeout: Optional[float], **kwargs):
+        model = kwargs['model']
+        deadline = time.monotonic() + (timeout or self.default_timeout)
+        max_tokens = kwargs.get('max_tokens') or 512
+        token_cost = sum(estimate_tokens(m.get('content', '')) for m in kwargs.get('messages', [])) + max_tokens
+
+        state = self._model_state(model)
+        attempt = 0
+        while True:
+            self._track(model, 'waiting', 1)
+            try:
+                try:
+                    waited = self._acquire(model, token_cost, deadline)
+                except LLMDeadlineExceeded:
+                    # Counted like any other failed call: this is how rate limiting fails
+                    self._record(call_site, errors=1)
+                    raise
+                self._record(call_site, wait_seconds=waited)
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not state['semaphore'].acquire(timeout=remaining):
+                    state['tokens'].refund(token_cost)
+                    self._record(call_site, errors=1)
+                    raise LLMDeadlineExceeded(f"No free {model} slot before deadline")
+            finally:
+                self._track(model, 'waiting', -1)
+
+            started = time.monotonic()
+            self._track(model, 'active', 1)
+            try:
+                response = self.backend.create(timeout=max(deadline - started, 0.1), **kwargs)
+            except Exception as exc:
+                # No usage to settle against: give the token reservation back
+                # (the request slot stays spent), a retry reserves it again
+                state['tokens'].refund(token_cost)
+                retryable = _is_retryable(exc)
+                if _status_code(exc) == 429:
+                    self._record(call_site, rate_limited=1)
+
+                delay = self._backoff(attempt, exc) if retryable else 0
+                if not retryable or attempt >= self.max_retries or time.monotonic() + delay > deadline:
+                    self._record(call_site, errors=1)
+                    raise
+                attempt += 1
+                self._record(call_site, retries=1)
+                time.sleep(delay)
+                continue
+            finally:
+                state['semaphore'].release()
+                self._track(model, 'active', -1)
+
+            usage = getattr(response, 'usage', None)
+            if usage is not None:
+                # Give back the reserved-but-unused part of max_tokens
+                state['tokens'].refund(max(0, token_cost - usage.prompt_tokens - usage.completion_tokens))
+                self._record(call_site, prompt_tokens=usage.prompt_tokens,
+                             completion_tokens=usage.completion_tokens)
+            self._record(call_site, calls=1, latency_seconds=time.monotonic() - started)
+            return response
+
+    def client(self, call_site: str) -> "GatewayClient":
+        """
+        Groq-compatible client bound to a call site
+
+        Args:
+            call_site: Component name used in stats
+
+        Returns:
+            Object exposing .chat.completions.create(**kwargs)
+        """
+        return GatewayClient(self, call_site)
+
+
+class GatewayClient:
+    """Drop-in replacement for Groq(...) that routes through an LLMGateway"""
+
+    def __init__(self, gateway: LLMGateway, call_site: str):
+        self.gateway = gateway
+        self.call_site = call_site
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        return self.gateway.chat(call_site=self.call_site, **kwargs)
+
+
+_gateways: Dict[Optional[str], LLMGateway] = {}
+_override: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway(api_key: Optional[str] = None) -> LLMGateway:
+    """
+    Process-wide gateway (one per API key)
+
+    Set LLM_BACKEND=stub to run every component against StubBackend, and
+    LLM_LIMITS to a JSON {model: {'rpm', 'tpm', 'concurrency'}} object to
+    override the client-side quotas (e.g. for a paid Groq tier).
+
+    Args:
+        api_key: Groq API key (default: GROQ_API_KEY env var)
+
+    Returns:
+        Shared LLMGateway
+    """
+    if _override is not None:
+        return _override
+
+    api_key = api_key or os.environ.get('GROQ_API_KEY')
+    with _gateway_lock:
+        if api_key not in _gateways:
+            backend = StubBackend() if os.environ.get('LLM_BACKEND') == 'stub' else None
+            limits = json.loads(os.environ['LLM_LIMITS']) if os.environ.get('LLM_LIMITS') else None
+            _gateways[api_key] = LLMGateway(backend=backend, api_key=api_key, limits=limits)
+        return _gateways[api_key]
+
+
+def all_gateways() -> List[LLMGateway]:
+    """Every gateway created in this process (the override included), for metrics"""
+    with _gateway_lock:
+        gateways = list(_gateways.values())
+    if _override is not None and _override not in gateways:
+        gateways.append(_override)
+    return gateways
+
+
+def set_gateway(gateway: Optional[LLMGateway]):
+    """
+    Route every component through `gateway` (None restores the default)
+
+    Args:
+        gateway: Gateway to use, e.g. LLMGateway(backend=StubBackend(...))
+    """
+    global _override
+    _override = gateway
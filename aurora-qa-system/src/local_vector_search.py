@@ -0,0 +1,225 @@
+"""
+Local Vector Search Module
+
+In-process stand-in for QdrantSearch: same search()/upsert_messages()
+interface and result format, no server and no network.
+
+Architecture:
+- Vectors live in one normalized numpy matrix; search is an exact cosine
+  scan (a few milliseconds for thousands of messages)
+- Filters match QdrantSearch._build_filter: user_id equality, and any
+  normalized date inside the requested range
+- Embedders:
+  - HashingEmbedder (default): feature-hashed words + bigrams. Fully
+    offline and deterministic, so benchmark runs are comparable anywhere
+  - FastEmbedEmbedder: the production bge-small model (needs the model
+    files, downloaded on first use)
+
+Usage:
+    vectors = LocalVectorSearch()
+    vectors.upsert_messages(messages, point_ids=list(range(len(messages))))
+    HybridRetriever(qdrant_search=vectors)
+"""
+import re
+import zlib
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+
+class HashingEmbedder:
+    """
+    Deterministic bag-of-words embeddings via the hashing trick
+    """
+
+    def __init__(self, dim: int = 384):
+        """
+        Args:
+            dim: Vector size (384 matches bge-small)
+        """
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = re.findall(r'\w+', text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            (len(texts), dim) float32 matrix, rows L2-normalized
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode('utf-8'))
+                vectors[row, h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        return self.embed([query])[0]
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        return self.embed(queries)
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        return self.embed(texts)
+
+
+class FastEmbedEmbedder:
+    """
+    The production FastEmbed model, with QdrantSearch's query/passage handling
+    """
+
+    def __init__(self, model_name: str = "BAAI/bge-small-en-v1.5"):
+        from fastembed import TextEmbedding
+        self.model = TextEmbedding(model_name=model_name)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        return np.asarray(list(self.model.embed([query]))[0], dtype=np.float32)
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        return np.asarray(list(self.model.embed(queries)), dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(list(self.model.embed([f"passage: {t}" for t in texts])), dtype=np.float32)
+
+
+class LocalVectorSearch:
+    """
+    Exact cosine search over an in-memory matrix, with Qdrant-style filters
+    """
+
+    def __init__(self, embedder=None):
+        """
+        Args:
+            embedder: HashingEmbedder (default) or FastEmbedEmbedder
+        """
+        self.embedder = embedder or HashingEmbedder()
+        self.vectors: Optional[np.ndarray] = None
+        self.point_ids: List[int] = []
+        self.payloads: List[Dict] = []
+        self._rows: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.point_ids)
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Embed several search queries in one call (QdrantSearch.embed_queries)
+
+        Args:
+            queries: Search queries
+
+        Returns:
+            (len(queries), dim) matrix, one row per query
+        """
+        return self.embedder.embed_queries(queries)
+
+    def upsert_messages(self, messages: List[Dict], point_ids: List[int], batch_size: int = 1000) -> int:
+        """
+        Embed messages and insert/overwrite their points
+
+        Args:
+            messages: Message dicts (with normalized_dates)
+            point_ids: Point id per message (its BM25 position)
+            batch_size: Messages embedded per batch
+
+        Returns:
+            Number of points upserted
+        """
+        for start in range(0, len(messages), batch_size):
+            batch = messages[start:start + batch_size]
+            vectors = self.embedder.embed_documents([msg['message'] for msg in batch])
+            with self._lock:
+                for msg, point_id, vector in zip(batch, point_ids[start:start + batch_size], vectors):
+                    self._upsert(point_id, vector, msg)
+        return len(messages)
+
+    def _upsert(self, point_id: int, vector: np.ndarray, msg: Dict):
+        payload = {
+            'message': msg['message'],
+            'user_id': msg['user_id'],
+            'user_name': msg['user_name'],
+            'timestamp': msg['timestamp'],
+            'normalized_dates': msg.get('normalized_dates', [])
+        }
+        row = self._rows.get(point_id)
+        if row is not None:
+            self.vectors[row] = vector
+            self.payloads[row] = payload
+            return
+
+        if self.vectors is None:
+            self.vectors = np.empty((0, len(vector)), dtype=np.float32)
+        if len(self.point_ids) == len(self.vectors):
+            # Grow geometrically so bulk upserts stay linear
+            grown = np.empty((max(16, 2 * len(self.vectors)), self.vectors.shape[1]), dtype=np.float32)
+            grown[:len(self.vectors)] = self.vectors
+            self.vectors = grown
+        self._rows[point_id] = len(self.point_ids)
+        self.vectors[len(self.point_ids)] = vector
+        self.point_ids.append(point_id)
+        self.payloads.append(payload)
+
+    def _matches(self, payload: Dict, date_range: Optional[Tuple[str, str]], user_id: Optional[str]) -> bool:
+        if user_id and payload['user_id'] != user_id:
+            return False
+        if date_range:
+            start, end = date_range[0][:10], date_range[1][:10]
+            return any(start <= date <= end for date in payload['normalized_dates'])
+        return True
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        date_range: Optional[Tuple[str, str]] = None,
+        user_id: Optional[str] = None,
+        verbose: bool = False,
+        query_vector: Optional[np.ndarray] = None
+    ) -> List[Dict]:
+        """
+        Search with optional temporal and user filtering (QdrantSearch.search format)
+
+        Args:
+            query: Search query
+            top_k: Number of results
+            date_range: Optional (start, end) ISO date range
+            user_id: Optional user ID filter
+            verbose: Print debug info
+            query_vector: Embedding of `query` from embed_queries (skips embedding)
+
+        Returns:
+            [{'id', 'score', 'message', 'user_id', 'user_name', 'timestamp', 'normalized_dates'}, ...]
+        """
+        if not self.point_ids:
+            return []
+
+        if query_vector is None:
+            query_vector = self.embedder.embed_query(query)
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        with self._lock:
+            count = len(self.point_ids)
+            scores = self.vectors[:count] @ query_vector
+            payloads = self.payloads[:count]
+            point_ids = self.point_ids[:count]
+
+        if date_range or user_id:
+            allowed = np.array([self._matches(p, date_range, user_id) for p in payloads], dtype=bool)
+            scores = np.where(allowed, scores, -np.inf)
+            if verbose:
+                print(f"   Local filter: date_range={date_range}, user_id={user_id} ({int(allowed.sum())} candidates)")
+
+        k = min(top_k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+
+        return [
+            {'id': point_ids[row], 'score': float(scores[row]), **payloads[row]}
+            for row in top if np.isfinite(scores[row])
+        ]
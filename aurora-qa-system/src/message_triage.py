@@ -0,0 +1,155 @@
+"""
+Message Triage Module
+
+Cheap pre-triage for HybridExtractor: picks each message's route before
+any model (GLiNER, spaCy or LLM) runs.
+
+Architecture:
+- Compiled patterns (one alternation regex per trigger family) instead of
+  repeated substring scans
+- Routes:
+  - llm: complex messages (questions, multiple entities) and messages with
+    no cue the Filter's rules can act on (it would find nothing)
+  - filter: simple messages with a relationship verb or possessive cue
+  - skip: empty messages
+- Every decision carries a reason so the split can be tuned from reports
+
+Usage:
+    triage = MessageTriage(use_llm=True)
+    route, reason = triage.route("Can I get a Bentley for my Paris trip?")
+    # ('llm', 'question')
+"""
+import re
+from collections import Counter
+from typing import List, Dict, Tuple
+
+
+ROUTE_FILTER = 'filter'
+ROUTE_LLM = 'llm'
+ROUTE_SKIP = 'skip'
+
+# Questions with uncertain intent (often need semantic understanding)
+QUESTION_TRIGGERS = [
+    "what are",
+    "what is",
+    "where can",
+    "how many",
+    "how much",
+    "which",
+    "could you",
+    "can you",
+    "is it possible",
+    "would you",
+    "i'd love",
+    "i would like to know",
+    "wondering",
+]
+
+# Multiple entity indicators (need semantic division)
+MULTI_ENTITY_TRIGGERS = [
+    " for my ",
+    " to the ",
+    " at the ",
+    " instead of ",
+    " rather than ",
+    " as well as ",
+    " and also ",
+]
+
+# Word stems the Filter's verb rules and possessive rule act on
+FILTER_CUES = [
+    r"own", r"ha(?:ve|s)", r"book", r"reserv", r"rent", r"need", r"plan",
+    r"going", r"travel", r"visit", r"was", r"prefer", r"lik", r"lov",
+    r"favou?rit", r"dining", r"attend", r"my", r"our",
+]
+
+
+def _alternation(phrases: List[str]) -> "re.Pattern":
+    """One compiled regex matching any of the literal phrases"""
+    return re.compile("|".join(re.escape(phrase) for phrase in phrases))
+
+
+class MessageTriage:
+    """
+    Rule-based router deciding Filter vs Reasoner per message
+    """
+
+    def __init__(self, use_llm: bool = True):
+        """
+        Initialize triage
+
+        Args:
+            use_llm: Whether the LLM route is available (False routes
+                     everything non-empty to the Filter)
+        """
+        self.use_llm = use_llm
+        self.question_pattern = _alternation(QUESTION_TRIGGERS)
+        self.multi_entity_pattern = _alternation(MULTI_ENTITY_TRIGGERS)
+        self.filter_cue_pattern = re.compile(r"\b(?:" + "|".join(FILTER_CUES) + r")\w*", re.IGNORECASE)
+
+    def is_complex(self, text: str) -> bool:
+        """
+        Detect if a message requires LLM understanding
+
+        Args:
+            text: Message text
+
+        Returns:
+            True if the message has a question or multi-entity trigger
+        """
+        text_lower = text.lower()
+        return bool(self.question_pattern.search(text_lower) or self.multi_entity_pattern.search(text_lower))
+
+    def route(self, text: str) -> Tuple[str, str]:
+        """
+        Decide the route for one message
+
+        Args:
+            text: Message text
+
+        Returns:
+            (route, reason) - route is 'filter', 'llm' or 'skip'
+        """
+        if not text or not text.strip():
+            return ROUTE_SKIP, 'empty'
+
+        if not self.use_llm:
+            return ROUTE_FILTER, 'llm_disabled'
+
+        text_lower = text.lower()
+        if self.question_pattern.search(text_lower):
+            return ROUTE_LLM, 'question'
+        if self.multi_entity_pattern.search(text_lower):
+            return ROUTE_LLM, 'multi_entity'
+        if not self.filter_cue_pattern.search(text):
+            return ROUTE_LLM, 'no_filter_cue'
+
+        return ROUTE_FILTER, 'filter_cue'
+
+    def route_batch(self, messages: List[Dict]) -> List[Tuple[str, str]]:
+        """
+        Routes for many messages
+
+        Args:
+            messages: Message dicts
+
+        Returns:
+            (route, reason) per message, in order
+        """
+        return [self.route(message.get('message', '') or '') for message in messages]
+
+    @staticmethod
+    def summarize(decisions: List[Tuple[str, str]]) -> Dict[str, Dict[str, int]]:
+        """
+        Count decisions by route and reason
+
+        Args:
+            decisions: Output of route_batch (plus any escalations)
+
+        Returns:
+            {route: {reason: count}}
+        """
+        summary: Dict[str, Dict[str, int]] = {}
+        for (route, reason), count in Counter(decisions).items():
+            summary.setdefault(route, {})[reason] = count
+        return summary
@@ -0,0 +1,378 @@
+"""
+Metrics Module
+
+In-process metrics exposed in Prometheus text format (GET /metrics).
+
+Architecture:
+- Counters, gauges and histograms keep one shard per thread: the request
+  path only touches its own thread's dict (no lock, no contention); a
+  scrape sums the shards. The only lock is taken once per thread, when its
+  shard is created. Shards of finished threads (e.g. per-batch thread
+  pools) are folded into one retired total, so the shard count follows
+  the live threads
+- Pipeline metrics come from finished request traces (src/tracing.py):
+  request count + latency per route (LOOKUP/ANALYTICS), latency per stage
+  and result counts per retrieval source. They are recorded after the
+  answer, off the stages' own code paths
+- LLM calls/errors/retries/tokens per call site and the gateway queue depth
+  are read from LLMGateway at scrape time (the gateway already counts them)
+- Cache lookups (hit/miss per cache) are counted where the cache lives
+
+Usage:
+    add_trace_listener(observe_trace)          # once, at startup
+    CACHE_LOOKUPS.inc(cache="minhash_signatures", result="hit")
+    text = REGISTRY.render()                   # Prometheus exposition format
+"""
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+# Seconds; spans range from sub-millisecond lookups to multi-second LLM calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Results returned per retrieval source (top_k is 10-20)
+RESULT_COUNT_BUCKETS = (0, 1, 2, 5, 10, 15, 20, 30, 50)
+
+
+class _ThreadShards:
+    """
+    One dict per writing thread; readers merge them
+    """
+
+    def __init__(self, merge: Callable[[Dict, Dict], None]):
+        """
+        Args:
+            merge: merge(into, shard) adds a shard's values into another dict
+        """
+        self._merge = merge
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, Dict]] = []
+        self._retired: Dict = {}
+        self._lock = threading.Lock()
+
+    def mine(self) -> Dict:
+        """This thread's shard (created on its first write)"""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = {}
+            with self._lock:
+                self._retire_finished()
+                self._shards.append((threading.current_thread(), shard))
+            self._local.shard = shard
+        return shard
+
+    def _retire_finished(self):
+        """Fold the shards of finished threads into the retired total (lock held)"""
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                # A finished thread writes no more: its shard is final
+                self._merge(self._retired, shard)
+        self._shards = live
+
+    def snapshot(self) -> List[Dict]:
+        """Copies of every shard (dict() copies atomically under the GIL)"""
+        with self._lock:
+            self._retire_finished()
+            shards = [self._retired] + [shard for _, shard in self._shards]
+            return [dict(shard) for shard in shards]
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+
+class _Metric:
+    """Name, help text and label names shared by every metric type"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._shards = _ThreadShards(self._merge)
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    @staticmethod
+    def _merge(into: Dict, shard: Dict):
+        """Add one shard's values into `into`"""
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """
+    Monotonic count (e.g. requests, cache hits)
+    """
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        """Add `amount` to the series selected by `labels`"""
+        shard = self._shards.mine()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    @staticmethod
+    def _merge(into: Dict, shard: Dict):
+        for key, value in shard.items():
+            into[key] = into.get(key, 0) + value
+
+    def values(self) -> Dict[Tuple, float]:
+        """Total per label set"""
+        totals: Dict[Tuple, float] = {}
+        for shard in self._shards.snapshot():
+            self._merge(totals, shard)
+        return totals
+
+    def samples(self) -> List[Tuple[str, Dict, float]]:
+        return [(self.name, self._labels(key), value) for key, value in sorted(self.values().items())]
+
+
+class Gauge(Counter):
+    """
+    Up/down value (e.g. requests in progress); inc() and dec() from any thread
+    """
+
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        """Subtract `amount` from the series selected by `labels`"""
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """
+    Distribution over fixed buckets (e.g. latency in seconds)
+    """
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        """
+        Args:
+            name: Metric name
+            documentation: HELP text
+            labelnames: Label names
+            buckets: Upper bounds (+Inf is added)
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        """Record one observation"""
+        shard = self._shards.mine()
+        key = self._key(labels)
+        counts = shard.get(key)
+        if counts is None:
+            # [bucket counts..., +Inf count, sum]
+            counts = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[len(self.buckets)] += 1
+        counts[-1] += value
+
+    @staticmethod
+    def _merge(into: Dict, shard: Dict):
+        # New lists: the retired total is shared with snapshot copies
+        for key, counts in shard.items():
+            counts = list(counts)
+            merged = into.get(key)
+            into[key] = counts if merged is None else [a + b for a, b in zip(merged, counts)]
+
+    def values(self) -> Dict[Tuple, List[float]]:
+        """Per label set: [non-cumulative bucket counts..., +Inf count, sum]"""
+        totals: Dict[Tuple, List[float]] = {}
+        for shard in self._shards.snapshot():
+            self._merge(totals, shard)
+        return totals
+
+    def samples(self) -> List[Tuple[str, Dict, float]]:
+        samples = []
+        for key, counts in sorted(self.values().items()):
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts[:-1]):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", {**labels, 'le': _format_value(bound)}, cumulative))
+            samples.append((f"{self.name}_sum", labels, counts[-1]))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+# A collector returns [(name, type, help, [(labels, value), ...]), ...] at scrape time
+Collector = Callable[[], List[Tuple[str, str, str, List[Tuple[Dict, float]]]]]
+
+
+class MetricsRegistry:
+    """
+    Metrics + scrape-time collectors rendered together
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Collector] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Collector):
+        """Call `collector` on every scrape (for values owned elsewhere)"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        Prometheus text exposition format (version 0.0.4)
+
+        Returns:
+            Metrics document
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for name, labels, value in metric.samples():
+                lines.append(_sample_line(name, labels, value))
+
+        for collector in self._collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                lines.append(f"# collector error: {type(e).__name__}: {e}")
+                continue
+            for name, type_name, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {type_name}")
+                for labels, value in samples:
+                    lines.append(_sample_line(name, labels, value))
+
+        return "\n".join(lines) + "\n"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _sample_line(name: str, labels: Dict, value: float) -> str:
+    if labels:
+        rendered = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+        return f"{name}{{{rendered}}} {_format_value(value)}"
+    return f"{name} {_format_value(value)}"
+
+
+# ==================== Application Metrics ====================
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "aurora_http_requests_total", "HTTP requests by method, path and status", ("method", "path", "status"))
+HTTP_IN_PROGRESS = REGISTRY.gauge(
+    "aurora_http_requests_in_progress", "HTTP requests being served (queue depth)", ("path",))
+QA_REQUESTS = REGISTRY.counter(
+    "aurora_qa_requests_total", "Answered questions by pipeline route and outcome", ("route", "status"))
+QA_LATENCY = REGISTRY.histogram(
+    "aurora_qa_request_duration_seconds", "End-to-end answer latency by pipeline route", ("route",))
+STAGE_LATENCY = REGISTRY.histogram(
+    "aurora_stage_duration_seconds", "Latency per pipeline stage (tracing span name)", ("stage",))
+RETRIEVAL_RESULTS = REGISTRY.histogram(
+    "aurora_retrieval_results", "Results returned per retrieval source and query",
+    ("source",), buckets=RESULT_COUNT_BUCKETS)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "aurora_cache_lookups_total", "Cache lookups by cache and result (hit/miss)", ("cache", "result"))
+
+
+def observe_trace(trace) -> None:
+    """
+    Record a finished request trace (tracing listener)
+
+    Args:
+        trace: src.tracing.Trace
+    """
+    root = trace.root
+    route = root.attributes.get('route', 'UNKNOWN')
+    QA_REQUESTS.inc(route=route, status="error" if root.error else "ok")
+    QA_LATENCY.observe(root.duration_ms / 1000, route=route)
+
+    for s in trace.spans[1:]:
+        STAGE_LATENCY.observe(s.duration_ms / 1000, stage=s.name)
+        if s.name.startswith("retriever.") and 'results' in s.attributes:
+            RETRIEVAL_RESULTS.observe(s.attributes['results'], source=s.name.split(".", 1)[1])
+
+
+def cache_hit_ratio(cache: str) -> Optional[float]:
+    """Hits / lookups for one cache (None before the first lookup)"""
+    values = CACHE_LOOKUPS.values()
+    hits = values.get((cache, "hit"), 0)
+    total = hits + values.get((cache, "miss"), 0)
+    return hits / total if total else None
+
+
+def _llm_collector():
+    """LLM usage per call site and queue depth per model, from the live gateways"""
+    from src.llm_gateway import all_gateways
+
+    stats: Dict[str, Dict[str, float]] = {}
+    queues: Dict[Tuple[str, str], int] = {}
+    for gateway in all_gateways():
+        for site, counts in gateway.stats().items():
+            totals = stats.setdefault(site, {})
+            for key, value in counts.items():
+                totals[key] = totals.get(key, 0) + value
+        for model, depth in gateway.queue_depth().items():
+            for state, value in depth.items():
+                queues[(model, state)] = queues.get((model, state), 0) + value
+
+    def per_site(key):
+        return [({'call_site': site}, counts[key]) for site, counts in sorted(stats.items())]
+
+    tokens = []
+    for site, counts in sorted(stats.items()):
+        tokens.append(({'call_site': site, 'kind': 'prompt'}, counts['prompt_tokens']))
+        tokens.append(({'call_site': site, 'kind': 'completion'}, counts['completion_tokens']))
+
+    return [
+        ("aurora_llm_calls_total", "counter", "Successful LLM calls by call site", per_site('calls')),
+        ("aurora_llm_errors_total", "counter", "Failed LLM calls (after retries) by call site", per_site('errors')),
+        ("aurora_llm_retries_total", "counter", "LLM call retries by call site", per_site('retries')),
+        ("aurora_llm_rate_limited_total", "counter", "429 responses by call site", per_site('rate_limited')),
+        ("aurora_llm_tokens_total", "counter", "LLM tokens by call site and kind", tokens),
+        ("aurora_llm_wait_seconds_total", "counter", "Time spent waiting for rate-limit quota",
+         per_site('wait_seconds')),
+        ("aurora_llm_queue_depth", "gauge", "LLM calls waiting for quota/a slot, or running, per model",
+         [({'model': model, 'state': state}, value) for (model, state), value in sorted(queues.items())]),
+    ]
+
+
+REGISTRY.add_collector(_llm_collector)
@@ -25,8 +25,13 @@ class NameResolver:
     - User ID mapping: "Sophia Al-Farsi" → user_id (for fast filtering)
     """
 
-    def __init__(self):
-        """Initialize empty name resolver"""
+    def __init__(self, user_index: Optional[Dict] = None):
+        """
+        Initialize empty name resolver
+
+        Args:
+            user_index: Already-parsed user_index.json (default: read it from disk)
+        """
         # Canonical storage: normalized → original
         self.canonical_names: Dict[str, str] = {}  # "sophia al-farsi" → "Sophia Al-Farsi"
 
@@ -68,25 +73,24 @@ class NameResolver:
         }
 
         # Load user_index if available
-        self._load_user_index()
+        self._load_user_index(user_index)
 
-    def _load_user_index(self):
-        """Load user_index.json to build user_name → user_id mapping"""
+    def _load_user_index(self, user_index: Optional[Dict] = None):
+        """Build user_name → user_id mapping from user_index.json (or an already-parsed copy)"""
         user_index_path = "data/user_indexed/user_index.json"
-        if os.path.exists(user_index_path):
+        if user_index is None and os.path.exists(user_index_path):
             try:
                 with open(user_index_path, 'r') as f:
                     user_index = json.load(f)
-
-                # Build reverse mapping: user_name → user_id
-                for user_id, data in user_index.items():
-                    user_name = data['user_name']
-                    self.user_id_map[user_name] = user_id
-
             except Exception as e:
                 # Silent fail - user_id mapping is optional
                 pass
 
+        # Build reverse mapping: user_name → user_id
+        for user_id, data in (user_index or {}).items():
+            user_name = data['user_name']
+            self.user_id_map[user_name] = user_id
+
     def get_user_id(self, user_name: str) -> Optional[str]:
         """
         Get user_id for a canonical user_name
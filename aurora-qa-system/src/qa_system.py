@@ -7,19 +7,43 @@ Complete RAG pipeline integrating all components:
 3. ResultComposer - Merge/interleave results
 4. AnswerGenerator - Generate final answer with LLM
 
+Each step is a tracing span (src/tracing.py): inside a trace, answer() leaves
+a per-stage latency and token breakdown.
+
+answer_batch() answers many questions together: identical questions and
+sub-queries are handled once, routing is batched, sub-queries are embedded
+in one call and retrieved concurrently, and answer generation runs with
+bounded parallelism; results are yielded as they complete.
+
 Usage:
     system = QASystem()
     result = system.answer("What are Vikram's service expectations?")
     print(result['answer'])
+
+    for done in system.answer_batch(questions):
+        print(done['indices'], done.get('result', {}).get('answer'))
 """
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
 import os
+import time
+import queue
+import threading
+import contextvars
 
 from src.query_processor import QueryProcessor
 from src.hybrid_retriever import HybridRetriever
 from src.result_composer import ResultComposer
 from src.answer_generator import AnswerGenerator
 from src.graph_analytics import GraphAnalytics
+from src.tracing import span
+from src.request_coalescer import normalize_question
+
+
+def _submit(pool: ThreadPoolExecutor, fn, *args, context: Optional[contextvars.Context] = None, **kwargs) -> Future:
+    """Submit fn to pool in a copy of `context` (default: the current one), so tracing spans follow"""
+    context = contextvars.copy_context() if context is None else context.copy()
+    return pool.submit(context.run, fn, *args, **kwargs)
 
 
 class QASystem:
@@ -35,7 +59,12 @@ class QASystem:
         embedding_path: str = "data/embeddings",
         bm25_path: str = "data/bm25",
         graph_path: str = "data/knowledge_graph.pkl",
-        groq_api_key: str = None
+        groq_api_key: str = None,
+        context_token_budget: Optional[int] = 1500,
+        shared_from: Optional["QASystem"] = None,
+        preloaded: Optional[Dict] = None,
+        shared_memory: bool = False,
+        qdrant_search=None
     ):
         """
         Initialize QA system with all components
@@ -45,37 +74,95 @@ class QASystem:
             bm25_path: Path to BM25 index
             graph_path: Path to knowledge graph
             groq_api_key: Groq API key for LLM
+            context_token_budget: Token budget for LLM context (None = no packing)
+            shared_from: Existing system whose index-independent components
+                         (Qdrant client + embedding model, answer generator)
+                         are reused; only BM25, the graph and what depends on
+                         them are loaded fresh (see reload_indexes)
+            preloaded: Indexes loaded before workers forked (shared_index.preload)
+            shared_memory: Memory-map BM25 from its shared export (multi-worker)
+            qdrant_search: Vector backend to use instead of connecting to Qdrant
+                           (e.g. LocalVectorSearch for offline benchmarks)
         """
+        self.embedding_path = embedding_path
+        self.bm25_path = bm25_path
+        self.graph_path = graph_path
+        self.groq_api_key = groq_api_key
+        self.context_token_budget = context_token_budget
+        self.shared_memory = shared_memory
+
         print("\n🚀 Initializing QA System...")
         print("="*80)
+        start = time.perf_counter()
 
-        # Initialize retriever (loads all indexes)
+        # Initialize retriever (loads all indexes, in parallel)
         self.retriever = HybridRetriever(
             embedding_path=embedding_path,
             bm25_path=bm25_path,
-            graph_path=graph_path
+            graph_path=graph_path,
+            qdrant_search=shared_from.retriever.qdrant_search if shared_from else qdrant_search,
+            preloaded=preloaded,
+            shared_memory=shared_memory
         )
+        self.load_times: Dict[str, float] = dict(self.retriever.load_times)
 
         # Initialize query processor
         print("\n  5/5 Initializing query processor...")
-        self.processor = QueryProcessor(self.retriever.name_resolver)
+        step = time.perf_counter()
+        self.processor = QueryProcessor(self.retriever.name_resolver, api_key=groq_api_key)
+        self.load_times['query_processor'] = round(time.perf_counter() - step, 3)
 
         # Initialize result composer
         self.composer = ResultComposer()
 
         # Initialize answer generator
-        self.generator = AnswerGenerator(api_key=groq_api_key)
+        step = time.perf_counter()
+        self.generator = shared_from.generator if shared_from else AnswerGenerator(api_key=groq_api_key)
+        self.load_times['answer_generator'] = round(time.perf_counter() - step, 3)
 
-        # Initialize graph analytics pipeline
-        print("\n  6/6 Initializing graph analytics pipeline...")
-        self.analytics = GraphAnalytics(
-            knowledge_graph=self.retriever.knowledge_graph,
-            api_key=groq_api_key
-        )
+        # Graph analytics pipeline is only needed by ANALYTICS queries: built on first use
+        self._analytics: Optional[GraphAnalytics] = None
+        self._analytics_lock = threading.Lock()
 
-        print("\n✅ QA System ready!")
+        self.load_seconds = round(time.perf_counter() - start, 3)
+        print(f"\n✅ QA System ready! ({self.load_seconds:.2f}s)")
         print("="*80)
 
+    @property
+    def analytics(self) -> GraphAnalytics:
+        """Graph analytics pipeline (created on the first ANALYTICS query)"""
+        if self._analytics is None:
+            with self._analytics_lock:
+                if self._analytics is None:
+                    print("\n  Initializing graph analytics pipeline...")
+                    start = time.perf_counter()
+                    self._analytics = GraphAnalytics(
+                        knowledge_graph=self.retriever.knowledge_graph,
+                        api_key=self.groq_api_key
+                    )
+                    self.load_times['graph_analytics'] = round(time.perf_counter() - start, 3)
+        return self._analytics
+
+    def reload_indexes(self) -> "QASystem":
+        """
+        Build a new system on the current index files
+
+        The Qdrant client, embedding model and answer generator are shared
+        with this system; this system keeps working until it is dropped.
+
+        Returns:
+            New QASystem
+        """
+        return QASystem(
+            embedding_path=self.embedding_path,
+            bm25_path=self.bm25_path,
+            graph_path=self.graph_path,
+            groq_api_key=self.groq_api_key,
+            context_token_budget=self.context_token_budget,
+            shared_from=self,
+            shared_memory=self.shared_memory
+        )
+
     def answer(
         self,
         query: str,
@@ -113,7 +200,9 @@ class QASystem:
             print("STEP 1: Query Processing")
             print("-"*80)
 
-        query_plans = self.processor.process(query, verbose=verbose)
+        with span("query_processor.process") as stage:
+            query_plans = self.processor.process(query, verbose=verbose)
+            stage.set_attribute("sub_queries", len(query_plans))
 
         # ========== ROUTING: Check if ANALYTICS or LOOKUP ==========
         route = query_plans[0].get('route', 'LOOKUP')
@@ -124,17 +213,7 @@ class QASystem:
                 print("\n🔀 ROUTE: ANALYTICS → Using Graph Analytics Pipeline")
                 print("-"*80)
 
-            analytics_result = self.analytics.analyze(query, verbose=verbose)
-
-            # Format as standard result
-            return {
-                'query': query,
-                'answer': analytics_result['answer'],
-                'sources': [],  # Analytics doesn't return message sources
-                'query_plans': query_plans,
-                'analytics_data': analytics_result['aggregated_data'],
-                'route': 'ANALYTICS'
-            }
+            return self._analytics_answer(query, query_plans, verbose=verbose)
 
         # ========== STEP 2: HYBRID RETRIEVAL (LOOKUP Route) ==========
         if verbose:
@@ -153,54 +232,240 @@ class QASystem:
                       f"graph={plan['weights']['graph']}")
 
             # Retrieve with dynamic weights AND query type for conditional diversity
-            results = self.retriever.search(
-                query=plan['query'],
-                top_k=top_k,
-                weights=plan['weights'],
-                query_type=plan['type'],  # Pass query type for conditional diversity
-                verbose=False  # Suppress retriever verbose to avoid clutter
-            )
+            with span("retriever.search", sub_query=i, query_type=plan['type']) as stage:
+                results = self.retriever.search(
+                    query=plan['query'],
+                    top_k=top_k,
+                    weights=plan['weights'],
+                    query_type=plan['type'],  # Pass query type for conditional diversity
+                    verbose=False  # Suppress retriever verbose to avoid clutter
+                )
+                stage.set_attribute("results", len(results))
 
             all_results.append(results)
 
             if verbose:
                 print(f"    Retrieved: {len(results)} results")
 
+        result = self._lookup_answer(query, query_plans, all_results, top_k, temperature, verbose=verbose)
+
+        if verbose:
+            print(f"\n{'='*80}")
+            print("PIPELINE COMPLETE")
+            print(f"{'='*80}\n")
+
+        return result
+
+    def answer_batch(
+        self,
+        queries: List[str],
+        top_k: int = 20,
+        temperature: float = 0.3,
+        retrieval_workers: int = 8,
+        llm_concurrency: int = 4,
+        stats: Optional[Dict] = None
+    ) -> Iterator[Dict]:
+        """
+        Answer many questions, yielding each one as soon as it is answered
+
+        Work shared across the batch:
+        - Equivalent questions (normalize_question) are answered once
+        - Routing is one LLM call per chunk of questions; decomposition of
+          the LOOKUP questions runs concurrently
+        - Identical sub-queries are retrieved once; all of them are embedded
+          in one vector-backend call, then retrieved on `retrieval_workers`
+          threads
+        - A question generates its answer as soon as its own sub-queries are
+          retrieved, at most `llm_concurrency` at a time (ANALYTICS questions
+          share the same slots); every call still goes through the shared
+          LLM gateway limits
+
+        Args:
+            queries: User questions
+            top_k: Number of context messages to retrieve per sub-query
+            temperature: LLM temperature for answer generation
+            retrieval_workers: Threads for decomposition and retrieval
+            llm_concurrency: Questions generating answers at the same time
+            stats: Optional dict filled with batch counters (questions,
+                   unique_questions, routes, sub_queries, unique_sub_queries,
+                   batch_embedded)
+
+        Yields:
+            {'indices': [positions in queries], 'query': str, 'result': answer() dict}
+            or {'indices', 'query', 'error': str}, in completion order
+        """
+        stats = stats if stats is not None else {}
+        groups: Dict[str, Dict] = {}
+        for i, query in enumerate(queries):
+            groups.setdefault(normalize_question(query), {'query': query, 'indices': []})['indices'].append(i)
+        items = list(groups.values())
+        stats.update(questions=len(queries), unique_questions=len(items))
+
+        completed: "queue.Queue[Dict]" = queue.Queue()
+        context = contextvars.copy_context()  # the caller's trace, for work started from callbacks
+
+        def finish(item: Dict, result: Optional[Dict] = None, error: Optional[Exception] = None):
+            entry = {'indices': item['indices'], 'query': item['query']}
+            if error is not None:
+                entry['error'] = str(error) or type(error).__name__
+            else:
+                entry['result'] = result
+            completed.put(entry)
+
+        retrieval_pool = ThreadPoolExecutor(max_workers=retrieval_workers, thread_name_prefix="batch-retrieval")
+        answer_pool = ThreadPoolExecutor(max_workers=llm_concurrency, thread_name_prefix="batch-answer")
+        sub_queries: Dict[tuple, Dict] = {}
+        lock = threading.Lock()
+
+        def analytics(item: Dict):
+            try:
+                finish(item, self._analytics_answer(item['query'], item['plans']))
+            except Exception as e:
+                finish(item, error=e)
+
+        def lookup(item: Dict):
+            try:
+                all_results = [sub_queries[key]['future'].result() for key in item['keys']]
+                result = self._lookup_answer(item['query'], item['plans'], all_results, top_k, temperature)
+            except Exception as e:
+                finish(item, error=e)
+                return
+            finish(item, result)
+
+        def retrieve(plan: Dict, query_vector) -> List:
+            with span("retriever.search", query_type=plan['type'], batched=True) as stage:
+                results = self.retriever.search(
+                    query=plan['query'],
+                    top_k=top_k,
+                    weights=plan['weights'],
+                    query_type=plan['type'],
+                    verbose=False,
+                    query_vector=query_vector
+                )
+                stage.set_attribute("results", len(results))
+            return results
+
+        def retrieved(key: tuple, _future: Future):
+            # Runs in the retrieval thread: start each question whose last sub-query this was
+            for item in sub_queries[key]['items']:
+                with lock:
+                    item['waiting'] -= 1
+                    ready = item['waiting'] == 0
+                if ready:
+                    try:
+                        _submit(answer_pool, lookup, item, context=context)
+                    except RuntimeError as e:  # batch abandoned (pools shut down)
+                        finish(item, error=e)
+
+        try:
+            # ========== STEP 1: PLANNING (batched routing) ==========
+            with span("query_processor.route_queries", questions=len(items)) as stage:
+                routes = self.processor.route_queries([item['query'] for item in items])
+                stage.set_attribute("analytics", routes.count("ANALYTICS"))
+            stats['routes'] = {route: routes.count(route) for route in ("LOOKUP", "ANALYTICS")}
+
+            with span("query_processor.process", questions=len(items)):
+                planned = [_submit(retrieval_pool, self.processor.process, item['query'], route=route)
+                           for item, route in zip(items, routes)]
+                lookups = []
+                for item, future in zip(items, planned):
+                    try:
+                        item['plans'] = future.result()
+                    except Exception as e:
+                        finish(item, error=e)
+                        continue
+                    if item['plans'][0].get('route', 'LOOKUP') == "ANALYTICS":
+                        _submit(answer_pool, analytics, item)
+                    else:
+                        lookups.append(item)
+
+            # ========== STEP 2: SUB-QUERY DEDUPLICATION ==========
+            for item in lookups:
+                item['keys'] = []
+                for plan in item['plans']:
+                    key = (plan['query'], plan['type'], tuple(sorted(plan['weights'].items())))
+                    entry = sub_queries.setdefault(key, {'plan': plan, 'items': []})
+                    if key not in item['keys']:
+                        entry['items'].append(item)
+                    item['keys'].append(key)
+                item['waiting'] = len(set(item['keys']))
+            stats['sub_queries'] = sum(len(item['keys']) for item in lookups)
+            stats['unique_sub_queries'] = len(sub_queries)
+
+            # ========== STEP 3: BATCH EMBEDDING + CONCURRENT RETRIEVAL ==========
+            with span("retriever.embed_queries", sub_queries=len(sub_queries)) as stage:
+                vectors = self.retriever.embed_queries([key[0] for key in sub_queries])
+                stage.set_attribute("batched", vectors is not None)
+            stats['batch_embedded'] = vectors is not None
+
+            for n, (key, entry) in enumerate(sub_queries.items()):
+                entry['future'] = _submit(retrieval_pool, retrieve, entry['plan'],
+                                          vectors[n] if vectors is not None else None)
+                entry['future'].add_done_callback(lambda future, key=key: retrieved(key, future))
+
+            # ========== STEP 4: ANSWERS, AS THEY COMPLETE ==========
+            for _ in items:
+                yield completed.get()
+        finally:
+            retrieval_pool.shutdown(wait=False, cancel_futures=True)
+            answer_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _analytics_answer(self, query: str, query_plans: List[Dict], verbose: bool = False) -> Dict:
+        """ANALYTICS route: graph analytics pipeline, formatted as a standard result"""
+        with span("graph_analytics.analyze"):
+            analytics_result = self.analytics.analyze(query, verbose=verbose)
+
+        return {
+            'query': query,
+            'answer': analytics_result['answer'],
+            'sources': [],  # Analytics doesn't return message sources
+            'query_plans': query_plans,
+            'analytics_data': analytics_result['aggregated_data'],
+            'route': 'ANALYTICS'
+        }
+
+    def _lookup_answer(
+        self,
+        query: str,
+        query_plans: List[Dict],
+        all_results: List[List],
+        top_k: int,
+        temperature: float,
+        verbose: bool = False
+    ) -> Dict:
+        """LOOKUP route after retrieval: compose the per-plan results and generate the answer"""
         # ========== STEP 3: RESULT COMPOSITION ==========
         if verbose:
             print("\nSTEP 3: Result Composition")
             print("-"*80)
 
-        composed_results = self.composer.compose(
-            all_results,
-            strategy="auto",
-            max_results=top_k,
-            verbose=verbose
-        )
+        with span("result_composer.compose"):
+            composed_results = self.composer.compose(
+                all_results,
+                strategy="auto",
+                max_results=top_k,
+                verbose=verbose
+            )
 
         # ========== STEP 4: ANSWER GENERATION ==========
         if verbose:
             print("\nSTEP 4: Answer Generation")
             print("-"*80)
 
-        result = self.generator.generate_with_sources(
-            query=query,
-            composed_results=composed_results,
-            temperature=temperature,
-            verbose=verbose
-        )
+        with span("answer_generator.generate_with_sources"):
+            result = self.generator.generate_with_sources(
+                query=query,
+                composed_results=composed_results,
+                temperature=temperature,
+                verbose=verbose,
+                context_token_budget=self.context_token_budget
+            )
 
         # Add pipeline metadata
         result['query'] = query
         result['query_plans'] = query_plans
         result['num_sources'] = len(composed_results)
         result['route'] = 'LOOKUP'
-
-        if verbose:
-            print(f"\n{'='*80}")
-            print("PIPELINE COMPLETE")
-            print(f"{'='*80}\n")
-
         return result
 
 
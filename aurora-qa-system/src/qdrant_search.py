@@ -22,7 +22,7 @@ Usage:
 import os
 from typing import List, Optional, Tuple, Dict
 from qdrant_client import QdrantClient
-from qdrant_client.models import Filter, FieldCondition, MatchValue, MatchAny, Range
+from qdrant_client.models import Filter, FieldCondition, MatchValue, MatchAny, Range, PointStruct
 from fastembed import TextEmbedding
 
 
@@ -131,7 +131,8 @@ class QdrantSearch:
         top_k: int = 10,
         date_range: Optional[Tuple[str, str]] = None,
         user_id: Optional[str] = None,
-        verbose: bool = False
+        verbose: bool = False,
+        query_vector: Optional[List[float]] = None
     ) -> List[Dict]:
         """
         Search with optional temporal and user filtering
@@ -142,6 +143,7 @@ class QdrantSearch:
             date_range: Optional (start, end) date range
             user_id: Optional user ID filter
             verbose: Print debug info
+            query_vector: Embedding of `query` from embed_queries (skips embedding)
 
         Returns:
             List of results with metadata
@@ -159,8 +161,8 @@ class QdrantSearch:
             ]
         """
         # Embed query using FastEmbed (ONNX - lightweight!)
-        query_embedding = list(self.embedding_model.embed([query]))[0]
-        query_vector = query_embedding.tolist()
+        if query_vector is None:
+            query_vector = self.embed_queries([query])[0]
 
         # Build filter
         filter_condition = self._build_filter(date_range=date_range, user_id=user_id)
@@ -192,6 +194,59 @@ class QdrantSearch:
 
         return formatted
 
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embed several search queries in one model call
+
+        Args:
+            queries: Search queries
+
+        Returns:
+            One vector per query (for search(query_vector=...))
+        """
+        return [vector.tolist() for vector in self.embedding_model.embed(queries)]
+
+    def upsert_messages(self, messages: List[Dict], point_ids: List[int], batch_size: int = 50) -> int:
+        """
+        Embed messages and upsert them (payload as in scripts/index_to_qdrant.py)
+
+        Existing point ids are overwritten in place, so re-running is safe.
+
+        Args:
+            messages: Message dicts (with normalized_dates)
+            point_ids: Point id per message (its BM25 position)
+            batch_size: Points per upsert request
+
+        Returns:
+            Number of points upserted
+        """
+        texts = [f"passage: {msg['message']}" for msg in messages]
+        vectors = list(self.embedding_model.embed(texts))
+
+        points = [
+            PointStruct(
+                id=point_id,
+                vector=vector.tolist(),
+                payload={
+                    "message": msg['message'],
+                    "user_id": msg['user_id'],
+                    "user_name": msg['user_name'],
+                    "timestamp": msg['timestamp'],
+                    "normalized_dates": msg.get('normalized_dates', [])
+                }
+            )
+            for msg, point_id, vector in zip(messages, point_ids, vectors)
+        ]
+
+        for i in range(0, len(points), batch_size):
+            self.client.upsert(
+                collection_name=self.collection_name,
+                points=points[i:i + batch_size],
+                wait=True
+            )
+
+        return len(points)
+
 
 def test_qdrant_search():
     """Test Qdrant search with filters"""
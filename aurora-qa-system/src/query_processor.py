@@ -4,6 +4,8 @@ Query Processor Module
 Handles query understanding, decomposition, and dynamic weight assignment.
 
 Architecture:
+- Routing: LOOKUP vs ANALYTICS (one LLM call per query; route_queries
+  classifies a whole batch of questions per call)
 - Query decomposition: Multi-entity → single-entity sub-queries (LLM-based + rule-based fallback)
 - Query classification: Detect query type (entity-specific, conceptual, etc.)
 - Dynamic weighting: Assign optimal weights per query type
@@ -14,9 +16,49 @@ from typing import List, Dict, Optional
 import re
 import os
 import json
-from groq import Groq
+from src.llm_gateway import get_gateway
 # from mistralai import Mistral  # SWITCHED TO GROQ FOR BETTER RATE LIMITS
 from src.name_resolver import NameResolver
+from src.tracing import span
+
+
+# Routing instructions shared by the single and batched router prompts
+ROUTING_GUIDE = """You are a query router for a concierge QA system. Classify the query as LOOKUP or ANALYTICS.
+
+**LOOKUP** - Filter and retrieve messages by specific criteria:
+- Asks about specific people (contains names like Layla, Vikram, etc.)
+- Filters by specific dates, locations, or attributes
+- Can be answered by retrieving and reading relevant messages
+- Even if query says "which clients", if it's filtering by ONE specific thing (date/location/attribute), it's LOOKUP
+Examples:
+  ✓ "What is Layla's phone number?"
+  ✓ "Which clients have plans for January 2025?" (filter by specific date)
+  ✓ "Which clients visited Paris?" (filter by specific location)
+  ✓ "Are there clients who visited both Paris and Tokyo?" (filter by two locations)
+  ✓ "Compare Layla and Lily's preferences" (specific named people)
+  ✓ "Which clients requested private museum access?" (filter by specific service)
+  ✓ "Which clients have billing issues?" (filter by specific issue type)
+  ✓ "Vikram's Tokyo plans" (specific person)
+
+**ANALYTICS** - Find patterns through aggregation, grouping, or ranking:
+- Requires counting, grouping, finding commonalities, or ranking
+- Keywords: "SAME", "MOST", "SIMILAR", "COMMON", "POPULAR", "how many", "count"
+- Cannot be answered by simple retrieval - needs to process ALL data and aggregate
+Examples:
+  ✓ "Which clients requested the SAME restaurants?" (group by restaurant, find overlaps)
+  ✓ "Who has the MOST restaurant bookings?" (count per user, rank)
+  ✓ "What are the MOST POPULAR destinations?" (count frequency, rank)
+  ✓ "What services do MULTIPLE clients prefer?" (count per service)
+  ✓ "Find clients with SIMILAR preferences" (compare across all)
+  ✓ "Which hotel did EVERYONE book?" (aggregate all bookings)
+
+**Key Distinction:**
+- LOOKUP = Filter/retrieve by criteria → "Find all messages matching X"
+- ANALYTICS = Aggregate/group/rank → "Find patterns/commonalities across all data"
+
+**Critical Rule:**
+- If query contains SAME/MOST/SIMILAR/POPULAR/COUNT → ANALYTICS
+- Otherwise, even if "which clients" → LOOKUP"""
 
 
 class QueryProcessor:
@@ -51,7 +93,7 @@ class QueryProcessor:
             try:
                 api_key = api_key or os.environ.get('GROQ_API_KEY')
                 if api_key:
-                    self.llm_client = Groq(api_key=api_key)
+                    self.llm_client = get_gateway(api_key).client('query_processor')
                 else:
                     print("⚠️  Warning: GROQ_API_KEY not found, falling back to rule-based processing")
                     self.use_llm = False
@@ -114,58 +156,13 @@ class QueryProcessor:
 
         # PRE-FILTER RULES: Handle edge cases before LLM
         # These patterns work better with LOOKUP than ANALYTICS
-        query_lower = query.lower()
-
-        # "What types..." queries - better with LOOKUP (LLM extracts categories)
-        # ANALYTICS has limited entity database, misses diverse categories
-        if any(pattern in query_lower for pattern in [
-            "what types of",
-            "what type of",
-            "which types of",
-            "what kinds of",
-            "what kind of"
-        ]):
+        if self._is_category_query(query):
             if verbose:
                 print("🔀 Router: 'What types...' pattern detected → LOOKUP")
             return "LOOKUP"
 
         # The corrected routing prompt
-        prompt = f"""You are a query router for a concierge QA system. Classify the query as LOOKUP or ANALYTICS.
-
-**LOOKUP** - Filter and retrieve messages by specific criteria:
-- Asks about specific people (contains names like Layla, Vikram, etc.)
-- Filters by specific dates, locations, or attributes
-- Can be answered by retrieving and reading relevant messages
-- Even if query says "which clients", if it's filtering by ONE specific thing (date/location/attribute), it's LOOKUP
-Examples:
-  ✓ "What is Layla's phone number?"
-  ✓ "Which clients have plans for January 2025?" (filter by specific date)
-  ✓ "Which clients visited Paris?" (filter by specific location)
-  ✓ "Are there clients who visited both Paris and Tokyo?" (filter by two locations)
-  ✓ "Compare Layla and Lily's preferences" (specific named people)
-  ✓ "Which clients requested private museum access?" (filter by specific service)
-  ✓ "Which clients have billing issues?" (filter by specific issue type)
-  ✓ "Vikram's Tokyo plans" (specific person)
-
-**ANALYTICS** - Find patterns through aggregation, grouping, or ranking:
-- Requires counting, grouping, finding commonalities, or ranking
-- Keywords: "SAME", "MOST", "SIMILAR", "COMMON", "POPULAR", "how many", "count"
-- Cannot be answered by simple retrieval - needs to process ALL data and aggregate
-Examples:
-  ✓ "Which clients requested the SAME restaurants?" (group by restaurant, find overlaps)
-  ✓ "Who has the MOST restaurant bookings?" (count per user, rank)
-  ✓ "What are the MOST POPULAR destinations?" (count frequency, rank)
-  ✓ "What services do MULTIPLE clients prefer?" (count per service)
-  ✓ "Find clients with SIMILAR preferences" (compare across all)
-  ✓ "Which hotel did EVERYONE book?" (aggregate all bookings)
-
-**Key Distinction:**
-- LOOKUP = Filter/retrieve by criteria → "Find all messages matching X"
-- ANALYTICS = Aggregate/group/rank → "Find patterns/commonalities across all data"
-
-**Critical Rule:**
-- If query contains SAME/MOST/SIMILAR/POPULAR/COUNT → ANALYTICS
-- Otherwise, even if "which clients" → LOOKUP
+        prompt = f"""{ROUTING_GUIDE}
 
 User Query: "{query}"
 
@@ -205,13 +202,77 @@ Classification:"""
                 print(f"⚠️  Router: LLM error ({str(e)[:50]}...), defaulting to LOOKUP")
             return "LOOKUP"
 
-    def process(self, query: str, verbose: bool = False) -> List[Dict]:
+    def route_queries(self, queries: List[str], verbose: bool = False, chunk_size: int = 20) -> List[str]:
+        """
+        Route many queries with one LLM call per chunk (batch endpoint)
+
+        Same rules as route_query; a query the batched answer does not
+        classify is routed on its own.
+
+        Args:
+            queries: User query strings
+            verbose: Print routing decisions
+            chunk_size: Queries per routing call
+
+        Returns:
+            "LOOKUP" or "ANALYTICS" per query, in order
+        """
+        if not self.use_llm or not self.llm_client:
+            return ["LOOKUP"] * len(queries)
+
+        routes: List[Optional[str]] = [
+            "LOOKUP" if self._is_category_query(query) else None for query in queries
+        ]
+        pending = [i for i, route in enumerate(routes) if route is None]
+
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            if len(chunk) == 1:
+                continue  # single query: route_query below
+
+            listed = "\n".join(f'{n}. "{queries[i]}"' for n, i in enumerate(chunk, 1))
+            prompt = f"""{ROUTING_GUIDE}
+
+User Queries:
+{listed}
+
+Classify each query. Respond with one line per query in the form "<number>: LOOKUP" or "<number>: ANALYTICS", nothing else.
+
+Classifications:"""
+
+            try:
+                response = self.llm_client.chat.completions.create(
+                    model="llama-3.3-70b-versatile",
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.1,
+                    max_tokens=8 * len(chunk) + 10
+                )
+                text = response.choices[0].message.content.upper()
+                for n, label in re.findall(r'^\s*(\d+)\s*[:.)-]\s*\**\s*(LOOKUP|ANALYTICS)', text, re.MULTILINE):
+                    if 1 <= int(n) <= len(chunk):
+                        routes[chunk[int(n) - 1]] = label
+            except Exception as e:
+                if verbose:
+                    print(f"⚠️  Router: batched call failed ({str(e)[:50]}...), routing one by one")
+
+        for i, route in enumerate(routes):
+            if route is None:
+                routes[i] = self.route_query(queries[i], verbose=verbose)
+
+        if verbose:
+            print(f"🔀 Router: {len(queries)} queries → "
+                  f"{routes.count('LOOKUP')} LOOKUP, {routes.count('ANALYTICS')} ANALYTICS")
+
+        return routes
+
+    def process(self, query: str, verbose: bool = False, route: Optional[str] = None) -> List[Dict]:
         """
         Process query: route, decompose if needed, classify, assign weights
 
         Args:
             query: User query string
             verbose: Print processing details
+            route: Route decided beforehand (e.g. by route_queries); skips routing
 
         Returns:
             List of query plans:
@@ -233,7 +294,10 @@ Classification:"""
             print(f"Original Query: '{query}'")
 
         # Step 1: Route query to appropriate pipeline
-        route = self.route_query(query, verbose=verbose)
+        if route is None:
+            with span("query_processor.route") as stage:
+                route = self.route_query(query, verbose=verbose)
+                stage.set_attribute("route", route)
 
         # Step 2: If ANALYTICS, skip decomposition (analytics handles full query)
         if route == "ANALYTICS":
@@ -248,9 +312,13 @@ Classification:"""
             sub_queries = [query]
         # Step 4: Decompose if multi-entity comparison (LLM-based if available)
         elif self.use_llm and self.llm_client:
-            sub_queries = self._decompose_llm(query, verbose=verbose)
+            with span("query_processor.decompose", method="llm") as stage:
+                sub_queries = self._decompose_llm(query, verbose=verbose)
+                stage.set_attribute("sub_queries", len(sub_queries))
         else:
-            sub_queries = self._decompose(query, verbose=verbose)
+            with span("query_processor.decompose", method="rules") as stage:
+                sub_queries = self._decompose(query, verbose=verbose)
+                stage.set_attribute("sub_queries", len(sub_queries))
 
         # Step 5: Classify each sub-query and assign weights
         plans = []
@@ -280,6 +348,23 @@ Classification:"""
 
         return plans
 
+    def _is_category_query(self, query: str) -> bool:
+        """
+        Detect "What types of..." queries
+
+        These route to LOOKUP without asking the LLM: the answer generator
+        extracts the categories, while ANALYTICS only knows the entity
+        database and misses diverse categories.
+        """
+        query_lower = query.lower()
+        return any(pattern in query_lower for pattern in [
+            "what types of",
+            "what type of",
+            "which types of",
+            "what kinds of",
+            "what kind of"
+        ])
+
     def _is_aggregation_query(self, query: str) -> bool:
         """
         Detect if query is an aggregation query (cross-entity analysis)
@@ -0,0 +1,144 @@
+"""
+Request Coalescer Module
+
+Single-flight coalescing of identical concurrent questions in the API, plus
+a short-lived result window, so a question broadcast to the whole concierge
+team runs the retrieval + LLM pipeline once.
+
+Architecture:
+- Key = (index generation, normalised question): case, repeated whitespace
+  and trailing punctuation are ignored ("Who is going to Paris?" ==
+  "who is going to  paris"); a hot-reload starts a new key space
+- The first request for a key starts the computation as its own task;
+  requests with the same key arriving while it runs await that task
+  instead of starting another. The task is shielded, so a disconnecting
+  client does not cancel the answer the others are waiting for
+- Successful results stay in a small LRU window for `window` seconds after
+  completion; errors are shared by the waiters but never kept
+- Lookups are counted in CACHE_LOOKUPS (cache="ask_coalescing"): hit =
+  answered by another request's computation (in flight or window)
+
+Usage:
+    coalescer = RequestCoalescer(window=5.0)
+    result, source = await coalescer.run(coalescer.key(question, generation.generation), compute)
+    # source: "computed", "in_flight" or "window"
+"""
+import re
+import time
+import asyncio
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+from src.metrics import CACHE_LOOKUPS
+
+
+# Trailing characters that do not change a question
+_TRAILING = " ?!.。？！"
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalise a question for coalescing
+
+    Args:
+        question: Question as submitted
+
+    Returns:
+        NFKC-normalised, case-folded text with collapsed whitespace and
+        without trailing punctuation
+    """
+    text = unicodedata.normalize('NFKC', question).casefold()
+    return re.sub(r'\s+', ' ', text).strip().rstrip(_TRAILING)
+
+
+class RequestCoalescer:
+    """
+    Single-flight execution with a short result window (asyncio)
+    """
+
+    def __init__(self, window: float = 5.0, max_entries: int = 1024,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize coalescer
+
+        Args:
+            window: Seconds a finished result keeps answering the same key
+                    (0 = coalesce in-flight requests only)
+            max_entries: Results kept in the window (least recently used evicted)
+            clock: Monotonic clock (tests)
+        """
+        self.window = window
+        self.max_entries = max_entries
+        self.clock = clock
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._results: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.stats = {'computed': 0, 'in_flight': 0, 'window': 0, 'errors': 0}
+
+    @staticmethod
+    def key(question: str, generation: Any = None) -> Tuple:
+        """Coalescing key for a question on one index generation"""
+        return (generation, normalize_question(question))
+
+    def _cached(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._results.get(key)
+        if entry is None:
+            return False, None
+        expires, result = entry
+        if self.clock() >= expires:
+            del self._results[key]
+            return False, None
+        self._results.move_to_end(key)
+        return True, result
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if task.cancelled() or task.exception() is not None:
+            self.stats['errors'] += 1
+            return
+        if self.window > 0:
+            self._results[key] = (self.clock() + self.window, task.result())
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+    async def run(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, str]:
+        """
+        Result for `key`, computing it at most once across concurrent callers
+
+        Args:
+            key: Coalescing key (see key())
+            compute: Coroutine function producing the result
+
+        Returns:
+            (result, source) with source "computed", "in_flight" or "window"
+        """
+        hit, result = self._cached(key)
+        if hit:
+            self.stats['window'] += 1
+            CACHE_LOOKUPS.inc(cache="ask_coalescing", result="hit")
+            return result, "window"
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            source = "in_flight"
+            self.stats['in_flight'] += 1
+            CACHE_LOOKUPS.inc(cache="ask_coalescing", result="hit")
+        else:
+            source = "computed"
+            self.stats['computed'] += 1
+            CACHE_LOOKUPS.inc(cache="ask_coalescing", result="miss")
+            task = asyncio.ensure_future(compute())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+
+        return await asyncio.shield(task), source
+
+    def info(self) -> Dict:
+        """Counters and sizes (for /health)"""
+        return {**self.stats, 'in_flight_keys': len(self._in_flight),
+                'window_entries': len(self._results), 'window_seconds': self.window}
+
+    def clear(self):
+        """Forget finished results (in-flight computations keep running)"""
+        self._results.clear()
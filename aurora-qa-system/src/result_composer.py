@@ -7,13 +7,34 @@ Architecture:
 - Interleaves results from multiple sub-queries (for balanced comparison context)
 - Deduplicates messages by ID
 - Formats context for LLM consumption
+- Packs context into a token budget (near-duplicate removal, sentence
+  trimming, score-ordered fill)
 
 Use Cases:
 - Single query: Return results as-is
 - Multi-entity comparison: Interleave for balanced representation
 - Aggregation: Merge and deduplicate
 """
+import re
+import zlib
+import numpy as np
 from typing import List, Tuple, Dict
+from src.token_budget import estimate_tokens
+from src.metrics import CACHE_LOOKUPS
+
+
+# MinHash settings for near-duplicate detection
+_MINHASH_PERMUTATIONS = 64
+_MINHASH_PRIME = (1 << 31) - 1
+_MINHASH_RNG = np.random.RandomState(42)
+_MINHASH_A = _MINHASH_RNG.randint(1, _MINHASH_PRIME, size=_MINHASH_PERMUTATIONS).astype(np.uint64)
+_MINHASH_B = _MINHASH_RNG.randint(0, _MINHASH_PRIME, size=_MINHASH_PERMUTATIONS).astype(np.uint64)
+
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+_QUERY_STOPWORDS = {
+    'the', 'and', 'for', 'what', 'which', 'who', 'how', 'are', 'was', 'were',
+    'has', 'have', 'did', 'does', 'any', 'about', 'with', 'from', 'their', 'his', 'her'
+}
 
 
 class ResultComposer:
@@ -26,6 +47,13 @@ class ResultComposer:
     - PASSTHROUGH: Single query, return as-is
     """
 
+    # Cap on cached MinHash signatures (cleared when exceeded)
+    MAX_SIGNATURE_CACHE = 50000
+
+    def __init__(self):
+        """Initialize composer with an empty MinHash signature cache"""
+        self._signatures: Dict[Tuple[str, int], np.ndarray] = {}
+
     def compose(
         self,
         results_list: List[List[Tuple[Dict, float]]],
@@ -204,6 +232,149 @@ class ResultComposer:
         return "\n\n".join(context_parts)
 
 
+    def _signature(self, msg: Dict) -> np.ndarray:
+        """
+        MinHash signature of a message (word-bigram shingles)
+
+        Cached by (ID, text hash), so an edited message under the same ID
+        gets a fresh signature.
+
+        Args:
+            msg: Message dict
+
+        Returns:
+            Array of _MINHASH_PERMUTATIONS minimum hash values
+        """
+        key = (msg.get('id') or '', zlib.crc32(msg['message'].encode('utf-8')))
+        signature = self._signatures.get(key)
+        if signature is not None:
+            CACHE_LOOKUPS.inc(cache="minhash_signatures", result="hit")
+            return signature
+        CACHE_LOOKUPS.inc(cache="minhash_signatures", result="miss")
+
+        words = re.findall(r'\w+', msg['message'].lower())
+        shingles = {' '.join(words[i:i + 2]) for i in range(max(len(words) - 1, 1))} or {''}
+        hashes = np.array([zlib.crc32(sh.encode('utf-8')) for sh in shingles], dtype=np.uint64)
+        signature = ((np.outer(_MINHASH_A, hashes) + _MINHASH_B[:, None]) % _MINHASH_PRIME).min(axis=1)
+
+        if len(self._signatures) >= self.MAX_SIGNATURE_CACHE:
+            self._signatures.clear()
+        self._signatures[key] = signature
+        return signature
+
+    def _trim_to_query(self, message: str, query_terms: set, max_tokens: int) -> str:
+        """
+        Shorten a long message to its sentences that match the query
+
+        Args:
+            message: Message text
+            query_terms: Lowercase query words
+            max_tokens: Token limit for the trimmed message
+
+        Returns:
+            Message (unchanged if short enough), else the best-matching
+            sentences in original order, joined with " ... "
+        """
+        if estimate_tokens(message) <= max_tokens:
+            return message
+
+        sentences = [s for s in _SENTENCE_SPLIT.split(message) if s.strip()]
+        overlap = [len(query_terms & set(re.findall(r'\w+', s.lower()))) for s in sentences]
+
+        # Best-matching sentences first (ties: earlier sentence), keep what fits
+        chosen, used = [], 0
+        for i in sorted(range(len(sentences)), key=lambda i: (-overlap[i], i)):
+            cost = estimate_tokens(sentences[i])
+            if chosen and used + cost > max_tokens:
+                continue
+            chosen.append(i)
+            used += cost
+
+        trimmed = ' ... '.join(sentences[i] for i in sorted(chosen))
+        # A single overlong sentence: hard cut on words
+        while estimate_tokens(trimmed) > max_tokens and ' ' in trimmed:
+            trimmed = trimmed.rsplit(' ', 1)[0]
+        return trimmed + (' ...' if trimmed != message else '')
+
+    def pack_context(
+        self,
+        composed_results: List[Tuple[Dict, float]],
+        query: str,
+        token_budget: int = 1500,
+        max_message_tokens: int = 100,
+        duplicate_threshold: float = 0.8,
+        include_scores: bool = False
+    ) -> Tuple[str, Dict]:
+        """
+        Format results into LLM context within a token budget
+
+        Steps:
+        1. Visit messages in score order
+        2. Drop near-duplicates of an already kept message (MinHash Jaccard)
+        3. Trim long messages to the sentences that match the query
+        4. Keep messages while they fit the budget
+        The kept messages are emitted in their composed order, so the
+        interleaving of comparison queries is preserved.
+
+        Args:
+            composed_results: List of (message, score) tuples
+            query: User query (for sentence selection)
+            token_budget: Maximum estimated tokens for the context
+            max_message_tokens: Messages longer than this are trimmed
+            duplicate_threshold: Estimated Jaccard at or above which a message is a duplicate
+            include_scores: Whether to include relevance scores in context
+
+        Returns:
+            (context string, stats) where stats = {
+                'budget', 'tokens', 'candidates', 'kept', 'trimmed',
+                'dropped_duplicates', 'dropped_budget'
+            }
+        """
+        query_terms = {
+            w for w in re.findall(r'\w+', query.lower())
+            if len(w) > 2 and w not in _QUERY_STOPWORDS
+        }
+
+        order = sorted(range(len(composed_results)), key=lambda i: -composed_results[i][1])
+        kept = {}  # position in composed_results -> message text
+        kept_signatures = []
+        used = 0
+        stats = {
+            'budget': token_budget, 'tokens': 0, 'candidates': len(composed_results),
+            'kept': 0, 'trimmed': 0, 'dropped_duplicates': 0, 'dropped_budget': 0
+        }
+
+        for i in order:
+            msg, score = composed_results[i]
+
+            signature = self._signature(msg)
+            if any(np.mean(signature == other) >= duplicate_threshold for other in kept_signatures):
+                stats['dropped_duplicates'] += 1
+                continue
+
+            text = self._trim_to_query(msg['message'], query_terms, max_message_tokens)
+            label = f"{msg['user_name']} (relevance: {score:.3f})" if include_scores else msg['user_name']
+            # "[n] user:" header + text + blank line separator
+            cost = estimate_tokens(f"[{len(composed_results)}] {label}:\n{text}") + 2
+            if used + cost > token_budget:
+                stats['dropped_budget'] += 1
+                continue
+
+            kept[i] = (label, text)
+            kept_signatures.append(signature)
+            used += cost
+            if text != msg['message']:
+                stats['trimmed'] += 1
+
+        context = "\n\n".join(
+            f"[{n}] {label}:\n{text}"
+            for n, (label, text) in enumerate((kept[i] for i in sorted(kept)), 1)
+        )
+        stats['kept'] = len(kept)
+        stats['tokens'] = estimate_tokens(context)
+        return context, stats
+
+
 def test_result_composer():
     """Test ResultComposer with sample data"""
     print("="*80)
@@ -250,6 +421,16 @@ def test_result_composer():
     context = composer.format_context_for_llm(composed[:4], include_scores=False)
     print(context)
 
+    # Test 4: Token-budgeted packing
+    print("\n" + "="*80)
+    print("TEST 4: PACK CONTEXT (Token Budget)")
+    print("="*80)
+    duplicate = ({'id': 't1b', 'user_name': 'Thiago Monteiro', 'message': 'I love Italian cuisine!'}, 0.80)
+    context, stats = composer.pack_context(composed + [duplicate], "Italian cuisine", token_budget=60)
+    print(context)
+    print(f"\nKept {stats['kept']}/{stats['candidates']} messages, ~{stats['tokens']} tokens "
+          f"(duplicates dropped: {stats['dropped_duplicates']}, over budget: {stats['dropped_budget']})")
+
     print("\n" + "="*80)
 
 
@@ -8,6 +8,10 @@ Handles 90%+ of messages using:
 - Location NER for travel patterns
 
 Goal: raw_messages.json → high-quality triples.json
+
+Batch path: nlp.pipe with the NER component disabled for the message parse
+(NER only runs on candidate location phrases), optionally across several
+processes (n_process).
 """
 import json
 import spacy
@@ -16,6 +20,10 @@ from tqdm import tqdm
 from collections import defaultdict
 
 
+# Components not needed for the message parse (locations use a separate NER pass)
+PIPE_DISABLE = ["ner"]
+
+
 class RuleBasedExtractor:
     """Pure rule-based triple extractor using spaCy"""
 
@@ -82,6 +90,9 @@ class RuleBasedExtractor:
             'request', 'inquiry', 'question'
         }
 
+        # NER results for candidate location phrases
+        self._location_phrases: Dict[str, bool] = {}
+
         print("✅ Rule-based extractor initialized")
 
     def extract_from_message(self, message: Dict) -> List[Dict]:
@@ -96,13 +107,27 @@ class RuleBasedExtractor:
         """
         text = message.get('message', '')
         user_name = message.get('user_name', 'Unknown')
-        message_id = message.get('id')
-        timestamp = message.get('timestamp')
 
         if not text or not user_name:
             return []
 
-        doc = self.nlp(text)
+        return self._triples_from_doc(message, self.nlp(text, disable=PIPE_DISABLE))
+
+    def _triples_from_doc(self, message: Dict, doc) -> List[Dict]:
+        """
+        Extract triples from a message's spaCy parse
+
+        Args:
+            message: Message dict with 'user_name', 'message', 'id', 'timestamp'
+            doc: spaCy parse of the message text
+
+        Returns:
+            List of triple dicts
+        """
+        user_name = message.get('user_name', 'Unknown')
+        message_id = message.get('id')
+        timestamp = message.get('timestamp')
+
         triples = []
 
         # ========== EXTRACTION 1: POSSESSIVE OWNS ==========
@@ -231,11 +256,15 @@ class RuleBasedExtractor:
 
     def _is_location(self, phrase: str, doc) -> bool:
         """Check if phrase is a location using NER"""
-        # Use spaCy NER to detect locations
-        sub_doc = self.nlp(phrase)
-        for ent in sub_doc.ents:
-            if ent.label_ in ('GPE', 'LOC', 'FAC'):  # Geopolitical, Location, Facility
-                return True
+        # Use spaCy NER to detect locations (phrases repeat a lot: memoized)
+        if phrase not in self._location_phrases:
+            sub_doc = self.nlp(phrase)
+            self._location_phrases[phrase] = any(
+                ent.label_ in ('GPE', 'LOC', 'FAC')  # Geopolitical, Location, Facility
+                for ent in sub_doc.ents
+            )
+        if self._location_phrases[phrase]:
+            return True
 
         # Common location keywords as fallback
         location_keywords = {
@@ -254,25 +283,39 @@ class RuleBasedExtractor:
     def extract_from_messages_batch(
         self,
         messages: List[Dict],
-        show_progress: bool = True
+        show_progress: bool = True,
+        batch_size: int = 256,
+        n_process: int = 1
     ) -> List[Dict]:
         """
-        Extract triples from multiple messages
+        Extract triples from multiple messages (streamed through nlp.pipe)
 
         Args:
             messages: List of message dicts
             show_progress: Show progress bar
+            batch_size: nlp.pipe batch size
+            n_process: spaCy worker processes (-1 = one per CPU core)
 
         Returns:
             List of all extracted triples
         """
         all_triples = []
 
-        iterator = tqdm(messages, desc="Extracting") if show_progress else messages
-
-        for message in iterator:
-            triples = self.extract_from_message(message)
-            all_triples.extend(triples)
+        # Same skip rule as extract_from_message
+        valid = [m for m in messages if m.get('message') and m.get('user_name')]
+        docs = self.nlp.pipe(
+            (m['message'] for m in valid),
+            batch_size=batch_size,
+            n_process=n_process,
+            disable=PIPE_DISABLE
+        )
+
+        iterator = zip(valid, docs)
+        if show_progress:
+            iterator = tqdm(iterator, total=len(valid), desc="Extracting")
+
+        for message, doc in iterator:
+            all_triples.extend(self._triples_from_doc(message, doc))
 
         return all_triples
 
@@ -0,0 +1,314 @@
+"""
+Shared Index Module
+
+Memory-shared index loading for multi-worker deployments (several uvicorn
+or gunicorn workers in one container).
+
+Architecture:
+- BM25 is exported once to flat numpy arrays (CSR postings, idf, doc
+  lengths) plus a packed JSON blob of the messages, under
+  data/shared_index/<bm25.pkl fingerprint>/
+- Workers open those files with mmap: the pages live in the OS page cache
+  and are shared by every process, whether workers are forked or spawned
+  - MappedBM25Scorer: same scores as BM25Okapi.get_scores (no per-document
+    Counter dicts, so nothing for refcounting to dirty)
+  - MappedMessages: list-like view that decodes a message on access, with a
+    sorted id array for get_message() lookups
+- Pre-fork preload (gunicorn --preload): preload() builds the remaining
+  Python-object indexes (knowledge graph, user index) in the parent and
+  calls gc.freeze(), so the collector never writes to those pages and they
+  stay shared copy-on-write after fork
+- Qdrant/FastEmbed and the Groq clients are not shared: they hold sockets
+  and thread pools that are not fork-safe, so each worker creates them
+  after fork (see QASystem)
+
+Usage:
+    bm25_search = load_shared_bm25("data/bm25")      # any worker
+    preloaded = preload("data")                      # gunicorn master, before fork
+    QASystem(preloaded=preloaded, shared_memory=True)
+"""
+import os
+import gc
+import json
+import shutil
+import pickle
+import tempfile
+from typing import Dict, List, Optional
+import numpy as np
+from src.bm25_search import BM25Search
+from src.knowledge_graph import KnowledgeGraph
+
+
+SHARED_DIR_NAME = "shared_index"
+
+ARRAYS = ['idf', 'postings_offsets', 'postings_docs', 'postings_tf', 'doc_len',
+          'message_offsets', 'message_blob', 'ids_sorted', 'ids_order']
+
+
+class MappedBM25Scorer:
+    """
+    BM25Okapi scoring over memory-mapped CSR postings
+    """
+
+    def __init__(self, directory: str):
+        """
+        Open an exported BM25 index
+
+        Args:
+            directory: Export directory (see export_bm25)
+        """
+        with open(os.path.join(directory, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+        with open(os.path.join(directory, 'vocab.json'), 'r') as f:
+            self.vocab: Dict[str, int] = json.load(f)
+
+        self.k1 = meta['k1']
+        self.b = meta['b']
+        self.avgdl = meta['avgdl']
+        self.corpus_size = meta['corpus_size']
+
+        self.idf = np.load(os.path.join(directory, 'idf.npy'), mmap_mode='r')
+        self.postings_offsets = np.load(os.path.join(directory, 'postings_offsets.npy'), mmap_mode='r')
+        self.postings_docs = np.load(os.path.join(directory, 'postings_docs.npy'), mmap_mode='r')
+        self.postings_tf = np.load(os.path.join(directory, 'postings_tf.npy'), mmap_mode='r')
+        self.doc_len = np.load(os.path.join(directory, 'doc_len.npy'), mmap_mode='r')
+
+    def get_scores(self, query: List[str]) -> np.ndarray:
+        """
+        BM25 score of every document for a tokenized query
+
+        Args:
+            query: Query tokens
+
+        Returns:
+            Scores array (corpus_size), equal to BM25Okapi.get_scores
+        """
+        score = np.zeros(self.corpus_size)
+        for token in query:
+            term = self.vocab.get(token)
+            if term is None:
+                continue
+            start, end = self.postings_offsets[term], self.postings_offsets[term + 1]
+            docs = self.postings_docs[start:end]
+            tf = self.postings_tf[start:end]
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[docs] / self.avgdl)
+            score[docs] += self.idf[term] * (tf * (self.k1 + 1) / (tf + norm))
+        return score
+
+
+class MappedMessages:
+    """
+    Read-only, list-like view of messages packed in a memory-mapped blob
+    """
+
+    def __init__(self, directory: str):
+        """
+        Open exported messages
+
+        Args:
+            directory: Export directory (see export_bm25)
+        """
+        self.offsets = np.load(os.path.join(directory, 'message_offsets.npy'), mmap_mode='r')
+        self.blob = np.load(os.path.join(directory, 'message_blob.npy'), mmap_mode='r')
+        self.ids_sorted = np.load(os.path.join(directory, 'ids_sorted.npy'), mmap_mode='r')
+        self.ids_order = np.load(os.path.join(directory, 'ids_order.npy'), mmap_mode='r')
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> Dict:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return json.loads(self.blob[self.offsets[index]:self.offsets[index + 1]].tobytes())
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def find(self, message_id: str) -> Optional[Dict]:
+        """
+        Look up a message by id (binary search over the sorted id array)
+
+        Args:
+            message_id: Message ID
+
+        Returns:
+            Message dict or None
+        """
+        encoded = message_id.encode('utf-8')
+        if len(encoded) > self.ids_sorted.dtype.itemsize:
+            return None
+        key = np.array(encoded, dtype=self.ids_sorted.dtype)
+        i = int(np.searchsorted(self.ids_sorted, key))
+        if i < len(self.ids_sorted) and self.ids_sorted[i] == key:
+            return self[int(self.ids_order[i])]
+        return None
+
+
+def shared_index_dir(bm25_path: str = "data/bm25") -> str:
+    """
+    Export directory for the current bm25.pkl (keyed by its mtime and size)
+
+    Args:
+        bm25_path: BM25 base path (without .pkl)
+
+    Returns:
+        Directory path under <data dir>/shared_index/
+    """
+    stat = os.stat(f"{bm25_path}.pkl")
+    fingerprint = f"{stat.st_mtime_ns}-{stat.st_size}"
+    return os.path.join(os.path.dirname(bm25_path), SHARED_DIR_NAME, fingerprint)
+
+
+def export_bm25(bm25: object, messages: List[Dict], directory: str):
+    """
+    Write a BM25Okapi index and its messages as flat arrays
+
+    Args:
+        bm25: Fitted BM25Okapi
+        messages: Messages in corpus order
+        directory: Output directory (created)
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    vocab = {term: i for i, term in enumerate(sorted(bm25.idf))}
+    idf = np.array([bm25.idf[term] for term in sorted(bm25.idf)], dtype=np.float64)
+
+    # CSR postings: per term, the documents containing it and their term frequency
+    terms, docs, tfs = [], [], []
+    for doc_id, freqs in enumerate(bm25.doc_freqs):
+        for term, tf in freqs.items():
+            terms.append(vocab[term])
+            docs.append(doc_id)
+            tfs.append(tf)
+    terms = np.array(terms, dtype=np.int64)
+    order = np.argsort(terms, kind='stable')
+    postings_offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(terms, minlength=len(vocab)), out=postings_offsets[1:])
+
+    encoded = [json.dumps(msg, ensure_ascii=False).encode('utf-8') for msg in messages]
+    message_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=message_offsets[1:])
+
+    ids = np.array([msg['id'].encode('utf-8') for msg in messages])
+    ids_order = np.argsort(ids, kind='stable')
+
+    arrays = {
+        'idf': idf,
+        'postings_offsets': postings_offsets,
+        'postings_docs': np.array(docs, dtype=np.int32)[order],
+        'postings_tf': np.array(tfs, dtype=np.float64)[order],
+        'doc_len': np.array(bm25.doc_len, dtype=np.float64),
+        'message_offsets': message_offsets,
+        'message_blob': np.frombuffer(b''.join(encoded), dtype=np.uint8),
+        'ids_sorted': ids[ids_order],
+        'ids_order': ids_order.astype(np.int64),
+    }
+    for name in ARRAYS:
+        np.save(os.path.join(directory, f"{name}.npy"), arrays[name])
+
+    with open(os.path.join(directory, 'vocab.json'), 'w') as f:
+        json.dump(vocab, f)
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump({'k1': bm25.k1, 'b': bm25.b, 'avgdl': bm25.avgdl, 'corpus_size': bm25.corpus_size}, f)
+
+
+def ensure_shared_bm25(bm25_path: str = "data/bm25") -> str:
+    """
+    Export bm25.pkl unless an export for this exact file already exists
+
+    Concurrent workers each write to a temp directory and rename it into
+    place; the first rename wins and the others are discarded.
+
+    Args:
+        bm25_path: BM25 base path (without .pkl)
+
+    Returns:
+        Export directory
+    """
+    directory = shared_index_dir(bm25_path)
+    if os.path.exists(os.path.join(directory, 'meta.json')):
+        return directory
+
+    print(f"\n📦 Exporting BM25 index for shared memory → {directory}")
+    with open(f"{bm25_path}.pkl", 'rb') as f:
+        data = pickle.load(f)
+
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix='.export-')
+    try:
+        export_bm25(data['bm25'], data['messages'], tmp_dir)
+        os.rename(tmp_dir, directory)
+    except OSError:
+        if not os.path.exists(os.path.join(directory, 'meta.json')):
+            raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # Drop exports of older bm25.pkl versions (workers still mapping them keep their pages)
+    for name in os.listdir(parent):
+        if name != os.path.basename(directory) and not name.startswith('.'):
+            shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+    return directory
+
+
+def load_shared_bm25(bm25_path: str = "data/bm25", user_index: Optional[Dict] = None,
+                     user_index_path: Optional[str] = None) -> BM25Search:
+    """
+    BM25Search backed by the memory-mapped export (read-only)
+
+    Args:
+        bm25_path: BM25 base path (without .pkl)
+        user_index: Already-parsed user_index.json
+        user_index_path: user_index.json path (if user_index is not given)
+
+    Returns:
+        BM25Search whose scorer and messages are memory-mapped
+    """
+    directory = ensure_shared_bm25(bm25_path)
+
+    bm25_search = BM25Search()
+    bm25_search.bm25 = MappedBM25Scorer(directory)
+    bm25_search.messages = MappedMessages(directory)
+
+    if user_index is None and user_index_path and os.path.exists(user_index_path):
+        with open(user_index_path, 'r') as f:
+            user_index = json.load(f)
+    bm25_search.user_index = user_index or {}
+
+    print(f"✅ Mapped {len(bm25_search.messages)} messages (shared memory)")
+    return bm25_search
+
+
+def preload(data_dir: str = "data") -> Dict:
+    """
+    Load the read-only indexes once, before workers fork
+
+    Args:
+        data_dir: Directory holding bm25.pkl, knowledge_graph.pkl and user_indexed/
+
+    Returns:
+        {'user_index', 'bm25_search', 'knowledge_graph'} for QASystem(preloaded=...)
+    """
+    print(f"\n📦 Preloading indexes from {data_dir} (shared by forked workers)...")
+    user_index_path = os.path.join(data_dir, "user_indexed", "user_index.json")
+    user_index = {}
+    if os.path.exists(user_index_path):
+        with open(user_index_path, 'r') as f:
+            user_index = json.load(f)
+
+    bm25_search = load_shared_bm25(os.path.join(data_dir, "bm25"), user_index=user_index)
+    knowledge_graph = KnowledgeGraph()
+    knowledge_graph.load(os.path.join(data_dir, "knowledge_graph.pkl"))
+
+    # Move everything allocated so far out of the collector's reach: GC passes
+    # would otherwise touch (and copy) every preloaded page in every worker
+    gc.collect()
+    gc.freeze()
+    print(f"✅ Preloaded; {gc.get_freeze_count()} objects frozen")
+
+    return {'user_index': user_index, 'bm25_search': bm25_search, 'knowledge_graph': knowledge_graph}
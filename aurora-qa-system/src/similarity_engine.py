@@ -0,0 +1,293 @@
+"""
+User Similarity Engine
+
+Precomputes client similarity for SIMILAR analytics queries.
+
+Architecture:
+- Encode each user as a sparse binary vector over entities (CSR matrix)
+- Pairwise overlaps in one sparse product: shared = X · Xᵀ
+- Jaccard / cosine derived from overlaps and per-user set sizes
+- Tiered grouping: highly similar (3+ shared), moderately similar (2 shared)
+- Ranking on arrays: components, shared counts and scores are computed in
+  numpy and only the top groups become dicts with shared entity names
+
+The LLM only verbalises the result; it no longer has to find overlaps in a
+raw JSON dump of every client's preferences.
+
+Usage:
+    engine = UserSimilarityEngine({"Hans Müller": ["Noma", "Paris"], ...})
+    groups = engine.cluster()
+    # Returns: {'highly_similar': [...], 'moderately_similar': [...], 'individual': [...]}
+"""
+from typing import List, Dict, Iterable, Optional
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+
+class UserSimilarityEngine:
+    """
+    Sparse user × entity similarity
+
+    Metrics:
+    - jaccard: |A ∩ B| / |A ∪ B|
+    - cosine:  |A ∩ B| / sqrt(|A| · |B|)
+    """
+
+    METRICS = ('jaccard', 'cosine')
+
+    def __init__(self, profiles: Dict[str, Iterable[str]]):
+        """
+        Build the user × entity incidence matrix
+
+        Args:
+            profiles: {user: iterable of entities}
+        """
+        self.users = sorted(profiles)
+        self.entities = sorted({e for entities in profiles.values() for e in entities})
+        entity_ids = {e: i for i, e in enumerate(self.entities)}
+
+        rows, cols = [], []
+        for row, user in enumerate(self.users):
+            for entity in set(profiles[user]):
+                rows.append(row)
+                cols.append(entity_ids[entity])
+
+        data = np.ones(len(rows), dtype=np.float32)
+        self.matrix = sparse.csr_matrix(
+            (data, (rows, cols)),
+            shape=(len(self.users), len(self.entities))
+        )
+        self.sizes = np.asarray(self.matrix.getnnz(axis=1))
+
+        # Shared-entity counts for every user pair (upper triangle only)
+        shared = sparse.triu(self.matrix @ self.matrix.T, k=1).tocoo()
+        self._pair_rows = shared.row
+        self._pair_cols = shared.col
+        self._pair_shared = shared.data.astype(np.int64)
+
+    @classmethod
+    def from_index(cls, index, entity_type: str) -> "UserSimilarityEngine":
+        """
+        Build from an EntityAggregateIndex's user → entities table
+
+        Args:
+            index: EntityAggregateIndex
+            entity_type: Entity type to compare users on
+
+        Returns:
+            UserSimilarityEngine
+        """
+        return cls(index.user_entities.get(entity_type, {}))
+
+    def _scores(self, metric: str) -> np.ndarray:
+        """Similarity score for every stored pair"""
+        if metric not in self.METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+
+        size_a = self.sizes[self._pair_rows]
+        size_b = self.sizes[self._pair_cols]
+        if metric == 'jaccard':
+            return self._pair_shared / (size_a + size_b - self._pair_shared)
+        return self._pair_shared / np.sqrt(size_a * size_b)
+
+    def shared_entities(self, user_ids: List[int]) -> List[str]:
+        """
+        Entities common to all given users
+
+        Args:
+            user_ids: Row indices into self.users
+
+        Returns:
+            Sorted list of shared entity names
+        """
+        common = None
+        for row in user_ids:
+            cols = set(self.matrix.indices[self.matrix.indptr[row]:self.matrix.indptr[row + 1]])
+            common = cols if common is None else common & cols
+        return sorted(self.entities[c] for c in (common or []))
+
+    def pairwise(self, metric: str = 'jaccard', min_shared: int = 1, top_k: Optional[int] = None) -> List[Dict]:
+        """
+        Most similar user pairs
+
+        Args:
+            metric: 'jaccard' or 'cosine'
+            min_shared: Minimum number of shared entities
+            top_k: Maximum pairs to return (None = all)
+
+        Returns:
+            List of {'clients': [a, b], 'shared': [...], 'score': float},
+            sorted by shared count then score (descending)
+        """
+        scores = self._scores(metric)
+        keep = np.nonzero(self._pair_shared >= min_shared)[0]
+        keep = keep[_top_candidates(self._pair_shared[keep], scores[keep], top_k)]
+        order = keep[np.lexsort((self._pair_cols[keep], self._pair_rows[keep],
+                                 -scores[keep], -self._pair_shared[keep]))]
+        if top_k is not None:
+            order = order[:top_k]
+
+        return [
+            {
+                'clients': [self.users[self._pair_rows[i]], self.users[self._pair_cols[i]]],
+                'shared': self.shared_entities([self._pair_rows[i], self._pair_cols[i]]),
+                'score': round(float(scores[i]), 3)
+            }
+            for i in order
+        ]
+
+    def _tier_groups(self, mask: np.ndarray, threshold: int, scores: np.ndarray,
+                     max_groups: Optional[int] = None) -> List[Dict]:
+        """
+        Group users connected by pairs in one similarity tier
+
+        A connected component becomes one group if all its members share at
+        least `threshold` entities; otherwise its pairs are reported separately.
+        Groups are ranked on arrays; dicts (and shared entity names) are only
+        built for the top `max_groups`.
+        """
+        n = len(self.users)
+        rows, cols = self._pair_rows[mask], self._pair_cols[mask]
+        pair_scores = scores[mask]
+        if len(rows) == 0:
+            return []
+
+        graph = sparse.coo_matrix((np.ones(len(rows)), (rows, cols)), shape=(n, n))
+        num_components, labels = connected_components(graph, directed=False)
+        pair_labels = labels[rows]
+
+        # Members of every component at once (users sorted by label)
+        by_label = np.argsort(labels, kind='stable')
+        sizes = np.bincount(labels, minlength=num_components)
+        members = np.split(by_label, np.cumsum(sizes)[:-1])
+
+        # Entities shared by all members: component × entity counts equal to the size
+        indicator = sparse.csr_matrix((np.ones(n, dtype=np.float32), (labels, np.arange(n))),
+                                      shape=(num_components, n))
+        counts = (indicator @ self.matrix).tocsr()
+        count_rows = np.repeat(np.arange(num_components), np.diff(counts.indptr))
+        full = counts.data == sizes[count_rows]
+        component_shared = np.bincount(count_rows[full], minlength=num_components)
+
+        pairs_per_component = np.bincount(pair_labels, minlength=num_components)
+        component_scores = (np.bincount(pair_labels, weights=pair_scores, minlength=num_components)
+                            / np.maximum(pairs_per_component, 1))
+        grouped = (pairs_per_component > 0) & (sizes > 2) & (component_shared >= threshold)
+
+        # Candidates: whole components, then the pairs of the other components
+        group_ids = np.nonzero(grouped)[0]
+        pair_ids = np.nonzero(~grouped[pair_labels])[0]
+        shared_counts = np.concatenate([component_shared[group_ids], self._pair_shared[mask][pair_ids]])
+        rounded = np.round(np.concatenate([component_scores[group_ids], pair_scores[pair_ids]]), 3)
+
+        def clients(candidate):
+            if candidate < len(group_ids):
+                return members[group_ids[candidate]].tolist()
+            pair = pair_ids[candidate - len(group_ids)]
+            return [int(rows[pair]), int(cols[pair])]
+
+        candidates = _top_candidates(shared_counts, rounded, max_groups)
+        ranked = sorted(candidates, key=lambda c: (-shared_counts[c], -rounded[c], clients(c)))
+        if max_groups is not None:
+            ranked = ranked[:max_groups]
+
+        groups = []
+        for candidate in ranked:
+            ids = clients(candidate)
+            score = (component_scores[group_ids[candidate]] if candidate < len(group_ids)
+                     else pair_scores[pair_ids[candidate - len(group_ids)]])
+            groups.append({
+                'clients': [self.users[m] for m in ids],
+                'shared': self.shared_entities(ids),
+                'score': round(float(score), 3)
+            })
+        return groups
+
+    def cluster(
+        self,
+        high_threshold: int = 3,
+        moderate_threshold: int = 2,
+        metric: str = 'jaccard',
+        max_groups: int = 10
+    ) -> Dict:
+        """
+        Group clients into similarity tiers
+
+        Args:
+            high_threshold: Shared entities for "highly similar"
+            moderate_threshold: Shared entities for "moderately similar"
+            metric: Score reported per group ('jaccard' or 'cosine')
+            max_groups: Maximum groups listed per tier
+
+        Returns:
+            {
+                'metric': str,
+                'highly_similar': [{'clients', 'shared', 'score'}, ...],
+                'moderately_similar': [...],
+                'individual': [clients without any moderate overlap],
+                'total_clients': int
+            }
+        """
+        scores = self._scores(metric)
+        high_mask = self._pair_shared >= high_threshold
+        moderate_mask = (self._pair_shared >= moderate_threshold) & ~high_mask
+
+        paired = np.zeros(len(self.users), dtype=bool)
+        paired[self._pair_rows[high_mask | moderate_mask]] = True
+        paired[self._pair_cols[high_mask | moderate_mask]] = True
+
+        return {
+            'metric': metric,
+            'highly_similar': self._tier_groups(high_mask, high_threshold, scores, max_groups),
+            'moderately_similar': self._tier_groups(moderate_mask, moderate_threshold, scores, max_groups),
+            'individual': [u for i, u in enumerate(self.users) if not paired[i]],
+            'total_clients': len(self.users)
+        }
+
+
+def _top_candidates(shared: np.ndarray, scores: np.ndarray, k: Optional[int]) -> np.ndarray:
+    """
+    Indices that can rank in the top k by (shared, score) descending
+
+    Ties with the k-th candidate are all kept, so a final sort over the
+    result ranks exactly like a sort over everything.
+    """
+    if k is None or len(shared) <= k:
+        return np.arange(len(shared))
+    if k <= 0:
+        return np.arange(0)
+    key = shared + scores / 2  # scores are in [0, 1]: shared count first, then score
+    kth = np.partition(key, len(key) - k)[len(key) - k]
+    return np.nonzero(key >= kth)[0]
+
+
+def format_similarity_groups(result: Dict, entity_type: str) -> str:
+    """
+    Plain markdown rendering of cluster() output
+
+    Args:
+        result: Output of UserSimilarityEngine.cluster()
+        entity_type: Entity type label (restaurant, hotel, ...)
+
+    Returns:
+        Markdown text
+    """
+    lines = []
+
+    for key, title in [('highly_similar', 'Highly Similar Clients'),
+                       ('moderately_similar', 'Moderately Similar Clients')]:
+        if not result.get(key):
+            continue
+        lines.append(f"**{title}:**")
+        for group in result[key]:
+            lines.append(f"- {', '.join(group['clients'])} - Share: {', '.join(group['shared'])}")
+        lines.append("")
+
+    if not lines:
+        return f"No clients share two or more {entity_type}s."
+
+    if result.get('individual'):
+        lines.append(f"**Individual preferences:** {', '.join(result['individual'])}")
+
+    return '\n'.join(lines).strip()
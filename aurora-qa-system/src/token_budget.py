@@ -0,0 +1,75 @@
+"""
+Token Budget Utilities
+
+Local prompt-size estimates, so payloads can be sized before calling the LLM.
+
+Architecture:
+- estimate_tokens(): offline approximation of a Llama-3 style BPE tokenizer
+  (no model download, no network)
+- pack_lines(): greedily keep lines in order until a token budget is spent
+
+The estimate errs slightly high (about 4 characters per token for English
+words, digits in groups of 3, one token per punctuation mark), which is
+the safe side for staying under a budget.
+
+Usage:
+    estimate_tokens("Which clients booked Noma?")  # → 8
+    kept, dropped = pack_lines(lines, budget=500)
+"""
+import re
+from typing import List, Tuple
+
+
+_PIECE_PATTERN = re.compile(r"[^\W\d_]+|\d+|[^\w\s]|_")
+
+# Average characters per token for words / digits (Llama-3 BPE)
+_CHARS_PER_WORD_TOKEN = 4
+_DIGITS_PER_TOKEN = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of LLM tokens in a text
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Estimated token count
+    """
+    if not text:
+        return 0
+
+    tokens = 0
+    for piece in _PIECE_PATTERN.findall(text):
+        if piece[0].isdigit():
+            tokens += -(-len(piece) // _DIGITS_PER_TOKEN)
+        elif piece[0].isalpha():
+            tokens += -(-len(piece) // _CHARS_PER_WORD_TOKEN)
+        else:
+            tokens += 1
+
+    # Line breaks are tokens of their own
+    return tokens + text.count('\n')
+
+
+def pack_lines(lines: List[str], budget: int) -> Tuple[List[str], List[str]]:
+    """
+    Keep lines (in order) while they fit in the token budget
+
+    Args:
+        lines: Candidate lines, most important first
+        budget: Maximum tokens for the kept lines
+
+    Returns:
+        (kept lines, dropped lines)
+    """
+    kept = []
+    used = 0
+    for i, line in enumerate(lines):
+        cost = estimate_tokens(line) + 1  # + newline
+        if used + cost > budget:
+            return kept, lines[i:]
+        kept.append(line)
+        used += cost
+    return kept, []
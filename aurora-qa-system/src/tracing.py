@@ -0,0 +1,330 @@
+"""
+Tracing Module
+
+Request-level spans for the QA pipeline: where did the time (and the LLM
+tokens) of one answer go?
+
+Architecture:
+- A Trace is one request; it owns a tree of Spans (name, start/end,
+  duration, attributes, LLM token counts)
+- The active span is kept in a contextvar, so components open child spans
+  with `with span("retriever.bm25"):` without passing a trace around.
+  Outside a trace, span() is a no-op
+- LLMGateway.chat opens an "llm.<call_site>" span and records the response
+  usage on it; token counts roll up to every enclosing span, so each stage
+  reports the tokens it spent
+- Trace.timings() is the compact per-stage breakdown returned in /ask
+  metadata; Trace.to_otlp() is the OpenTelemetry (OTLP/JSON) form
+- JSONFileExporter appends one OTLP/JSON document per trace to a local file
+  (no collector needed; the lines can be replayed into any OTLP receiver)
+- Trace listeners (e.g. metrics.observe_trace) see every finished trace
+
+Usage:
+    with start_trace("POST /ask") as trace:
+        with span("retriever.search", query=query) as s:
+            results = ...
+            s.set_attribute("results", len(results))
+    trace.timings()
+"""
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+
+SERVICE_NAME = "aurora-qa-system"
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    One timed stage of a trace
+    """
+
+    def __init__(self, name: str, trace: "Trace", parent: Optional["Span"] = None,
+                 attributes: Optional[Dict] = None):
+        """
+        Start a span (ended by end())
+
+        Args:
+            name: Stage name, e.g. "retriever.qdrant"
+            trace: Owning trace
+            parent: Enclosing span (None for the root)
+            attributes: Initial attributes
+        """
+        self.name = name
+        self.trace = trace
+        self.parent = parent
+        self.span_id = os.urandom(8).hex()
+        self.attributes: Dict = dict(attributes or {})
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self._start_perf = time.perf_counter_ns()
+
+    def set_attribute(self, key: str, value):
+        """Attach a key/value (counts, ids, flags) to the span"""
+        self.attributes[key] = value
+
+    def add_tokens(self, prompt_tokens: int, completion_tokens: int):
+        """Record LLM usage on this span and every enclosing span"""
+        span = self
+        while span is not None:
+            span.prompt_tokens += prompt_tokens
+            span.completion_tokens += completion_tokens
+            span = span.parent
+
+    def end(self):
+        """Stop the clock (idempotent)"""
+        if self.end_ns is None:
+            self.end_ns = self.start_ns + (time.perf_counter_ns() - self._start_perf)
+
+    @property
+    def duration_ms(self) -> float:
+        """Duration so far (or in total, once ended)"""
+        end_ns = self.end_ns if self.end_ns is not None else \
+            self.start_ns + (time.perf_counter_ns() - self._start_perf)
+        return (end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict:
+        """Compact form for /ask metadata (times relative to the trace start)"""
+        origin = self.trace.root.start_ns
+        entry = {
+            'name': self.name,
+            'parent': self.parent.name if self.parent else None,
+            'start_ms': round((self.start_ns - origin) / 1e6, 2),
+            'duration_ms': round(self.duration_ms, 2),
+        }
+        if self.prompt_tokens or self.completion_tokens:
+            entry['tokens'] = {'prompt': self.prompt_tokens, 'completion': self.completion_tokens}
+        if self.attributes:
+            entry['attributes'] = self.attributes
+        if self.error:
+            entry['error'] = self.error
+        return entry
+
+    def to_otlp(self) -> Dict:
+        """OTLP/JSON span"""
+        attributes = dict(self.attributes)
+        if self.prompt_tokens or self.completion_tokens:
+            attributes['llm.usage.prompt_tokens'] = self.prompt_tokens
+            attributes['llm.usage.completion_tokens'] = self.completion_tokens
+        otlp = {
+            'traceId': self.trace.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns or self.start_ns),
+            'attributes': [_otlp_attribute(key, value) for key, value in attributes.items()],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1}
+        }
+        if self.parent is not None:
+            otlp['parentSpanId'] = self.parent.span_id
+        return otlp
+
+
+class _NoopSpan:
+    """Returned by span() outside a trace: accepts and ignores everything"""
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def add_tokens(self, prompt_tokens: int, completion_tokens: int):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """
+    Spans recorded for one request
+    """
+
+    def __init__(self, name: str, attributes: Optional[Dict] = None):
+        """
+        Start a trace with its root span
+
+        Args:
+            name: Root span name, e.g. "POST /ask"
+            attributes: Root span attributes
+        """
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+        self.root = Span(name, self, attributes=attributes)
+        self.spans.append(self.root)
+
+    def timings(self) -> Dict:
+        """
+        Per-stage breakdown for API responses
+
+        Returns:
+            {
+                'trace_id': str,
+                'total_ms': float,
+                'tokens': {'prompt': int, 'completion': int},
+                'stages': {span name: total ms across its occurrences},
+                'spans': [span dicts in start order]
+            }
+        """
+        stages: Dict[str, float] = {}
+        for s in self.spans[1:]:
+            stages[s.name] = round(stages.get(s.name, 0.0) + s.duration_ms, 2)
+
+        return {
+            'trace_id': self.trace_id,
+            'total_ms': round(self.root.duration_ms, 2),
+            'tokens': {'prompt': self.root.prompt_tokens, 'completion': self.root.completion_tokens},
+            'stages': stages,
+            'spans': [s.to_dict() for s in self.spans[1:]]
+        }
+
+    def to_otlp(self) -> Dict:
+        """OTLP/JSON ExportTraceServiceRequest for this trace"""
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': [_otlp_attribute('service.name', SERVICE_NAME)]},
+                'scopeSpans': [{
+                    'scope': {'name': __name__},
+                    'spans': [s.to_otlp() for s in self.spans]
+                }]
+            }]
+        }
+
+
+def _otlp_attribute(key: str, value) -> Dict:
+    """OTLP AnyValue encoding"""
+    if isinstance(value, bool):
+        encoded = {'boolValue': value}
+    elif isinstance(value, int):
+        encoded = {'intValue': str(value)}
+    elif isinstance(value, float):
+        encoded = {'doubleValue': value}
+    else:
+        encoded = {'stringValue': str(value)}
+    return {'key': key, 'value': encoded}
+
+
+class JSONFileExporter:
+    """
+    Appends each finished trace as one OTLP/JSON line to a local file
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Output file (JSON lines; parent directory is created)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, trace: Trace):
+        line = json.dumps(trace.to_otlp(), ensure_ascii=False)
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(line + '\n')
+
+
+_exporter: Optional[JSONFileExporter] = None
+_listeners: List = []
+
+
+def set_exporter(exporter: Optional[JSONFileExporter]):
+    """
+    Export every finished trace (None disables export)
+
+    Args:
+        exporter: Object with an export(trace) method, e.g. JSONFileExporter
+    """
+    global _exporter
+    _exporter = exporter
+
+
+def add_trace_listener(listener):
+    """
+    Call `listener(trace)` for every finished trace
+
+    Args:
+        listener: Callable taking a Trace (must be fast: runs on the request thread)
+    """
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def current_span() -> Optional[Span]:
+    """Innermost open span of the current request (None outside a trace)"""
+    return _current_span.get()
+
+
+@contextmanager
+def start_trace(name: str, **attributes):
+    """
+    Trace the enclosed block as one request
+
+    Args:
+        name: Root span name
+        **attributes: Root span attributes
+
+    Yields:
+        Trace (finished and exported when the block exits)
+    """
+    trace = Trace(name, attributes)
+    token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except Exception as e:
+        trace.root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        trace.root.end()
+        if _exporter is not None:
+            try:
+                _exporter.export(trace)
+            except Exception as e:
+                print(f"⚠️  Trace export failed: {e}")
+        for listener in _listeners:
+            try:
+                listener(trace)
+            except Exception as e:
+                print(f"⚠️  Trace listener failed: {e}")
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time the enclosed block as a child of the current span
+
+    Args:
+        name: Stage name
+        **attributes: Span attributes
+
+    Yields:
+        Span (or a no-op stand-in outside a trace)
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+
+    child = Span(name, parent.trace, parent=parent, attributes=attributes)
+    parent.trace.spans.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
@@ -0,0 +1,277 @@
+"""
+Batch Extraction Testing Script
+Checks packed multi-message prompts, per-message fallback, concurrency,
+checkpoint/resume and failed extractions against the offline stub backend
+"""
+import sys
+import os
+import re
+import json
+import time
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.llm_gateway import LLMGateway, StubBackend, LLMError, set_gateway
+from src.llm_extractor import LLMSemanticExtractor, PROMPT_VERSION
+from src.extraction_executor import BatchExtractionExecutor
+
+MODEL = "llama-3.1-8b-instant"
+NUMBERED_LINE = re.compile(r'^(\d+)\. \[(.+?)\] "(.*)"$', re.MULTILINE)
+SINGLE_MESSAGE = re.compile(r'User name: "(.+?)".*\*\*Message to analyze:\*\*\n"(.*)"', re.DOTALL)
+USERS = ["Hans Müller", "Vikram Desai", "Sophia Al-Farsi", "Layla Kawaguchi"]
+
+
+def _responder(broken_batches=False):
+    """Stub LLM: one PREFERS triple per message, object = message text"""
+    def respond(model, messages, **kwargs):
+        prompt = messages[-1]['content']
+        numbered = NUMBERED_LINE.findall(prompt)
+        if numbered:
+            if broken_batches:
+                return "Sorry, here are the triples: ..."
+            return json.dumps({
+                index: [{"subject": name, "relationship": "PREFERS", "object": text}]
+                for index, name, text in numbered
+            })
+        name, text = SINGLE_MESSAGE.search(prompt).groups()
+        return json.dumps([{"subject": name, "relationship": "PREFERS", "object": text}])
+    return respond
+
+
+def _messages(n, long_every=0):
+    messages = []
+    for i in range(n):
+        text = f"I prefer window seats on flight {i}."
+        if long_every and i % long_every == 0:
+            text = " ".join([f"Please arrange the itinerary detail number {i}."] * 12)
+        messages.append({
+            "id": f"msg-{i}",
+            "user_name": USERS[i % len(USERS)],
+            "message": text,
+            "timestamp": "2024-01-01"
+        })
+    return messages
+
+
+def _setup(backend):
+    gateway = LLMGateway(backend=backend, limits={MODEL: {'rpm': 1000, 'tpm': 200000, 'concurrency': 4}})
+    set_gateway(gateway)
+    return LLMSemanticExtractor(api_key="test-key")
+
+
+def test_packed_prompts():
+    """Short messages share prompts, long ones go alone, triples stay per-message"""
+    print("="*60)
+    print("TEST 1: Packed Prompts")
+    print("="*60)
+
+    backend = StubBackend(_responder())
+    extractor = _setup(backend)
+    messages = _messages(20, long_every=10)
+
+    executor = BatchExtractionExecutor(extractor, max_messages_per_prompt=8)
+    groups = executor.pack(messages)
+    assert sum(len(group) for group in groups) == 20
+    assert all(len(group) <= 8 for group in groups)
+    assert [len(group) for group in groups].count(1) >= 2  # the two long messages
+    assert len(groups) < 20
+
+    results = executor.run(messages, show_progress=False)
+    assert len(backend.calls) == len(groups) == executor.stats['prompts']
+    for message in messages:
+        triples = results[message['id']]
+        assert len(triples) == 1
+        assert triples[0]['subject'] == message['user_name']
+        assert triples[0]['object'] == message['message']
+        assert triples[0]['message_id'] == message['id']
+
+    set_gateway(None)
+    print(f"✓ 20 messages in {len(groups)} prompts")
+    print("✅ PASSED")
+
+
+def test_fallback_to_single():
+    """Unparseable batch responses fall back to one call per message"""
+    print("\n" + "="*60)
+    print("TEST 2: Per-Message Fallback")
+    print("="*60)
+
+    backend = StubBackend(_responder(broken_batches=True))
+    extractor = _setup(backend)
+    messages = _messages(6)
+
+    triples = extractor.extract_from_messages_batch(messages, show_progress=False)
+
+    assert [t['message_id'] for t in triples] == [m['id'] for m in messages]
+    assert len(backend.calls) == 1 + 6  # one failed batch + six singles
+
+    set_gateway(None)
+    print(f"✓ {len(triples)} triples after fallback")
+    print("✅ PASSED")
+
+
+def test_concurrency():
+    """Prompts run concurrently (no fixed sleep between calls)"""
+    print("\n" + "="*60)
+    print("TEST 3: Concurrency")
+    print("="*60)
+
+    backend = StubBackend(_responder(), latency=0.2)
+    extractor = _setup(backend)
+    messages = _messages(32)
+
+    executor = BatchExtractionExecutor(extractor, max_workers=4, max_messages_per_prompt=4)
+    start = time.monotonic()
+    results = executor.run(messages, show_progress=False)
+    elapsed = time.monotonic() - start
+
+    assert len(results) == 32 and executor.stats['prompts'] == 8
+    # 8 prompts x 0.2s sequentially would take 1.6s
+    assert elapsed < 1.0, f"Prompts did not overlap ({elapsed:.2f}s)"
+
+    set_gateway(None)
+    print(f"✓ 8 prompts in {elapsed:.2f}s with 4 workers")
+    print("✅ PASSED")
+
+
+class Interrupted(BaseException):
+    """Stands in for Ctrl-C / a killed process mid-run"""
+
+
+def test_checkpoint_resume():
+    """A rerun skips unchanged messages already in the checkpoint"""
+    print("\n" + "="*60)
+    print("TEST 4: Checkpoint / Resume")
+    print("="*60)
+
+    respond = _responder()
+    calls = []
+
+    def interrupted_after_two(model, messages, **kwargs):
+        calls.append(1)
+        if len(calls) == 3:
+            raise Interrupted()
+        return respond(model, messages, **kwargs)
+
+    backend = StubBackend(interrupted_after_two)
+    extractor = _setup(backend)
+    messages = _messages(20)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoint = os.path.join(tmp, "checkpoint.jsonl")
+
+        # First run is interrupted after two of its four prompts
+        executor = BatchExtractionExecutor(extractor, max_workers=1, max_messages_per_prompt=5,
+                                           checkpoint_path=checkpoint)
+        try:
+            executor.run(messages, show_progress=False)
+            assert False, "Expected the run to be interrupted"
+        except Interrupted:
+            pass
+        with open(checkpoint, 'a') as f:
+            f.write('{"message_id": "msg-1')  # interrupted write
+        backend.responder = respond
+        first_calls = len(backend.calls)
+
+        # Records are only resumed for the messages asked for, with an unchanged key
+        assert set(executor.load_checkpoint()) == {f"msg-{i}" for i in range(10)}
+        assert set(executor.load_checkpoint(messages[5:])) == {f"msg-{i}" for i in range(5, 10)}
+        extractor.prompt_version = "triples-test"
+        assert executor.load_checkpoint(messages) == {}
+        extractor.prompt_version = PROMPT_VERSION
+
+        # Rerun over a subset with msg-7 edited since the checkpoint was written
+        subset = [dict(m, message="I prefer aisle seats now.") if m['id'] == 'msg-7' else m for m in messages[5:]]
+        executor = BatchExtractionExecutor(extractor, checkpoint_path=checkpoint)
+        results = executor.run(subset, show_progress=False)
+
+        assert executor.stats['resumed'] == 4
+        assert set(results) == {m['id'] for m in subset}
+        assert results['msg-7'][0]['object'] == "I prefer aisle seats now."
+        resumed_texts = set()
+        for call in backend.calls[first_calls:]:
+            resumed_texts.update(text for _, _, text in NUMBERED_LINE.findall(call['messages'][-1]['content']))
+        resumed_ids = {'msg-5', 'msg-6', 'msg-8', 'msg-9'}
+        assert resumed_texts == {m['message'] for m in subset if m['id'] not in resumed_ids}
+
+        # Complete run: nothing left to resume
+        assert not os.path.exists(checkpoint)
+
+    set_gateway(None)
+    print("✓ Resumed 4, re-extracted the edited message and 10 more")
+    print("✓ Stale keys (edited text, prompt version) and other ids are not resumed")
+    print("✓ Checkpoint removed after a complete run")
+    print("✅ PASSED")
+
+
+def _failing_responder(failing_texts):
+    """Stub LLM: packed replies leave out the failing messages, their single calls get a 400"""
+    respond = _responder()
+
+    def failing(model, messages, **kwargs):
+        prompt = messages[-1]['content']
+        numbered = NUMBERED_LINE.findall(prompt)
+        if numbered:
+            return json.dumps({
+                index: [{"subject": name, "relationship": "PREFERS", "object": text}]
+                for index, name, text in numbered if text not in failing_texts
+            })
+        if SINGLE_MESSAGE.search(prompt).group(2) in failing_texts:
+            raise LLMError("bad request", status_code=400)
+        return respond(model, messages, **kwargs)
+    return failing
+
+
+def test_failed_not_checkpointed():
+    """Failed extractions are not checkpointed as empty results; a rerun retries them"""
+    print("\n" + "="*60)
+    print("TEST 5: Failed Extractions")
+    print("="*60)
+
+    messages = _messages(8)
+    failing_texts = {messages[2]['message'], messages[5]['message']}
+    backend = StubBackend(_failing_responder(failing_texts))
+    extractor = _setup(backend)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoint = os.path.join(tmp, "checkpoint.jsonl")
+
+        executor = BatchExtractionExecutor(extractor, checkpoint_path=checkpoint)
+        results = executor.run(messages, show_progress=False)
+        assert set(results) == {m['id'] for m in messages} - {'msg-2', 'msg-5'}
+        assert executor.stats['failed'] == 2 and executor.stats['fallbacks'] == 1
+        assert set(executor.load_checkpoint()) == set(results)
+
+        # The provider recovers: the rerun sends only the two failed messages
+        backend.responder = _responder()
+        first_calls = len(backend.calls)
+        executor = BatchExtractionExecutor(extractor, checkpoint_path=checkpoint)
+        results = executor.run(messages, show_progress=False)
+        assert executor.stats['resumed'] == 6 and executor.stats['failed'] == 0
+        assert len(results) == 8 and all(len(results[m['id']]) == 1 for m in messages)
+        retried = set()
+        for call in backend.calls[first_calls:]:
+            retried.update(text for _, _, text in NUMBERED_LINE.findall(call['messages'][-1]['content']))
+        assert retried == failing_texts
+        assert not os.path.exists(checkpoint)
+
+    set_gateway(None)
+    print("✓ 2 failed messages left out of the checkpoint and retried on resume")
+    print("✅ PASSED")
+
+
+def main():
+    """Run all tests"""
+    test_packed_prompts()
+    test_fallback_to_single()
+    test_concurrency()
+    test_checkpoint_resume()
+    test_failed_not_checkpointed()
+
+    print("\n" + "="*60)
+    print("ALL TESTS PASSED ✅")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
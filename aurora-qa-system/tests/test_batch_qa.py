@@ -0,0 +1,323 @@
+"""
+Batch Question-Answering Testing Script
+Checks batched routing, the shared work of QASystem.answer_batch (equivalent
+questions, duplicate sub-queries, one embedding call), its bounded LLM
+parallelism and throughput, and the streaming /ask/batch endpoint
+"""
+import sys
+import os
+import re
+import json
+import time
+import threading
+from types import SimpleNamespace
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.llm_gateway import LLMGateway, StubBackend, set_gateway
+from src.local_vector_search import LocalVectorSearch
+from src.name_resolver import NameResolver
+from src.query_processor import QueryProcessor
+from src.tracing import start_trace
+from benchmarks.micro_benchmarks import _quiet
+
+MODEL = "llama-3.3-70b-versatile"
+LIMITS = {MODEL: {'rpm': 100000, 'tpm': 10 ** 8, 'concurrency': 32}}
+PLANNING_PROMPTS = ("Classify each query", "Respond with ONLY one word", "query decomposition expert")
+ANALYTICS_WORDS = re.compile(r'\b(same|most|similar|popular|count)\b', re.IGNORECASE)
+
+
+def _route_lines(prompt):
+    listed = re.findall(r'^(\d+)\. "(.*)"$', prompt, re.MULTILINE)
+    return [(n, "ANALYTICS" if ANALYTICS_WORDS.search(query) else "LOOKUP") for n, query in listed]
+
+
+def test_batched_routing():
+    """One routing call per chunk; unanswered queries fall back to route_query"""
+    print("="*60)
+    print("TEST 1: Batched Routing")
+    print("="*60)
+
+    def responder(model, messages, **kwargs):
+        prompt = messages[-1]['content']
+        if "Classify each query" in prompt:
+            # Leave out the last query: it must be routed on its own
+            return "\n".join(f"{n}: {label}" for n, label in _route_lines(prompt)[:-1])
+        query = re.search(r'User Query: "(.*)"', prompt).group(1)
+        return "ANALYTICS" if ANALYTICS_WORDS.search(query) else "LOOKUP"
+
+    backend = StubBackend(responder)
+    set_gateway(LLMGateway(backend=backend, limits=LIMITS))
+    try:
+        processor = QueryProcessor(NameResolver(), api_key="test-key")
+        queries = [
+            "Who is going to Paris?",
+            "Which restaurants are the MOST popular?",
+            "What types of cars do clients rent?",
+            "Which clients requested the SAME hotel?",
+        ]
+        routes = processor.route_queries(queries)
+        batched = [call for call in backend.calls if "Classify each query" in call['messages'][-1]['content']]
+
+        # Chunks of one use the single-query prompt
+        single = processor.route_queries(["Who has the MOST bookings?"], chunk_size=1)
+        plans = processor.process("Who is going to Paris?", route="ANALYTICS")
+    finally:
+        set_gateway(None)
+
+    assert routes == ["LOOKUP", "ANALYTICS", "LOOKUP", "ANALYTICS"], routes
+    assert len(batched) == 1 and len(backend.calls) == 3  # batch + fallback for the last + single
+    assert '"What types of cars' not in batched[0]['messages'][-1]['content']  # pre-filtered
+    assert single == ["ANALYTICS"]
+    assert plans[0]['route'] == "ANALYTICS" and plans[0]['query'] == "Who is going to Paris?"
+
+    # Without an LLM everything is LOOKUP
+    offline = _quiet(QueryProcessor, NameResolver(), use_llm=False)
+    assert offline.route_queries(queries) == ["LOOKUP"] * 4
+
+    # The load-test stub answers the batched prompt by the same keyword rule
+    from benchmarks.llm_stub_server import stub_content
+    content = stub_content({'messages': batched[0]['messages']})
+    assert content == "1: LOOKUP\n2: ANALYTICS\n3: ANALYTICS", content
+
+    print(f"✓ {len(queries)} queries → 1 batched call (+1 fallback), routes {routes}")
+    print("✓ 'What types of' pre-filtered; no LLM → LOOKUP; process(route=...) skips routing")
+    print("✅ PASSED")
+
+
+class CountingVectors(LocalVectorSearch):
+    """LocalVectorSearch counting batch and per-query embeddings"""
+
+    def __init__(self):
+        super().__init__()
+        self.batch_calls = []
+        self.single_embeds = 0
+
+    def embed_queries(self, queries):
+        self.batch_calls.append(list(queries))
+        return super().embed_queries(queries)
+
+    def search(self, query, top_k=10, date_range=None, user_id=None, verbose=False, query_vector=None):
+        if query_vector is None:
+            self.single_embeds += 1
+        return super().search(query, top_k=top_k, date_range=date_range, user_id=user_id,
+                              verbose=verbose, query_vector=query_vector)
+
+
+def _batch_system(latency):
+    """QASystem on data/ with in-process vectors and a stub LLM (latency per call)"""
+    from src.qa_system import QASystem
+    from src.answer_generator import AnswerGenerator
+
+    state = {'in_flight': 0, 'peak': 0, 'answers': 0}
+    lock = threading.Lock()
+
+    def responder(model, messages, **kwargs):
+        prompt = messages[-1]['content']
+        if "Classify each query" in prompt:
+            return "\n".join(f"{n}: {label}" for n, label in _route_lines(prompt))
+        if "Respond with ONLY one word" in prompt:
+            return "LOOKUP"
+        if "query decomposition expert" in prompt:
+            query = re.search(r'Query: "(.*)"', prompt).group(1)
+            if query.startswith("Compare"):
+                return json.dumps(["What are Vikram Desai's dining preferences?",
+                                   "What are Layla Kawaguchi's dining preferences?"])
+            return json.dumps([query])
+        return "a generated answer"
+
+    class Backend(StubBackend):
+        def create(self, timeout, **kwargs):
+            prompt = kwargs['messages'][-1]['content']
+            answer = not any(marker in prompt for marker in PLANNING_PROMPTS)
+            with lock:
+                state['in_flight'] += answer
+                state['peak'] = max(state['peak'], state['in_flight'])
+            try:
+                return super().create(timeout, **kwargs)
+            finally:
+                with lock:
+                    state['in_flight'] -= answer
+                    state['answers'] += answer
+
+    backend = Backend(responder, latency=latency)
+    set_gateway(LLMGateway(backend=backend, limits=LIMITS))
+
+    vectors = CountingVectors()
+    offline = SimpleNamespace(
+        retriever=SimpleNamespace(qdrant_search=vectors),
+        generator=AnswerGenerator(api_key="test-key")
+    )
+    system = _quiet(QASystem, groq_api_key="test-key", shared_from=offline)
+    messages = list(system.retriever.bm25_search.messages)
+    vectors.upsert_messages(messages, point_ids=list(range(len(messages))))
+    return system, vectors, backend, state
+
+
+def test_shared_work_and_bounded_generation():
+    """Duplicates are answered once, sub-queries embedded once, generation bounded"""
+    print("\n" + "="*60)
+    print("TEST 2: Shared Retrieval and Bounded Generation")
+    print("="*60)
+
+    questions = [
+        "What are Vikram Desai's dining preferences?",
+        "Compare the dining preferences of Vikram Desai and Layla Kawaguchi",
+        "what are vikram desai's dining preferences",  # same question, other spelling
+        "Which clients requested a private tour of the Louvre?",
+        "Which clients have plans for December 2025?",
+        "Who requested a personal shopper in Milan?",
+        "What are Layla Kawaguchi's dining preferences?",
+        "Which clients booked a chauffeur in Tokyo?",
+    ]
+    system, vectors, backend, state = _batch_system(latency=0.1)
+    try:
+        stats = {}
+        start = time.perf_counter()
+        with start_trace("POST /ask/batch") as trace:
+            done = list(system.answer_batch(questions, top_k=5, llm_concurrency=2, stats=stats))
+        batch_seconds = time.perf_counter() - start
+    finally:
+        set_gateway(None)
+
+    # Every question answered exactly once, equivalent ones together
+    indices = sorted(i for item in done for i in item['indices'])
+    assert indices == list(range(len(questions)))
+    assert len(done) == stats['unique_questions'] == 7 and stats['questions'] == 8
+    merged = next(item for item in done if 0 in item['indices'])
+    assert merged['indices'] == [0, 2] and merged['result']['answer'] == "a generated answer"
+    assert all('result' in item and item['result']['route'] == "LOOKUP" for item in done)
+
+    # "Compare ..." decomposes into two sub-queries already asked on their own
+    assert stats['sub_queries'] == 8 and stats['unique_sub_queries'] == 6, stats
+    assert len(vectors.batch_calls) == 1 and len(vectors.batch_calls[0]) == 6
+    assert vectors.single_embeds == 0 and stats['batch_embedded']
+
+    # One routing call for the whole batch; answers never exceed llm_concurrency
+    routing = [c for c in backend.calls if "Classify each query" in c['messages'][-1]['content']]
+    assert len(routing) == 1 and stats['routes'] == {'LOOKUP': 7, 'ANALYTICS': 0}
+    assert state['answers'] == 7 and state['peak'] <= 2, state
+
+    # Work done on the pool threads is part of the batch trace
+    stages = trace.timings()['stages']
+    for name in ("query_processor.route_queries", "retriever.embed_queries", "retriever.bm25",
+                 "answer_generator.generate", "llm.answer_generator"):
+        assert name in stages, name
+
+    print(f"✓ {stats['questions']} questions → {stats['unique_questions']} answered, "
+          f"{stats['sub_queries']} sub-queries → {stats['unique_sub_queries']} retrieved")
+    print(f"✓ 1 routing call, 1 embedding call of {len(vectors.batch_calls[0])} queries, 0 per-query embeddings")
+    print(f"✓ Peak concurrent answer generations: {state['peak']} (limit 2), {batch_seconds:.2f}s")
+    print("✅ PASSED")
+
+
+def test_batch_throughput():
+    """A batch finishes far sooner than the same questions one by one"""
+    print("\n" + "="*60)
+    print("TEST 3: Batch vs Sequential Throughput")
+    print("="*60)
+
+    questions = [f"Which clients requested a {thing}?" for thing in
+                 ("private tour of the Louvre", "personal shopper in Milan", "yacht in Monaco",
+                  "chauffeur in Tokyo", "table at Noma", "suite in London", "spa day", "helicopter tour")]
+    system, _, _, _ = _batch_system(latency=0.15)
+    try:
+        start = time.perf_counter()
+        for question in questions:
+            system.answer(question, top_k=5)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        done = list(system.answer_batch(questions, top_k=5, llm_concurrency=4))
+        batched = time.perf_counter() - start
+    finally:
+        set_gateway(None)
+
+    assert len(done) == len(questions) and all('result' in item for item in done)
+    assert batched * 2.5 < sequential, (batched, sequential)
+
+    print(f"✓ {len(questions)} questions: sequential {sequential:.2f}s, batch {batched:.2f}s "
+          f"({sequential / batched:.1f}x)")
+    print("✅ PASSED")
+
+
+def test_api_streaming():
+    """/ask/batch streams one NDJSON line per question, then a summary"""
+    print("\n" + "="*60)
+    print("TEST 4: /ask/batch NDJSON Stream")
+    print("="*60)
+
+    from fastapi.testclient import TestClient
+    import api
+
+    class BatchSystem:
+        def __init__(self):
+            self.calls = []
+
+        def answer_batch(self, queries, stats=None, **kwargs):
+            self.calls.append(kwargs)
+            stats.update(questions=len(queries), unique_questions=3, sub_queries=3, unique_sub_queries=2)
+            # Completion order differs from request order
+            yield {'indices': [2], 'query': queries[2], 'error': "LLM unavailable"}
+            yield {'indices': [1], 'query': queries[1],
+                   'result': {'answer': "3 members", 'route': 'ANALYTICS', 'sources': [], 'query_plans': [{}]}}
+            yield {'indices': [0, 3], 'query': queries[0],
+                   'result': {'answer': "Layla", 'route': 'LOOKUP', 'num_sources': 1, 'model': MODEL,
+                              'sources': [{'user_id': 'u1', 'text': "Paris in May", 'score': 0.9}]}}
+
+    system = BatchSystem()
+    original = api.load_qa_system
+    api.load_qa_system = lambda previous: system
+    try:
+        with TestClient(api.app) as client:
+            deadline = time.time() + 5
+            while client.get("/ready").status_code != 200:
+                assert time.time() < deadline, "API never became ready"
+                time.sleep(0.02)
+
+            questions = ["Who is going to Paris?", "Which hotel is the MOST popular?",
+                         "Who booked Noma?", "who is going to paris"]
+            with client.stream("POST", "/ask/batch", json={"questions": questions}) as response:
+                content_type = response.headers['content-type']
+                lines = [json.loads(line) for line in response.iter_lines() if line]
+
+            empty = client.post("/ask/batch", json={"questions": ["ok", "  "]})
+            too_many = client.post("/ask/batch", json={"questions": ["q"] * (api.BATCH_MAX_QUESTIONS + 1)})
+            none = client.post("/ask/batch", json={"questions": []})
+    finally:
+        api.load_qa_system = original
+
+    assert response.status_code == 200 and content_type.startswith("application/x-ndjson")
+    answers, summary = lines[:-1], lines[-1]
+    assert [line['index'] for line in answers] == [2, 1, 0, 3]
+    assert answers[0] == {'index': 2, 'question': "Who booked Noma?", 'success': False, 'error': "LLM unavailable"}
+    assert answers[1]['metadata']['route'] == "ANALYTICS" and answers[1]['metadata']['confidence'] == "high"
+    assert answers[2]['answer'] == answers[3]['answer'] == "Layla"
+    assert answers[3]['question'] == "who is going to paris" and answers[3]['metadata']['shared_with'] == [0]
+    assert answers[2]['metadata']['sources'][0]['text'] == "Paris in May"
+
+    assert summary['done'] and summary['success'] and summary['errors'] == 1
+    assert summary['questions'] == 4 and summary['unique_sub_queries'] == 2 and summary['trace_id']
+    assert system.calls[0]['llm_concurrency'] == api.BATCH_LLM_CONCURRENCY
+    assert empty.status_code == 400 and "Question 1" in empty.json()['message']
+    assert too_many.status_code == 400 and none.status_code == 422
+
+    print(f"✓ {len(answers)} answer lines in completion order + summary ({summary['processing_time_ms']}ms)")
+    print("✓ Equivalent questions share an answer; a failed question does not fail the batch")
+    print("✓ Empty / oversized batches rejected")
+    print("✅ PASSED")
+
+
+def main():
+    """Run all tests"""
+    test_batched_routing()
+    test_shared_work_and_bounded_generation()
+    test_batch_throughput()
+    test_api_streaming()
+
+    print("\n" + "="*60)
+    print("ALL TESTS PASSED ✅")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
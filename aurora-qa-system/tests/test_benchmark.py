@@ -0,0 +1,178 @@
+"""
+Benchmark Testing Script
+Checks the offline benchmark building blocks: recorded/replayed LLM
+responses, the local Qdrant stand-in, a small end-to-end benchmark run
+with regression comparison, and full coverage by the shipped recordings
+"""
+import sys
+import os
+import json
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.llm_gateway import LLMGateway, StubBackend, RecordedBackend
+from src.local_vector_search import LocalVectorSearch
+
+
+def test_record_and_replay():
+    """Recorded responses replay identically; unrecorded requests fall back"""
+    print("="*60)
+    print("TEST 1: Record and Replay LLM Responses")
+    print("="*60)
+
+    path = os.path.join(tempfile.mkdtemp(), "recordings", "llm.json")
+    live = StubBackend(lambda model, messages, **kwargs: f"answer to {messages[-1]['content']}")
+    messages = [{"role": "user", "content": "Who is going to London?"}]
+
+    recorder = RecordedBackend(path, backend=live)
+    gateway = LLMGateway(backend=recorder)
+    recorded = gateway.client("bench").chat.completions.create(
+        model="llama-3.3-70b-versatile", messages=messages, temperature=0.3, max_tokens=100)
+    recorder.save()
+    assert recorder.counts['recorded'] == 1 and os.path.exists(path)
+
+    replayer = RecordedBackend(path)
+    gateway = LLMGateway(backend=replayer)
+    client = gateway.client("bench").chat.completions
+    replayed = client.create(model="llama-3.3-70b-versatile", messages=messages, temperature=0.3, max_tokens=100)
+    assert replayed.choices[0].message.content == recorded.choices[0].message.content
+    assert replayed.usage.prompt_tokens == recorded.usage.prompt_tokens
+
+    # Any change to the request is a different recording
+    missed = client.create(model="llama-3.3-70b-versatile", messages=messages, temperature=0.0, max_tokens=100)
+    assert missed.choices[0].message.content == RecordedBackend.FALLBACK_TEXT
+    assert replayer.counts == {'recorded': 0, 'replayed': 1, 'fallback': 1}
+
+    print(f"✓ Recorded → replayed: '{replayed.choices[0].message.content}'")
+    print("✓ Unrecorded request → fallback placeholder (counted)")
+    print("✅ PASSED")
+
+
+def test_local_vector_search():
+    """Same result format and filters as QdrantSearch"""
+    print("\n" + "="*60)
+    print("TEST 2: Local Vector Search")
+    print("="*60)
+
+    messages = [
+        {'id': 'a', 'user_id': 'u1', 'user_name': 'Layla Kawaguchi', 'timestamp': '2025-01-01T00:00:00',
+         'message': "Book me a suite in London for the opera", 'normalized_dates': ['2025-12-05']},
+        {'id': 'b', 'user_id': 'u2', 'user_name': 'Vikram Desai', 'timestamp': '2025-01-02T00:00:00',
+         'message': "Arrange a car service to the airport in Tokyo", 'normalized_dates': ['2025-11-20']},
+        {'id': 'c', 'user_id': 'u1', 'user_name': 'Layla Kawaguchi', 'timestamp': '2025-01-03T00:00:00',
+         'message': "Reserve opera tickets in Milan", 'normalized_dates': []},
+    ]
+    vectors = LocalVectorSearch()
+    assert vectors.search("opera") == []
+    vectors.upsert_messages(messages, point_ids=[0, 1, 2], batch_size=2)
+    assert len(vectors) == 3
+
+    results = vectors.search("opera tickets Milan", top_k=2)
+    assert results[0]['id'] == 2 and len(results) == 2
+    assert set(results[0]) == {'id', 'score', 'message', 'user_id', 'user_name', 'timestamp', 'normalized_dates'}
+
+    assert [r['id'] for r in vectors.search("opera", top_k=5, user_id='u2')] == [1]
+    dated = vectors.search("opera", top_k=5, date_range=('2025-12-01T00:00:00', '2025-12-31T23:59:59'))
+    assert [r['id'] for r in dated] == [0]
+
+    # Upserting an existing point id overwrites it
+    vectors.upsert_messages([{**messages[1], 'message': "opera tickets in Milan please"}], point_ids=[1])
+    assert len(vectors) == 3 and vectors.search("opera tickets in Milan please", top_k=1)[0]['id'] == 1
+
+    print("✓ Qdrant result format, ranked by cosine similarity")
+    print("✓ user_id and normalized date range filters")
+    print("✓ Upsert overwrites by point id")
+    print("✅ PASSED")
+
+
+def test_benchmark_run_and_compare():
+    """A small offline run yields latency, throughput and quality; compare() flags regressions"""
+    print("\n" + "="*60)
+    print("TEST 3: Benchmark Run and Regression Check")
+    print("="*60)
+
+    from benchmarks.retrieval_benchmark import run_benchmark, compare, relevant_ids
+
+    data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
+    recordings = os.path.join(tempfile.mkdtemp(), "none.json")
+    result = run_benchmark(data_dir=data_dir, repeat=1, warmup=0, recordings=recordings,
+                           query_ids=["Q1", "Q7", "Q10"])
+    json.dumps(result)
+
+    assert result['errors'] == [] and result['throughput']['queries'] == 3
+    assert result['latency_ms']['end_to_end']['n'] == 3
+    assert 'retriever.bm25' in result['latency_ms']['stages']
+    assert result['quality']['queries'] == 3 and 0.0 <= result['quality']['recall@10'] <= 1.0
+    assert result['llm']['fallback'] > 0 and result['memory']['peak_rss_mb'] > 0
+
+    assert compare(result, result) == []
+    slower = json.loads(json.dumps(result))
+    slower['latency_ms']['end_to_end']['p95'] *= 2
+    slower['quality']['mrr'] = result['quality']['mrr'] - 0.5
+    regressions = compare(slower, result)
+    assert any(r.startswith("end_to_end p95") for r in regressions)
+    assert any(r.startswith("mrr") for r in regressions)
+
+    messages = [{'id': 'x', 'user_name': 'A', 'message': "Louvre tour", 'normalized_dates': ['2025-12-01']},
+                {'id': 'y', 'user_name': 'B', 'message': "louvred shutters", 'normalized_dates': []}]
+    assert relevant_ids({'all_of': [['louvre']]}, messages) == ['x']
+    assert relevant_ids({'user': 'B', 'all_of': [['louvre']]}, messages) == []
+    assert relevant_ids({'dates': ['2025-12-01', '2025-12-31']}, messages) == ['x']
+
+    e2e = result['latency_ms']['end_to_end']
+    print(f"✓ 3 queries: p50 {e2e['p50']}ms, recall@10 {result['quality']['recall@10']}")
+    print(f"✓ Regressions flagged: {regressions}")
+    print("✓ Labelling rules: word boundaries, author, date range")
+    print("✅ PASSED")
+
+
+def test_shipped_recordings():
+    """The shipped recordings answer every LLM call, on both routes, with or without GROQ_API_KEY"""
+    print("\n" + "="*60)
+    print("TEST 4: Shipped Recordings Cover the Query Set")
+    print("="*60)
+
+    from unittest.mock import patch
+    from benchmarks.retrieval_benchmark import run_benchmark, load_queries, RECORDINGS_PATH
+
+    assert os.path.exists(RECORDINGS_PATH)
+    data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
+    queries = load_queries()
+
+    results = []
+    for api_key in ("test-key", None):
+        with patch.dict(os.environ):
+            os.environ.pop('GROQ_API_KEY', None)
+            if api_key:
+                os.environ['GROQ_API_KEY'] = api_key
+            results.append(run_benchmark(data_dir=data_dir, repeat=1, warmup=0))
+
+    for result in results:
+        assert result['errors'] == [] and result['throughput']['queries'] == len(queries)
+        assert result['llm']['fallback'] == 0 and result['llm']['replayed'] > 0
+        by_route = result['latency_ms']['by_route']
+        assert set(by_route) == {'LOOKUP', 'ANALYTICS'}
+        assert by_route['ANALYTICS']['n'] == sum(1 for query in queries if query['id'].startswith('A'))
+    assert results[0]['quality'] == results[1]['quality']
+    assert results[0]['llm'] == results[1]['llm']
+
+    llm = results[0]['llm']
+    print(f"✓ {llm['replayed']} LLM calls replayed, 0 fallbacks, routes {sorted(results[0]['latency_ms']['by_route'])}")
+    print(f"✓ Same quality with and without GROQ_API_KEY: MRR {results[0]['quality']['mrr']}")
+    print("✅ PASSED")
+
+
+def main():
+    """Run all tests"""
+    test_record_and_replay()
+    test_local_vector_search()
+    test_benchmark_run_and_compare()
+    test_shipped_recordings()
+
+    print("\n" + "="*60)
+    print("ALL TESTS PASSED ✅")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
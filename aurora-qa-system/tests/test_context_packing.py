@@ -0,0 +1,120 @@
+"""
+Context Packing Testing Script
+Checks token-budgeted LLM context (duplicates, trimming, budget fill)
+and the static prompt prefix used by AnswerGenerator
+"""
+import sys
+import os
+import pickle
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.result_composer import ResultComposer
+from src.token_budget import estimate_tokens
+
+
+def _load_results(n=20):
+    with open('data/bm25.pkl', 'rb') as f:
+        messages = pickle.load(f)['messages']
+    return [(msg, 1.0 - i / 100) for i, msg in enumerate(messages[:n])]
+
+
+def test_budget_respected():
+    """Context never exceeds the budget and every candidate is accounted for"""
+    print("="*60)
+    print("TEST 1: Token Budget")
+    print("="*60)
+
+    composer = ResultComposer()
+    results = _load_results(20)
+
+    for budget in [50, 200, 5000]:
+        context, stats = composer.pack_context(results, "dining preferences", token_budget=budget)
+        assert estimate_tokens(context) <= budget
+        assert stats['kept'] + stats['dropped_duplicates'] + stats['dropped_budget'] == len(results)
+        print(f"✓ budget {budget}: kept {stats['kept']}, ~{stats['tokens']} tokens")
+
+    # A large budget keeps everything (no duplicates in the sample)
+    assert stats['kept'] == len(results) and stats['dropped_budget'] == 0
+
+    print("✅ PASSED")
+
+
+def test_duplicates_and_trimming():
+    """Near-duplicates are dropped, long messages keep their matching sentences"""
+    print("\n" + "="*60)
+    print("TEST 2: Duplicates and Trimming")
+    print("="*60)
+
+    composer = ResultComposer()
+    long_message = (
+        "Please renew my gym membership for another year. "
+        "Also update the billing address on file to my new apartment. "
+        "For Friday, book a table at Noma for four people at 8 PM. "
+        "Remind my assistant about the dry cleaning pickup next week. "
+        "Lastly, confirm the car service to the airport on Monday morning."
+    )
+    results = [
+        ({'id': 'a', 'user_name': 'Hans Müller', 'message': "Book a table at Noma for Friday night, please."}, 0.9),
+        ({'id': 'b', 'user_name': 'Hans Müller', 'message': "Book a table at Noma for Friday night please!"}, 0.8),
+        ({'id': 'c', 'user_name': 'Vikram Desai', 'message': long_message}, 0.7),
+    ]
+
+    context, stats = composer.pack_context(results, "Who booked a table at Noma?", max_message_tokens=30)
+
+    assert stats['dropped_duplicates'] == 1 and stats['kept'] == 2
+    assert stats['trimmed'] == 1
+    assert "book a table at Noma for four people" in context
+    assert "gym membership" not in context
+    # Composed order is kept: [1] Hans, [2] Vikram
+    assert context.startswith("[1] Hans Müller:") and "[2] Vikram Desai:" in context
+
+    # Same ID, edited text: the cached signature of the old text is not reused
+    edited = [results[0], ({'id': 'b', 'user_name': 'Hans Müller', 'message': long_message}, 0.8)]
+    context, stats = composer.pack_context(edited, "Who booked a table at Noma?", max_message_tokens=30)
+    assert stats['dropped_duplicates'] == 0 and stats['kept'] == 2
+
+    print(context)
+    print("✓ Signature cache follows edited message text")
+    print("✅ PASSED")
+
+
+def test_static_prompt_prefix():
+    """Prompt prefix is identical across queries; tokens reported per section"""
+    print("\n" + "="*60)
+    print("TEST 3: Static Prompt Prefix")
+    print("="*60)
+
+    from src.answer_generator import AnswerGenerator, USER_PROMPT_PREFIX
+
+    # Dummy key: no LLM calls are made by this test
+    generator = AnswerGenerator(api_key="test-key")
+    prompt_a = generator._build_prompt("Which clients booked Noma?", "[1] Hans Müller:\nBook Noma")
+    prompt_b = AnswerGenerator(api_key="test-key")._build_prompt("How many trips to Paris?", "[1] Vikram Desai:\nParis")
+
+    assert prompt_a.startswith(USER_PROMPT_PREFIX) and prompt_b.startswith(USER_PROMPT_PREFIX)
+    assert generator._get_system_prompt() is AnswerGenerator(api_key="test-key")._get_system_prompt()
+    assert prompt_a.endswith("QUESTION: Which clients booked Noma?\n\nAnswer:")
+    assert "bold client names" in prompt_a and "Start with the number" in prompt_b
+
+    breakdown = generator.prompt_token_breakdown("Which clients booked Noma?", "[1] Hans Müller:\nBook Noma")
+    sections = ['system', 'instructions', 'context', 'format_hint', 'question']
+    assert all(breakdown[name] > 0 for name in sections)
+    assert breakdown['total'] == sum(breakdown[name] for name in sections)
+
+    print(f"✓ Sections: {breakdown}")
+    print("✅ PASSED")
+
+
+def main():
+    """Run all tests"""
+    test_budget_respected()
+    test_duplicates_and_trimming()
+    test_static_prompt_prefix()
+
+    print("\n" + "="*60)
+    print("ALL TESTS PASSED ✅")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Extraction Batching Testing Script
+Checks the batched GLiNER / spaCy extraction paths against the one-message-
+at-a-time paths, with stub models (spaCy and GLiNER packages installed, no
+model downloads): GLiNER analyze_batch + pool workers, RuleBasedExtractor
+nlp.pipe batching and the location-phrase memo
+"""
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import spacy
+import torch
+from spacy.tokens import Doc
+from spacy.vocab import Vocab
+
+from src import entity_extraction_gliner
+from src.entity_extraction_gliner import GLiNEREntityExtractor, ENTITY_LABELS, _init_worker, _worker_models
+from src.rule_based_extractor import RuleBasedExtractor
+from src.extraction_cache import ExtractionCache
+from benchmarks.micro_benchmarks import _quiet
+
+# Hand-annotated parses: words, heads, deps, POS, lemmas
+PARSES = {
+    "I prefer aisle seats": (
+        ["I", "prefer", "aisle", "seats"], [1, 1, 3, 1],
+        ["nsubj", "ROOT", "compound", "dobj"], ["PRON", "VERB", "NOUN", "NOUN"], ["I", "prefer", "aisle", "seat"]
+    ),
+    "Update my BMW": (
+        ["Update", "my", "BMW"], [0, 2, 0],
+        ["ROOT", "poss", "dobj"], ["VERB", "PRON", "PROPN"], ["update", "my", "BMW"]
+    ),
+    "I visited London": (
+        ["I", "visited", "London"], [1, 1, 1],
+        ["nsubj", "ROOT", "dobj"], ["PRON", "VERB", "PROPN"], ["I", "visit", "London"]
+    ),
+    "We love Nobu": (
+        ["We", "love", "Nobu"], [1, 1, 1],
+        ["nsubj", "ROOT", "dobj"], ["PRON", "VERB", "PROPN"], ["we", "love", "Nobu"]
+    ),
+}
+LOCATIONS = {"London"}
+
+MESSAGES = [
+    {"id": "m1", "user_name": "Sophia Al-Farsi", "message": "I prefer aisle seats", "timestamp": "2024-01-01"},
+    {"id": "m2", "user_name": "Vikram Desai", "message": "Update my BMW", "timestamp": "2024-01-02"},
+    {"id": "m3", "user_name": "Hans Müller", "message": "I visited London", "timestamp": "2024-01-03"},
+    {"id": "m4", "user_name": "Layla Kawaguchi", "message": "We love Nobu", "timestamp": "2024-01-04"},
+    {"id": "m5", "user_name": "Vikram Desai", "message": "I visited London", "timestamp": "2024-01-05"},
+    {"id": "m6", "user_name": "Amira", "message": "", "timestamp": "2024-01-06"},
+]
+
+
+class StubNLP:
+    """spaCy pipeline stand-in: real Docs built from the annotated parses"""
+
+    meta = {'name': 'core_web_stub', 'version': '0.0.0'}
+    pipe_names = ['tagger', 'parser']
+
+    def __init__(self):
+        self.vocab = Vocab()
+        self.calls = []  # (kind, texts, disable)
+
+    def _parse(self, text):
+        if text in PARSES:
+            words, heads, deps, pos, lemmas = PARSES[text]
+            return Doc(self.vocab, words=words, heads=heads, deps=deps, pos=pos, lemmas=lemmas)
+        # Unannotated text (e.g. a candidate location phrase): tokens + NER only
+        words = text.split()
+        ents = ["B-GPE"] + ["I-GPE"] * (len(words) - 1) if text in LOCATIONS else ["O"] * len(words)
+        return Doc(self.vocab, words=words, ents=ents)
+
+    def __call__(self, text, disable=None):
+        self.calls.append(('call', [text], disable))
+        return self._parse(text)
+
+    def pipe(self, texts, batch_size=1000, n_process=1, disable=None):
+        texts = list(texts)
+        self.calls.append(('pipe', texts, disable))
+        return (self._parse(text) for text in texts)
+
+
+class StubGLiNER:
+    """GLiNER stand-in: capitalised words after the first are entities (numpy scores, like the model)"""
+
+    def __init__(self):
+        self.calls = []  # (kind, texts)
+
+    @classmethod
+    def from_pretrained(cls, name):
+        return cls()
+
+    def _entities(self, text):
+        entities, start = [], 0
+        for position, word in enumerate(text.split()):
+            start = text.index(word, start)
+            if position and word[0].isupper():
+                label = 'location' if word in LOCATIONS else 'service'
+                entities.append({'start': start, 'end': start + len(word), 'text': word,
+                                 'label': label, 'score': np.float32(0.9)})
+            start += len(word)
+        return entities
+
+    def predict_entities(self, text, labels, threshold=0.5):
+        self.calls.append(('predict', [text]))
+        return self._entities(text)
+
+    def batch_predict_entities(self, texts, labels, threshold=0.5, batch_size=8):
+        self.calls.append(('batch', list(texts)))
+        return [self._entities(text) for text in texts]
+
+
+def _stub_models():
+    """Patch model loading: GLiNER.from_pretrained / spacy.load return stubs"""
+    return (
+        patch.object(entity_extraction_gliner, 'GLiNER', StubGLiNER),
+        patch.object(spacy, 'load', lambda *args, **kwargs: StubNLP())
+    )
+
+
+def _gliner_extractor(cache=None):
+    gliner_patch, spacy_patch = _stub_models()
+    with gliner_patch, spacy_patch:
+        return _quiet(GLiNEREntityExtractor, gliner_model="stub-gliner", cache=cache)
+
+
+def _rule_extractor():
+    with patch.object(spacy, 'load', lambda *args, **kwargs: StubNLP()):
+        return _quiet(RuleBasedExtractor)
+
+
+def test_rule_based_pipe():
+    """nlp.pipe batch output equals per-message output"""
+    print("="*60)
+    print("TEST 1: Rule-Based nlp.pipe Batch")
+    print("="*60)
+
+    extractor = _rule_extractor()
+    per_message = [triple for message in MESSAGES for triple in extractor.extract_from_message(message)]
+
+    extractor = _rule_extractor()
+    batch = extractor.extract_from_messages_batch(MESSAGES, show_progress=False, batch_size=2)
+
+    assert batch == per_message
+    assert {(t['relationship'], t['object']) for t in batch} == {
+        ('PREFERS', 'aisle seats'), ('OWNS', 'my BMW'), ('VISITED', 'London'), ('PREFERS', 'Nobu')
+    }
+    # One pipe over the non-empty messages, message parse without NER
+    pipes = [call for call in extractor.nlp.calls if call[0] == 'pipe']
+    assert len(pipes) == 1
+    assert pipes[0][1] == [m['message'] for m in MESSAGES if m['message']]
+    assert pipes[0][2] == ['ner']
+
+    print(f"✓ {len(batch)} triples, batch == per-message")
+    print("✅ PASSED")
+
+
+def test_location_memo():
+    """Location NER runs once per phrase and the memo returns the same answer"""
+    print("\n" + "="*60)
+    print("TEST 2: Location Phrase Memo")
+    print("="*60)
+
+    extractor = _rule_extractor()
+    nlp = extractor.nlp
+
+    for phrase, expected in [("London", True), ("aisle seats", False)]:
+        first = extractor._is_location(phrase, None)
+        second = extractor._is_location(phrase, None)
+        assert first == second == expected
+        assert extractor._location_phrases[phrase] is expected
+        assert nlp.calls.count(('call', [phrase], None)) == 1
+
+    # "I visited London" twice in the batch: the memo answers the second time
+    extractor = _rule_extractor()
+    batch = extractor.extract_from_messages_batch(MESSAGES, show_progress=False)
+    assert [t['message_id'] for t in batch if t['relationship'] == 'VISITED'] == ['m3', 'm5']
+    assert extractor.nlp.calls.count(('call', ['London'], None)) == 1
+
+    print("✓ One NER call per phrase, same result from the memo")
+    print("✅ PASSED")
+
+
+def test_gliner_analyze_batch():
+    """Batched GLiNER + nlp.pipe output equals per-message output, cached or not"""
+    print("\n" + "="*60)
+    print("TEST 3: GLiNER analyze_batch")
+    print("="*60)
+
+    extractor = _gliner_extractor()
+    per_message = [extractor.extract_from_message(message) for message in MESSAGES]
+
+    extractor = _gliner_extractor()
+    batch = extractor.extract_batch_by_message(MESSAGES, show_progress=False, batch_size=4)
+    assert batch == per_message
+    assert sum(len(triples) for triples in batch) >= 5
+    # One batched GLiNER call and one nlp.pipe for the whole chunk
+    assert extractor.gliner.calls == [('batch', [m['message'] for m in MESSAGES])]
+    assert [call[0] for call in extractor.nlp.calls] == ['pipe']
+
+    # Cached: the second run reads entities and parses back, no model calls
+    cache = ExtractionCache(":memory:")
+    extractor = _gliner_extractor(cache=cache)
+    assert extractor.extract_batch_by_message(MESSAGES, show_progress=False) == per_message
+    calls = (len(extractor.gliner.calls), len(extractor.nlp.calls))
+    assert extractor.extract_batch_by_message(MESSAGES, show_progress=False) == per_message
+    assert (len(extractor.gliner.calls), len(extractor.nlp.calls)) == calls
+    for entities, _ in extractor.analyze_batch(MESSAGES):
+        assert all(type(entity['score']) is float for entity in entities)
+
+    print(f"✓ {sum(len(t) for t in batch)} triples, batch == per-message, cached rerun makes no model calls")
+    print("✅ PASSED")
+
+
+def test_gliner_pool_workers():
+    """Pool workers (_init_worker models) give the same analyses as in-process batching"""
+    print("\n" + "="*60)
+    print("TEST 4: GLiNER Pool Workers")
+    print("="*60)
+
+    gliner_patch, spacy_patch = _stub_models()
+    with gliner_patch, spacy_patch:
+        _init_worker("stub-gliner", ENTITY_LABELS, torch.get_num_threads())
+    assert isinstance(_worker_models['gliner'], StubGLiNER)
+    assert isinstance(_worker_models['nlp'], StubNLP)
+    assert _worker_models['labels'] == ENTITY_LABELS
+
+    extractor = _gliner_extractor()
+    in_process = extractor.analyze_batch(MESSAGES, batch_size=4)
+
+    # Threads stand in for the process pool: same submit/result protocol,
+    # parses still cross as Doc bytes into the parent's vocab
+    try:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            pooled = extractor.analyze_batch(MESSAGES, batch_size=4, pool=pool, n_process=2)
+        worker_calls = _worker_models['gliner'].calls
+    finally:
+        _worker_models.clear()
+
+    assert len(worker_calls) == 2  # one shard per worker
+    for message, (entities, doc), (pool_entities, pool_doc) in zip(MESSAGES, in_process, pooled):
+        assert pool_entities == entities
+        assert [(t.text, t.dep_, t.head.i, t.pos_) for t in pool_doc] == [(t.text, t.dep_, t.head.i, t.pos_) for t in doc]
+        assert pool_doc.vocab is extractor.nlp.vocab
+        assert (extractor._triples_from_analysis(message, pool_entities, pool_doc)
+                == extractor.extract_from_message(message))
+
+    print(f"✓ {len(MESSAGES)} messages over 2 workers, same entities, parses and triples")
+    print("✅ PASSED")
+
+
+def main():
+    """Run all tests"""
+    test_rule_based_pipe()
+    test_location_memo()
+    test_gliner_analyze_batch()
+    test_gliner_pool_workers()
+
+    print("\n" + "="*60)
+    print("ALL TESTS PASSED ✅")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
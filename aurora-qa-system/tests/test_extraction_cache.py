@@ -0,0 +1,162 @@
+"""
+Extraction Cache Testing Script
+Checks content-addressed keys, per-stage storage and incremental
+LLM re-extraction (only new or changed messages are sent)
+"""
+import sys
+import os
+import json
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.extraction_cache import ExtractionCache, cache_key
+from src.llm_gateway import LLMGateway, StubBackend, LLMError, set_gateway
+from src.llm_extractor import LLMSemanticExtractor
+from src.extraction_executor import BatchExtractionExecutor
+
+MODEL = "llama-3.1-8b-instant"
+
+
+def test_keys_and_stages():
+    """Keys change with any input; stages are stored separately and persist"""
+    print("="*60)
+    print("TEST 1: Keys and Stages")
+    print("="*60)
+
+    base = cache_key("Book Noma for Friday", "Hans Müller", "llm", MODEL, "v1")
+    variants = [
+        cache_key("Book Noma for Saturday", "Hans Müller", "llm", MODEL, "v1"),
+        cache_key("Book Noma for Friday", "Vikram Desai", "llm", MODEL, "v1"),
+        cache_key("Book Noma for Friday", "Hans Müller", "gliner", MODEL, "v1"),
+        cache_key("Book Noma for Friday", "Hans Müller", "llm", "other-model", "v1"),
+        cache_key("Book Noma for Friday", "Hans Müller", "llm", MODEL, "v2"),
+    ]
+    assert base == cache_key("Book Noma for Friday", "Hans Müller", "llm", MODEL, "v1")
+    assert len(set(variants + [base])) == 6
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.db")
+        cache = ExtractionCache(path)
+        cache.put('llm_triples', base, [{'subject': 'Hans Müller', 'object': 'Noma'}], message_id='m1')
+        cache.put('spacy_parses', base, b'\x00\x01parse')
+        assert cache.get('gliner_entities', base) is None
+        cache.close()
+
+        cache = ExtractionCache(path)
+        assert cache.get('llm_triples', base) == [{'subject': 'Hans Müller', 'object': 'Noma'}]
+        assert cache.get('spacy_parses', base) == b'\x00\x01parse'
+        stats = cache.stats()
+        assert stats['llm_triples'] == {'hits': 1, 'misses': 0, 'entries': 1}
+        assert stats['gliner_entities']['entries'] == 0
+        cache.close()
+
+    print("✓ 6 distinct keys, 3 separate stages, persisted across reopen")
+    print("✅ PASSED")
+
+
+def test_incremental_llm_extraction():
+    """Rebuilds only send new or changed messages to the LLM"""
+    print("\n" + "="*60)
+    print("TEST 2: Incremental LLM Extraction")
+    print("="*60)
+
+    def responder(model, messages, **kwargs):
+        prompt = messages[-1]['content']
+        count = prompt.count('\n', prompt.index('**Messages to analyze:**'), prompt.index('**Output (JSON'))
+        return json.dumps({str(i): [{"relationship": "PREFERS", "object": "aisle seats"}] for i in range(1, count)})
+
+    backend = StubBackend(responder)
+    set_gateway(LLMGateway(backend=backend, limits={MODEL: {'rpm': 1000, 'tpm': 200000, 'concurrency': 4}}))
+    extractor = LLMSemanticExtractor(api_key="test-key")
+
+    messages = [
+        {"id": f"m{i}", "user_name": "Layla Kawaguchi", "message": f"I prefer aisle seats on trip {i}.",
+         "timestamp": "2024-01-01"}
+        for i in range(12)
+    ]
+    cache = ExtractionCache(":memory:")
+
+    BatchExtractionExecutor(extractor, cache=cache).run(messages, show_progress=False)
+    first_calls = len(backend.calls)
+    assert first_calls > 0 and cache.count('llm_triples') == 12
+
+    # Unchanged corpus: nothing is sent
+    executor = BatchExtractionExecutor(extractor, cache=cache)
+    executor.run(messages, show_progress=False)
+    assert len(backend.calls) == first_calls and executor.stats['cached'] == 12
+
+    # One edited message + one new message (same text as m0, new id)
+    edited = [dict(m) for m in messages]
+    edited[3]['message'] = "I prefer window seats on trip 3."
+    edited.append({**messages[0], "id": "m-new", "timestamp": "2024-02-01"})
+
+    executor = BatchExtractionExecutor(extractor, cache=cache)
+    results = executor.run(edited, show_progress=False)
+    assert executor.stats['cached'] == 12 and executor.stats['prompts'] == 1
+    assert len(backend.calls) == first_calls + 1
+    assert results['m-new'][0]['message_id'] == 'm-new'
+    assert results['m-new'][0]['timestamp'] == '2024-02-01'
+
+    # Prompt version bump invalidates the LLM stage
+    extractor.prompt_version = "triples-test-bump"
+    executor = BatchExtractionExecutor(extractor, cache=cache)
+    executor.run(messages, show_progress=False)
+    assert executor.stats['cached'] == 0
+
+    set_gateway(None)
+    print(f"✓ First run {first_calls} prompts, unchanged rerun 0, edit + new message 1")
+    print("✅ PASSED")
+
+
+def test_failures_not_cached():
+    """A failing extractor leaves no cache entry, so the next run retries"""
+    print("\n" + "="*60)
+    print("TEST 3: Failures Not Cached")
+    print("="*60)
+
+    def failing(model, messages, **kwargs):
+        raise LLMError("bad request", status_code=400)
+
+    backend = StubBackend(failing)
+    set_gateway(LLMGateway(backend=backend, limits={MODEL: {'rpm': 1000, 'tpm': 200000, 'concurrency': 4}}))
+    extractor = LLMSemanticExtractor(api_key="test-key")
+
+    messages = [
+        {"id": f"m{i}", "user_name": "Layla Kawaguchi", "message": f"I prefer aisle seats on trip {i}.",
+         "timestamp": "2024-01-01"}
+        for i in range(3)
+    ]
+    cache = ExtractionCache(":memory:")
+
+    executor = BatchExtractionExecutor(extractor, cache=cache)
+    results = executor.run(messages, show_progress=False)
+    assert results == {} and executor.stats['failed'] == 3
+    assert cache.count('llm_triples') == 0
+
+    # The provider recovers: nothing comes from the cache, all three are sent again
+    backend.responder = lambda model, messages, **kwargs: json.dumps(
+        {str(i): [{"relationship": "PREFERS", "object": "aisle seats"}] for i in range(1, 4)}
+    )
+    executor = BatchExtractionExecutor(extractor, cache=cache)
+    results = executor.run(messages, show_progress=False)
+    assert executor.stats['cached'] == 0 and len(results) == 3
+    assert cache.count('llm_triples') == 3
+
+    set_gateway(None)
+    print("✓ Failed extractions left no cache entries and were retried")
+    print("✅ PASSED")
+
+
+def main():
+    """Run all tests"""
+    test_keys_and_stages()
+    test_incremental_llm_extraction()
+    test_failures_not_cached()
+
+    print("\n" + "="*60)
+    print("ALL TESTS PASSED ✅")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+Graph Analytics Testing Script
+Checks that precomputed analytics aggregates match a full graph scan
+"""
+import sys
+import os
+import pickle
+import tempfile
+import subprocess
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from src.knowledge_graph import KnowledgeGraph
+from src.graph_analytics import GraphAnalytics
+from benchmarks.micro_benchmarks import _quiet
+
+
+def _load_analytics():
+    kg = KnowledgeGraph()
+    kg.load('data/knowledge_graph.pkl')
+    # Dummy key: no LLM calls are made by these tests
+    return GraphAnalytics(kg, api_key="test-key")
+
+
+def test_index_matches_graph_scan():
+    """Index-based SAME/MOST aggregates equal the scan-based ones"""
+    print("="*60)
+    print("TEST 1: Index vs Graph Scan")
+    print("="*60)
+
+    # Shipped graph carries its index, so load() doesn't rebuild it on every start
+    with open('data/knowledge_graph.pkl', 'rb') as f:
+        assert 'analytics_index' in pickle.load(f), "Shipped graph has no analytics_index"
+    print("✓ Shipped graph stores the analytics index")
+
+    analytics = _load_analytics()
+
+    for entity_type in ['restaurant', 'hotel', 'destination', 'service']:
+        triples = analytics._query_graph(entity_type, [entity_type])
+        assert analytics.kg.analytics_index.num_mentions(entity_type) == len(triples)
+
+        for method in ['SAME', 'MOST', 'SIMILAR']:
+            scanned = analytics._aggregate_triples(triples, method)
+            indexed = analytics._aggregate_from_index(entity_type, method)
+
+            if method == 'SIMILAR':
+                assert scanned == indexed, f"{entity_type}/{method} mismatch"
+                continue
+
+            scanned_sets = {k: set(v) for k, v in scanned.items()}
+            indexed_sets = {k: set(v) for k, v in indexed.items()}
+            assert scanned_sets == indexed_sets, f"{entity_type}/{method} mismatch"
+
+            counts = [len(users) for users in indexed.values()]
+            assert counts == sorted(counts, reverse=True), "Ranking not descending"
+
+        print(f"✓ {entity_type}: {len(triples)} mentions")
+
+    print("✅ PASSED")
+
+
+def test_incremental_update():
+    """New triples update entity counts without a rebuild"""
+    print("\n" + "="*60)
+    print("TEST 2: Incremental Update")
+    print("="*60)
+
+    kg = KnowledgeGraph()
+    kg.add_triple("Hans Müller", "RENTED/BOOKED", "a table at Noma", message_id="m1")
+    kg.add_triple("Vikram Desai", "RENTED/BOOKED", "dinner at Noma", message_id="m2")
+    kg.add_triple("Vikram Desai", "RENTED/BOOKED", "a suite at the Four Seasons", message_id="m3")
+
+    index = kg.analytics_index
+    assert index.ranked('restaurant', min_users=2) == [('Noma', ['Hans Müller', 'Vikram Desai'])]
+    assert index.ranked('hotel', min_users=2) == []
+    assert index.user_profiles('hotel') == {'Vikram Desai': ['Four Seasons']}
+
+    kg.add_triple("Hans Müller", "VISITED", "the Four Seasons lobby", message_id="m4")
+    assert index.ranked('hotel', top_k=1) == [('Four Seasons', ['Hans Müller', 'Vikram Desai'])]
+
+    print("✓ Counts follow new triples")
+    print("✅ PASSED")
+
+
+def test_similarity_groups():
+    """Similarity tiers come from sparse overlap counts"""
+    print("\n" + "="*60)
+    print("TEST 3: Similarity Groups")
+    print("="*60)
+
+    from src.similarity_engine import UserSimilarityEngine
+
+    engine = UserSimilarityEngine({
+        'A': ['Noma', 'Alinea', 'The Ivy', 'Le Bernardin'],
+        'B': ['Noma', 'Alinea', 'The Ivy'],
+        'C': ['Noma', 'Alinea', 'The Ivy', 'Osteria Francescana'],
+        'D': ['Le Bernardin', 'Osteria Francescana'],
+        'E': ['Le Bernardin', 'Osteria Francescana', 'River Café'],
+        'F': ['Eleven Madison Park'],
+    })
+    groups = engine.cluster()
+
+    assert groups['highly_similar'][0]['clients'] == ['A', 'B', 'C']
+    assert groups['highly_similar'][0]['shared'] == ['Alinea', 'Noma', 'The Ivy']
+    assert {'clients': ['D', 'E'], 'shared': ['Le Bernardin', 'Osteria Francescana'],
+            'score': 0.667} in groups['moderately_similar']
+    assert groups['individual'] == ['F']
+
+    pairs = engine.pairwise(metric='cosine', top_k=1)
+    assert pairs[0]['clients'] == ['A', 'B'] and len(pairs[0]['shared']) == 3
+
+    empty = UserSimilarityEngine({}).cluster()
+    assert empty['highly_similar'] == [] and empty['total_clients'] == 0
+
+    # 2,000 clients: top groups are picked on arrays, same ranking as listing every group
+    rng = np.random.default_rng(0)
+    venues = [f"Venue {i}" for i in range(400)]
+    weights = 1 / np.arange(1, 401) ** 0.8
+    engine = UserSimilarityEngine({
+        f"Client {i}": list(rng.choice(venues, size=rng.integers(1, 13), p=weights / weights.sum()))
+        for i in range(2000)
+    })
+    start = time.perf_counter()
+    top = engine.cluster(max_groups=10)
+    elapsed = time.perf_counter() - start
+    everything = engine.cluster(max_groups=10 ** 6)
+    for tier in ('highly_similar', 'moderately_similar'):
+        assert top[tier] == everything[tier][:10] and len(top[tier]) == 10
+    assert engine.pairwise(top_k=5) == engine.pairwise()[:5]
+    assert elapsed < 2.0, f"cluster() took {elapsed:.2f}s for 2,000 clients"
+
+    print(f"✓ Highly similar: {groups['highly_similar'][0]['clients']}")
+    print(f"✓ 2,000 clients clustered in {elapsed:.3f}s, top 10 == full ranking[:10]")
+    print("✅ PASSED")
+
+
+def test_entity_dictionary():
+    """Mined entities: alias clusters, types and one-pass matching"""
+    print("\n" + "="*60)
+    print("TEST 4: Entity Dictionary")
+    print("="*60)
+
+    from src.entity_dictionary import EntityDictionary
+
+    dictionary = EntityDictionary.mine([
+        ("RENTED/BOOKED", "a table at The French Laundry"),
+        ("PREFERS", "dinner at the French Laundry"),
+        ("RENTED/BOOKED", "a suite at the Ritz - Carlton in Kyoto"),
+        ("RENTED/BOOKED", "a suite at The Ritz in Paris"),
+        ("RENTED/BOOKED", "a table for two at River Cafe"),
+    ])
+
+    # Alias clustering: one canonical entity for both spellings
+    laundry = dictionary.match("lunch at french laundry")
+    assert [e['name'] for e in laundry] == ['The French Laundry']
+    assert laundry[0]['type'] == 'restaurant'
+    assert dictionary.canonical_name("the River Café") == 'The River Café'
+
+    # Longest match wins within a type, other types may overlap
+    names = [(e['name'], e['type']) for e in dictionary.match("a suite at the Ritz-Carlton in Kyoto")]
+    assert names == [('Ritz-Carlton', 'hotel'), ('Kyoto', 'destination')]
+
+    # Contained names merge within a type; one-word venues need more than one mention
+    dictionary = EntityDictionary.mine([
+        ("RENTED/BOOKED", "a wine tasting tour in Napa Valley"),
+        ("RENTED/BOOKED", "a private wine tour in Napa"),
+        ("PREFERS", "a table for two at Nobu London"),
+        ("RENTED/BOOKED", "a reservation for six at Nobu tomorrow"),
+        ("RENTED/BOOKED", "a dinner at Daniel 's in New York"),
+        ("PREFERS", "the villa at the Cote d'Azur"),
+        ("RENTED/BOOKED", "a suite at the Ice Hotel"),
+        ("RENTED/BOOKED", "dinner at Cipriani"),
+        ("RENTED/BOOKED", "lunch at Cipriani"),
+    ])
+    assert [e['name'] for e in dictionary.match("a wine tour in napa")] == ['Napa Valley']
+    assert [e['name'] for e in dictionary.match("dinner at Nobu")] == ['Nobu London']
+    assert dictionary.match("Daniel") == [] and dictionary.match("Cote") == []
+    assert dictionary.canonical_name("the Ice Hotel") == 'Ice Hotel'
+    assert dictionary.match("Cipriani")[0]['type'] == 'restaurant'
+    # Contained in two names of its type: ambiguous, stays on its own
+    dictionary = EntityDictionary.mine([("PREFERS", "dinner at Nobu"), ("PREFERS", "lunch at Nobu"),
+                                        ("PREFERS", "dinner at Nobu London"), ("PREFERS", "dinner at Nobu Malibu")])
+    names = {e['name'] for e in dictionary.match("Nobu, Nobu London, Nobu Malibu", 'restaurant')}
+    assert names == {'Nobu', 'Nobu London', 'Nobu Malibu'}
+
+    # Whole words only, ids survive a save/load round trip
+    assert dictionary.match("a spacious room") == []
+    restored = EntityDictionary.from_dict(dictionary.to_dict())
+    assert restored.match("The Ritz")[0]['id'] == dictionary.match("ritz")[0]['id']
+
+    # Graphs saved side by side keep their own dictionaries
+    directory = tempfile.mkdtemp()
+    first, second = KnowledgeGraph(), KnowledgeGraph()
+    first.add_triple("Hans Müller", "RENTED/BOOKED", "a table at Noma", message_id="m1")
+    second.add_triple("Vikram Desai", "RENTED/BOOKED", "a suite at the Ritz - Carlton", message_id="m2")
+    for graph in (first, second):
+        graph.rebuild_entity_dictionary()
+    _quiet(first.save, os.path.join(directory, "graph.pkl"))
+    _quiet(second.save, os.path.join(directory, "graph.pkl.tmp"))
+    reloaded = KnowledgeGraph()
+    _quiet(reloaded.load, os.path.join(directory, "graph.pkl"))
+    assert first.entity_dictionary.to_dict() != second.entity_dictionary.to_dict()
+    assert reloaded.entity_dictionary.to_dict() == first.entity_dictionary.to_dict()
+    assert sorted(os.listdir(directory)) == ['graph.entity_dictionary.pkl', 'graph.pkl',
+                                             'graph.pkl.tmp', 'graph.pkl.tmp.entity_dictionary.pkl']
+
+    print(f"✓ {len(dictionary.entities)} entities, types: {dictionary.types}")
+    print("✓ Napa → Napa Valley, Nobu → Nobu London; one-mention 'Daniel'/'Cote' dropped")
+    print("✓ Each graph file keeps its own <graph>.entity_dictionary.pkl")
+    print("✅ PASSED")
+
+
+def test_templated_answers():
+    """SAME/MOST/COUNT answers are rendered without an LLM call"""
+    print("\n" + "="*60)
+    print("TEST 5: Templated Answers")
+    print("="*60)
+
+    analytics = _load_analytics()
+    analytics.llm = None  # Any LLM call would fail loudly
+    analytics._extract_entity_info = lambda query, verbose=False: ('restaurant', 'MOST', [])
+
+    result = analytics.analyze("What are the most popular restaurants?")
+    top_entity, top_users = next(iter(result['aggregated_data'].items()))
+    assert result['answer'].startswith("**Most Popular Restaurants:**")
+    assert f"1. **{top_entity}** - Requested by {len(top_users)} clients" in result['answer']
+
+    from src.analytics_renderer import render_analytics_answer
+
+    aggregated = {'Noma': ['A', 'B', 'C'], 'Alinea': ['A', 'D'], 'The Ivy': ['E']}
+    same = render_analytics_answer(aggregated, 'restaurant', 'SAME')
+    assert "- **Noma**: Requested by A, B, C (3 clients)" in same
+    assert "The Ivy" not in same and "In total, 2 restaurants" in same
+
+    count = render_analytics_answer(aggregated, 'restaurant', 'COUNT')
+    assert count.startswith("**3 restaurants** were requested by **5 clients**.")
+
+    print(f"✓ {result['answer'].splitlines()[2]}")
+    print("✅ PASSED")
+
+
+def test_payload_budget():
+    """Analytics payloads stay within the token budget as data grows"""
+    print("\n" + "="*60)
+    print("TEST 6: Payload Token Budget")
+    print("="*60)
+
+    from src.analytics_payload import build_analytics_payload
+    from src.token_budget import estimate_tokens
+
+    small = {'Noma': ['Hans Müller', 'Vikram Desai'], 'Alinea': ['Hans Müller']}
+    payload, stats = build_analytics_payload(small, 'restaurant', 'MOST', token_budget=200)
+    assert payload == "Noma (2): Hans Müller; Vikram Desai\nAlinea (1): Hans Müller"
+    assert stats['entries_shown'] == stats['entries_total'] == 2
+
+    sizes = []
+    for n in [100, 1000, 10000]:
+        aggregated = {f"Venue {i}": [f"Client {j}" for j in range(i % 7 + 1)] for i in range(n)}
+        payload, stats = build_analytics_payload(aggregated, 'restaurant', 'MOST', token_budget=500)
+        assert estimate_tokens(payload) <= 500
+        assert stats['entries_shown'] < n and "more restaurants not shown" in payload
+        # Highest-ranked entities come first
+        assert " (7): " in payload.splitlines()[0]
+        sizes.append(stats['tokens'])
+
+    assert max(sizes) - min(sizes) < 50, "Payload size should not grow with the data"
+    assert stats['format'].startswith("one line per restaurant:")
+
+    # SIMILAR: the individual line counts against the budget too
+    similar = {
+        'highly_similar': [{'clients': [f"Client {i}", f"Client {i + 1}"], 'shared': ['Noma', 'Alinea', 'Nobu'],
+                            'score': 0.8} for i in range(200)],
+        'moderately_similar': [],
+        'individual': [f"Solo Client Number {i}" for i in range(500)]
+    }
+    for budget in [60, 300, 1200]:
+        payload, stats = build_analytics_payload(similar, 'restaurant', 'SIMILAR', token_budget=budget)
+        assert estimate_tokens(payload) <= budget
+        assert payload.splitlines()[-1].startswith("individual: ")
+    assert stats['format'].startswith("one line per group:") and "individual:" in stats['format']
+
+    print(f"✓ Payload tokens at 100/1k/10k entities: {sizes}")
+    print("✓ SIMILAR payloads (groups + individual line) stay within budget")
+    print("✅ PASSED")
+
+
+def test_script_imports():
+    """Scripts that put src/ itself on sys.path can still load the graph"""
+    print("\n" + "="*60)
+    print("TEST 7: Script-Style Imports")
+    print("="*60)
+
+    # As scripts/rebuild_triples_clean.py: sys.path[0] = scripts/, then 'src'
+    code = ("import sys; sys.path[0] = 'scripts'; sys.path.insert(0, 'src'); "
+            "from knowledge_graph import KnowledgeGraph; "
+            "kg = KnowledgeGraph(); kg.load('data/knowledge_graph.pkl'); "
+            "print(kg.graph.number_of_edges())")
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert int(result.stdout.strip().splitlines()[-1]) > 0
+
+    print("✓ `from knowledge_graph import KnowledgeGraph` works without the src package")
+    print("✅ PASSED")
+
+
+def main():
+    """Run all tests"""
+    test_index_matches_graph_scan()
+    test_incremental_update()
+    test_similarity_groups()
+    test_entity_dictionary()
+    test_templated_answers()
+    test_payload_budget()
+    test_script_imports()
+
+    print("\n" + "="*60)
+    print("ALL TESTS PASSED ✅")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
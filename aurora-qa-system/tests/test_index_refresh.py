@@ -0,0 +1,232 @@
+"""
+Index Refresh Testing Script
+Checks delta detection, delta-only BM25/user/graph updates with stable
+point ids, the versioned manifest, and failed-run recovery (before and
+during the publish)
+"""
+import sys
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.index_refresh import IndexRefresher, load_manifest
+from src.bm25_search import BM25Search
+from src.knowledge_graph import KnowledgeGraph
+
+
+class RecordingVectorIndex:
+    """Stands in for QdrantSearch: records upserted point ids"""
+
+    def __init__(self):
+        self.upserts = []
+
+    def upsert_messages(self, messages, point_ids):
+        self.upserts.append(dict(zip(point_ids, (m['message'] for m in messages))))
+        return len(messages)
+
+
+def recording_extractor(calls):
+    """One OWNS triple per message, recording which messages were sent"""
+    def extract(messages):
+        calls.append([m['id'] for m in messages])
+        return [
+            {'subject': m['user_name'], 'relationship': 'OWNS', 'object': m['message'].split()[-1].strip('.'),
+             'message_id': m['id'], 'timestamp': m['timestamp']}
+            for m in messages
+        ]
+    return extract
+
+
+def _copy_data(tmp):
+    for name in ('bm25.pkl', 'knowledge_graph.pkl', 'knowledge_graph.entity_dictionary.pkl'):
+        shutil.copy(os.path.join('data', name), os.path.join(tmp, name))
+    os.makedirs(os.path.join(tmp, 'user_indexed'))
+    shutil.copy('data/user_indexed/user_index.json', os.path.join(tmp, 'user_indexed', 'user_index.json'))
+
+
+def _feed(base_messages):
+    """Current corpus + 1 edited message + 2 new messages (one from a new user)"""
+    feed = [{k: m[k] for k in ('id', 'user_id', 'user_name', 'timestamp', 'message')} for m in base_messages]
+    feed[5] = {**feed[5], 'message': "Please book a table at Noma for next Friday."}
+    feed.append({'id': 'new-1', 'user_id': feed[0]['user_id'], 'user_name': feed[0]['user_name'],
+                 'timestamp': '2025-11-02T10:00:00+00:00', 'message': "I just bought a Zephyrcraft."})
+    feed.append({'id': 'new-2', 'user_id': 'user-new', 'user_name': 'Ines Okafor',
+                 'timestamp': '2025-11-03T10:00:00+00:00', 'message': "Book the Quillon suite for December 3rd."})
+    return feed
+
+
+def test_delta_refresh():
+    """Only the delta is normalised, embedded, tokenized and extracted"""
+    print("="*60)
+    print("TEST 1: Delta Refresh")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _copy_data(tmp)
+        vectors, calls = RecordingVectorIndex(), []
+        refresher = IndexRefresher(data_dir=tmp, vector_index=vectors, extract_triples=recording_extractor(calls))
+        refresher.load()
+        base = refresher.bm25.messages
+        n = len(base)
+        edited_id = base[5]['id']
+        old_edges = sum(1 for *_, mid in refresher.graph.graph.edges(data='message_id') if mid == edited_id)
+
+        report = refresher.refresh(_feed(base))
+
+        assert report['published'] and report['version'] == 1
+        assert (report['new'], report['changed'], report['unchanged']) == (2, 1, n - 1)
+        assert vectors.upserts == [{n: "I just bought a Zephyrcraft.",
+                                    n + 1: "Book the Quillon suite for December 3rd.",
+                                    5: "Please book a table at Noma for next Friday."}]
+        assert calls == [['new-1', 'new-2', edited_id]]
+
+        # Reload from disk: BM25 positions, user index, graph
+        bm25 = BM25Search()
+        bm25.load(os.path.join(tmp, 'bm25'), user_index_path=os.path.join(tmp, 'user_indexed', 'user_index.json'))
+        assert len(bm25.messages) == n + 2 and bm25.messages[n + 1]['id'] == 'new-2'
+        assert bm25.messages[n + 1]['normalized_dates'] == ['2025-12-03']
+        assert bm25.search("Quillon", top_k=1)[0][0]['id'] == 'new-2'
+        assert bm25.search("Zephyrcraft", top_k=1, user_id=base[0]['user_id'])[0][0]['id'] == 'new-1'
+        assert bm25.user_index['user-new'] == {'user_name': 'Ines Okafor', 'message_count': 1, 'message_indices': [n + 1]}
+
+        graph = KnowledgeGraph()
+        graph.load(os.path.join(tmp, 'knowledge_graph.pkl'))
+        edited_edges = [(u, v) for u, v, mid in graph.graph.edges(data='message_id') if mid == edited_id]
+        assert edited_edges == [(base[5]['user_name'], 'Friday')]
+        assert 'Ines Okafor' in graph.user_index and 'zephyrcraft' in graph.entity_index
+        # The re-mined dictionary is published under the graph's name, no temp files left
+        assert graph.entity_dictionary.to_dict() == refresher.graph.entity_dictionary.to_dict()
+        assert not [name for name in os.listdir(tmp) if '.tmp' in name]
+
+        manifest = load_manifest(tmp)
+        assert manifest['version'] == 1 and 'pending_version' not in manifest
+        assert list(manifest['steps']) == ['dates', 'vectors', 'bm25', 'graph']
+        assert all(step['version'] == 1 and step['messages'] == 3 for step in manifest['steps'].values())
+        assert manifest['steps']['graph']['triples_removed'] == old_edges
+
+        # Unchanged feed: nothing sent anywhere, version unchanged
+        report = refresher.refresh(_feed(base))
+        assert not report['published'] and report['version'] == 1 and len(vectors.upserts) == 1 and len(calls) == 1
+
+    print(f"✓ {n} indexed, delta 2 new + 1 changed, {old_edges} stale edges dropped")
+    print("✓ New user indexed, manifest version 1, unchanged rerun is a no-op")
+    print("✅ PASSED")
+
+
+def test_failed_refresh_recovers():
+    """A failing step leaves the published index untouched; the rerun redoes the delta"""
+    print("\n" + "="*60)
+    print("TEST 2: Failed Refresh Recovers")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _copy_data(tmp)
+        with open(os.path.join(tmp, 'bm25.pkl'), 'rb') as f:
+            original_bm25 = f.read()
+
+        def broken_extractor(messages):
+            raise RuntimeError("extractor unavailable")
+
+        vectors = RecordingVectorIndex()
+        refresher = IndexRefresher(data_dir=tmp, vector_index=vectors, extract_triples=broken_extractor)
+        refresher.load()
+        feed = _feed(refresher.bm25.messages)
+
+        try:
+            refresher.refresh(feed)
+            assert False, "Expected the graph step to fail"
+        except RuntimeError:
+            pass
+
+        manifest = load_manifest(tmp)
+        assert manifest['version'] == 0 and manifest['pending_version'] == 1 and 'staged' not in manifest
+        assert list(manifest['steps']) == ['dates', 'vectors', 'bm25']
+        with open(os.path.join(tmp, 'bm25.pkl'), 'rb') as f:
+            assert f.read() == original_bm25
+
+        calls = []
+        refresher = IndexRefresher(data_dir=tmp, vector_index=vectors, extract_triples=recording_extractor(calls))
+        report = refresher.refresh(feed)
+        assert report['version'] == 1 and (report['new'], report['changed']) == (2, 1)
+        assert report['recovered'] is None
+        # Qdrant upserts are idempotent: same point ids both times
+        assert vectors.upserts[0] == vectors.upserts[1]
+
+    print("✓ Graph step failed: version stayed 0, bm25.pkl untouched")
+    print("✓ Rerun published version 1 with the same point ids")
+    print("✅ PASSED")
+
+
+def test_interrupted_publish_recovers():
+    """A failure between artifact replaces is finished by the next refresh"""
+    print("\n" + "="*60)
+    print("TEST 3: Interrupted Publish Recovers")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _copy_data(tmp)
+        user_index_path = os.path.join(tmp, 'user_indexed', 'user_index.json')
+        real_replace = os.replace
+
+        def failing_replace(src, dst):
+            # bm25.pkl is already in place when user_index.json fails
+            if dst == user_index_path:
+                raise OSError("disk full")
+            return real_replace(src, dst)
+
+        vectors, calls = RecordingVectorIndex(), []
+        refresher = IndexRefresher(data_dir=tmp, vector_index=vectors, extract_triples=recording_extractor(calls))
+        refresher.load()
+        n = len(refresher.bm25.messages)
+        feed = _feed(refresher.bm25.messages)
+
+        with patch('os.replace', failing_replace):
+            try:
+                refresher.refresh(feed)
+                assert False, "Expected the publish to fail"
+            except OSError:
+                pass
+
+        manifest = load_manifest(tmp)
+        assert manifest['version'] == 0 and manifest['pending_version'] == 1
+        assert manifest['staged']['version'] == 1
+        bm25 = BM25Search()
+        bm25.load(os.path.join(tmp, 'bm25'), user_index_path=user_index_path)
+        assert len(bm25.messages) == n + 2 and 'user-new' not in bm25.user_index  # mixed on disk
+
+        # Next run: BM25 alone shows no delta, but the publish is finished first
+        refresher = IndexRefresher(data_dir=tmp, vector_index=vectors, extract_triples=recording_extractor(calls))
+        report = refresher.refresh(feed)
+        assert report['recovered'] == 1 and report['version'] == 1 and not report['published']
+        assert len(vectors.upserts) == 1 and len(calls) == 1  # nothing redone
+
+        manifest = load_manifest(tmp)
+        assert manifest['version'] == 1 and 'pending_version' not in manifest and 'staged' not in manifest
+        assert manifest['history'][-1]['version'] == 1 and manifest['messages'] == n + 2
+        bm25.load(os.path.join(tmp, 'bm25'), user_index_path=user_index_path)
+        assert bm25.user_index['user-new']['message_indices'] == [n + 1]
+        graph = KnowledgeGraph()
+        graph.load(os.path.join(tmp, 'knowledge_graph.pkl'))
+        assert 'Ines Okafor' in graph.user_index
+        assert not [name for name in os.listdir(tmp) if '.tmp' in name]
+
+    print("✓ Failed after bm25.pkl was replaced: manifest kept version 0 with the staged publish")
+    print("✓ Next refresh finished the publish: version 1, user index and graph in place")
+    print("✅ PASSED")
+
+
+def main():
+    """Run all tests"""
+    test_delta_refresh()
+    test_failed_refresh_recovers()
+    test_interrupted_publish_recovers()
+
+    print("\n" + "="*60)
+    print("ALL TESTS PASSED ✅")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
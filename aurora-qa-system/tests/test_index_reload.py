@@ -0,0 +1,181 @@
+"""
+Index Hot-Reload Testing Script
+Checks atomic generation swaps (in-flight requests keep their generation),
+watch mode, failed loads, and the API's /admin/reload and /health
+"""
+import sys
+import os
+import json
+import time
+import tempfile
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.index_reloader import IndexReloader
+
+
+class FakeSystem:
+    """Stands in for QASystem: answers with the index file it was built from"""
+
+    def __init__(self, data_dir, delay=0.0):
+        with open(os.path.join(data_dir, 'bm25.pkl')) as f:
+            self.index = f.read()
+        self.delay = delay
+        self.retriever = self
+        self.generator = self
+
+    def answer(self, query, **kwargs):
+        time.sleep(self.delay)
+        return {'answer': f"{query} from {self.index}", 'route': 'LOOKUP', 'sources': [], 'num_sources': 0}
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def _publish(data_dir, version, index):
+    _write(os.path.join(data_dir, 'bm25.pkl'), index)
+    _write(os.path.join(data_dir, 'index_manifest.json'), json.dumps({'version': version}))
+
+
+def _wait_ready(client, timeout=5):
+    """The first generation loads in the background; wait for /ready"""
+    deadline = time.time() + timeout
+    while client.get("/ready").status_code != 200:
+        assert time.time() < deadline, "API never became ready"
+        time.sleep(0.02)
+
+
+def test_swap_keeps_in_flight_requests():
+    """Requests started before a swap finish on the old generation"""
+    print("="*60)
+    print("TEST 1: Swap Keeps In-Flight Requests")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _publish(tmp, 1, "index-v1")
+        loads = []
+
+        def loader(previous):
+            loads.append(previous)
+            return FakeSystem(tmp, delay=0.3)
+
+        reloader = IndexReloader(loader, data_dir=tmp)
+        reloader.reload()
+        assert reloader.current.version == 1 and loads == [None]
+
+        # Long request on generation 1
+        answers = {}
+        old = reloader.current
+        worker = threading.Thread(target=lambda: answers.update(old=old.system.answer("q")["answer"]))
+        worker.start()
+
+        _publish(tmp, 2, "index-v2")
+        result = reloader.reload(force=False)
+        assert result['reloaded'] and result['index_version'] == 2 and result['generation'] == 2
+        assert loads[1] is old.system, "loader should receive the previous system"
+
+        new_answer = reloader.current.system.answer("q")["answer"]
+        worker.join()
+        assert answers['old'] == "q from index-v1" and new_answer == "q from index-v2"
+
+        # Nothing changed since → no load
+        assert reloader.reload(force=False)['reason'] == 'unchanged' and len(loads) == 2
+
+        # A failing load keeps the current generation
+        def broken(previous):
+            raise RuntimeError("corrupt pickle")
+        reloader.loader = broken
+        assert reloader.reload()['reason'] == 'load_failed'
+        assert reloader.current.generation == 2 and 'corrupt pickle' in reloader.last_error
+
+    print("✓ In-flight request answered from v1 while v2 was swapped in")
+    print("✓ Unchanged files skip the load; failed load keeps generation 2")
+    print("✅ PASSED")
+
+
+def test_watch_mode():
+    """Manifest bumps reload on the next poll; bare file edits wait until stable"""
+    print("\n" + "="*60)
+    print("TEST 2: Watch Mode")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _publish(tmp, 1, "index-v1")
+        reloader = IndexReloader(lambda previous: FakeSystem(tmp), data_dir=tmp, poll_interval=0.05)
+        reloader.reload()
+        reloader.start_watching()
+        try:
+            _publish(tmp, 2, "index-v2")
+            deadline = time.time() + 2
+            while reloader.current.version != 2 and time.time() < deadline:
+                time.sleep(0.01)
+            assert reloader.current.version == 2 and reloader.current.system.index == "index-v2"
+
+            # Rebuild script rewrites the graph without a manifest bump
+            _write(os.path.join(tmp, 'knowledge_graph.pkl'), "graph-rebuilt")
+            deadline = time.time() + 2
+            while reloader.current.generation != 3 and time.time() < deadline:
+                time.sleep(0.01)
+            assert reloader.current.generation == 3 and reloader.current.version == 2
+        finally:
+            reloader.stop_watching()
+        assert not reloader.watching
+
+    print("✓ Manifest bump → version 2; settled graph rewrite → generation 3")
+    print("✅ PASSED")
+
+
+def test_api_reload_endpoint():
+    """POST /admin/reload swaps generations; /health and /ask report the version"""
+    print("\n" + "="*60)
+    print("TEST 3: API Reload Endpoint")
+    print("="*60)
+
+    from fastapi.testclient import TestClient
+    import api
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _publish(tmp, 1, "index-v1")
+        original = (api.load_qa_system, api.DATA_DIR)
+        api.load_qa_system = lambda previous: FakeSystem(tmp)
+        api.DATA_DIR = tmp
+        os.environ['ADMIN_TOKEN'] = "secret"
+        try:
+            with TestClient(api.app) as client:
+                _wait_ready(client)
+                health = client.get("/health").json()
+                assert health['index']['index_version'] == 1 and health['index']['generation'] == 1
+
+                _publish(tmp, 2, "index-v2")
+                assert client.post("/admin/reload").status_code == 401
+                response = client.post("/admin/reload", headers={"X-Admin-Token": "secret"})
+                assert response.status_code == 200 and response.json()['index_version'] == 2
+
+                answer = client.post("/ask", json={"question": "Who?"}).json()
+                assert answer['answer'] == "Who? from index-v2"
+                assert answer['metadata']['index_version'] == 2
+                assert client.get("/health").json()['index']['reloads'] == 1
+        finally:
+            api.load_qa_system, api.DATA_DIR = original
+            del os.environ['ADMIN_TOKEN']
+
+    print("✓ Admin token enforced, version 1 → 2, /ask and /health report it")
+    print("✅ PASSED")
+
+
+def main():
+    """Run all tests"""
+    test_swap_keeps_in_flight_requests()
+    test_watch_mode()
+    test_api_reload_endpoint()
+
+    print("\n" + "="*60)
+    print("ALL TESTS PASSED ✅")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+LLM Gateway Testing Script
+Checks rate limiting, Retry-After retries, deadlines and concurrency caps
+against the offline stub backend
+"""
+import sys
+import os
+import time
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.llm_gateway import LLMGateway, StubBackend, LLMError, LLMDeadlineExceeded, TokenBucket
+
+MODEL = "llama-3.3-70b-versatile"
+MESSAGES = [{"role": "user", "content": "Classify: Which clients booked Noma?"}]
+
+
+def test_retry_after():
+    """429s are retried after the Retry-After delay"""
+    print("="*60)
+    print("TEST 1: Retry-After")
+    print("="*60)
+
+    failures = [LLMError("rate limited", status_code=429, retry_after=0.2)]
+
+    def responder(**kwargs):
+        if failures:
+            raise failures.pop()
+        return "LOOKUP"
+
+    gateway = LLMGateway(backend=StubBackend(responder))
+    llm = gateway.client("query_processor")
+
+    start = time.monotonic()
+    response = llm.chat.completions.create(model=MODEL, messages=MESSAGES, max_tokens=10)
+    elapsed = time.monotonic() - start
+
+    assert response.choices[0].message.content == "LOOKUP"
+    assert elapsed >= 0.2, "Retry-After was not honoured"
+    stats = gateway.stats()["query_processor"]
+    assert stats['calls'] == 1 and stats['retries'] == 1 and stats['rate_limited'] == 1
+
+    # Non-retryable errors surface immediately
+    def bad_request(**kwargs):
+        raise LLMError("bad request", status_code=400)
+
+    gateway = LLMGateway(backend=StubBackend(bad_request))
+    try:
+        gateway.chat(model=MODEL, messages=MESSAGES)
+        assert False, "Expected LLMError"
+    except LLMError as e:
+        assert e.status_code == 400
+    assert gateway.stats()["default"]['retries'] == 0
+    assert gateway._model_state(MODEL)['tokens'].wait_time(600) == 0, "Failed call kept its token reservation"
+
+    # A failed attempt's token reservation is refunded: the retry does not
+    # wait for quota a single call fits in
+    failures = [LLMError("rate limited", status_code=429, retry_after=0)]
+    gateway = LLMGateway(backend=StubBackend(responder), limits={MODEL: {'rpm': 100, 'tpm': 600, 'concurrency': 4}})
+    response = gateway.chat(model=MODEL, messages=MESSAGES, max_tokens=500, timeout=1.0)
+    assert response.choices[0].message.content == "LOOKUP"
+    assert gateway.stats()["default"]['retries'] == 1
+
+    print(f"✓ Retried after {elapsed:.2f}s")
+    print("✓ Failed attempts give their token reservation back")
+    print("✅ PASSED")
+
+
+def test_rate_limit_and_deadline():
+    """Requests/min bucket spaces calls; deadline stops long waits"""
+    print("\n" + "="*60)
+    print("TEST 2: Token Bucket + Deadline")
+    print("="*60)
+
+    bucket = TokenBucket(capacity=2, period=1.0)
+    assert bucket.try_acquire(1) and bucket.try_acquire(1)
+    assert not bucket.try_acquire(1)
+    assert 0 < bucket.wait_time(1) <= 0.5
+
+    # 120 req/min = one request every 0.5s once the burst is spent
+    gateway = LLMGateway(backend=StubBackend(), limits={MODEL: {'rpm': 120, 'tpm': 100000, 'concurrency': 4}})
+    for _ in range(120):
+        assert gateway._model_state(MODEL)['requests'].try_acquire(1)
+
+    start = time.monotonic()
+    gateway.chat(model=MODEL, messages=MESSAGES, max_tokens=10)
+    waited = time.monotonic() - start
+    assert 0.3 < waited < 1.5, f"Expected ~0.5s wait, got {waited:.2f}s"
+
+    # Tokens/min: once a long completion used the quota, the next call cannot start in 0.2s
+    long_answer = StubBackend(lambda **kwargs: "word " * 500)
+    gateway = LLMGateway(backend=long_answer, limits={MODEL: {'rpm': 100, 'tpm': 600, 'concurrency': 4}})
+    gateway.chat(model=MODEL, messages=MESSAGES, max_tokens=500)
+    try:
+        gateway.chat(model=MODEL, messages=MESSAGES, max_tokens=500, timeout=0.2)
+        assert False, "Expected deadline"
+    except LLMDeadlineExceeded:
+        pass
+    stats = gateway.stats()["default"]
+    assert stats['calls'] == 1 and stats['errors'] == 1, "Quota deadline not counted as an error"
+
+    print(f"✓ Waited {waited:.2f}s for a request slot")
+    print("✓ Deadline while waiting for quota counted in errors")
+    print("✅ PASSED")
+
+
+def test_concurrency_cap():
+    """No more than `concurrency` calls per model run at once"""
+    print("\n" + "="*60)
+    print("TEST 3: Concurrency Cap")
+    print("="*60)
+
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def responder(**kwargs):
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.pop()
+        return "OK"
+
+    gateway = LLMGateway(backend=StubBackend(responder),
+                         limits={MODEL: {'rpm': 1000, 'tpm': 10 ** 6, 'concurrency': 2}})
+    threads = [threading.Thread(target=gateway.chat, kwargs={'model': MODEL, 'messages': MESSAGES})
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert max(peak) == 2
+    assert gateway.stats()["default"]['calls'] == 8
+
+    print(f"✓ Peak concurrency: {max(peak)}")
+    print("✅ PASSED")
+
+
+def main():
+    """Run all tests"""
+    test_retry_after()
+    test_rate_limit_and_deadline()
+    test_concurrency_cap()
+
+    print("\n" + "="*60)
+    print("ALL TESTS PASSED ✅")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Load Test Testing Script
+Checks the Groq-compatible LLM stub (latency, 429 injection, router
+answers) through the real Groq SDK, saturation detection, and a short
+load test against a live api:app
+"""
+import sys
+import os
+import json
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from groq import RateLimitError
+from benchmarks.llm_stub_server import StubLLMServer
+from benchmarks.load_test import find_saturation, run_load_test
+from src.llm_gateway import LLMGateway, GroqBackend
+
+
+def test_stub_server():
+    """The real SDK talks to the stub; 429s carry retry-after and are retried by the gateway"""
+    print("="*60)
+    print("TEST 1: Groq-Compatible Stub Server")
+    print("="*60)
+
+    server = StubLLMServer(latency_ms=50, jitter_ms=0, error_rate=0.0, retry_after=0.05).start()
+    original = os.environ.get('GROQ_BASE_URL')
+    os.environ['GROQ_BASE_URL'] = server.url
+    try:
+        gateway = LLMGateway(backend=GroqBackend(api_key="stub"), backoff_base=0.01)
+        llm = gateway.client("stub_test").chat.completions
+
+        started = time.perf_counter()
+        response = llm.create(model="llama-3.3-70b-versatile", max_tokens=10, messages=[{
+            "role": "user",
+            "content": 'User Query: "What are the most popular destinations?"\n\n'
+                       'Classify this query. Respond with ONLY one word: LOOKUP or ANALYTICS'}])
+        assert response.choices[0].message.content == "ANALYTICS"
+        assert time.perf_counter() - started >= 0.05 and response.usage.prompt_tokens > 0
+
+        # Every call rejected: the gateway retries after retry-after, then gives up
+        server.error_rate = 1.0
+        try:
+            llm.create(model="llama-3.3-70b-versatile", messages=[{"role": "user", "content": "hi"}], timeout=2)
+            assert False, "Expected RateLimitError"
+        except RateLimitError:
+            pass
+        stats = gateway.stats()['stub_test']
+        assert stats['rate_limited'] >= 2 and stats['retries'] >= 1
+
+        # Server-side quota: the second call within the minute is rejected
+        server.error_rate = 0.0
+        quota = StubLLMServer(latency_ms=0, jitter_ms=0, rpm=1)
+        status, _, _ = quota.complete({'messages': [{'role': 'user', 'content': "a"}]})
+        status_429, body, headers = quota.complete({'messages': [{'role': 'user', 'content': "b"}]})
+        quota.httpd.server_close()
+        assert status == 200 and status_429 == 429 and float(headers['retry-after']) > 0
+        assert body['error']['code'] == "rate_limit_exceeded"
+    finally:
+        server.stop()
+        if original is None:
+            os.environ.pop('GROQ_BASE_URL', None)
+        else:
+            os.environ['GROQ_BASE_URL'] = original
+
+    print("✓ Router prompt answered by keyword rule (ANALYTICS), latency injected")
+    print(f"✓ Injected 429s: {stats['rate_limited']} rate limited, {stats['retries']} retries")
+    print("✓ rpm quota → 429 with retry-after")
+    print("✅ PASSED")
+
+
+def test_find_saturation():
+    """Saturation = SLO breach, error budget breach or flat throughput, per route"""
+    print("\n" + "="*60)
+    print("TEST 2: Saturation Detection")
+    print("="*60)
+
+    def step(concurrency, rps, p95, error_rate=0.0):
+        summary = {'throughput_rps': rps, 'error_rate': error_rate, 'latency_ms': {'p95': p95}}
+        return {'load': {'concurrency': concurrency}, 'overall': summary, 'routes': {'POST /ask LOOKUP': summary}}
+
+    flat = [step(1, 2.0, 500), step(2, 3.9, 520), step(4, 4.1, 900), step(8, 4.0, 1800)]
+    saturation = find_saturation(flat, slo_ms=5000, max_error_rate=0.01)
+    assert saturation['saturated_at'] == {'concurrency': 4} and "throughput flat" in saturation['reason']
+    assert saturation['last_good'] == {'concurrency': 2} and saturation['max_throughput_rps'] == 4.1
+
+    slow = [step(1, 2.0, 500), step(2, 4.0, 6000)]
+    assert "SLO" in find_saturation(slow, slo_ms=5000, max_error_rate=0.01, key='POST /ask LOOKUP')['reason']
+
+    failing = [step(1, 2.0, 500), step(2, 4.0, 600, error_rate=0.2)]
+    assert "error rate" in find_saturation(failing, slo_ms=5000, max_error_rate=0.01)['reason']
+
+    fine = [step(1, 2.0, 500), step(2, 4.0, 600)]
+    assert find_saturation(fine, slo_ms=5000, max_error_rate=0.01)['saturated_at'] is None
+
+    print("✓ Flat throughput, SLO breach and error rate each mark saturation")
+    print("✓ Last good load level and max throughput reported")
+    print("✅ PASSED")
+
+
+def test_load_test_against_api():
+    """A short closed-loop run against api:app (local vectors, stub LLM) reports per route"""
+    print("\n" + "="*60)
+    print("TEST 3: Load Test Against api:app")
+    print("="*60)
+
+    result = run_load_test(
+        mode="concurrency", levels=[1, 2], duration=1.5, warmup=0.5,
+        llm_options={'latency_ms': 20, 'jitter_ms': 5},
+        llm_limits={model: {'rpm': 100000, 'tpm': 10000000, 'concurrency': 8}
+                    for model in ('llama-3.3-70b-versatile', 'llama-3.1-8b-instant')}
+    )
+    json.dumps(result)
+
+    assert [step['load'] for step in result['steps']] == [{'concurrency': 1}, {'concurrency': 2}]
+    for step in result['steps']:
+        overall = step['overall']
+        assert overall['requests'] > 0 and overall['error_rate'] == 0.0, overall
+        assert overall['latency_ms']['p95'] > 0 and step['llm']['calls'] > 0
+    assert 'POST /ask LOOKUP' in result['steps'][0]['routes']
+    assert 'overall' in result['saturation'] and 'POST /ask LOOKUP' in result['saturation']['routes']
+
+    throughputs = [step['overall']['throughput_rps'] for step in result['steps']]
+    print(f"✓ Throughput by concurrency 1 → 2: {throughputs} rps, no errors")
+    print(f"✓ Saturation: {result['saturation']['overall']}")
+    print("✅ PASSED")
+
+
+def main():
+    """Run all tests"""
+    test_stub_server()
+    test_find_saturation()
+    test_load_test_against_api()
+
+    print("\n" + "="*60)
+    print("ALL TESTS PASSED ✅")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
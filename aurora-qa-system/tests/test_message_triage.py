@@ -0,0 +1,91 @@
+"""
+Message Triage Testing Script
+Checks the pre-triage router used by HybridExtractor (routes, reasons,
+parity with the original substring triggers, routing summary)
+"""
+import sys
+import os
+import time
+import pickle
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.message_triage import (
+    MessageTriage, QUESTION_TRIGGERS, MULTI_ENTITY_TRIGGERS,
+    ROUTE_FILTER, ROUTE_LLM, ROUTE_SKIP
+)
+
+
+def _load_messages():
+    with open('data/bm25.pkl', 'rb') as f:
+        return pickle.load(f)['messages']
+
+
+def test_routes():
+    """Routes and reasons on representative messages"""
+    print("="*60)
+    print("TEST 1: Routes")
+    print("="*60)
+
+    triage = MessageTriage(use_llm=True)
+    cases = [
+        ("I need four front-row seats for the game.", ROUTE_FILTER, 'filter_cue'),
+        ("I prefer aisle seats.", ROUTE_FILTER, 'filter_cue'),
+        ("Can I get a Bentley for my Paris trip?", ROUTE_LLM, 'multi_entity'),
+        ("What are the best restaurants in Paris?", ROUTE_LLM, 'question'),
+        ("Change my car service to the BMW instead of the Mercedes.", ROUTE_LLM, 'multi_entity'),
+        ("Thanks, that works perfectly.", ROUTE_LLM, 'no_filter_cue'),
+        ("   ", ROUTE_SKIP, 'empty'),
+    ]
+
+    for text, route, reason in cases:
+        assert triage.route(text) == (route, reason), (text, triage.route(text))
+        print(f"✓ {route:6s} ({reason}): {text.strip()[:50]}")
+
+    # Without an LLM everything non-empty goes to the Filter
+    assert MessageTriage(use_llm=False).route("What are the best restaurants?") == (ROUTE_FILTER, 'llm_disabled')
+
+    print("✅ PASSED")
+
+
+def test_parity_with_substring_triggers():
+    """Compiled patterns flag exactly the messages the substring scans did"""
+    print("\n" + "="*60)
+    print("TEST 2: Parity with Substring Triggers")
+    print("="*60)
+
+    triage = MessageTriage()
+    messages = _load_messages()
+
+    def old_is_complex(text):
+        text_lower = text.lower()
+        return (any(t in text_lower for t in QUESTION_TRIGGERS)
+                or any(t in text_lower for t in MULTI_ENTITY_TRIGGERS))
+
+    for msg in messages:
+        assert triage.is_complex(msg['message']) == old_is_complex(msg['message']), msg['message']
+
+    start = time.perf_counter()
+    decisions = triage.route_batch(messages)
+    elapsed = time.perf_counter() - start
+
+    summary = MessageTriage.summarize(decisions)
+    assert sum(sum(reasons.values()) for reasons in summary.values()) == len(messages)
+
+    print(f"✓ {len(messages)} messages identical, routed in {elapsed*1000:.1f}ms")
+    for route, reasons in sorted(summary.items()):
+        print(f"✓ {route}: {reasons}")
+    print("✅ PASSED")
+
+
+def main():
+    """Run all tests"""
+    test_routes()
+    test_parity_with_substring_triggers()
+
+    print("\n" + "="*60)
+    print("ALL TESTS PASSED ✅")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
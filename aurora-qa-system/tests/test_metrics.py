@@ -0,0 +1,240 @@
+"""
+Metrics Testing Script
+Checks the thread-sharded counters/histograms and Prometheus rendering,
+trace-derived pipeline metrics and LLM gateway metrics, and the API's
+/metrics and probing /health endpoints
+"""
+import sys
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import networkx as nx
+from src.metrics import (MetricsRegistry, REGISTRY, STAGE_LATENCY, RETRIEVAL_RESULTS,
+                         CACHE_LOOKUPS, observe_trace, cache_hit_ratio)
+from src.tracing import start_trace, span, add_trace_listener
+from src.llm_gateway import LLMGateway, StubBackend, LLMError, set_gateway
+
+
+def _sample(text, line_prefix):
+    """Value of the first exposition line starting with line_prefix"""
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_sharded_metrics_and_rendering():
+    """Concurrent updates are not lost; output follows the text format"""
+    print("="*60)
+    print("TEST 1: Sharded Metrics and Rendering")
+    print("="*60)
+
+    registry = MetricsRegistry()
+    requests = registry.counter("test_requests_total", "Requests", ("route",))
+    in_progress = registry.gauge("test_in_progress", "In progress")
+    latency = registry.histogram("test_latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+
+    def worker():
+        for i in range(10000):
+            requests.inc(route="LOOKUP")
+            in_progress.inc()
+            latency.observe(0.05 if i % 2 else 0.5, route="LOOKUP")
+            in_progress.dec()
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latency.observe(5.0, route="ANALYTICS")
+
+    text = registry.render()
+    assert "# TYPE test_requests_total counter" in text and "# TYPE test_latency_seconds histogram" in text
+    assert _sample(text, 'test_requests_total{route="LOOKUP"}') == 80000
+    assert _sample(text, 'test_in_progress') == 0
+    assert _sample(text, 'test_latency_seconds_bucket{route="LOOKUP",le="0.1"}') == 40000
+    assert _sample(text, 'test_latency_seconds_bucket{route="LOOKUP",le="1"}') == 80000
+    assert _sample(text, 'test_latency_seconds_bucket{route="LOOKUP",le="+Inf"}') == 80000
+    assert _sample(text, 'test_latency_seconds_count{route="LOOKUP"}') == 80000
+    assert abs(_sample(text, 'test_latency_seconds_sum{route="LOOKUP"}') - 40000 * 0.55) < 1e-6
+    assert _sample(text, 'test_latency_seconds_bucket{route="ANALYTICS",le="1"}') == 0
+    assert _sample(text, 'test_latency_seconds_bucket{route="ANALYTICS",le="+Inf"}') == 1
+
+    try:
+        requests.inc(path="/ask")
+        assert False, "Expected ValueError for wrong labels"
+    except ValueError:
+        pass
+
+    # Short-lived thread pools (one per batch): finished threads' shards are folded away
+    for _ in range(50):
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda i: (requests.inc(route="BATCH"), latency.observe(0.5, route="BATCH")), range(8)))
+    text = registry.render()
+    assert _sample(text, 'test_requests_total{route="BATCH"}') == 400
+    assert _sample(text, 'test_latency_seconds_count{route="BATCH"}') == 400
+    assert _sample(text, 'test_requests_total{route="LOOKUP"}') == 80000
+    assert len(requests._shards) <= 2 and len(latency._shards) <= 2
+
+    print("✓ 8 threads × 10,000 updates: no lost increments")
+    print("✓ 50 short-lived pools: shards of finished threads folded into one total")
+    print("✓ Cumulative buckets, _sum/_count, +Inf, label validation")
+    print("✅ PASSED")
+
+
+def test_trace_and_llm_metrics():
+    """Finished traces feed stage/route metrics; LLM usage comes from the gateway"""
+    print("\n" + "="*60)
+    print("TEST 2: Trace and LLM Metrics")
+    print("="*60)
+
+    failures = [LLMError("rate limited", status_code=429, retry_after=0.01)]
+
+    def responder(model, messages, **kwargs):
+        if failures:
+            raise failures.pop()
+        return "fine"
+
+    gateway = LLMGateway(backend=StubBackend(responder))
+    set_gateway(gateway)
+    add_trace_listener(observe_trace)  # as api.py does (idempotent)
+    try:
+        before = STAGE_LATENCY.values().get(("retriever.bm25",), [0.0])
+        with start_trace("POST /ask") as trace:
+            with span("retriever.bm25") as s:
+                time.sleep(0.01)
+                s.set_attribute("results", 12)
+            with span("answer_generator.generate"):
+                gateway.client("metrics_test").chat.completions.create(
+                    model="llama-3.3-70b-versatile", messages=[{"role": "user", "content": "hi"}])
+            trace.root.set_attribute("route", "LOOKUP")
+
+        text = REGISTRY.render()
+    finally:
+        set_gateway(None)
+
+    # values(): [per-bucket counts..., +Inf count, sum]
+    after = STAGE_LATENCY.values()[("retriever.bm25",)]
+    assert sum(after[:-1]) - sum(before[:-1]) == 1 and after[-1] - before[-1] >= 0.01
+    assert sum(RETRIEVAL_RESULTS.values()[("bm25",)][:-1]) >= 1
+    assert _sample(text, 'aurora_stage_duration_seconds_count{stage="llm.metrics_test"}') >= 1
+    assert _sample(text, 'aurora_llm_calls_total{call_site="metrics_test"}') == 1
+    assert _sample(text, 'aurora_llm_retries_total{call_site="metrics_test"}') == 1
+    assert _sample(text, 'aurora_llm_rate_limited_total{call_site="metrics_test"}') == 1
+    assert _sample(text, 'aurora_llm_tokens_total{call_site="metrics_test",kind="prompt"}') > 0
+    assert _sample(text, 'aurora_llm_queue_depth{model="llama-3.3-70b-versatile",state="waiting"}') == 0
+    assert _sample(text, 'aurora_llm_queue_depth{model="llama-3.3-70b-versatile",state="active"}') == 0
+
+    CACHE_LOOKUPS.inc(cache="metrics_test", result="hit")
+    CACHE_LOOKUPS.inc(cache="metrics_test", result="hit")
+    CACHE_LOOKUPS.inc(cache="metrics_test", result="miss")
+    assert abs(cache_hit_ratio("metrics_test") - 2 / 3) < 1e-9 and cache_hit_ratio("unused") is None
+
+    print("✓ Stage latency + retrieval result counts from a finished trace")
+    print("✓ LLM calls, 429 retry, tokens and queue depth per call site")
+    print("✓ Cache hit ratio from hit/miss counters")
+    print("✅ PASSED")
+
+
+def test_api_metrics_and_health():
+    """/metrics counts routes and stages; /health probes components"""
+    print("\n" + "="*60)
+    print("TEST 3: API /metrics and /health")
+    print("="*60)
+
+    from fastapi.testclient import TestClient
+    import api
+
+    class BrokenQdrantClient:
+        def get_collection(self, name):
+            raise ConnectionError("qdrant unreachable")
+
+    graph = nx.MultiDiGraph()
+    graph.add_edge("Layla", "London", relation="PLANNING_TRIP_TO")
+
+    class ProbedSystem:
+        def __init__(self):
+            self.retriever = SimpleNamespace(
+                qdrant_search=SimpleNamespace(client=BrokenQdrantClient(), collection_name="aurora_messages"),
+                bm25_search=SimpleNamespace(messages=[{}, {}, {}], search=lambda query, top_k=10: []),
+                knowledge_graph=SimpleNamespace(graph=graph)
+            )
+            self.generator = self
+
+        def answer(self, query, **kwargs):
+            route = "ANALYTICS" if "most" in query else "LOOKUP"
+            with span("retriever.qdrant") as s:
+                s.set_attribute("results", 4)
+            return {'answer': "ok", 'route': route, 'sources': [], 'num_sources': 0}
+
+    original = api.load_qa_system
+    api.load_qa_system = lambda previous: ProbedSystem()
+    try:
+        with TestClient(api.app) as client:
+            deadline = time.time() + 5
+            while client.get("/ready").status_code != 200:
+                assert time.time() < deadline, "API never became ready"
+                time.sleep(0.02)
+
+            before = client.get("/metrics").text
+            for question in ("Who is going to London?", "Who booked the most dinners?", "Who?"):
+                assert client.post("/ask", json={"question": question}).status_code == 200
+            response = client.get("/metrics")
+            health = client.get("/health").json()
+    finally:
+        api.load_qa_system = original
+
+    assert response.headers['content-type'].startswith("text/plain; version=0.0.4")
+    text = response.text
+
+    def delta(prefix):
+        return (_sample(text, prefix) or 0) - (_sample(before, prefix) or 0)
+
+    assert delta('aurora_qa_requests_total{route="LOOKUP",status="ok"}') == 2
+    assert delta('aurora_qa_requests_total{route="ANALYTICS",status="ok"}') == 1
+    assert delta('aurora_http_requests_total{method="POST",path="/ask",status="200"}') == 3
+    assert delta('aurora_stage_duration_seconds_count{stage="retriever.qdrant"}') == 3
+    assert delta('aurora_retrieval_results_count{source="qdrant"}') == 3
+    assert _sample(text, 'aurora_http_requests_in_progress{path="/ask"}') == 0
+    assert _sample(text, 'aurora_ready') == 1 and _sample(text, 'aurora_index_generation') == 1
+
+    components = health['components']
+    assert health['status'] == "degraded"
+    assert components['qdrant']['status'] == "error" and "qdrant unreachable" in components['qdrant']['error']
+    assert components['bm25'] == {**components['bm25'], 'status': "ok", 'documents': 3}
+    assert components['knowledge_graph']['nodes'] == 2 and components['knowledge_graph']['edges'] == 1
+    assert components['llm']['status'] == "ok" and 'errors' in components['llm']
+
+    # No Qdrant client (local vectors) is "not_available"; a bug inside a probe is an error
+    import asyncio
+    from src.local_vector_search import LocalVectorSearch
+    local = SimpleNamespace(retriever=SimpleNamespace(qdrant_search=LocalVectorSearch()))
+    assert asyncio.run(api.run_probe(api.probe_qdrant, local)) == {'status': "not_available"}
+    broken = SimpleNamespace(retriever=SimpleNamespace(bm25_search=SimpleNamespace(messages=[])))
+    result = asyncio.run(api.run_probe(api.probe_bm25, broken))
+    assert result['status'] == "error" and result['error'].startswith("AttributeError")
+
+    print("✓ /metrics: per-route requests, HTTP counts, stage histograms, readiness")
+    print(f"✓ /health probes: qdrant={components['qdrant']['status']}, bm25={components['bm25']['status']} "
+          f"→ {health['status']}")
+    print("✓ Missing component → not_available, exception inside a probe → error")
+    print("✅ PASSED")
+
+
+def main():
+    """Run all tests"""
+    test_sharded_metrics_and_rendering()
+    test_trace_and_llm_metrics()
+    test_api_metrics_and_health()
+
+    print("\n" + "="*60)
+    print("ALL TESTS PASSED ✅")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Micro-Benchmark Testing Script
+Checks the scaled synthetic corpora (members, ids, dates, graph triples)
+and a short micro-benchmark run with growth exponents and cProfile output
+"""
+import sys
+import os
+import json
+import pickle
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.knowledge_graph import KnowledgeGraph
+from benchmarks.micro_benchmarks import scale_corpus, run_micro_benchmarks, _quiet
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+def test_scale_corpus():
+    """Scale N = N consistent copies of the snapshot on distinct synthetic members"""
+    print("="*60)
+    print("TEST 1: Scaled Synthetic Corpus")
+    print("="*60)
+
+    with open(os.path.join(DATA_DIR, "bm25.pkl"), 'rb') as f:
+        snapshot = pickle.load(f)['messages']
+    graph = KnowledgeGraph()
+    _quiet(graph.load, os.path.join(DATA_DIR, "knowledge_graph.pkl"))
+
+    corpus = scale_corpus(snapshot, graph, scale=3, seed=7)
+    messages = corpus['messages']
+    assert len(messages) == 3 * len(snapshot)
+    assert messages[:len(snapshot)] == snapshot  # first copy is the snapshot itself
+    assert len({msg['id'] for msg in messages}) == len(messages)
+
+    names = {msg['user_name'] for msg in messages}
+    assert len(names) == 30 and len(corpus['user_index']) == 30 and len(set(corpus['users'])) == 30
+
+    # user_index positions point at that member's messages
+    for user_id, entry in corpus['user_index'].items():
+        assert entry['message_count'] == len(entry['message_indices'])
+        assert all(messages[i]['user_id'] == user_id for i in entry['message_indices'])
+
+    # Clones keep the text, shift the dates
+    clone = messages[len(snapshot):2 * len(snapshot)]
+    dated = [(a, b) for a, b in zip(snapshot, clone) if a.get('normalized_dates')]
+    assert all(a['message'] == b['message'] for a, b in zip(snapshot, clone))
+    assert dated and all(len(a['normalized_dates']) == len(b['normalized_dates']) for a, b in dated)
+
+    # Graph triples are cloned onto the clone members and message ids
+    scaled_graph = corpus['knowledge_graph']
+    assert scaled_graph.graph.number_of_edges() == 3 * graph.graph.number_of_edges()
+    ids = {msg['id'] for msg in messages}
+    assert all(data['message_id'] in ids for _, _, data in scaled_graph.graph.edges(data=True)
+               if data.get('message_id'))
+    assert len(scaled_graph.user_index) == 30
+
+    print(f"✓ {len(messages)} messages, {len(names)} members, {scaled_graph.graph.number_of_edges()} edges")
+    print("✓ Unique ids, consistent user_index, shifted dates, cloned triples")
+    print("✅ PASSED")
+
+
+def test_micro_benchmark_run():
+    """Two scales, a few benchmarks: latencies, growth exponents and profiles"""
+    print("\n" + "="*60)
+    print("TEST 2: Micro-Benchmark Run")
+    print("="*60)
+
+    profile_dir = tempfile.mkdtemp()
+    only = ['bm25.search', 'name_resolver.resolve', 'retriever._reciprocal_rank_fusion',
+            'graph_analytics._query_graph']
+    result = run_micro_benchmarks(data_dir=DATA_DIR, scales=[1, 2], min_time=0.01, only=only,
+                                  profile_dir=profile_dir)
+    json.dumps(result)
+
+    assert set(result['scales']) == {'1x', '2x'}
+    assert result['scales']['2x']['corpus']['messages'] == 2 * result['scales']['1x']['corpus']['messages']
+    for scale in result['scales'].values():
+        assert set(scale['benchmarks']) == set(only)
+        for bench in scale['benchmarks'].values():
+            assert bench['latency_us']['n'] >= bench['inputs'] and bench['latency_us']['p50'] > 0
+            assert os.path.exists(bench['profile']) and bench['top_functions']
+
+    assert set(result['growth_exponent']) == set(only)
+    assert os.path.exists(os.path.join(profile_dir, "2x_bm25.search.txt"))
+
+    print(f"✓ Growth exponents: {result['growth_exponent']}")
+    print("✓ cProfile .prof/.txt per benchmark and scale")
+    print("✅ PASSED")
+
+
+def main():
+    """Run all tests"""
+    test_scale_corpus()
+    test_micro_benchmark_run()
+
+    print("\n" + "="*60)
+    print("ALL TESTS PASSED ✅")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Request Coalescing Testing Script
+Checks single-flight coalescing of identical questions, the result window,
+error sharing, and /ask coalescing against a live api:app
+"""
+import sys
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.request_coalescer import RequestCoalescer, normalize_question
+from src.metrics import CACHE_LOOKUPS
+
+
+def test_single_flight_and_window():
+    """Concurrent identical keys compute once; the window answers until it expires"""
+    print("="*60)
+    print("TEST 1: Single Flight and Result Window")
+    print("="*60)
+
+    assert normalize_question("  Who is going to  PARIS?? ") == normalize_question("who is going to paris")
+    assert normalize_question("Who is going to Paris?") != normalize_question("Who is going to Rome?")
+
+    now = [0.0]
+    coalescer = RequestCoalescer(window=5.0, clock=lambda: now[0])
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {'answer': len(calls)}
+
+    async def scenario():
+        key = coalescer.key("Who is going to Paris?", generation=1)
+        results = await asyncio.gather(*(coalescer.run(key, compute) for _ in range(10)))
+        cached = await coalescer.run(coalescer.key("who is going to paris", generation=1), compute)
+        other_generation = await coalescer.run(coalescer.key("Who is going to Paris?", generation=2), compute)
+        now[0] = 6.0  # window over
+        expired = await coalescer.run(key, compute)
+        return results, cached, other_generation, expired
+
+    results, cached, other_generation, expired = asyncio.run(scenario())
+    sources = [source for _, source in results]
+    assert sources.count("computed") == 1 and sources.count("in_flight") == 9
+    assert all(result is results[0][0] for result, _ in results)
+    assert cached == (results[0][0], "window")
+    assert other_generation[1] == "computed" and expired[1] == "computed"
+    assert len(calls) == 3
+    assert coalescer.info()['in_flight_keys'] == 0 and coalescer.info()['window_entries'] == 2
+
+    print("✓ 10 concurrent requests → 1 computation (9 joined in flight)")
+    print("✓ Window answers equivalent questions; new generation / expiry recompute")
+    print("✅ PASSED")
+
+
+def test_errors_and_cancellation():
+    """Errors reach every waiter but are not kept; a cancelled caller does not cancel the others"""
+    print("\n" + "="*60)
+    print("TEST 2: Errors and Cancellation")
+    print("="*60)
+
+    coalescer = RequestCoalescer(window=5.0)
+    attempts = []
+
+    async def failing():
+        attempts.append(1)
+        await asyncio.sleep(0.02)
+        raise RuntimeError("rate limited")
+
+    async def slow():
+        await asyncio.sleep(0.1)
+        return "answer"
+
+    async def scenario():
+        outcomes = await asyncio.gather(*(coalescer.run("k", failing) for _ in range(3)), return_exceptions=True)
+        retry = await asyncio.gather(coalescer.run("k", failing), return_exceptions=True)
+
+        leader = asyncio.ensure_future(coalescer.run("s", slow))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(coalescer.run("s", slow))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return outcomes, retry, await follower, leader.cancelled()
+
+    outcomes, retry, follower, leader_cancelled = asyncio.run(scenario())
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes + retry)
+    assert len(attempts) == 2  # one shared failure, then a fresh attempt
+    assert follower == ("answer", "in_flight") and leader_cancelled
+    assert coalescer.info()['errors'] == 2
+
+    print("✓ One failure shared by 3 waiters, not cached (retry recomputes)")
+    print("✓ Cancelled leader: follower still gets the answer")
+    print("✅ PASSED")
+
+
+def test_api_coalescing():
+    """Identical concurrent /ask questions run the pipeline once"""
+    print("\n" + "="*60)
+    print("TEST 3: /ask Coalescing")
+    print("="*60)
+
+    from fastapi.testclient import TestClient
+    import api
+
+    class SlowSystem:
+        def __init__(self):
+            self.calls = 0
+            self.lock = threading.Lock()
+
+        def answer(self, query, **kwargs):
+            with self.lock:
+                self.calls += 1
+            time.sleep(0.3)
+            return {'answer': f"answer to {query}", 'route': 'LOOKUP', 'sources': [], 'num_sources': 0}
+
+    system = SlowSystem()
+    original = api.load_qa_system
+    api.load_qa_system = lambda previous: system
+    hits_before = CACHE_LOOKUPS.values().get(("ask_coalescing", "hit"), 0)
+    try:
+        with TestClient(api.app) as client:
+            deadline = time.time() + 5
+            while client.get("/ready").status_code != 200:
+                assert time.time() < deadline, "API never became ready"
+                time.sleep(0.02)
+
+            questions = ["Who is going to Paris?", "who is going to paris", "Who is going to  Paris"] * 2
+            with ThreadPoolExecutor(max_workers=len(questions)) as pool:
+                responses = list(pool.map(lambda q: client.post("/ask", json={"question": q}).json(), questions))
+            windowed = client.post("/ask", json={"question": "Who is going to Paris?"}).json()
+            timed = client.post("/ask", json={"question": "Who is going to Paris?", "include_timings": True}).json()
+            health = client.get("/health").json()
+    finally:
+        api.load_qa_system = original
+
+    sources = [response['metadata']['coalesced'] for response in responses]
+    assert sources.count("computed") == 1 and sources.count("in_flight") == 5, sources
+    assert len({response['answer'] for response in responses}) == 1
+    assert len({response['metadata']['trace_id'] for response in responses}) == 1
+    assert windowed['metadata']['coalesced'] == "window"
+    assert timed['metadata']['coalesced'] == "computed" and 'timings' in timed['metadata']
+    assert system.calls == 2  # the shared run + the timing request
+    assert health['coalescing']['in_flight'] == 5 and health['coalescing']['window'] == 1
+    assert CACHE_LOOKUPS.values().get(("ask_coalescing", "hit"), 0) - hits_before == 6
+
+    print(f"✓ 6 concurrent equivalent questions → 1 pipeline run ({sources.count('in_flight')} joined)")
+    print("✓ Follow-up served from the window; include_timings runs its own pipeline")
+    print("✓ /health and CACHE_LOOKUPS report the hits")
+    print("✅ PASSED")
+
+
+def main():
+    """Run all tests"""
+    test_single_flight_and_window()
+    test_errors_and_cancellation()
+    test_api_coalescing()
+
+    print("\n" + "="*60)
+    print("ALL TESTS PASSED ✅")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Shared Index Testing Script
+Checks the memory-mapped BM25 export (identical scores, messages and id
+lookups), export reuse, and pre-fork sharing with forked workers
+"""
+import sys
+import os
+import gc
+import json
+import shutil
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from src.bm25_search import BM25Search
+from src.shared_index import load_shared_bm25, ensure_shared_bm25, preload
+from src.hybrid_retriever import HybridRetriever
+
+QUERIES = ["How many cars does Vikram Desai have", "Layla planning trip to London",
+           "private tour of the Louvre", "zzz-no-such-term", "book book book dinner"]
+
+
+class OfflineQdrant:
+    """Stands in for an already-connected QdrantSearch"""
+
+    def search(self, query, top_k=10, date_range=None, user_id=None, verbose=False):
+        return []
+
+
+def _copy_data(tmp):
+    for name in ('bm25.pkl', 'knowledge_graph.pkl', 'knowledge_graph.entity_dictionary.pkl'):
+        shutil.copy(os.path.join('data', name), os.path.join(tmp, name))
+    os.makedirs(os.path.join(tmp, 'user_indexed'))
+    shutil.copy('data/user_indexed/user_index.json', os.path.join(tmp, 'user_indexed', 'user_index.json'))
+
+
+def _private_dirty_kb():
+    with open('/proc/self/smaps_rollup') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith('Private_Dirty'))
+
+
+def test_mapped_bm25_matches_pickle():
+    """Mapped scorer, messages and id lookups match the unpickled index"""
+    print("="*60)
+    print("TEST 1: Mapped BM25 Matches Pickle")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _copy_data(tmp)
+        base = os.path.join(tmp, 'bm25')
+        user_index_path = os.path.join(tmp, 'user_indexed', 'user_index.json')
+
+        pickled = BM25Search()
+        pickled.load(base, user_index_path=user_index_path)
+        mapped = load_shared_bm25(base, user_index_path=user_index_path)
+
+        for query in QUERIES:
+            tokens = pickled.tokenize(query)
+            assert np.allclose(pickled.bm25.get_scores(tokens), mapped.bm25.get_scores(tokens))
+            assert pickled.search(query, top_k=10) == mapped.search(query, top_k=10)
+
+        user_id = next(iter(pickled.user_index))
+        assert pickled.search("dinner", top_k=5, user_id=user_id) == mapped.search("dinner", top_k=5, user_id=user_id)
+
+        assert len(mapped.messages) == len(pickled.messages)
+        for i in (0, 1, len(pickled.messages) // 2, -1):
+            assert mapped.messages[i] == pickled.messages[i]
+        for msg in pickled.messages[::97]:
+            assert mapped.get_message(msg['id']) == pickled.get_message(msg['id']) == msg
+        assert mapped.get_message("no-such-id") is None and pickled.get_message("no-such-id") is None
+
+    print(f"✓ {len(QUERIES)} queries: identical scores and results")
+    print(f"✓ {len(pickled.messages)} messages, id lookups via sorted id array")
+    print("✅ PASSED")
+
+
+def test_export_reuse():
+    """Exports are reused for the same bm25.pkl and replaced when it changes"""
+    print("\n" + "="*60)
+    print("TEST 2: Export Reuse")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _copy_data(tmp)
+        base = os.path.join(tmp, 'bm25')
+
+        first = ensure_shared_bm25(base)
+        meta_mtime = os.stat(os.path.join(first, 'meta.json')).st_mtime_ns
+        assert ensure_shared_bm25(base) == first
+        assert os.stat(os.path.join(first, 'meta.json')).st_mtime_ns == meta_mtime
+
+        # A refreshed bm25.pkl gets a new export; the old one is removed
+        stat = os.stat(f"{base}.pkl")
+        os.utime(f"{base}.pkl", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        second = ensure_shared_bm25(base)
+        assert second != first and not os.path.exists(first)
+        assert os.listdir(os.path.dirname(second)) == [os.path.basename(second)]
+
+    print("✓ Same file → same export; changed file → new export, old removed")
+    print("✅ PASSED")
+
+
+def test_prefork_sharing():
+    """Forked workers reuse the preloaded indexes instead of copying them"""
+    print("\n" + "="*60)
+    print("TEST 3: Pre-Fork Sharing")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _copy_data(tmp)
+        preloaded = preload(tmp)
+        assert gc.get_freeze_count() > 0
+
+        growth = {}
+        try:
+            for mode in ('preloaded', 'own'):
+                read_fd, write_fd = os.pipe()
+                pid = os.fork()
+                if pid == 0:
+                    os.close(read_fd)
+                    before = _private_dirty_kb()
+                    if mode == 'preloaded':
+                        retriever = HybridRetriever(
+                            bm25_path=os.path.join(tmp, 'bm25'), graph_path=os.path.join(tmp, 'knowledge_graph.pkl'),
+                            qdrant_search=OfflineQdrant(), preloaded=preloaded, shared_memory=True
+                        )
+                        same = retriever.knowledge_graph is preloaded['knowledge_graph']
+                    else:
+                        retriever = HybridRetriever(
+                            bm25_path=os.path.join(tmp, 'bm25'), graph_path=os.path.join(tmp, 'knowledge_graph.pkl'),
+                            qdrant_search=OfflineQdrant()
+                        )
+                        same = False
+                    hits = sum(len(retriever.bm25_search.search(q)) for q in QUERIES)
+                    report = {'kb': _private_dirty_kb() - before, 'same': same, 'hits': hits}
+                    os.write(write_fd, json.dumps(report).encode())
+                    os._exit(0)
+
+                os.close(write_fd)
+                os.waitpid(pid, 0)
+                with os.fdopen(read_fd) as f:
+                    growth[mode] = json.load(f)
+        finally:
+            gc.unfreeze()
+
+    assert growth['preloaded']['same'] and growth['preloaded']['hits'] == growth['own']['hits'] > 0
+    assert growth['preloaded']['kb'] < growth['own']['kb'] * 0.75, growth
+
+    print(f"✓ Worker private memory: {growth['preloaded']['kb']} KB shared vs {growth['own']['kb']} KB own copy")
+    print("✅ PASSED")
+
+
+def main():
+    """Run all tests"""
+    test_mapped_bm25_matches_pickle()
+    test_export_reuse()
+    test_prefork_sharing()
+
+    print("\n" + "="*60)
+    print("ALL TESTS PASSED ✅")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Startup Testing Script
+Checks parallel component loading with a shared user index, lazy graph
+analytics, and the API's background startup + /ready endpoint
+"""
+import sys
+import os
+import json
+import time
+import threading
+from types import SimpleNamespace
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.llm_gateway import LLMGateway, StubBackend, set_gateway
+
+
+class OfflineQdrant:
+    """Stands in for an already-connected QdrantSearch"""
+
+    def search(self, query, top_k=10, date_range=None, user_id=None, verbose=False):
+        return []
+
+
+def test_shared_user_index():
+    """user_index.json is parsed once and shared by BM25 and the name resolver"""
+    print("="*60)
+    print("TEST 1: Shared User Index")
+    print("="*60)
+
+    from src.hybrid_retriever import HybridRetriever
+
+    parsed = []
+    original_load = json.load
+
+    def counting_load(f, *args, **kwargs):
+        parsed.append(getattr(f, 'name', '?'))
+        return original_load(f, *args, **kwargs)
+
+    json.load = counting_load
+    try:
+        retriever = HybridRetriever(qdrant_search=OfflineQdrant())
+    finally:
+        json.load = original_load
+
+    user_index_reads = [name for name in parsed if name.endswith('user_index.json')]
+    assert len(user_index_reads) == 1, user_index_reads
+    assert len(retriever.bm25_search.user_index) == len(retriever.name_resolver.user_id_map) > 0
+    assert set(retriever.load_times) == {'qdrant', 'user_index', 'bm25', 'knowledge_graph', 'name_resolver'}
+
+    print(f"✓ user_index.json parsed once for {len(retriever.bm25_search.user_index)} users")
+    print(f"✓ Load times: {retriever.load_times}")
+    print("✅ PASSED")
+
+
+def test_lazy_graph_analytics():
+    """GraphAnalytics is only built by the first ANALYTICS query"""
+    print("\n" + "="*60)
+    print("TEST 2: Lazy Graph Analytics")
+    print("="*60)
+
+    from src.qa_system import QASystem
+    from src.graph_analytics import GraphAnalytics
+    from src.answer_generator import AnswerGenerator
+
+    set_gateway(LLMGateway(backend=StubBackend(lambda model, messages, **kwargs: "{}")))
+
+    # Offline stand-ins for the index-independent components
+    offline = SimpleNamespace(
+        retriever=SimpleNamespace(qdrant_search=OfflineQdrant()),
+        generator=AnswerGenerator(api_key="test-key")
+    )
+    first = QASystem(groq_api_key="test-key", shared_from=offline)
+    # Reload path: share the Qdrant searcher and generator
+    shared = first.reload_indexes()
+
+    assert first._analytics is None and 'graph_analytics' not in first.load_times
+
+    # Concurrent first use builds exactly one instance
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(first.analytics)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(a) for a in seen}) == 1 and isinstance(seen[0], GraphAnalytics)
+    assert seen[0].kg is first.retriever.knowledge_graph and 'graph_analytics' in first.load_times
+
+    assert shared.generator is first.generator
+    assert shared.retriever.qdrant_search is first.retriever.qdrant_search
+    set_gateway(None)
+
+    print(f"✓ Built on first use in {first.load_times['graph_analytics']}s (once across 4 threads)")
+    print("✓ Reloaded system shares the Qdrant searcher and answer generator")
+    print("✅ PASSED")
+
+
+def test_ready_endpoint():
+    """The API serves /ready (503) while the first generation loads in the background"""
+    print("\n" + "="*60)
+    print("TEST 3: Ready Endpoint")
+    print("="*60)
+
+    from fastapi.testclient import TestClient
+    import api
+
+    release = threading.Event()
+
+    class SlowSystem:
+        load_times = {'qdrant': 0.5, 'bm25': 0.2, 'knowledge_graph': 0.3}
+
+        def __init__(self):
+            release.wait(5)
+
+    original = api.load_qa_system
+    api.load_qa_system = lambda previous: SlowSystem()
+    try:
+        with TestClient(api.app) as client:
+            response = client.get("/ready")
+            assert response.status_code == 503 and response.json()['status'] == 'loading'
+            assert client.post("/ask", json={"question": "Who?"}).status_code == 503
+
+            release.set()
+            deadline = time.time() + 5
+            while client.get("/ready").status_code != 200:
+                assert time.time() < deadline
+                time.sleep(0.02)
+
+            ready = client.get("/ready").json()
+            assert ready['status'] == 'ready' and ready['components'] == SlowSystem.load_times
+            assert ready['lazy_components'] == {'graph_analytics': 'on_first_use'}
+
+        def broken_loader(previous):
+            raise RuntimeError("missing bm25.pkl")
+
+        api.load_qa_system = broken_loader
+        with TestClient(api.app) as client:
+            deadline = time.time() + 5
+            while client.get("/ready").json()['status'] == 'loading':
+                assert time.time() < deadline
+                time.sleep(0.02)
+            failed = client.get("/ready")
+            assert failed.status_code == 503 and 'missing bm25.pkl' in failed.json()['error']
+    finally:
+        api.load_qa_system = original
+
+    print("✓ 503 loading → 200 ready with per-component load times")
+    print("✓ Failed startup load reported by /ready")
+    print("✅ PASSED")
+
+
+def main():
+    """Run all tests"""
+    test_shared_user_index()
+    test_lazy_graph_analytics()
+    test_ready_endpoint()
+
+    print("\n" + "="*60)
+    print("ALL TESTS PASSED ✅")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Synthetic Corpus Testing Script
+Checks the generated corpus (ids, user index, triples, normalized dates),
+its ground-truth labels against the benchmark's rule labelling, and that
+the indexes build from it
+"""
+import sys
+import os
+import json
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.date_normalizer import normalize_dates
+from src.bm25_search import BM25Search
+from src.knowledge_graph import KnowledgeGraph
+from benchmarks.retrieval_benchmark import relevant_ids
+from benchmarks.micro_benchmarks import _quiet
+from benchmarks.synthetic_corpus import (
+    SyntheticCorpusGenerator, build_indexes, ENTITIES, INTENTS, SERVICE_OBJECTS
+)
+
+
+def _read_jsonl(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_generated_corpus():
+    """Messages, user index and triples agree; generation is reproducible"""
+    print("="*60)
+    print("TEST 1: Generated Corpus")
+    print("="*60)
+
+    output_dir = tempfile.mkdtemp()
+    manifest = SyntheticCorpusGenerator(messages=3000, users=12, seed=3).write(output_dir, progress_every=0)
+    messages = _read_jsonl(os.path.join(output_dir, "raw_messages.jsonl"))
+    triples = _read_jsonl(os.path.join(output_dir, "triples.jsonl"))
+    with open(os.path.join(output_dir, "user_indexed", "user_index.json")) as f:
+        user_index = json.load(f)
+
+    assert len(messages) == 3000 and manifest['counts']['messages'] == 3000
+    assert len({msg['id'] for msg in messages}) == 3000
+    assert set(messages[0]) == {'id', 'user_id', 'user_name', 'timestamp', 'message', 'normalized_dates'}
+
+    # user_index positions point at that member's messages and cover the corpus
+    assert sum(entry['message_count'] for entry in user_index.values()) == 3000
+    for user_id, entry in user_index.items():
+        assert entry['message_count'] == len(entry['message_indices'])
+        assert all(messages[i]['user_id'] == user_id and messages[i]['user_name'] == entry['user_name']
+                   for i in entry['message_indices'])
+
+    # Zipf activity: the busiest member writes far more than the median one
+    activity = manifest['messages_per_member']
+    assert activity['max'] > 2 * activity['median']
+
+    # Triples reference their message and its author
+    by_id = {msg['id']: msg for msg in messages}
+    assert len(triples) == manifest['counts']['triples'] > 0
+    for triple in triples:
+        msg = by_id[triple['message_id']]
+        assert triple['subject'] == msg['user_name'] and triple['timestamp'] == msg['timestamp']
+    assert {triple['relationship'] for triple in triples} == {rel for _, rel, _, _ in INTENTS.values() if rel}
+
+    # normalized_dates are what the pipeline's normalizer extracts
+    dated = [msg for msg in messages if msg['normalized_dates']]
+    assert dated and len(dated) == manifest['counts']['dated']
+    for msg in messages[:300] + dated[:200]:
+        assert normalize_dates(msg['message'], msg['timestamp']) == msg['normalized_dates'], msg
+
+    # Same seed, same corpus
+    again = next(SyntheticCorpusGenerator(messages=3000, users=12, seed=3).generate())[0]
+    assert again == messages[0]
+
+    print(f"✓ {len(messages)} messages, {len(triples)} triples, {len(user_index)} members "
+          f"(max {activity['max']} / median {activity['median']} messages)")
+    print("✓ Unique ids, consistent user index, triples tied to their messages")
+    print("✓ normalized_dates match normalize_dates(); reproducible from the seed")
+    print("✅ PASSED")
+
+
+def test_templates_and_labels():
+    """Every template/entity gives the expected dates; labels match their rules"""
+    print("\n" + "="*60)
+    print("TEST 2: Templates and Ground-Truth Labels")
+    print("="*60)
+
+    timestamp = "2025-03-02T20:11:28.161737+00:00"
+    phrasings = [(" on May 8, 2025", ["2025-05-08"]), (" next month", ["2025-04-01"]), ("", [])]
+    checked = 0
+    for kind, _, _, templates in INTENTS.values():
+        for template in templates:
+            for entity in (ENTITIES[kind] if kind else [None]):
+                phrase = SERVICE_OBJECTS[entity] if kind == 'service' else entity
+                for when, expected in phrasings:
+                    if when and '{when}' not in template:
+                        continue
+                    text = template.format(e=phrase, when=when)
+                    assert normalize_dates(text, timestamp) == expected, text
+                    checked += 1
+
+    output_dir = tempfile.mkdtemp()
+    SyntheticCorpusGenerator(messages=4000, seed=5).write(output_dir, progress_every=0)
+    messages = _read_jsonl(os.path.join(output_dir, "raw_messages.jsonl"))
+    with open(os.path.join(output_dir, "queries.json")) as f:
+        queries = json.load(f)['queries']
+
+    labelled = [query for query in queries if 'rule' in query]
+    assert {query['category'] for query in labelled} >= {'user_lookup', 'topic', 'temporal'}
+    for query in labelled:
+        assert query['relevant_ids'] == relevant_ids(query['rule'], messages), query['id']
+    # Entity topics always have hits; month-restricted ones may not at this size
+    assert all(query['relevant_ids'] for query in labelled
+               if query['category'] == 'topic' and 'dates' not in query['rule'])
+
+    analytics = [query for query in queries if query['category'] == 'analytics']
+    assert analytics and all(query['answer'] for query in analytics)
+    for query in analytics:
+        members = [item['members'] for item in query['answer']]
+        assert members == sorted(members, reverse=True)
+
+    print(f"✓ {checked} template/entity/date phrasings normalize as generated")
+    print(f"✓ {len(labelled)} labelled queries reproduced by their rules")
+    print(f"✓ {len(analytics)} analytics answers, e.g. {analytics[0]['answer'][0]}")
+    print("✅ PASSED")
+
+
+def test_build_indexes():
+    """The corpus directory loads like data/ (BM25, user index, graph)"""
+    print("\n" + "="*60)
+    print("TEST 3: Index Build")
+    print("="*60)
+
+    output_dir = tempfile.mkdtemp()
+    generator = SyntheticCorpusGenerator(messages=1500, users=6, seed=11)
+    _quiet(generator.write, output_dir, progress_every=0)
+    _quiet(build_indexes, output_dir)
+
+    bm25 = BM25Search()
+    _quiet(bm25.load, os.path.join(output_dir, "bm25"),
+           user_index_path=os.path.join(output_dir, "user_indexed", "user_index.json"))
+    assert len(bm25.messages) == 1500 and len(bm25.user_index) == 6
+
+    member = generator.members[0]
+    results = bm25.search(f"{member['user_name']} table", top_k=5)
+    assert results and results[0][0]['user_name'] == member['user_name']
+
+    graph = KnowledgeGraph()
+    _quiet(graph.load, os.path.join(output_dir, "knowledge_graph.pkl"))
+    assert len(graph.user_index) == 6
+    restaurants = {entity['name'] for entity in graph.entity_dictionary.entities.values()
+                   if entity['type'] == 'restaurant'}
+    assert "Osteria Francescana" in restaurants
+
+    print(f"✓ BM25: {len(bm25.messages)} messages, {len(bm25.user_index)} members")
+    print(f"✓ Graph: {graph.graph.number_of_edges()} edges, {len(restaurants)} restaurants recognised")
+    print("✅ PASSED")
+
+
+def main():
+    """Run all tests"""
+    test_generated_corpus()
+    test_templates_and_labels()
+    test_build_indexes()
+
+    print("\n" + "="*60)
+    print("ALL TESTS PASSED ✅")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
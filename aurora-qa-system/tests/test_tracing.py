@@ -0,0 +1,195 @@
+"""
+Tracing Testing Script
+Checks span nesting and token roll-up, the per-stage breakdown of a full
+(offline) pipeline run, the OTLP/JSON exporter, and /ask metadata.timings
+"""
+import sys
+import os
+import json
+import time
+import tempfile
+from types import SimpleNamespace
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.llm_gateway import LLMGateway, StubBackend, set_gateway
+from src.tracing import start_trace, span, current_span, set_exporter, JSONFileExporter
+
+
+class OfflineQdrant:
+    """Stands in for an already-connected QdrantSearch"""
+
+    def search(self, query, top_k=10, date_range=None, user_id=None, verbose=False):
+        return []
+
+
+def test_span_tree_and_tokens():
+    """Spans nest via the context; LLM usage rolls up to every enclosing span"""
+    print("="*60)
+    print("TEST 1: Span Tree and Token Roll-Up")
+    print("="*60)
+
+    gateway = LLMGateway(backend=StubBackend(lambda model, messages, **kwargs: "a short answer"))
+    llm = gateway.client('answer_generator')
+
+    # Outside a trace spans are no-ops
+    with span("retriever.bm25") as s:
+        s.set_attribute("results", 3)
+    assert current_span() is None
+
+    with start_trace("request") as trace:
+        with span("stage", kind="outer") as outer:
+            with span("inner") as inner:
+                inner.set_attribute("results", 7)
+                llm.chat.completions.create(model="llama-3.1-8b-instant",
+                                            messages=[{"role": "user", "content": "hello there"}])
+            outer.set_attribute("done", True)
+        assert current_span() is trace.root
+    assert current_span() is None
+
+    names = [s.name for s in trace.spans]
+    assert names == ["request", "stage", "inner", "llm.answer_generator"], names
+    llm_span = trace.spans[3]
+    assert llm_span.parent.name == "inner" and llm_span.attributes['model'] == "llama-3.1-8b-instant"
+
+    stats = gateway.stats()['answer_generator']
+    for s in trace.spans:
+        assert s.prompt_tokens == stats['prompt_tokens'] > 0
+        assert s.completion_tokens == stats['completion_tokens'] > 0
+        assert s.end_ns >= s.start_ns
+
+    timings = trace.timings()
+    assert [s['name'] for s in timings['spans']] == names[1:]
+    assert timings['tokens']['prompt'] == stats['prompt_tokens']
+    assert timings['spans'][1]['attributes'] == {'results': 7}
+    assert timings['total_ms'] >= timings['stages']['stage'] >= timings['stages']['inner']
+
+    # Errors are recorded and re-raised
+    try:
+        with start_trace("failing") as failed:
+            with span("boom"):
+                raise ValueError("bad input")
+    except ValueError:
+        pass
+    assert failed.spans[1].error == "ValueError: bad input" and failed.root.error
+
+    print(f"✓ {len(names)} spans nested; tokens rolled up ({stats['prompt_tokens']}+{stats['completion_tokens']})")
+    print("✓ No-op outside a trace; errors recorded on the span")
+    print("✅ PASSED")
+
+
+def test_pipeline_breakdown():
+    """A full LOOKUP answer reports every pipeline stage"""
+    print("\n" + "="*60)
+    print("TEST 2: Pipeline Breakdown")
+    print("="*60)
+
+    from src.qa_system import QASystem
+    from src.answer_generator import AnswerGenerator
+
+    set_gateway(LLMGateway(backend=StubBackend(lambda model, messages, **kwargs: "LOOKUP")))
+    try:
+        offline = SimpleNamespace(
+            retriever=SimpleNamespace(qdrant_search=OfflineQdrant()),
+            generator=AnswerGenerator(api_key="test-key")
+        )
+        system = QASystem(groq_api_key="test-key", shared_from=offline)
+
+        with start_trace("POST /ask") as trace:
+            result = system.answer("What are Vikram Desai's dining preferences?", top_k=5)
+    finally:
+        set_gateway(None)
+
+    timings = trace.timings()
+    expected = ["query_processor.process", "query_processor.route", "query_processor.decompose",
+                "retriever.search", "retriever.detect", "retriever.qdrant", "retriever.bm25",
+                "retriever.graph", "retriever.fusion", "result_composer.compose",
+                "answer_generator.context", "answer_generator.generate", "llm.answer_generator"]
+    for name in expected:
+        assert name in timings['stages'], name
+
+    by_name = {s['name']: s for s in timings['spans']}
+    assert by_name['retriever.bm25']['parent'] == "retriever.search"
+    assert by_name['retriever.bm25']['attributes']['results'] > 0
+    assert by_name['retriever.qdrant']['attributes']['results'] == 0
+    assert by_name['answer_generator.generate']['tokens']['prompt'] == result['tokens']['prompt']
+    assert timings['tokens']['completion'] >= result['tokens']['completion']
+
+    print(f"✓ {len(timings['spans'])} spans, total {timings['total_ms']:.1f}ms")
+    for name in ("query_processor.process", "retriever.search", "answer_generator.generate_with_sources"):
+        print(f"   {name}: {timings['stages'][name]:.1f}ms")
+    print("✅ PASSED")
+
+
+def test_otlp_export_and_api():
+    """Traces are exported as OTLP/JSON; /ask returns timings on request"""
+    print("\n" + "="*60)
+    print("TEST 3: OTLP Export and /ask Timings")
+    print("="*60)
+
+    from fastapi.testclient import TestClient
+    import api
+
+    class TracedSystem:
+        def __init__(self):
+            self.retriever = self
+            self.generator = self
+
+        def answer(self, query, **kwargs):
+            with span("retriever.search") as s:
+                s.set_attribute("results", 2)
+            return {'answer': "ok", 'route': 'LOOKUP', 'sources': [], 'num_sources': 0}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        export_path = os.path.join(tmp, 'traces', 'traces.jsonl')
+        set_exporter(JSONFileExporter(export_path))
+        original = api.load_qa_system
+        api.load_qa_system = lambda previous: TracedSystem()
+        try:
+            with TestClient(api.app) as client:
+                # The first generation loads in the background
+                deadline = time.time() + 5
+                while client.get("/ready").status_code != 200:
+                    assert time.time() < deadline, "API never became ready"
+                    time.sleep(0.02)
+                plain = client.post("/ask", json={"question": "Who?"}).json()
+                timed = client.post("/ask", json={"question": "Who?", "include_timings": True}).json()
+        finally:
+            api.load_qa_system = original
+            set_exporter(None)
+
+        with open(export_path) as f:
+            exported = [json.loads(line) for line in f]
+
+    assert 'timings' not in plain['metadata'] and plain['metadata']['trace_id']
+    timings = timed['metadata']['timings']
+    assert timings['trace_id'] == timed['metadata']['trace_id']
+    assert timings['spans'][0]['name'] == "retriever.search" and timings['spans'][0]['parent'] == "POST /ask"
+
+    assert len(exported) == 2
+    spans = exported[1]['resourceSpans'][0]['scopeSpans'][0]['spans']
+    root, child = spans
+    assert root['name'] == "POST /ask" and 'parentSpanId' not in root
+    assert child['parentSpanId'] == root['spanId'] and child['traceId'] == root['traceId'] == timings['trace_id']
+    assert len(root['traceId']) == 32 and len(root['spanId']) == 16
+    assert int(child['endTimeUnixNano']) >= int(child['startTimeUnixNano']) >= int(root['startTimeUnixNano'])
+    assert {'key': 'results', 'value': {'intValue': '2'}} in child['attributes']
+    assert {'key': 'route', 'value': {'stringValue': 'LOOKUP'}} in root['attributes']
+
+    print("✓ metadata.timings only when include_timings is set")
+    print(f"✓ {len(exported)} traces exported as OTLP/JSON (parent/child ids linked)")
+    print("✅ PASSED")
+
+
+def main():
+    """Run all tests"""
+    test_span_tree_and_tokens()
+    test_pipeline_breakdown()
+    test_otlp_export_and_api()
+
+    print("\n" + "="*60)
+    print("ALL TESTS PASSED ✅")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()